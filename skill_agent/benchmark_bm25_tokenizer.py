@@ -0,0 +1,105 @@
+"""
+BM25 分词器基准
+用同一批技能检索文本分别以 ngram（单字 + 二元组）与词典分词建立 BM25 索引，
+对比词表大小、倒排项数、快照文件大小、建索引耗时与查询延迟
+
+用法:
+    python benchmark_bm25_tokenizer.py --skills ../ai_agent_for_skill/Assets/Skills --repeat 50
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+# 设置UTF-8编码输出（Windows兼容）
+if sys.platform == 'win32':
+    import io
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8', errors='replace')
+
+QUERIES = [
+    "眩晕敌人的技能",
+    "击退",
+    "护盾 治疗",
+    "火焰范围伤害",
+    "冲锋后击晕目标",
+    "冰霜减速",
+    "召唤物",
+    "持续伤害 燃烧",
+    "闪现突进",
+    "DamageAction 暴击",
+]
+
+
+def run_tokenizer(config, texts, queries, rounds: int):
+    from core.bm25_tokenizer import create_tokenizer
+    from core.hybrid_search import BM25Index
+
+    tokenizer = create_tokenizer(config)
+    index = BM25Index(tokenizer=tokenizer)
+    doc_ids = [f"doc_{i}" for i in range(len(texts))]
+
+    start = time.perf_counter()
+    index.add_documents(texts, doc_ids)
+    build_seconds = time.perf_counter() - start
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "bench.bm25")
+        index.save(path)
+        file_bytes = os.path.getsize(path)
+
+    # 预热（编译倒排数组）
+    for query in queries:
+        index.search(query, top_k=10)
+    latencies = []
+    for _ in range(rounds):
+        for query in queries:
+            t = time.perf_counter()
+            index.search(query, top_k=10)
+            latencies.append((time.perf_counter() - t) * 1000)
+    latencies.sort()
+
+    postings = sum(len(p) for p in index.inverted_index.values())
+    return {
+        "signature": tokenizer.signature,
+        "vocabulary_size": len(index.inverted_index),
+        "postings": postings,
+        "avg_doc_length": round(index.avg_doc_length, 1),
+        "snapshot_kb": round(file_bytes / 1024, 1),
+        "build_ms": round(build_seconds * 1000, 1),
+        "query_ms_avg": round(sum(latencies) / len(latencies), 3),
+        "query_ms_p95": round(latencies[int(len(latencies) * 0.95) - 1], 3),
+        "sample_tokens": tokenizer.tokenize(queries[0]),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark BM25 tokenizers")
+    parser.add_argument("--skills", default="../ai_agent_for_skill/Assets/Skills")
+    parser.add_argument("--repeat", type=int, default=50)
+    parser.add_argument("--rounds", type=int, default=50)
+    args = parser.parse_args()
+
+    from benchmark_indexing import load_search_texts
+
+    texts = load_search_texts(args.skills, args.repeat)
+    print(f"Loaded {len(texts)} search texts")
+
+    results = {}
+    for name, config in [
+        ("ngram", {"type": "ngram"}),
+        ("dictionary", {"type": "dictionary", "ngram_fallback": True}),
+        ("dictionary_unigram", {"type": "dictionary", "ngram_fallback": False}),
+    ]:
+        results[name] = run_tokenizer(config, texts, QUERIES, args.rounds)
+        print(f"{name}: {results[name]}")
+
+    print(json.dumps({"texts": len(texts), "results": results}, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""
+嵌入后端对比基准
+在同一批文本上依次运行 sentence_transformers / onnx(fp32) / onnx(int8) 后端，
+输出吞吐、单条延迟以及与 SentenceTransformer 结果的余弦一致性
+
+用法:
+    python benchmark_embedding_backends.py --model Data/models/Qwen3-Embedding-0.6B --threads 8
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import numpy as np
+
+# 设置UTF-8编码输出（Windows兼容）
+if sys.platform == 'win32':
+    import io
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8', errors='replace')
+
+SAMPLE_TEXTS = [
+    "释放一道火焰冲击波，对敌人造成魔法伤害",
+    "召唤一个火元素，持续攻击敌人",
+    "冰霜新星，冻结周围敌人并造成冰霜伤害",
+    "闪电链，对多个敌人造成雷电伤害",
+    "护盾术，为目标添加护盾保护",
+    "治疗光环，恢复周围友军生命值",
+    "冲锋：向前位移并击退路径上的敌人",
+    "Blink forward and leave a trail of fire that damages enemies",
+]
+
+
+def _run_backend(model_path, backend, texts, batch_size, threads, onnx_path, quantize):
+    from core.embeddings import EmbeddingGenerator
+
+    config = {
+        "model_name": model_path,
+        "cache_path": None,
+        "l1_cache_size": 1,
+        "backend": backend,
+        "onnx_path": onnx_path,
+        "onnx_quantize": quantize,
+        "onnx_intra_op_threads": threads,
+    }
+    load_start = time.perf_counter()
+    generator = EmbeddingGenerator(config)
+    load_time = time.perf_counter() - load_start
+
+    # 预热一次，排除首批次的图优化开销
+    generator._encode_batch_sync(texts[:batch_size], batch_size)
+
+    start = time.perf_counter()
+    batch = np.stack(generator._encode_batch_sync(texts, batch_size))
+    batch_time = time.perf_counter() - start
+
+    single_times = []
+    for text in texts[:16]:
+        t0 = time.perf_counter()
+        generator._encode_batch_sync([text], 1, prompt_name="query")
+        single_times.append(time.perf_counter() - t0)
+
+    return batch, {
+        "load_s": round(load_time, 2),
+        "texts_per_s": round(len(texts) / batch_time, 1),
+        "single_p50_ms": round(float(np.percentile(single_times, 50)) * 1000, 2),
+        "single_p95_ms": round(float(np.percentile(single_times, 95)) * 1000, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark embedding backends side by side")
+    parser.add_argument("--model", default="Data/models/Qwen3-Embedding-0.6B")
+    parser.add_argument("--onnx-path", default=None, help="ONNX 导出目录（默认 <model>/onnx）")
+    parser.add_argument("--threads", type=int, default=os.cpu_count())
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--repeat", type=int, default=32, help="样例文本重复次数")
+    args = parser.parse_args()
+
+    texts = [f"{t} #{i}" for i in range(args.repeat) for t in SAMPLE_TEXTS]
+    variants = [
+        ("sentence_transformers", "sentence_transformers", None, False),
+        ("onnx-fp32", "onnx", (args.onnx_path or os.path.join(args.model, "onnx")) + "-fp32", False),
+        ("onnx-int8", "onnx", args.onnx_path, True),
+    ]
+
+    results = {}
+    reference = None
+    for label, backend, onnx_path, quantize in variants:
+        vectors, stats = _run_backend(
+            args.model, backend, texts, args.batch_size, args.threads, onnx_path, quantize
+        )
+        if reference is None:
+            reference = vectors
+        cosines = (vectors * reference).sum(axis=1) / (
+            np.linalg.norm(vectors, axis=1) * np.linalg.norm(reference, axis=1)
+        )
+        stats["cosine_vs_st_min"] = round(float(cosines.min()), 5)
+        stats["cosine_vs_st_mean"] = round(float(cosines.mean()), 5)
+        results[label] = stats
+        print(f"{label:>22}: {stats}")
+
+    print(json.dumps({"texts": len(texts), "threads": args.threads, "results": results},
+                     ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""
+索引编码基准
+解析技能目录，用 SkillIndexer.build_search_text 生成检索文本，
+分别以固定批大小与按 token 长度分桶的动态批处理编码，对比耗时与填充率
+
+用法:
+    python benchmark_indexing.py --skills ../ai_agent_for_skill/Assets/Skills --repeat 20
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+# 设置UTF-8编码输出（Windows兼容）
+if sys.platform == 'win32':
+    import io
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8', errors='replace')
+
+
+def load_search_texts(skills_directory: str, repeat: int):
+    """解析技能文件并生成检索文本；repeat>1 时加后缀复制，模拟更大的技能库"""
+    from core.skill_indexer import SkillIndexer
+
+    indexer = SkillIndexer({
+        "skills_directory": skills_directory,
+        "index_cache": os.path.join(tempfile.gettempdir(), "benchmark_skill_index.json"),
+    })
+    texts = []
+    for file_path in indexer.scan_skills():
+        skill = indexer.parse_skill_file(file_path)
+        if skill:
+            texts.append(indexer.build_search_text(skill))
+    return [f"{text}\n#{i}" for i in range(repeat) for text in texts]
+
+
+def run_encode(model_path: str, texts, batch_size: int, token_budget, backend: str, max_length: int):
+    from core.embeddings import EmbeddingGenerator
+
+    generator = EmbeddingGenerator({
+        "model_name": model_path,
+        "backend": backend,
+        "batch_size": batch_size,
+        "max_length": max_length,
+        "batch_token_budget": token_budget,
+        "cache_path": None,
+    })
+    # 预热
+    generator.encode(texts[:2], use_cache=False)
+    generator._batch_stats = {"batches": 0, "texts": 0, "tokens": 0, "padded_tokens": 0}
+
+    start = time.perf_counter()
+    generator.encode(texts, use_cache=False)
+    elapsed = time.perf_counter() - start
+
+    stats = generator.get_batching_stats()
+    if not token_budget:
+        # 固定批模式未统计 token，这里按 SentenceTransformer 的切分方式（按字符数降序）补算填充率
+        order = sorted(range(len(texts)), key=lambda i: -len(texts[i]))
+        token_lengths = generator._token_lengths(texts)
+        lengths = [token_lengths[i] for i in order]
+        padded = sum(
+            len(lengths[i:i + batch_size]) * max(lengths[i:i + batch_size])
+            for i in range(0, len(lengths), batch_size)
+        )
+        stats["tokens"] = sum(lengths)
+        stats["padded_tokens"] = padded
+        stats["padding_ratio"] = round(1 - sum(lengths) / padded, 4) if padded else 0.0
+    stats["seconds"] = round(elapsed, 2)
+    stats["texts_per_s"] = round(len(texts) / elapsed, 1) if elapsed else 0.0
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark fixed vs length-bucketed embedding batches")
+    parser.add_argument("--model", default="Data/models/Qwen3-Embedding-0.6B")
+    parser.add_argument("--skills", default="../ai_agent_for_skill/Assets/Skills")
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument("--backend", default="sentence_transformers")
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--token-budget", type=int, default=16384)
+    parser.add_argument("--max-length", type=int, default=8192)
+    args = parser.parse_args()
+
+    texts = load_search_texts(args.skills, args.repeat)
+    print(f"Loaded {len(texts)} search texts")
+
+    fixed = run_encode(args.model, texts, args.batch_size, None, args.backend, args.max_length)
+    print(f"fixed batch_size={args.batch_size}: {fixed}")
+    bucketed = run_encode(args.model, texts, args.batch_size, args.token_budget, args.backend, args.max_length)
+    print(f"bucketed token_budget={args.token_budget}: {bucketed}")
+
+    speedup = fixed["seconds"] / bucketed["seconds"] if bucketed["seconds"] else 0.0
+    print(json.dumps({
+        "texts": len(texts),
+        "fixed": fixed,
+        "bucketed": bucketed,
+        "speedup": round(speedup, 2),
+    }, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,242 @@
+"""
+BM25 索引磁盘格式
+把倒排索引序列化为单个二进制文件，启动时通过 mmap 直接映射，无需重新解析技能文件
+
+文件布局（小端）：
+    8 字节 magic | 8 字节头部长度 | 头部 JSON | 按 8 字节对齐的数组区
+数组区：
+    terms / doc_ids      以 \\0 分隔的 UTF-8 字节串（加载时一次性解码成字典）
+    term_offsets         int64[V+1]，每个词项的倒排表在 postings_* 中的区间
+    postings_doc         int32[P]，按文档序号升序
+    postings_tf          int32[P]
+    doc_lengths          int32[N]
+    documents / metadatas  UTF-8 字节区 + int64[N+1] 偏移（按需解码单条）
+
+头部中的 index_version 由上层写入（通常是向量表版本号），用于判断快照是否过期。
+"""
+
+import json
+import logging
+import os
+import struct
+from collections.abc import Mapping
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+BM25_FILE_MAGIC = b"SKBM25\x00\x00"
+BM25_FORMAT_VERSION = 1
+
+_HEADER_PREFIX = struct.Struct("<8sQ")
+_ALIGN = 8
+_SEPARATOR = "\x00"
+
+
+def _align(offset: int) -> int:
+    return (offset + _ALIGN - 1) // _ALIGN * _ALIGN
+
+
+def _pack_keys(keys: List[str]) -> np.ndarray:
+    return np.frombuffer(_SEPARATOR.join(keys).encode("utf-8"), dtype=np.uint8)
+
+
+def _unpack_keys(blob: np.ndarray, count: int) -> List[str]:
+    if count == 0:
+        return []
+    return blob.tobytes().decode("utf-8").split(_SEPARATOR)
+
+
+def _pack_values(values: List[str]) -> Tuple[np.ndarray, np.ndarray]:
+    encoded = [v.encode("utf-8") for v in values]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum([len(e) for e in encoded], dtype=np.int64)
+    return np.frombuffer(b"".join(encoded), dtype=np.uint8), offsets
+
+
+class _PackedValues(Mapping):
+    """doc_id -> 值的只读映射，值从 mmap 字节区按需解码"""
+
+    def __init__(
+        self,
+        doc_index: Dict[str, int],
+        blob: np.ndarray,
+        offsets: np.ndarray,
+        decode: Callable[[str], Any],
+    ):
+        self._doc_index = doc_index
+        self._blob = blob
+        self._offsets = offsets
+        self._decode = decode
+
+    def __getitem__(self, doc_id: str) -> Any:
+        i = self._doc_index[doc_id]
+        raw = self._blob[self._offsets[i]:self._offsets[i + 1]].tobytes()
+        return self._decode(raw.decode("utf-8"))
+
+    def __contains__(self, doc_id: object) -> bool:
+        return doc_id in self._doc_index
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._doc_index)
+
+    def __len__(self) -> int:
+        return len(self._doc_index)
+
+
+class BM25Segment:
+    """mmap 映射的只读 BM25 索引段"""
+
+    def __init__(self, path: str, header: Dict[str, Any], arrays: Dict[str, np.ndarray]):
+        self.path = path
+        self.header = header
+        self.doc_ids = _unpack_keys(arrays["doc_ids"], header["doc_count"])
+        self.terms = _unpack_keys(arrays["terms"], header["vocabulary_size"])
+        self.doc_index = {doc_id: i for i, doc_id in enumerate(self.doc_ids)}
+        self.term_index = {term: i for i, term in enumerate(self.terms)}
+
+        self.term_offsets = arrays["term_offsets"]
+        self.postings_doc = arrays["postings_doc"]
+        self.postings_tf = arrays["postings_tf"]
+        self.doc_lengths = arrays["doc_lengths"]
+
+        self.documents = _PackedValues(
+            self.doc_index, arrays["documents"], arrays["document_offsets"], lambda s: s
+        )
+        self.metadatas = _PackedValues(
+            self.doc_index, arrays["metadatas"], arrays["metadata_offsets"], json.loads
+        )
+
+    @property
+    def doc_count(self) -> int:
+        return len(self.doc_ids)
+
+    @property
+    def index_version(self) -> Any:
+        return self.header.get("index_version")
+
+    def postings(self, term: str) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+        """返回 (文档序号数组, 词频数组)，词项不存在时返回 None"""
+        tid = self.term_index.get(term)
+        if tid is None:
+            return None
+        start, end = self.term_offsets[tid], self.term_offsets[tid + 1]
+        return self.postings_doc[start:end], self.postings_tf[start:end]
+
+    def doc_freq(self, term: str) -> int:
+        tid = self.term_index.get(term)
+        if tid is None:
+            return 0
+        return int(self.term_offsets[tid + 1] - self.term_offsets[tid])
+
+
+def write_bm25_file(
+    path: str,
+    documents: Mapping,
+    doc_lengths: Mapping,
+    inverted_index: Mapping,
+    metadatas: Optional[Mapping] = None,
+    **header_fields: Any,
+) -> None:
+    """
+    把 BM25 索引写入磁盘（先写临时文件再原子替换）
+
+    Args:
+        path: 目标文件路径
+        documents: doc_id -> 文档文本
+        doc_lengths: doc_id -> 分词后长度
+        inverted_index: term -> {doc_id: tf}
+        metadatas: doc_id -> 元数据（可选）
+        **header_fields: 写入头部的附加字段（k1、b、index_version 等）
+    """
+    metadatas = metadatas or {}
+    doc_ids = list(documents)
+    doc_index = {doc_id: i for i, doc_id in enumerate(doc_ids)}
+    terms = sorted(inverted_index)
+
+    term_offsets = np.zeros(len(terms) + 1, dtype=np.int64)
+    postings_doc: List[int] = []
+    postings_tf: List[int] = []
+    for t, term in enumerate(terms):
+        pairs = sorted((doc_index[d], tf) for d, tf in inverted_index[term].items() if d in doc_index)
+        postings_doc.extend(p[0] for p in pairs)
+        postings_tf.extend(p[1] for p in pairs)
+        term_offsets[t + 1] = len(postings_doc)
+
+    document_blob, document_offsets = _pack_values([documents[d] for d in doc_ids])
+    metadata_blob, metadata_offsets = _pack_values([
+        json.dumps(metadatas.get(d) or {}, ensure_ascii=False, default=str) for d in doc_ids
+    ])
+
+    arrays = {
+        "doc_ids": _pack_keys(doc_ids),
+        "terms": _pack_keys(terms),
+        "term_offsets": term_offsets,
+        "postings_doc": np.asarray(postings_doc, dtype=np.int32),
+        "postings_tf": np.asarray(postings_tf, dtype=np.int32),
+        "doc_lengths": np.asarray([doc_lengths[d] for d in doc_ids], dtype=np.int32),
+        "documents": document_blob,
+        "document_offsets": document_offsets,
+        "metadatas": metadata_blob,
+        "metadata_offsets": metadata_offsets,
+    }
+
+    sections: Dict[str, Dict[str, Any]] = {}
+    offset = 0
+    for name, array in arrays.items():
+        sections[name] = {"offset": offset, "dtype": array.dtype.str, "length": int(array.size)}
+        offset = _align(offset + array.nbytes)
+
+    header = {
+        **header_fields,
+        "format_version": BM25_FORMAT_VERSION,
+        "doc_count": len(doc_ids),
+        "vocabulary_size": len(terms),
+        "sections": sections,
+    }
+    header_bytes = json.dumps(header, ensure_ascii=False, default=str).encode("utf-8")
+    data_start = _align(_HEADER_PREFIX.size + len(header_bytes))
+
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(_HEADER_PREFIX.pack(BM25_FILE_MAGIC, len(header_bytes)))
+        f.write(header_bytes)
+        for name, array in arrays.items():
+            f.seek(data_start + sections[name]["offset"])
+            f.write(array.tobytes())
+        f.truncate(data_start + offset)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def read_bm25_header(path: str) -> Dict[str, Any]:
+    """只读取头部（用于版本检查，不映射数组区）"""
+    with open(path, "rb") as f:
+        magic, header_len = _HEADER_PREFIX.unpack(f.read(_HEADER_PREFIX.size))
+        if magic != BM25_FILE_MAGIC:
+            raise ValueError(f"Not a BM25 index file: {path}")
+        header = json.loads(f.read(header_len).decode("utf-8"))
+    if header.get("format_version") != BM25_FORMAT_VERSION:
+        raise ValueError(
+            f"Unsupported BM25 format version {header.get('format_version')} in {path}"
+        )
+    header["_data_start"] = _align(_HEADER_PREFIX.size + header_len)
+    return header
+
+
+def open_bm25_file(path: str, header: Optional[Dict[str, Any]] = None) -> BM25Segment:
+    """mmap 打开 BM25 索引文件"""
+    header = header or read_bm25_header(path)
+    data = np.memmap(path, dtype=np.uint8, mode="r")
+    start = header["_data_start"]
+
+    arrays: Dict[str, np.ndarray] = {}
+    for name, section in header["sections"].items():
+        dtype = np.dtype(section["dtype"])
+        begin = start + section["offset"]
+        arrays[name] = data[begin:begin + section["length"] * dtype.itemsize].view(dtype)
+
+    return BM25Segment(path, header, arrays)
@@ -0,0 +1,185 @@
+"""
+BM25 分词器
+提供可替换的分词接口：
+- NgramTokenizer: 中文按单字 + 二元组切分（原有行为）
+- DictionaryTokenizer: 用 Aho–Corasick 自动机匹配游戏术语词典（眩晕/击退/护盾 等作为整词），
+  未被词典覆盖的中文片段再按单字（可选二元组）切分
+
+任何实现了 tokenize(text) 与 signature 属性的对象都可以传给 BM25Index；
+signature 会写入 BM25 快照，分词器变化后旧快照自动失效。
+"""
+
+import hashlib
+import logging
+import re
+from collections import deque
+from typing import Dict, Iterable, Iterator, List, Optional, Protocol, Tuple
+
+logger = logging.getLogger(__name__)
+
+TOKENIZER_NGRAM = "ngram"
+TOKENIZER_DICTIONARY = "dictionary"
+
+CHINESE_PATTERN = re.compile(r'[\u4e00-\u9fff]+')
+ENGLISH_PATTERN = re.compile(r'[a-z0-9]+')
+
+
+class Tokenizer(Protocol):
+    """BM25 分词器接口"""
+
+    signature: str
+
+    def tokenize(self, text: str) -> List[str]: ...
+
+
+def _append_ngrams(tokens: List[str], chinese_text: str, bigrams: bool) -> None:
+    for i in range(len(chinese_text)):
+        tokens.append(chinese_text[i])
+        if bigrams and i < len(chinese_text) - 1:
+            tokens.append(chinese_text[i:i + 2])
+
+
+class NgramTokenizer:
+    """中文单字 + 二元组、英文按单词的分词器"""
+
+    signature = TOKENIZER_NGRAM
+
+    def tokenize(self, text: str) -> List[str]:
+        if not text:
+            return []
+        tokens: List[str] = []
+        for match in CHINESE_PATTERN.finditer(text):
+            _append_ngrams(tokens, match.group(), bigrams=True)
+        tokens.extend(ENGLISH_PATTERN.findall(text.lower()))
+        return tokens
+
+
+class _AhoCorasick:
+    """多模式串匹配自动机（输出每个匹配的起点与长度）"""
+
+    def __init__(self, patterns: Iterable[str]):
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[Tuple[int, ...]] = [()]
+
+        for pattern in patterns:
+            node = 0
+            for ch in pattern:
+                nxt = self._goto[node].get(ch)
+                if nxt is None:
+                    nxt = len(self._goto)
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._out.append(())
+                    self._goto[node][ch] = nxt
+                node = nxt
+            if len(pattern) not in self._out[node]:
+                self._out[node] += (len(pattern),)
+
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for ch, nxt in self._goto[node].items():
+                queue.append(nxt)
+                f = self._fail[node]
+                while f and ch not in self._goto[f]:
+                    f = self._fail[f]
+                self._fail[nxt] = self._goto[f].get(ch, 0)
+                self._out[nxt] += self._out[self._fail[nxt]]
+
+    def iter_matches(self, text: str) -> Iterator[Tuple[int, int]]:
+        goto, fail, out = self._goto, self._fail, self._out
+        node = 0
+        for i, ch in enumerate(text):
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+            for length in out[node]:
+                yield i - length + 1, length
+
+
+class DictionaryTokenizer:
+    """
+    基于游戏术语词典的分词器
+
+    中文按最左最长匹配切出词典词，同时输出被长词覆盖的短词典词
+    （“范围伤害”还会输出“范围”“伤害”），保证短查询仍能命中。
+    """
+
+    def __init__(self, terms: Iterable[str], ngram_fallback: bool = True):
+        """
+        Args:
+            terms: 词典词（只保留含中文的词，英文由单词切分处理）
+            ngram_fallback: 未覆盖的中文片段是否额外输出二元组（否则只输出单字）
+        """
+        self.terms = sorted({t.lower() for t in terms if t and CHINESE_PATTERN.search(t)})
+        self.ngram_fallback = ngram_fallback
+        self._automaton = _AhoCorasick(self.terms)
+
+        digest = hashlib.md5("\n".join(self.terms).encode("utf-8")).hexdigest()[:12]
+        fallback = "bigram" if ngram_fallback else "unigram"
+        self.signature = f"{TOKENIZER_DICTIONARY}:{fallback}:{digest}"
+
+    def tokenize(self, text: str) -> List[str]:
+        if not text:
+            return []
+        lowered = text.lower()
+        tokens: List[str] = []
+
+        # 1. 词典匹配：最左最长切分，长词内部的词典词一并输出
+        matches = list(self._automaton.iter_matches(lowered))
+        span_end = [0] * len(lowered)
+        if matches:
+            longest: Dict[int, int] = {}
+            for start, length in matches:
+                if length > longest.get(start, 0):
+                    longest[start] = length
+            end = 0
+            for start in sorted(longest):
+                if start < end:
+                    continue
+                end = start + longest[start]
+                for p in range(start, end):
+                    span_end[p] = end
+            for start, length in matches:
+                if span_end[start] and start + length <= span_end[start]:
+                    tokens.append(lowered[start:start + length])
+
+        # 2. 未覆盖的中文片段按单字 / 二元组切分
+        for match in CHINESE_PATTERN.finditer(lowered):
+            run_start = None
+            for p in range(match.start(), match.end() + 1):
+                uncovered = p < match.end() and not span_end[p]
+                if uncovered and run_start is None:
+                    run_start = p
+                elif not uncovered and run_start is not None:
+                    _append_ngrams(tokens, lowered[run_start:p], self.ngram_fallback)
+                    run_start = None
+
+        # 3. 英文单词
+        tokens.extend(ENGLISH_PATTERN.findall(lowered))
+        return tokens
+
+
+def game_vocabulary() -> List[str]:
+    """GameTermMapper 中的全部术语（标准词与变体）"""
+    from .query_understanding import GameTermMapper
+
+    return list(GameTermMapper().term_to_category)
+
+
+def create_tokenizer(config: Optional[dict] = None) -> Tokenizer:
+    """
+    根据配置创建分词器
+
+    Args:
+        config: {"type": "dictionary" | "ngram", "ngram_fallback": bool, "extra_terms": [...]}
+    """
+    config = config or {}
+    tokenizer_type = config.get("type", TOKENIZER_DICTIONARY)
+    if tokenizer_type == TOKENIZER_NGRAM:
+        return NgramTokenizer()
+    if tokenizer_type == TOKENIZER_DICTIONARY:
+        terms = game_vocabulary() + list(config.get("extra_terms") or [])
+        return DictionaryTokenizer(terms, ngram_fallback=config.get("ngram_fallback", True))
+    raise ValueError(f"Unknown BM25 tokenizer type: {tokenizer_type}")
@@ -0,0 +1,332 @@
+"""
+嵌入推理后端
+为 EmbeddingGenerator 提供可替换的模型推理实现
+
+- sentence_transformers: 默认后端，直接使用 SentenceTransformer（PyTorch）
+- onnx: 首次使用时把 Transformer 主干导出为 ONNX，并做 int8 动态量化，
+  之后通过 onnxruntime 在 CPU 上推理；分词、prompt 拼接与池化方式
+  与 SentenceTransformer 保持一致，输出可与已缓存的向量直接比较
+
+两个后端都暴露与 SentenceTransformer 相同的最小接口：
+encode() / get_sentence_embedding_dimension() / max_seq_length
+"""
+
+import json
+import logging
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# 支持的后端名称
+BACKEND_SENTENCE_TRANSFORMERS = "sentence_transformers"
+BACKEND_ONNX = "onnx"
+SUPPORTED_BACKENDS = (BACKEND_SENTENCE_TRANSFORMERS, BACKEND_ONNX)
+
+# ONNX 导出产物
+ONNX_MODEL_FILE = "model.onnx"
+ONNX_QUANTIZED_MODEL_FILE = "model.int8.onnx"
+ONNX_EXPORT_META_FILE = "export_meta.json"
+ONNX_EXPORT_META_VERSION = 1
+ONNX_DEFAULT_OPSET = 17
+
+
+def _require_onnxruntime():
+    try:
+        import onnxruntime
+    except ImportError:
+        raise RuntimeError(
+            "ONNX embedding backend requires onnxruntime. Install with: pip install onnxruntime"
+        )
+    return onnxruntime
+
+
+def _pooling_mode(pooling_module) -> str:
+    """从 SentenceTransformer 的 Pooling 模块解析池化方式"""
+    if pooling_module is None:
+        return "mean"
+    config = pooling_module.get_config_dict()
+    if config.get("pooling_mode_lasttoken"):
+        return "lasttoken"
+    if config.get("pooling_mode_cls_token"):
+        return "cls"
+    if config.get("pooling_mode_max_tokens"):
+        return "max"
+    return "mean"
+
+
+def pool_hidden_states(hidden: np.ndarray, attention_mask: np.ndarray, mode: str) -> np.ndarray:
+    """
+    按 SentenceTransformer 的池化语义把 token 向量聚合为句向量
+
+    Args:
+        hidden: [batch, seq, dim] 最后一层隐状态
+        attention_mask: [batch, seq] 注意力掩码
+        mode: lasttoken / cls / max / mean
+
+    Returns:
+        [batch, dim] float32 句向量
+    """
+    mask = attention_mask.astype(np.float32)
+    if mode == "lasttoken":
+        # 兼容左/右填充：取每行最后一个有效 token
+        seq_len = mask.shape[1]
+        last = seq_len - 1 - np.argmax(mask[:, ::-1], axis=1)
+        pooled = hidden[np.arange(hidden.shape[0]), last]
+    elif mode == "cls":
+        pooled = hidden[:, 0]
+    elif mode == "max":
+        masked = np.where(mask[:, :, None] > 0, hidden, -1e9)
+        pooled = masked.max(axis=1)
+    else:
+        summed = (hidden * mask[:, :, None]).sum(axis=1)
+        counts = np.clip(mask.sum(axis=1, keepdims=True), 1e-9, None)
+        pooled = summed / counts
+    return np.asarray(pooled, dtype=np.float32)
+
+
+def _l2_normalize(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return matrix / np.clip(norms, 1e-12, None)
+
+
+def export_onnx_model(
+    model_path: str,
+    output_dir: str,
+    quantize: bool = True,
+    opset: int = ONNX_DEFAULT_OPSET,
+    weights_digest: str = "",
+) -> Dict[str, Any]:
+    """
+    把 SentenceTransformer 模型导出为 ONNX（可选 int8 动态量化）
+
+    只导出 Transformer 主干（input_ids/attention_mask -> last_hidden_state），
+    池化与归一化在 numpy 中完成，导出元数据写入 export_meta.json。
+
+    Args:
+        model_path: 本地模型路径
+        output_dir: 导出目录
+        quantize: 是否生成 int8 动态量化模型
+        opset: ONNX opset 版本
+        weights_digest: 原模型权重摘要，用于判断导出产物是否过期
+
+    Returns:
+        导出元数据
+    """
+    import torch
+    from sentence_transformers import SentenceTransformer
+
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    logger.info(f"Exporting {model_path} to ONNX at {output_dir}")
+    start = time.time()
+    st_model = SentenceTransformer(model_path, device="cpu")
+    transformer = st_model[0]
+    pooling = None
+    for module in st_model:
+        if module.__class__.__name__ == "Pooling":
+            pooling = module
+    tokenizer = transformer.tokenizer
+    auto_model = transformer.auto_model.eval()
+
+    class _Backbone(torch.nn.Module):
+        def __init__(self, model):
+            super().__init__()
+            self.model = model
+
+        def forward(self, input_ids, attention_mask):
+            kwargs = {"input_ids": input_ids, "attention_mask": attention_mask}
+            if getattr(self.model.config, "use_cache", False):
+                kwargs["use_cache"] = False
+            return self.model(**kwargs).last_hidden_state
+
+    sample = tokenizer(["export sample", "导出样例文本"], padding=True, return_tensors="pt")
+    fp32_path = output_dir / ONNX_MODEL_FILE
+    export_kwargs = {
+        "input_names": ["input_ids", "attention_mask"],
+        "output_names": ["last_hidden_state"],
+        "dynamic_axes": {
+            "input_ids": {0: "batch", 1: "sequence"},
+            "attention_mask": {0: "batch", 1: "sequence"},
+            "last_hidden_state": {0: "batch", 1: "sequence"},
+        },
+        "opset_version": opset,
+        "do_constant_folding": True,
+    }
+    # 新版 torch 默认走 dynamo 导出器，这里固定使用 TorchScript 导出以支持 dynamic_axes
+    try:
+        import inspect
+        if "dynamo" in inspect.signature(torch.onnx.export).parameters:
+            export_kwargs["dynamo"] = False
+    except (TypeError, ValueError):
+        pass
+    with torch.no_grad():
+        torch.onnx.export(
+            _Backbone(auto_model),
+            (sample["input_ids"], sample["attention_mask"]),
+            str(fp32_path),
+            **export_kwargs,
+        )
+
+    model_file = ONNX_MODEL_FILE
+    if quantize:
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+
+        quantize_dynamic(
+            str(fp32_path),
+            str(output_dir / ONNX_QUANTIZED_MODEL_FILE),
+            weight_type=QuantType.QInt8,
+        )
+        model_file = ONNX_QUANTIZED_MODEL_FILE
+
+    tokenizer.save_pretrained(str(output_dir))
+    meta = {
+        "meta_version": ONNX_EXPORT_META_VERSION,
+        "source_model": str(model_path),
+        "weights_digest": weights_digest,
+        "model_file": model_file,
+        "quantized": bool(quantize),
+        "pooling_mode": _pooling_mode(pooling),
+        "dimension": st_model.get_sentence_embedding_dimension(),
+        "max_seq_length": st_model.max_seq_length,
+        "prompts": dict(getattr(st_model, "prompts", {}) or {}),
+        "default_prompt_name": getattr(st_model, "default_prompt_name", None),
+        "opset": opset,
+        "exported_at": time.time(),
+    }
+    with open(output_dir / ONNX_EXPORT_META_FILE, "w", encoding="utf-8") as f:
+        json.dump(meta, f, ensure_ascii=False, indent=2)
+
+    logger.info(f"ONNX export finished in {time.time() - start:.1f}s ({model_file})")
+    return meta
+
+
+class OnnxEmbeddingBackend:
+    """
+    基于 onnxruntime 的 CPU 嵌入后端
+
+    首次使用时若导出目录不存在、量化选项或权重摘要不匹配，则重新导出一次。
+    """
+
+    def __init__(
+        self,
+        model_path: str,
+        onnx_path: Optional[str] = None,
+        quantize: bool = True,
+        intra_op_threads: Optional[int] = None,
+        max_seq_length: Optional[int] = None,
+        weights_digest: str = "",
+    ):
+        ort = _require_onnxruntime()
+        from transformers import AutoTokenizer
+
+        self.model_path = model_path
+        self.onnx_path = Path(onnx_path) if onnx_path else Path(model_path) / "onnx"
+        self.quantize = quantize
+        self.intra_op_threads = intra_op_threads
+
+        self.meta = self._load_or_export(weights_digest)
+        self.pooling_mode = self.meta["pooling_mode"]
+        self.prompts: Dict[str, str] = self.meta.get("prompts") or {}
+        self.default_prompt_name = self.meta.get("default_prompt_name")
+        self.max_seq_length = max_seq_length or self.meta.get("max_seq_length") or 512
+        self._dimension = int(self.meta["dimension"])
+
+        self.tokenizer = AutoTokenizer.from_pretrained(str(self.onnx_path))
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if intra_op_threads:
+            options.intra_op_num_threads = int(intra_op_threads)
+        model_file = self.onnx_path / self.meta["model_file"]
+        self.session = ort.InferenceSession(
+            str(model_file), sess_options=options, providers=["CPUExecutionProvider"]
+        )
+        self._input_names = {i.name for i in self.session.get_inputs()}
+        logger.info(
+            f"ONNX backend ready: {model_file.name}, pooling={self.pooling_mode}, "
+            f"intra_op_threads={intra_op_threads or 'auto'}"
+        )
+
+    def _load_or_export(self, weights_digest: str) -> Dict[str, Any]:
+        meta_file = self.onnx_path / ONNX_EXPORT_META_FILE
+        if meta_file.exists():
+            try:
+                with open(meta_file, "r", encoding="utf-8") as f:
+                    meta = json.load(f)
+                stale = (
+                    meta.get("meta_version") != ONNX_EXPORT_META_VERSION
+                    or bool(meta.get("quantized")) != bool(self.quantize)
+                    or (weights_digest and meta.get("weights_digest") != weights_digest)
+                    or not (self.onnx_path / meta.get("model_file", "")).is_file()
+                )
+                if not stale:
+                    return meta
+                logger.info(f"ONNX export at {self.onnx_path} is stale, re-exporting")
+            except (OSError, ValueError) as e:
+                logger.warning(f"Failed to read ONNX export metadata: {e}")
+        return export_onnx_model(
+            self.model_path, str(self.onnx_path), quantize=self.quantize,
+            weights_digest=weights_digest,
+        )
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return self._dimension
+
+    def _run(self, texts: List[str]) -> np.ndarray:
+        encoded = self.tokenizer(
+            texts,
+            padding=True,
+            truncation="longest_first",
+            max_length=self.max_seq_length,
+            return_tensors="np",
+        )
+        feeds = {
+            name: encoded[name].astype(np.int64)
+            for name in ("input_ids", "attention_mask")
+            if name in self._input_names
+        }
+        hidden = self.session.run(["last_hidden_state"], feeds)[0]
+        return pool_hidden_states(hidden, encoded["attention_mask"], self.pooling_mode)
+
+    def encode(
+        self,
+        sentences,
+        batch_size: int = 32,
+        show_progress_bar: bool = False,
+        convert_to_numpy: bool = True,
+        normalize_embeddings: bool = False,
+        prompt_name: Optional[str] = None,
+        prompt: Optional[str] = None,
+    ) -> np.ndarray:
+        """与 SentenceTransformer.encode 兼容的编码接口（始终返回 numpy）"""
+        single = isinstance(sentences, str)
+        texts = [sentences] if single else list(sentences)
+
+        if prompt is None:
+            name = prompt_name or self.default_prompt_name
+            if name:
+                if name not in self.prompts:
+                    raise ValueError(f"Prompt name '{name}' not found in exported prompts")
+                prompt = self.prompts[name]
+        if prompt:
+            texts = [prompt + t for t in texts]
+
+        if not texts:
+            return np.zeros((0, self._dimension), dtype=np.float32)
+
+        # 与 SentenceTransformer 一致：按长度排序后分批，减少填充
+        order = np.argsort([-len(t) for t in texts], kind="stable")
+        outputs = np.empty((len(texts), self._dimension), dtype=np.float32)
+        for start in range(0, len(texts), batch_size):
+            idx = order[start:start + batch_size]
+            outputs[idx] = self._run([texts[i] for i in idx])
+
+        if normalize_embeddings:
+            outputs = _l2_normalize(outputs)
+        return outputs[0] if single else outputs
+
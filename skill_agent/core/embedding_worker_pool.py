@@ -0,0 +1,495 @@
+"""
+嵌入工作进程池
+把模型推理移出服务进程，避免分词与前向计算占用 GIL / 阻塞事件循环
+
+架构：
+- 每个工作进程启动时加载一次模型（复用 EmbeddingGenerator 的后端与分桶批处理）
+- 结果通过每个工作进程独占的共享内存块返回，队列中只传递小的控制消息
+- 调度线程在 batch_window_ms 时间窗内合并并发请求（按 prompt 分组、文本去重），
+  凑成一个批次交给空闲的工作进程
+- 工作进程异常退出时，其在途请求失败，进程按原编号重启并复用原共享内存块；
+  超过 max_restarts 次的工作进程不再重启，全部退出后进程池进入故障状态，
+  排队中与新的请求直接失败（不会永久等待）
+
+工作进程池实现了与 SentenceTransformer 兼容的最小接口（encode /
+get_sentence_embedding_dimension / max_seq_length），可直接作为
+EmbeddingGenerator.model 使用。
+"""
+
+import asyncio
+import itertools
+import logging
+import multiprocessing as mp
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from multiprocessing import shared_memory
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# 调度线程 / 结果线程轮询间隔（秒）
+_POLL_INTERVAL = 0.5
+
+
+def _worker_main(worker_id: int, config: dict, task_queue, result_queue) -> None:
+    """
+    工作进程入口：加载模型 -> 上报维度 -> 挂载父进程分配的共享内存 -> 循环处理批次
+    """
+    from .embeddings import EmbeddingGenerator
+
+    worker_config = dict(config)
+    worker_config["cache_path"] = None
+    worker_config["l1_cache_size"] = 1
+    worker_config["worker_pool"] = {"enabled": False}
+    try:
+        generator = EmbeddingGenerator(worker_config)
+    except Exception as e:
+        result_queue.put(("failed", worker_id, repr(e)))
+        return
+
+    dim = generator.embedding_dimension
+    result_queue.put(("ready", worker_id, dim, generator.model.max_seq_length))
+
+    message = task_queue.get()
+    if message is None:
+        return
+    shm = shared_memory.SharedMemory(name=message[1])
+    capacity = shm.size // (dim * 4)
+    output = np.ndarray((capacity, dim), dtype=np.float32, buffer=shm.buf)
+
+    try:
+        while True:
+            task = task_queue.get()
+            if task is None:
+                break
+            batch_id, texts, prompt_name = task
+            try:
+                vectors = generator._encode_batch_sync(texts, generator.batch_size, prompt_name)
+                output[:len(vectors)] = vectors
+                result_queue.put(("done", worker_id, batch_id, len(vectors), None))
+            except Exception as e:
+                result_queue.put(("done", worker_id, batch_id, 0, repr(e)))
+    finally:
+        del output
+        shm.close()
+
+
+class _Request:
+    """一次 encode 调用（已按 max_batch_size 切分）"""
+
+    __slots__ = ("texts", "prompt_name", "future", "enqueued_at")
+
+    def __init__(self, texts: List[str], prompt_name: Optional[str]):
+        self.texts = texts
+        self.prompt_name = prompt_name
+        self.future: Future = Future()
+        self.enqueued_at = time.perf_counter()
+
+
+class EmbeddingWorkerPool:
+    """
+    持久化嵌入工作进程池
+
+    并发调用 encode() 时，落在同一时间窗内的请求会被合并成一个批次。
+    """
+
+    def __init__(
+        self,
+        config: dict,
+        num_workers: int = 2,
+        max_batch_size: int = 64,
+        batch_window_ms: float = 5.0,
+        start_timeout: float = 600.0,
+        max_restarts: int = 3,
+    ):
+        """
+        Args:
+            config: 工作进程内 EmbeddingGenerator 使用的 embedding 配置
+            num_workers: 工作进程数
+            max_batch_size: 单个合并批次的最大文本数（也是共享内存块的行数）
+            batch_window_ms: 合并等待时间窗（毫秒）
+            start_timeout: 等待工作进程加载模型的超时时间（秒）
+            max_restarts: 每个工作进程异常退出后最多重启的次数
+        """
+        self.config = config
+        self.num_workers = max(1, int(num_workers))
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.batch_window = max(0.0, float(batch_window_ms)) / 1000.0
+        self.max_restarts = max(0, int(max_restarts))
+
+        self._ctx = mp.get_context("spawn")
+        self._result_queue = self._ctx.Queue()
+        self._task_queues = []
+        self._processes = []
+        # 每次重启递增；空闲队列中代数过期的条目（进程已退出或已重启）被丢弃
+        self._generations: List[int] = []
+        self._restarts: Dict[int, int] = {}
+        self._retired: set = set()
+        self._broken: Optional[str] = None
+        self._last_check = time.perf_counter()
+        self._shms: Dict[int, shared_memory.SharedMemory] = {}
+        self._outputs: Dict[int, np.ndarray] = {}
+        self._idle_workers: "queue.Queue[tuple]" = queue.Queue()
+        self._requests: "queue.Queue[Optional[_Request]]" = queue.Queue()
+        self._inflight: Dict[int, tuple] = {}
+        self._inflight_lock = threading.Lock()
+        self._batch_ids = itertools.count()
+        self._closed = False
+
+        self._stats_lock = threading.Lock()
+        self._stats = {
+            "requests": 0,
+            "texts": 0,
+            "batches": 0,
+            "batch_texts": 0,
+            "deduplicated": 0,
+            "queue_wait_ms": 0.0,
+            "errors": 0,
+            "restarts": 0,
+        }
+
+        self.embedding_dimension = 0
+        self.max_seq_length = None
+        self._start(start_timeout)
+
+        self._dispatcher = threading.Thread(target=self._dispatch_loop, name="embedding-pool-dispatch", daemon=True)
+        self._collector = threading.Thread(target=self._collect_loop, name="embedding-pool-collect", daemon=True)
+        self._dispatcher.start()
+        self._collector.start()
+
+    def _start(self, timeout: float) -> None:
+        start = time.time()
+        for worker_id in range(self.num_workers):
+            self._spawn(worker_id)
+
+        ready = 0
+        while ready < self.num_workers:
+            remaining = timeout - (time.time() - start)
+            try:
+                message = self._result_queue.get(timeout=max(remaining, 0.01))
+            except queue.Empty:
+                self.close()
+                raise RuntimeError(f"Embedding workers did not start within {timeout}s")
+            if message[0] == "failed":
+                self.close()
+                raise RuntimeError(f"Embedding worker {message[1]} failed to load model: {message[2]}")
+            _, worker_id, dim, max_seq_length = message
+            self.embedding_dimension = dim
+            self.max_seq_length = max_seq_length
+            self._attach(worker_id)
+            ready += 1
+
+        logger.info(
+            f"Embedding worker pool ready: {self.num_workers} workers, dim={self.embedding_dimension}, "
+            f"window={self.batch_window * 1000:.1f}ms, max_batch={self.max_batch_size} "
+            f"({time.time() - start:.1f}s)"
+        )
+
+    def _spawn(self, worker_id: int) -> None:
+        """启动（或按原编号重启）一个工作进程，使用新的任务队列"""
+        task_queue = self._ctx.Queue()
+        process = self._ctx.Process(
+            target=_worker_main,
+            args=(worker_id, self.config, task_queue, self._result_queue),
+            name=f"embedding-worker-{worker_id}",
+            daemon=True,
+        )
+        process.start()
+        if worker_id < len(self._processes):
+            self._task_queues[worker_id] = task_queue
+            self._processes[worker_id] = process
+            self._generations[worker_id] += 1
+        else:
+            self._task_queues.append(task_queue)
+            self._processes.append(process)
+            self._generations.append(0)
+
+    def _attach(self, worker_id: int) -> None:
+        """把共享内存块交给已加载模型的工作进程并标记为空闲（重启的进程复用原内存块）"""
+        shm = self._shms.get(worker_id)
+        if shm is None:
+            # 父进程负责共享内存的创建与释放，工作进程只挂载
+            dim = self.embedding_dimension
+            shm = shared_memory.SharedMemory(create=True, size=self.max_batch_size * dim * 4)
+            self._shms[worker_id] = shm
+            self._outputs[worker_id] = np.ndarray((self.max_batch_size, dim), dtype=np.float32, buffer=shm.buf)
+        self._task_queues[worker_id].put(("attach", shm.name))
+        self._idle_workers.put((worker_id, self._generations[worker_id]))
+
+    # ==================== 调度 ====================
+
+    def _next_request(self, timeout: Optional[float]) -> Optional[_Request]:
+        try:
+            return self._requests.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def _dispatch_loop(self) -> None:
+        deferred: List[_Request] = []
+        while True:
+            first = deferred.pop(0) if deferred else self._next_request(_POLL_INTERVAL)
+            if first is None:
+                if self._closed:
+                    return
+                continue
+
+            # 在时间窗内收集同一 prompt 的请求
+            batch = [first]
+            total = len(first.texts)
+            deadline = time.perf_counter() + self.batch_window
+            while total < self.max_batch_size:
+                candidate = None
+                for i, pending in enumerate(deferred):
+                    if pending.prompt_name == first.prompt_name:
+                        candidate = deferred.pop(i)
+                        break
+                if candidate is None:
+                    remaining = deadline - time.perf_counter()
+                    if remaining <= 0:
+                        break
+                    candidate = self._next_request(remaining)
+                    if candidate is None:
+                        break
+                if candidate.prompt_name != first.prompt_name or total + len(candidate.texts) > self.max_batch_size:
+                    deferred.append(candidate)
+                    if candidate.prompt_name == first.prompt_name:
+                        break
+                    continue
+                batch.append(candidate)
+                total += len(candidate.texts)
+
+            worker_id = self._acquire_worker()
+            if worker_id is None:
+                error = RuntimeError(self._broken or "Embedding worker pool is closed")
+                for request in batch:
+                    if not request.future.done():
+                        request.future.set_exception(error)
+                continue
+            self._send_batch(worker_id, batch)
+
+    def _acquire_worker(self) -> Optional[int]:
+        """等待一个空闲的存活工作进程；进程池关闭或进入故障状态时返回 None"""
+        while not (self._closed or self._broken):
+            try:
+                worker_id, generation = self._idle_workers.get(timeout=_POLL_INTERVAL)
+            except queue.Empty:
+                continue
+            if generation == self._generations[worker_id] and self._processes[worker_id].is_alive():
+                return worker_id
+        return None
+
+    def _send_batch(self, worker_id: int, batch: List[_Request]) -> None:
+        # 合并批内去重
+        unique: Dict[str, int] = {}
+        for request in batch:
+            for text in request.texts:
+                unique.setdefault(text, len(unique))
+        texts = list(unique)
+        batch_id = next(self._batch_ids)
+
+        now = time.perf_counter()
+        with self._stats_lock:
+            self._stats["batches"] += 1
+            self._stats["batch_texts"] += len(texts)
+            self._stats["deduplicated"] += sum(len(r.texts) for r in batch) - len(texts)
+            self._stats["queue_wait_ms"] += sum(now - r.enqueued_at for r in batch) * 1000
+
+        with self._inflight_lock:
+            self._inflight[batch_id] = (worker_id, self._generations[worker_id], batch, unique)
+        self._task_queues[worker_id].put((batch_id, texts, batch[0].prompt_name))
+
+    def _collect_loop(self) -> None:
+        while True:
+            if time.perf_counter() - self._last_check >= _POLL_INTERVAL:
+                self._check_workers()
+            try:
+                message = self._result_queue.get(timeout=_POLL_INTERVAL)
+            except queue.Empty:
+                if self._closed:
+                    return
+                continue
+            except (EOFError, OSError):
+                return
+            if message is None:
+                return
+            if message[0] == "ready":
+                # 重启的工作进程已加载模型
+                if not self._closed:
+                    self._attach(message[1])
+                    logger.info(f"Embedding worker {message[1]} restarted")
+                continue
+            if message[0] == "failed":
+                # 进程随后退出，由 _check_workers 决定是否再次重启
+                logger.error(f"Embedding worker {message[1]} failed to load model: {message[2]}")
+                continue
+            if message[0] != "done":
+                continue
+
+            _, worker_id, batch_id, count, error = message
+            with self._inflight_lock:
+                entry = self._inflight.pop(batch_id, None)
+            if entry is None:
+                continue  # 工作进程已被判定退出，请求已失败
+            _, generation, batch, unique = entry
+            if error:
+                with self._stats_lock:
+                    self._stats["errors"] += 1
+                for request in batch:
+                    request.future.set_exception(RuntimeError(f"Embedding worker {worker_id} failed: {error}"))
+            else:
+                # 从共享内存拷贝一次，随后工作进程即可复用该缓冲区
+                matrix = np.array(self._outputs[worker_id][:count])
+                matrix.flags.writeable = False
+                for request in batch:
+                    rows = matrix[[unique[text] for text in request.texts]]
+                    request.future.set_result(rows)
+            self._idle_workers.put((worker_id, generation))
+
+    def _check_workers(self) -> None:
+        """
+        工作进程异常退出时让其在途请求失败，并按原编号重启；
+        重启次数用尽的进程不再重启，全部退出后进程池进入故障状态
+        """
+        self._last_check = time.perf_counter()
+        if self._closed:
+            return
+        for worker_id, process in enumerate(self._processes):
+            if process.is_alive() or worker_id in self._retired:
+                continue
+            with self._inflight_lock:
+                dead = [bid for bid, entry in self._inflight.items() if entry[0] == worker_id]
+                entries = [self._inflight.pop(bid) for bid in dead]
+            for _, _, batch, _ in entries:
+                for request in batch:
+                    if not request.future.done():
+                        request.future.set_exception(
+                            RuntimeError(f"Embedding worker {worker_id} exited unexpectedly")
+                        )
+
+            restarts = self._restarts.get(worker_id, 0)
+            if restarts >= self.max_restarts:
+                self._retired.add(worker_id)
+                logger.error(f"Embedding worker {worker_id} exited (code {process.exitcode}), not restarting")
+                continue
+            self._restarts[worker_id] = restarts + 1
+            with self._stats_lock:
+                self._stats["restarts"] += 1
+            logger.warning(
+                f"Embedding worker {worker_id} exited (code {process.exitcode}), "
+                f"restarting ({restarts + 1}/{self.max_restarts})"
+            )
+            self._spawn(worker_id)
+
+        if len(self._retired) == len(self._processes) and self._broken is None:
+            self._broken = "All embedding workers exited"
+            logger.error(f"{self._broken}; failing pending requests")
+            self._fail_pending(RuntimeError(self._broken))
+
+    def _fail_pending(self, error: Exception) -> None:
+        """让排队中尚未分发的请求失败"""
+        while True:
+            try:
+                request = self._requests.get_nowait()
+            except queue.Empty:
+                break
+            if request is not None and not request.future.done():
+                request.future.set_exception(error)
+
+    # ==================== 公共接口 ====================
+
+    def submit(self, texts: List[str], prompt_name: Optional[str] = None) -> List[Future]:
+        """提交编码请求，按 max_batch_size 切分，返回每段的 Future（结果为只读 float32 矩阵）"""
+        if self._closed:
+            raise RuntimeError("Embedding worker pool is closed")
+        if self._broken:
+            raise RuntimeError(self._broken)
+        futures = []
+        for start in range(0, len(texts), self.max_batch_size):
+            request = _Request(list(texts[start:start + self.max_batch_size]), prompt_name)
+            self._requests.put(request)
+            futures.append(request.future)
+        with self._stats_lock:
+            self._stats["requests"] += 1
+            self._stats["texts"] += len(texts)
+        return futures
+
+    def encode(
+        self,
+        sentences,
+        batch_size: int = 32,
+        show_progress_bar: bool = False,
+        convert_to_numpy: bool = True,
+        normalize_embeddings: bool = True,
+        prompt_name: Optional[str] = None,
+    ) -> np.ndarray:
+        """
+        与 SentenceTransformer.encode 兼容的同步接口
+
+        批大小与归一化由工作进程内的 embedding 配置决定，这里的同名参数仅为接口兼容。
+        """
+        single = isinstance(sentences, str)
+        texts = [sentences] if single else list(sentences)
+        if not texts:
+            return np.zeros((0, self.embedding_dimension), dtype=np.float32)
+        parts = [future.result() for future in self.submit(texts, prompt_name)]
+        matrix = parts[0] if len(parts) == 1 else np.concatenate(parts)
+        return matrix[0] if single else matrix
+
+    async def encode_async(self, texts: List[str], prompt_name: Optional[str] = None) -> np.ndarray:
+        """异步接口：在事件循环中等待结果，不占用线程池"""
+        if not texts:
+            return np.zeros((0, self.embedding_dimension), dtype=np.float32)
+        parts = await asyncio.gather(
+            *(asyncio.wrap_future(future) for future in self.submit(texts, prompt_name))
+        )
+        return parts[0] if len(parts) == 1 else np.concatenate(parts)
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return self.embedding_dimension
+
+    def get_statistics(self) -> Dict[str, Any]:
+        """合并批次统计"""
+        with self._stats_lock:
+            stats = dict(self._stats)
+        batches = stats["batches"]
+        return {
+            "num_workers": self.num_workers,
+            "alive_workers": sum(p.is_alive() for p in self._processes),
+            "restarts": stats["restarts"],
+            "broken": self._broken is not None,
+            "batch_window_ms": round(self.batch_window * 1000, 3),
+            "max_batch_size": self.max_batch_size,
+            "requests": stats["requests"],
+            "texts": stats["texts"],
+            "batches": batches,
+            "avg_batch_size": round(stats["batch_texts"] / batches, 2) if batches else 0.0,
+            "deduplicated": stats["deduplicated"],
+            "avg_queue_wait_ms": round(stats["queue_wait_ms"] / max(stats["requests"], 1), 3),
+            "errors": stats["errors"],
+        }
+
+    def close(self, timeout: float = 10.0) -> None:
+        """停止调度并关闭工作进程，释放共享内存"""
+        if self._closed:
+            return
+        self._closed = True
+        for task_queue in self._task_queues:
+            try:
+                task_queue.put(None)
+            except (OSError, ValueError):
+                pass
+        for process in self._processes:
+            process.join(timeout)
+            if process.is_alive():
+                process.terminate()
+        self._fail_pending(RuntimeError("Embedding worker pool is closed"))
+        self._outputs.clear()
+        for shm in self._shms.values():
+            shm.close()
+            shm.unlink()
+        self._shms.clear()
+        logger.info("Embedding worker pool closed")
@@ -6,26 +6,123 @@
 缓存架构：
 - L1: 内存LRU缓存（快速访问）
 - L2: SQLite磁盘缓存（持久化存储）
+
+L2 存储格式：
+- v1: pickle 序列化的 List[float]（旧格式，读取时惰性迁移为 v2）
+- v2: 小端 float32（可选 float16）原始字节 + 维度/模型元数据
+
+缓存键按模型指纹（模型路径、权重摘要、维度、编码选项）划分命名空间，
+更换模型或编码参数只会切换到新的命名空间，旧向量不会被误用，之后随 LRU 淘汰。
 """
 
 import asyncio
+import atexit
 import os
 import logging
 import pickle
+import queue
 import sqlite3
+import threading
 import time
 from pathlib import Path
 from typing import List, Union, Optional, Dict, Any
-import torch
+import numpy as np
 from sentence_transformers import SentenceTransformer
 from cachetools import LRUCache
 import hashlib
 
+from .embedding_backends import (
+    BACKEND_ONNX,
+    BACKEND_SENTENCE_TRANSFORMERS,
+    SUPPORTED_BACKENDS,
+    OnnxEmbeddingBackend,
+)
+
 logger = logging.getLogger(__name__)
 
 # HuggingFace 模型 ID
 QWEN3_EMBEDDING_HF_ID = "Qwen/Qwen3-Embedding-0.6B"
 
+# L2 磁盘缓存格式版本
+DISK_CACHE_FORMAT_VERSION = 2
+
+# 磁盘存储精度 -> 小端 numpy dtype
+_DISK_CACHE_DTYPES = {
+    "float32": "<f4",
+    "float16": "<f2",
+}
+
+# 参与权重摘要的文件及每个文件读取的头部字节数
+_WEIGHT_FILES = ("model.safetensors", "pytorch_model.bin", "model.ckpt.index")
+_WEIGHT_DIGEST_BYTES = 1024 * 1024
+
+# 单条 SQL 中 IN (...) 的最大参数数（低于 SQLite 默认上限 999）
+_SQLITE_IN_CHUNK = 500
+
+# 唤醒后台写入线程刷新 last_access 的队列标记
+_TOUCH_MARKER = object()
+_TOUCH_FLUSH_THRESHOLD = 256
+
+# 淘汰后保留到预算的比例，避免每次写入都触发淘汰
+_EVICTION_LOW_WATERMARK = 0.9
+
+# L2 命中时条目年龄分桶（秒）
+_HIT_AGE_BUCKETS = (
+    ("<1h", 3600),
+    ("<1d", 86400),
+    ("<7d", 7 * 86400),
+    ("<30d", 30 * 86400),
+    (">=30d", float("inf")),
+)
+
+
+def _pack_embedding(embedding: np.ndarray, dtype: str) -> bytes:
+    """将向量编码为小端原始字节"""
+    return np.ascontiguousarray(embedding, dtype=_DISK_CACHE_DTYPES[dtype]).tobytes()
+
+
+def _unpack_embedding(blob: bytes, dtype: str, dim: Optional[int] = None) -> Optional[np.ndarray]:
+    """
+    将小端原始字节解码为 float32 向量
+
+    float32 直接返回 blob 上的只读视图（零拷贝），float16 需要一次升精度拷贝。
+    维度与元数据不一致时返回 None（视为缓存未命中）。
+    """
+    np_dtype = _DISK_CACHE_DTYPES.get(dtype)
+    if np_dtype is None:
+        return None
+    embedding = np.frombuffer(blob, dtype=np_dtype)
+    if dim is not None and embedding.shape[0] != dim:
+        return None
+    if embedding.dtype != np.float32:
+        embedding = embedding.astype(np.float32)
+        embedding.flags.writeable = False
+    return embedding
+
+
+def compute_weights_digest(model_path: str) -> str:
+    """
+    计算模型权重摘要
+
+    对每个权重文件取 (文件名, 大小, 头部 1MB 内容) 做 md5，
+    safetensors 的头部包含全部张量的形状和偏移，足以区分不同权重，且无需读完整个文件。
+    路径不是本地目录（如 HuggingFace 模型 ID）时返回空字符串。
+    """
+    model_dir = Path(model_path)
+    if not model_dir.is_dir():
+        return ""
+
+    digest = hashlib.md5()
+    for name in _WEIGHT_FILES + ("config.json",):
+        weight_file = model_dir / name
+        if not weight_file.exists():
+            continue
+        digest.update(name.encode("utf-8"))
+        digest.update(str(weight_file.stat().st_size).encode("utf-8"))
+        with open(weight_file, "rb") as f:
+            digest.update(f.read(_WEIGHT_DIGEST_BYTES))
+    return digest.hexdigest()
+
 
 def ensure_model_downloaded(local_path: str) -> str:
     """
@@ -101,6 +198,25 @@ class EmbeddingGenerator:
                 - use_flash_attention: 是否使用flash_attention_2加速（需要GPU）
                 - cache_path: 磁盘缓存路径（默认 "Data/embedding_cache"，None则只用内存缓存）
                 - l1_cache_size: L1内存缓存大小（默认 2000）
+                - cache_dtype: L2磁盘缓存存储精度（"float32" 或 "float16"，默认 "float32"）
+                - cache_synchronous: SQLite synchronous 级别（默认 "NORMAL"，配合 WAL 使用）
+                - cache_write_behind: 是否使用后台线程批量写入L2（默认 True）
+                - cache_write_queue_size: 后台写入队列容量（默认 10000）
+                - cache_max_rows: L2最大行数（None 不限制）
+                - cache_max_bytes: L2最大向量字节数（默认 512MB，None 不限制）
+                - cache_budget_check_interval: 每写入多少行检查一次预算（默认 500）
+                - cache_vacuum_free_ratio: 空闲页占比超过该值时自动 VACUUM（默认 0.3）
+                - normalize_embeddings: 是否 L2 归一化（默认 True）
+                - cache_adopt_legacy: 是否复用无命名空间的旧缓存行（维度一致时，默认 True）
+                - backend: 推理后端（"sentence_transformers" 或 "onnx"，默认前者）
+                - onnx_path: ONNX 导出目录（默认 <model_name>/onnx）
+                - onnx_quantize: 是否使用 int8 动态量化模型（默认 True）
+                - onnx_intra_op_threads: onnxruntime 算子内线程数（默认 CPU 核数）
+                - batch_token_budget: 每批填充后的 token 上限，按长度分桶动态决定批大小
+                  （默认 16384，None/0 时使用固定 batch_size）
+                - max_batch_size: 分桶模式下单批最多文本数（默认 256）
+                - worker_pool: 进程外推理配置（enabled / num_workers / max_batch_size / batch_window_ms / max_restarts），
+                  启用后模型只在工作进程中加载，并发请求在时间窗内合并成批
         """
         self.config = config
         self.model_name = config.get("model_name", "../Data/models/Qwen3-Embedding-0.6B")
@@ -111,14 +227,94 @@ class EmbeddingGenerator:
         self.use_flash_attention = config.get("use_flash_attention", False)
         self.cache_path = config.get("cache_path", "Data/embedding_cache")
         self.l1_cache_size = config.get("l1_cache_size", 2000)
+        self.cache_dtype = config.get("cache_dtype", "float32")
+        if self.cache_dtype not in _DISK_CACHE_DTYPES:
+            logger.warning(f"Unsupported cache_dtype '{self.cache_dtype}', falling back to float32")
+            self.cache_dtype = "float32"
+        self.cache_synchronous = str(config.get("cache_synchronous", "NORMAL")).upper()
+        self.cache_write_behind = config.get("cache_write_behind", True)
+        self.cache_write_queue_size = config.get("cache_write_queue_size", 10000)
+        self.cache_max_rows = config.get("cache_max_rows", None)
+        self.cache_max_bytes = config.get("cache_max_bytes", 512 * 1024 * 1024)
+        self.cache_budget_check_interval = config.get("cache_budget_check_interval", 500)
+        self.cache_vacuum_free_ratio = config.get("cache_vacuum_free_ratio", 0.3)
+        self.normalize_embeddings = config.get("normalize_embeddings", True)
+        self.cache_adopt_legacy = config.get("cache_adopt_legacy", True)
+        self.batch_token_budget = config.get("batch_token_budget", 16384)
+        self.max_batch_size = config.get("max_batch_size", 256)
+        self.backend = str(config.get("backend", BACKEND_SENTENCE_TRANSFORMERS)).lower()
+        if self.backend not in SUPPORTED_BACKENDS:
+            raise ValueError(f"Unsupported embedding backend: {self.backend}. Supported: {SUPPORTED_BACKENDS}")
 
         # 加载本地模型
-        logger.info(f"Loading Qwen3 embedding model from: {self.model_name}")
+        logger.info(f"Loading Qwen3 embedding model from: {self.model_name} (backend: {self.backend})")
+
+        pool_config = config.get("worker_pool") or {}
+        if pool_config.get("enabled"):
+            from .embedding_worker_pool import EmbeddingWorkerPool
+
+            self.model = EmbeddingWorkerPool(
+                config,
+                num_workers=pool_config.get("num_workers", 2),
+                max_batch_size=pool_config.get("max_batch_size", 64),
+                batch_window_ms=pool_config.get("batch_window_ms", 5.0),
+                max_restarts=pool_config.get("max_restarts", 3),
+            )
+            # 长度分桶在工作进程内完成，父进程只负责缓存与请求合并
+            self.batch_token_budget = None
+        elif self.backend == BACKEND_ONNX:
+            self.model = OnnxEmbeddingBackend(
+                self.model_name,
+                onnx_path=config.get("onnx_path"),
+                quantize=config.get("onnx_quantize", True),
+                intra_op_threads=config.get("onnx_intra_op_threads") or os.cpu_count(),
+                max_seq_length=self.max_length,
+                weights_digest=compute_weights_digest(self.model_name),
+            )
+        else:
+            self.model = self._load_sentence_transformer()
+        if self.max_length and not self.uses_worker_pool:
+            self.model.max_seq_length = self.max_length
+
+        # 模型指纹：决定缓存命名空间
+        self.embedding_dimension = self.model.get_sentence_embedding_dimension()
+        self.model_fingerprint = self._compute_model_fingerprint()
+        self.cache_namespace = self.model_fingerprint[:16]
+
+        # L1 内存缓存（LRU）
+        self._l1_cache = LRUCache(maxsize=self.l1_cache_size)
+
+        # 缓存统计计数器
+        self._cache_stats = self._new_cache_stats()
+        self._batch_stats = {"batches": 0, "texts": 0, "tokens": 0, "padded_tokens": 0}
 
-        # 加载本地模型（简化版本，兼容sentence-transformers 2.7.0）
+        # L2 磁盘缓存（SQLite）
+        self._disk_cache_enabled = False
+        self._db_conn = None
+        self._db_lock = threading.RLock()
+        self._write_queue: Optional[queue.Queue] = None
+        self._writer_thread: Optional[threading.Thread] = None
+        self._pending_touches: Dict[str, float] = {}
+        self._touch_lock = threading.Lock()
+        self._rows_since_budget_check = 0
+        self._legacy_rows_present = False
+        if self.cache_path:
+            self._init_disk_cache(self.cache_path)
+
+        logger.info(f"Qwen3 embedding model loaded on device: {self.device}")
+        logger.info(f"Embedding dimension: {self.embedding_dimension}, cache namespace: {self.cache_namespace}")
+        logger.info(f"L1 cache size: {self.l1_cache_size}, L2 disk cache: {self._disk_cache_enabled}")
+
+    @property
+    def uses_worker_pool(self) -> bool:
+        """模型是否运行在进程外工作进程池中"""
+        return hasattr(self.model, "submit")
+
+    def _load_sentence_transformer(self):
+        """加载 SentenceTransformer 后端（简化版本，兼容sentence-transformers 2.7.0）"""
         try:
             # 标准加载方式（从本地路径）
-            self.model = SentenceTransformer(
+            model = SentenceTransformer(
                 self.model_name,
                 device=self.device,
                 cache_folder=self.cache_dir,
@@ -128,36 +324,50 @@ class EmbeddingGenerator:
         except Exception as e:
             # 降级加载（移除trust_remote_code参数）
             logger.warning(f"Failed to load with trust_remote_code, trying fallback: {e}")
-            self.model = SentenceTransformer(
+            model = SentenceTransformer(
                 self.model_name,
                 device=self.device,
                 cache_folder=self.cache_dir
             )
+        return model
 
-        # L1 内存缓存（LRU）
-        self._l1_cache = LRUCache(maxsize=self.l1_cache_size)
+    def _compute_model_fingerprint(self) -> str:
+        """
+        计算模型指纹：模型路径 + 权重摘要 + 维度 + 影响向量结果的编码选项
 
-        # L2 磁盘缓存（SQLite）
-        self._disk_cache_enabled = False
-        self._db_conn = None
-        if self.cache_path:
-            self._init_disk_cache(self.cache_path)
+        后端（如 ONNX）与磁盘存储精度不参与指纹，它们产出的向量与原模型数值兼容。
+        """
+        model_path = self.model_name
+        if Path(model_path).exists():
+            model_path = str(Path(model_path).resolve())
+        parts = {
+            "model_path": model_path,
+            "weights": compute_weights_digest(self.model_name),
+            "dimension": self.embedding_dimension,
+            "max_length": self.max_length,
+            "normalize": bool(self.normalize_embeddings),
+        }
+        fingerprint_str = "|".join(f"{k}={v}" for k, v in parts.items())
+        return hashlib.md5(fingerprint_str.encode("utf-8")).hexdigest()
 
-        # 缓存统计计数器
-        self._cache_stats = {
+    @staticmethod
+    def _new_cache_stats() -> Dict[str, Any]:
+        """创建空的缓存统计计数器"""
+        return {
             "l1_hits": 0,
             "l2_hits": 0,
             "misses": 0,
-            "total_requests": 0
+            "total_requests": 0,
+            "legacy_migrated": 0,
+            "l2_write_batches": 0,
+            "evictions": 0,
+            "vacuums": 0,
+            "hit_age": {name: 0 for name, _ in _HIT_AGE_BUCKETS}
         }
 
-        logger.info(f"Qwen3 embedding model loaded on device: {self.device}")
-        logger.info(f"Embedding dimension: {self.model.get_sentence_embedding_dimension()}")
-        logger.info(f"L1 cache size: {self.l1_cache_size}, L2 disk cache: {self._disk_cache_enabled}")
-
     def _init_disk_cache(self, cache_path: str) -> None:
         """
-        初始化磁盘缓存（使用SQLite）
+        初始化磁盘缓存（使用SQLite，WAL 模式）
 
         Args:
             cache_path: 缓存目录路径
@@ -168,60 +378,503 @@ class EmbeddingGenerator:
             db_path = cache_dir / "embeddings.db"
 
             self._db_conn = sqlite3.connect(str(db_path), check_same_thread=False)
+            # WAL 下读写互不阻塞，synchronous=NORMAL 只在 checkpoint 时 fsync
+            self._db_conn.execute("PRAGMA journal_mode=WAL")
+            self._db_conn.execute(f"PRAGMA synchronous={self.cache_synchronous}")
             self._db_conn.execute("""
                 CREATE TABLE IF NOT EXISTS embeddings (
                     key TEXT PRIMARY KEY,
                     embedding BLOB,
-                    created_at REAL
+                    created_at REAL,
+                    format_version INTEGER DEFAULT 1,
+                    dtype TEXT,
+                    dim INTEGER,
+                    model TEXT,
+                    last_access REAL,
+                    namespace TEXT
                 )
             """)
+            self._migrate_disk_cache_schema()
             self._db_conn.execute("CREATE INDEX IF NOT EXISTS idx_created_at ON embeddings(created_at)")
+            self._db_conn.execute("CREATE INDEX IF NOT EXISTS idx_last_access ON embeddings(last_access)")
+            self._db_conn.execute("CREATE INDEX IF NOT EXISTS idx_namespace ON embeddings(namespace)")
             self._db_conn.commit()
+            self._legacy_rows_present = self._db_conn.execute(
+                "SELECT 1 FROM embeddings WHERE namespace IS NULL LIMIT 1"
+            ).fetchone() is not None
 
             self._disk_cache_enabled = True
             self._db_path = db_path
-            logger.info(f"Disk cache initialized at: {db_path}")
+            self._enforce_disk_budget()
+            if self.cache_write_behind:
+                self._start_write_behind()
+            logger.info(
+                f"Disk cache initialized at: {db_path} (format v{DISK_CACHE_FORMAT_VERSION}, "
+                f"{self.cache_dtype}, write_behind={self.cache_write_behind})"
+            )
         except Exception as e:
             logger.warning(f"Failed to initialize disk cache: {e}. Using memory cache only.")
             self._disk_cache_enabled = False
             self._db_conn = None
 
-    def _get_from_disk_cache(self, key: str) -> Optional[List[float]]:
-        """从磁盘缓存获取embedding"""
-        if not self._disk_cache_enabled or not self._db_conn:
-            return None
+    def _migrate_disk_cache_schema(self) -> None:
+        """
+        为旧版 embeddings 表补齐 v2 元数据列
+
+        旧行保留 format_version=1（pickle）且没有命名空间，
+        由 _adopt_legacy_rows 在命中时惰性迁移到当前命名空间。
+        """
+        columns = {row[1] for row in self._db_conn.execute("PRAGMA table_info(embeddings)")}
+        for name, ddl in (
+            ("format_version", "INTEGER DEFAULT 1"),
+            ("dtype", "TEXT"),
+            ("dim", "INTEGER"),
+            ("model", "TEXT"),
+            ("last_access", "REAL"),
+            ("namespace", "TEXT"),
+        ):
+            if name not in columns:
+                self._db_conn.execute(f"ALTER TABLE embeddings ADD COLUMN {name} {ddl}")
+                logger.info(f"Disk cache schema upgraded: added column '{name}'")
+
+        if "last_access" not in columns:
+            # 旧行以创建时间作为初始访问时间，使淘汰顺序可以直接走 last_access 索引
+            self._db_conn.execute("UPDATE embeddings SET last_access = created_at WHERE last_access IS NULL")
+
+    def _start_write_behind(self) -> None:
+        """启动后台写入线程，编码路径只负责入队"""
+        self._write_queue = queue.Queue(maxsize=self.cache_write_queue_size)
+        self._writer_thread = threading.Thread(
+            target=self._write_behind_loop,
+            name="embedding-cache-writer",
+            daemon=True
+        )
+        self._writer_thread.start()
+        atexit.register(self.flush_disk_cache)
+
+    def _write_behind_loop(self) -> None:
+        """后台写入循环：一次取空队列，合并为一个事务写入"""
+        while True:
+            item = self._write_queue.get()
+            if item is None:
+                self._write_queue.task_done()
+                return
+
+            batch = [item]
+            stop = False
+            while True:
+                try:
+                    next_item = self._write_queue.get_nowait()
+                except queue.Empty:
+                    break
+                if next_item is None:
+                    stop = True
+                    break
+                batch.append(next_item)
+
+            try:
+                self._write_disk_batch([i for i in batch if i is not _TOUCH_MARKER])
+            finally:
+                for _ in range(len(batch) + (1 if stop else 0)):
+                    self._write_queue.task_done()
+            if stop:
+                return
+
+    def flush_disk_cache(self) -> None:
+        """等待后台写入队列（含 last_access 更新）全部落盘"""
+        if self._write_queue is not None and self._writer_thread is not None \
+                and self._writer_thread.is_alive():
+            self._write_queue.put(_TOUCH_MARKER)
+            self._write_queue.join()
+        elif self._db_conn is not None:
+            self._write_disk_batch([])
+
+    def close(self) -> None:
+        """落盘待写数据，停止后台写入线程并关闭磁盘缓存连接"""
+        if self._writer_thread is not None and self._writer_thread.is_alive():
+            self._write_queue.put(_TOUCH_MARKER)
+            self._write_queue.put(None)
+            self._writer_thread.join()
+        elif self._db_conn is not None:
+            self._write_disk_batch([])
+        self._writer_thread = None
+        self._write_queue = None
+        if self._db_conn is not None:
+            with self._db_lock:
+                self._db_conn.close()
+            self._db_conn = None
+            self._disk_cache_enabled = False
+        if self.uses_worker_pool:
+            self.model.close()
+
+    def _decode_disk_row(
+        self,
+        blob: bytes,
+        format_version: Optional[int],
+        dtype: Optional[str],
+        dim: Optional[int]
+    ) -> Optional[np.ndarray]:
+        """解码一行磁盘缓存（v1 pickle 行按旧格式读取，由调用方负责重写）"""
+        if format_version == DISK_CACHE_FORMAT_VERSION:
+            return _unpack_embedding(blob, dtype or "float32", dim)
+
+        embedding = np.asarray(pickle.loads(blob), dtype=np.float32)
+        embedding.flags.writeable = False
+        return embedding
+
+    def _select_disk_rows(self, keys: List[str], legacy: bool = False) -> List[tuple]:
+        """按键批量查询磁盘缓存行（每 _SQLITE_IN_CHUNK 个键一次 IN 查询）"""
+        namespace_clause = "namespace IS NULL" if legacy else "namespace = ?"
+        namespace_args = [] if legacy else [self.cache_namespace]
+        rows = []
+        with self._db_lock:
+            for start in range(0, len(keys), _SQLITE_IN_CHUNK):
+                chunk = keys[start:start + _SQLITE_IN_CHUNK]
+                placeholders = ",".join("?" * len(chunk))
+                rows.extend(self._db_conn.execute(
+                    "SELECT key, embedding, format_version, dtype, dim, created_at FROM embeddings "
+                    f"WHERE {namespace_clause} AND key IN ({placeholders})",
+                    namespace_args + chunk
+                ).fetchall())
+        return rows
+
+    def _get_many_from_disk_cache(self, keys: List[str]) -> Dict[str, np.ndarray]:
+        """
+        批量从磁盘缓存获取当前命名空间下的embedding
+
+        Returns:
+            命中的 {key: embedding}
+        """
+        found: Dict[str, np.ndarray] = {}
+        if not keys or not self._disk_cache_enabled or not self._db_conn:
+            return found
+
+        unique_keys = list(dict.fromkeys(keys))
         try:
-            cursor = self._db_conn.execute(
-                "SELECT embedding FROM embeddings WHERE key = ?", (key,)
-            )
-            row = cursor.fetchone()
-            if row:
-                return pickle.loads(row[0])
+            now = time.time()
+            for key, blob, format_version, dtype, dim, created_at in self._select_disk_rows(unique_keys):
+                embedding = self._decode_disk_row(blob, format_version, dtype, dim)
+                if embedding is None:
+                    continue
+                found[key] = embedding
+                self._record_hit_age(now - (created_at or now))
         except Exception as e:
             logger.warning(f"Disk cache read error: {e}")
-        return None
 
-    def _put_to_disk_cache(self, key: str, embedding: List[float]) -> None:
-        """将embedding写入磁盘缓存"""
-        if not self._disk_cache_enabled or not self._db_conn:
+        self._touch(found.keys())
+
+        if self._legacy_rows_present and self.cache_adopt_legacy:
+            missing = [key for key in unique_keys if key not in found]
+            if missing:
+                found.update(self._adopt_legacy_rows(missing))
+        return found
+
+    def _adopt_legacy_rows(self, keys: List[str]) -> Dict[str, np.ndarray]:
+        """
+        复用升级前写入的无命名空间缓存行
+
+        旧行没有模型元数据，只在维度与当前模型一致时采纳；
+        采纳的行（含 v1 pickle 行）会以当前格式和命名空间重写，旧行随之删除。
+        """
+        legacy_to_key = {key.split(":", 1)[-1]: key for key in keys}
+        adopted: Dict[str, np.ndarray] = {}
+        try:
+            now = time.time()
+            rows = self._select_disk_rows(list(legacy_to_key), legacy=True)
+            for legacy_key, blob, format_version, dtype, dim, created_at in rows:
+                embedding = self._decode_disk_row(blob, format_version, dtype, dim)
+                if embedding is None or embedding.shape[0] != self.embedding_dimension:
+                    continue
+                adopted[legacy_to_key[legacy_key]] = embedding
+                self._record_hit_age(now - (created_at or now))
+
+            if adopted:
+                with self._db_lock:
+                    with self._db_conn:
+                        self._db_conn.executemany(
+                            "DELETE FROM embeddings WHERE namespace IS NULL AND key = ?",
+                            [(key.split(":", 1)[-1],) for key in adopted]
+                        )
+                self._cache_stats["legacy_migrated"] += len(adopted)
+                self._put_many_to_disk_cache(list(adopted.items()))
+        except Exception as e:
+            logger.warning(f"Disk cache legacy adoption error: {e}")
+        return adopted
+
+    def _get_from_disk_cache(self, key: str) -> Optional[np.ndarray]:
+        """从磁盘缓存获取单个embedding"""
+        return self._get_many_from_disk_cache([key]).get(key)
+
+    def _record_hit_age(self, age_seconds: float) -> None:
+        """记录一次 L2 命中时条目的年龄分桶"""
+        for name, upper in _HIT_AGE_BUCKETS:
+            if age_seconds < upper:
+                self._cache_stats["hit_age"][name] += 1
+                return
+
+    def _touch(self, keys) -> None:
+        """
+        记录缓存条目被访问（LRU 淘汰依据）
+
+        last_access 更新先在内存中合并，随下一次写入事务落盘；
+        积累过多时主动唤醒写入，保证只读负载下也能刷新。
+        """
+        if not self._disk_cache_enabled:
+            return
+        now = time.time()
+        with self._touch_lock:
+            for key in keys:
+                self._pending_touches[key] = now
+            pending = len(self._pending_touches)
+        if pending >= _TOUCH_FLUSH_THRESHOLD:
+            if self._write_queue is not None:
+                self._write_queue.put(_TOUCH_MARKER)
+            else:
+                self._write_disk_batch([])
+
+    def _write_disk_batch(self, items: List[tuple]) -> None:
+        """在单个事务中写入一批 (key, embedding)，并合并刷新 last_access"""
+        if not self._db_conn:
+            return
+        with self._touch_lock:
+            touches, self._pending_touches = self._pending_touches, {}
+        if not items and not touches:
             return
+
+        now = time.time()
+        rows = [
+            (key, _pack_embedding(embedding, self.cache_dtype), now, DISK_CACHE_FORMAT_VERSION,
+             self.cache_dtype, int(embedding.shape[0]), self.model_name, now, self.cache_namespace)
+            for key, embedding in items
+        ]
         try:
-            embedding_blob = pickle.dumps(embedding)
-            self._db_conn.execute(
-                "INSERT OR REPLACE INTO embeddings (key, embedding, created_at) VALUES (?, ?, ?)",
-                (key, embedding_blob, time.time())
-            )
-            self._db_conn.commit()
+            with self._db_lock:
+                with self._db_conn:
+                    if rows:
+                        self._db_conn.executemany(
+                            "INSERT OR REPLACE INTO embeddings "
+                            "(key, embedding, created_at, format_version, dtype, dim, model, last_access, namespace) "
+                            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                            rows
+                        )
+                    if touches:
+                        self._db_conn.executemany(
+                            "UPDATE embeddings SET last_access = ? WHERE key = ?",
+                            [(ts, key) for key, ts in touches.items()]
+                        )
+            if rows:
+                self._cache_stats["l2_write_batches"] += 1
         except Exception as e:
             logger.warning(f"Disk cache write error: {e}")
+            return
+
+        self._rows_since_budget_check += len(rows)
+        if self._rows_since_budget_check >= self.cache_budget_check_interval:
+            self._enforce_disk_budget()
+
+    def _enforce_disk_budget(self) -> int:
+        """
+        按行数 / 字节预算淘汰最久未访问的条目
+
+        超出预算时删除到预算的 _EVICTION_LOW_WATERMARK，
+        删除后空闲页比例过高则自动 VACUUM。
+
+        Returns:
+            本次淘汰的行数
+        """
+        self._rows_since_budget_check = 0
+        if not self._db_conn or (not self.cache_max_rows and not self.cache_max_bytes):
+            return 0
+
+        evicted = 0
+        try:
+            with self._db_lock:
+                row_count, payload_bytes = self._db_conn.execute(
+                    "SELECT COUNT(*), COALESCE(SUM(LENGTH(embedding) + LENGTH(key)), 0) FROM embeddings"
+                ).fetchone()
+                if row_count == 0:
+                    return 0
+
+                excess = 0
+                if self.cache_max_rows and row_count > self.cache_max_rows:
+                    excess = row_count - int(self.cache_max_rows * _EVICTION_LOW_WATERMARK)
+                if self.cache_max_bytes and payload_bytes > self.cache_max_bytes:
+                    avg_row_bytes = payload_bytes / row_count
+                    target_bytes = self.cache_max_bytes * _EVICTION_LOW_WATERMARK
+                    excess = max(excess, int((payload_bytes - target_bytes) / avg_row_bytes) + 1)
+
+                if excess > 0:
+                    with self._db_conn:
+                        cursor = self._db_conn.execute(
+                            "DELETE FROM embeddings WHERE key IN ("
+                            "SELECT key FROM embeddings ORDER BY last_access ASC LIMIT ?)",
+                            (excess,)
+                        )
+                    evicted = cursor.rowcount
+                    self._cache_stats["evictions"] += evicted
+                    logger.info(
+                        f"Disk cache evicted {evicted} rows "
+                        f"(rows={row_count}, bytes={payload_bytes})"
+                    )
+
+                    page_count = self._db_conn.execute("PRAGMA page_count").fetchone()[0]
+                    free_pages = self._db_conn.execute("PRAGMA freelist_count").fetchone()[0]
+                    if page_count and free_pages / page_count > self.cache_vacuum_free_ratio:
+                        self._vacuum()
+        except Exception as e:
+            logger.warning(f"Disk cache eviction error: {e}")
+        return evicted
+
+    def _vacuum(self) -> None:
+        """重建数据库文件并截断 WAL（调用方需持有 _db_lock）"""
+        self._db_conn.execute("VACUUM")
+        self._db_conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        self._cache_stats["vacuums"] += 1
+
+    def compact_disk_cache(self, vacuum: bool = True) -> Dict[str, Any]:
+        """
+        按需整理磁盘缓存：落盘待写数据、执行预算淘汰，并可选 VACUUM
+
+        Args:
+            vacuum: 是否执行 VACUUM 回收空间
+
+        Returns:
+            整理前后的磁盘大小与淘汰行数
+        """
+        if not self._disk_cache_enabled or not self._db_conn:
+            return {"enabled": False}
+
+        self.flush_disk_cache()
+        size_before = self._disk_cache_file_size()
+        evicted = self._enforce_disk_budget()
+        if vacuum:
+            try:
+                with self._db_lock:
+                    self._vacuum()
+            except Exception as e:
+                logger.warning(f"Disk cache vacuum error: {e}")
+        size_after = self._disk_cache_file_size()
+
+        result = {
+            "enabled": True,
+            "evicted": evicted,
+            "size_before_bytes": size_before,
+            "size_after_bytes": size_after,
+        }
+        logger.info(f"Disk cache compacted: {result}")
+        return result
+
+    def _disk_cache_file_size(self) -> int:
+        """磁盘缓存占用字节数（数据库文件 + WAL）"""
+        if not hasattr(self, '_db_path'):
+            return 0
+        total = 0
+        for path in (self._db_path, self._db_path.with_name(self._db_path.name + "-wal")):
+            if path.exists():
+                total += path.stat().st_size
+        return total
+
+    def _put_many_to_disk_cache(self, items: List[tuple]) -> None:
+        """
+        批量写入磁盘缓存
+
+        启用 write-behind 时仅入队，由后台线程合并事务写入；否则同步写入一个事务。
+        """
+        if not items or not self._disk_cache_enabled or not self._db_conn:
+            return
+        if self._write_queue is not None:
+            for item in items:
+                self._write_queue.put(item)
+        else:
+            self._write_disk_batch(items)
+
+    def _put_to_disk_cache(self, key: str, embedding: np.ndarray) -> None:
+        """将单个embedding写入磁盘缓存"""
+        self._put_many_to_disk_cache([(key, embedding)])
+
+    def _lookup_cache(
+        self,
+        texts: List[str],
+        cache_suffix: str
+    ) -> tuple:
+        """
+        批量查询 L1 / L2 缓存
+
+        Returns:
+            (embeddings, keys, miss_indices)：embeddings 中未命中位置为 None
+        """
+        keys = [self._get_cache_key(text) + cache_suffix for text in texts]
+        embeddings: List[Optional[np.ndarray]] = [None] * len(texts)
+        l1_miss_indices = []
+
+        self._cache_stats["total_requests"] += len(texts)
+
+        # L1: 先查内存缓存
+        l1_hit_keys = []
+        for i, key in enumerate(keys):
+            cached = self._l1_cache.get(key)
+            if cached is not None:
+                embeddings[i] = cached
+                l1_hit_keys.append(key)
+                self._cache_stats["l1_hits"] += 1
+            else:
+                l1_miss_indices.append(i)
+        # L1 命中同样刷新 L2 的 last_access，避免热点条目被磁盘淘汰
+        self._touch(l1_hit_keys)
+
+        # L2: 一次批量查询磁盘缓存
+        disk_hits = self._get_many_from_disk_cache([keys[i] for i in l1_miss_indices])
+        miss_indices = []
+        for i in l1_miss_indices:
+            embedding = disk_hits.get(keys[i])
+            if embedding is not None:
+                # 回填L1缓存
+                self._l1_cache[keys[i]] = embedding
+                embeddings[i] = embedding
+                self._cache_stats["l2_hits"] += 1
+            else:
+                miss_indices.append(i)
+
+        self._cache_stats["misses"] += len(miss_indices)
+        return embeddings, keys, miss_indices
+
+    def _store_cache(self, keys: List[str], new_embeddings: List[np.ndarray]) -> None:
+        """写入 L1 并批量写入 L2"""
+        for key, embedding in zip(keys, new_embeddings):
+            self._l1_cache[key] = embedding
+        self._put_many_to_disk_cache(list(zip(keys, new_embeddings)))
 
     def get_embedding_dimension(self) -> int:
         """获取嵌入向量维度"""
-        return self.model.get_sentence_embedding_dimension()
+        return self.embedding_dimension
 
     def _get_cache_key(self, text: str) -> str:
-        """生成缓存键"""
-        return hashlib.md5(text.encode('utf-8')).hexdigest()
+        """生成缓存键（模型命名空间 + 文本摘要）"""
+        return f"{self.cache_namespace}:{hashlib.md5(text.encode('utf-8')).hexdigest()}"
+
+    def purge_stale_namespaces(self) -> int:
+        """
+        删除不属于当前模型命名空间的磁盘缓存行（包括无命名空间的旧行）
+
+        Returns:
+            删除的行数
+        """
+        if not self._disk_cache_enabled or not self._db_conn:
+            return 0
+        self.flush_disk_cache()
+        try:
+            with self._db_lock:
+                with self._db_conn:
+                    cursor = self._db_conn.execute(
+                        "DELETE FROM embeddings WHERE namespace IS NULL OR namespace != ?",
+                        (self.cache_namespace,)
+                    )
+            self._legacy_rows_present = False
+            logger.info(f"Purged {cursor.rowcount} stale embedding cache rows")
+            return cursor.rowcount
+        except Exception as e:
+            logger.error(f"Failed to purge stale namespaces: {e}")
+            return 0
 
     def encode(
         self,
@@ -229,7 +882,7 @@ class EmbeddingGenerator:
         use_cache: bool = True,
         show_progress: bool = False,
         prompt_name: Optional[str] = None
-    ) -> Union[List[float], List[List[float]]]:
+    ) -> Union[np.ndarray, List[np.ndarray]]:
         """
         将文本编码为向量
 
@@ -244,7 +897,7 @@ class EmbeddingGenerator:
             prompt_name: 提示名称，用于优化query编码（如"query"）
 
         Returns:
-            单个向量或向量列表
+            单个向量或向量列表（只读 float32 numpy 数组，与缓存共享内存）
         """
         # 统一处理为列表
         is_single = isinstance(texts, str)
@@ -253,84 +906,28 @@ class EmbeddingGenerator:
 
         # 检查缓存（缓存时需要考虑prompt_name）
         cache_suffix = f"_{prompt_name}" if prompt_name else ""
-        embeddings = []
-        texts_to_encode = []
-        text_indices = []
-
-        for i, text in enumerate(texts):
-            if use_cache:
-                self._cache_stats["total_requests"] += 1
-                cache_key = self._get_cache_key(text) + cache_suffix
-
-                # L1: 先查内存缓存
-                if cache_key in self._l1_cache:
-                    self._cache_stats["l1_hits"] += 1
-                    embeddings.append(self._l1_cache[cache_key])
-                    continue
-
-                # L2: 查磁盘缓存
-                disk_embedding = self._get_from_disk_cache(cache_key)
-                if disk_embedding is not None:
-                    self._cache_stats["l2_hits"] += 1
-                    # 回填L1缓存
-                    self._l1_cache[cache_key] = disk_embedding
-                    embeddings.append(disk_embedding)
-                    continue
-
-                # 缓存未命中
-                self._cache_stats["misses"] += 1
-
-            texts_to_encode.append(text)
-            text_indices.append(i)
+        if use_cache:
+            embeddings, keys, miss_indices = self._lookup_cache(texts, cache_suffix)
+        else:
+            embeddings, keys, miss_indices = [None] * len(texts), [], list(range(len(texts)))
 
         # 如果有未缓存的文本，进行编码
-        if texts_to_encode:
-            logger.debug(f"Encoding {len(texts_to_encode)} texts (cache hit: {len(embeddings)}/{len(texts)})")
-
-            # 按照Qwen3文档准备encode参数
-            encode_kwargs = {
-                'batch_size': self.batch_size,
-                'show_progress_bar': show_progress,
-                'convert_to_numpy': True,
-                'normalize_embeddings': True  # L2归一化，适合余弦相似度
-            }
-
-            # 按照文档：查询使用 prompt_name="query"，文档不需要prompt
-            # 添加向后兼容：旧版本可能不支持prompt_name
-            if prompt_name:
-                try:
-                    encode_kwargs['prompt_name'] = prompt_name
-                    new_embeddings = self.model.encode(
-                        texts_to_encode,
-                        **encode_kwargs
-                    )
-                except TypeError as e:
-                    # 降级：不使用prompt_name
-                    logger.warning(f"prompt_name not supported, falling back: {e}")
-                    encode_kwargs.pop('prompt_name', None)
-                    new_embeddings = self.model.encode(
-                        texts_to_encode,
-                        **encode_kwargs
-                    )
-            else:
-                new_embeddings = self.model.encode(
-                    texts_to_encode,
-                    **encode_kwargs
-                )
-
-            # 更新缓存和结果
-            for i, embedding in enumerate(new_embeddings):
-                text = texts_to_encode[i]
-                embedding_list = embedding.tolist()
+        if miss_indices:
+            logger.debug(f"Encoding {len(miss_indices)} texts (cache hit: {len(texts) - len(miss_indices)}/{len(texts)})")
+
+            new_embeddings = self._encode_batch_sync(
+                [texts[i] for i in miss_indices],
+                self.batch_size,
+                prompt_name,
+                show_progress=show_progress
+            )
 
-                if use_cache:
-                    cache_key = self._get_cache_key(text) + cache_suffix
-                    # 写入L1内存缓存
-                    self._l1_cache[cache_key] = embedding_list
-                    # 写入L2磁盘缓存
-                    self._put_to_disk_cache(cache_key, embedding_list)
+            for original_index, embedding in zip(miss_indices, new_embeddings):
+                embeddings[original_index] = embedding
 
-                embeddings.append(embedding_list)
+            # 更新缓存（L2 批量写入）
+            if use_cache:
+                self._store_cache([keys[i] for i in miss_indices], new_embeddings)
 
         # 如果是单个文本，返回单个向量
         if is_single:
@@ -344,7 +941,7 @@ class EmbeddingGenerator:
         batch_size: Optional[int] = None,
         show_progress: bool = True,
         prompt_name: Optional[str] = None
-    ) -> List[List[float]]:
+    ) -> List[np.ndarray]:
         """
         批量编码文本（适用于大规模初始化）
 
@@ -363,29 +960,7 @@ class EmbeddingGenerator:
 
         logger.info(f"Batch encoding {len(texts)} texts with batch_size={batch_size}")
 
-        # 按照Qwen3文档准备参数
-        encode_kwargs = {
-            'batch_size': batch_size,
-            'show_progress_bar': show_progress,
-            'convert_to_numpy': True,
-            'normalize_embeddings': True  # L2归一化
-        }
-
-        # 如果需要（如批量编码查询），可以添加prompt_name
-        # 添加向后兼容：旧版本可能不支持prompt_name
-        if prompt_name:
-            try:
-                encode_kwargs['prompt_name'] = prompt_name
-                embeddings = self.model.encode(texts, **encode_kwargs)
-            except TypeError as e:
-                # 降级：不使用prompt_name
-                logger.warning(f"prompt_name not supported in encode_batch, falling back: {e}")
-                encode_kwargs.pop('prompt_name', None)
-                embeddings = self.model.encode(texts, **encode_kwargs)
-        else:
-            embeddings = self.model.encode(texts, **encode_kwargs)
-
-        return [emb.tolist() for emb in embeddings]
+        return self._encode_batch_sync(texts, batch_size, prompt_name, show_progress=show_progress)
 
     async def encode_batch_async(
         self,
@@ -393,7 +968,7 @@ class EmbeddingGenerator:
         batch_size: Optional[int] = None,
         prompt_name: Optional[str] = None,
         use_cache: bool = True
-    ) -> List[List[float]]:
+    ) -> List[np.ndarray]:
         """
         异步批量编码文本（适用于大规模并发请求）
 
@@ -411,92 +986,201 @@ class EmbeddingGenerator:
         """
         # 分离缓存命中和未命中的文本
         cache_suffix = f"_{prompt_name}" if prompt_name else ""
-        cached_embeddings = {}
-        texts_to_encode = []
-        text_indices = []
-
-        for i, text in enumerate(texts):
-            if use_cache:
-                cache_key = self._get_cache_key(text) + cache_suffix
-                # 先查 L1 缓存
-                if cache_key in self._l1_cache:
-                    cached_embeddings[i] = self._l1_cache[cache_key]
-                    self._cache_stats['l1_hits'] += 1
-                    continue
-                # 再查 L2 缓存
-                if self._disk_cache_enabled:
-                    disk_result = self._get_from_disk_cache(cache_key)
-                    if disk_result is not None:
-                        cached_embeddings[i] = disk_result
-                        self._l1_cache[cache_key] = disk_result  # 回填 L1
-                        self._cache_stats['l2_hits'] += 1
-                        continue
-
-            texts_to_encode.append(text)
-            text_indices.append(i)
-            self._cache_stats['misses'] += 1
-
-        self._cache_stats['total_requests'] += len(texts)
+        if use_cache:
+            embeddings, keys, miss_indices = self._lookup_cache(texts, cache_suffix)
+        else:
+            embeddings, keys, miss_indices = [None] * len(texts), [], list(range(len(texts)))
 
         # 如果有未缓存的文本，异步编码
-        if texts_to_encode:
+        if miss_indices:
             batch_size = batch_size or self.batch_size
 
-            # 使用 to_thread 在线程池中执行编码
-            new_embeddings = await asyncio.to_thread(
-                self._encode_batch_sync,
-                texts_to_encode,
-                batch_size,
-                prompt_name
-            )
+            if self.uses_worker_pool:
+                # 工作进程池：直接在事件循环中等待结果，与其他并发请求合并成批
+                matrix = await self.model.encode_async([texts[i] for i in miss_indices], prompt_name)
+                new_embeddings = list(matrix)
+            else:
+                # 使用 to_thread 在线程池中执行编码
+                new_embeddings = await asyncio.to_thread(
+                    self._encode_batch_sync,
+                    [texts[i] for i in miss_indices],
+                    batch_size,
+                    prompt_name
+                )
 
-            # 更新缓存
-            for i, embedding in enumerate(new_embeddings):
-                text = texts_to_encode[i]
-                original_index = text_indices[i]
-                cached_embeddings[original_index] = embedding
+            for original_index, embedding in zip(miss_indices, new_embeddings):
+                embeddings[original_index] = embedding
 
-                if use_cache:
-                    cache_key = self._get_cache_key(text) + cache_suffix
-                    self._l1_cache[cache_key] = embedding
-                    if self._disk_cache_enabled:
-                        self._put_to_disk_cache(cache_key, embedding)
+            # 更新缓存
+            if use_cache:
+                self._store_cache([keys[i] for i in miss_indices], new_embeddings)
 
         # 按原始顺序返回结果
-        return [cached_embeddings[i] for i in range(len(texts))]
+        return embeddings
 
-    def _encode_batch_sync(
+    def _token_lengths(self, texts: List[str], prompt_name: Optional[str] = None) -> List[int]:
+        """
+        估算每条文本编码时的 token 数（含 prompt，截断到 max_length）
+
+        后端没有分词器时按字符数近似。
+        """
+        tokenizer = getattr(self.model, "tokenizer", None)
+        prompt = ""
+        if prompt_name:
+            prompt = (getattr(self.model, "prompts", None) or {}).get(prompt_name, "")
+        limit = self.max_length or None
+        if tokenizer is None:
+            lengths = [len(prompt) + len(t) for t in texts]
+        else:
+            try:
+                encoded = tokenizer(
+                    [prompt + t for t in texts] if prompt else texts,
+                    add_special_tokens=True,
+                    truncation=limit is not None,
+                    max_length=limit,
+                )["input_ids"]
+                lengths = [len(ids) for ids in encoded]
+            except Exception as e:
+                logger.debug(f"Tokenizer length estimation failed, using char counts: {e}")
+                lengths = [len(prompt) + len(t) for t in texts]
+        if limit:
+            lengths = [min(n, limit) for n in lengths]
+        return [max(n, 1) for n in lengths]
+
+    def _plan_length_buckets(self, lengths: List[int]) -> List[List[int]]:
+        """
+        按 token 长度排序并切分批次
+
+        每个批次填充后的 token 数（批大小 × 批内最长长度）不超过 batch_token_budget，
+        超长文本单独成批；批大小同时受 max_batch_size 限制。
+
+        Returns:
+            原始下标组成的批次列表（批内按长度升序）
+        """
+        order = sorted(range(len(lengths)), key=lambda i: lengths[i])
+        buckets: List[List[int]] = []
+        current: List[int] = []
+        for index in order:
+            # 升序遍历，当前文本就是加入后批内最长的
+            padded = (len(current) + 1) * lengths[index]
+            if current and (padded > self.batch_token_budget or len(current) >= self.max_batch_size):
+                buckets.append(current)
+                current = []
+            current.append(index)
+        if current:
+            buckets.append(current)
+        return buckets
+
+    def _model_encode(
         self,
         texts: List[str],
         batch_size: int,
-        prompt_name: Optional[str] = None
-    ) -> List[List[float]]:
-        """
-        同步批量编码（内部方法）
-        """
+        prompt_name: Optional[str],
+        show_progress: bool
+    ) -> np.ndarray:
         encode_kwargs = {
             'batch_size': batch_size,
-            'show_progress_bar': False,
+            'show_progress_bar': show_progress,
             'convert_to_numpy': True,
-            'normalize_embeddings': True
+            'normalize_embeddings': self.normalize_embeddings  # L2归一化，适合余弦相似度
         }
 
+        # 按照文档：查询使用 prompt_name="query"，文档不需要prompt
+        # 添加向后兼容：旧版本可能不支持prompt_name
         if prompt_name:
             try:
                 encode_kwargs['prompt_name'] = prompt_name
                 embeddings = self.model.encode(texts, **encode_kwargs)
-            except TypeError:
+            except TypeError as e:
+                logger.warning(f"prompt_name not supported, falling back: {e}")
                 encode_kwargs.pop('prompt_name', None)
                 embeddings = self.model.encode(texts, **encode_kwargs)
         else:
             embeddings = self.model.encode(texts, **encode_kwargs)
+        return np.asarray(embeddings, dtype=np.float32)
 
-        return [emb.tolist() for emb in embeddings]
+    def _encode_batch_sync(
+        self,
+        texts: List[str],
+        batch_size: int,
+        prompt_name: Optional[str] = None,
+        show_progress: bool = False
+    ) -> List[np.ndarray]:
+        """
+        同步批量编码（内部方法）
+
+        启用 batch_token_budget 时按 token 长度分桶编码，批大小由 token 预算决定，
+        结果按输入顺序返回；否则按固定 batch_size 编码。
+        返回只读 float32 行向量，可直接放入缓存并与调用方共享。
+        """
+        if not texts:
+            return []
+
+        if not self.batch_token_budget or len(texts) == 1:
+            matrix = self._model_encode(texts, batch_size, prompt_name, show_progress)
+            self._record_batches(
+                [min(batch_size, len(texts) - i) for i in range(0, len(texts), batch_size)], None
+            )
+        else:
+            lengths = self._token_lengths(texts, prompt_name)
+            buckets = self._plan_length_buckets(lengths)
+            matrix = np.empty((len(texts), self.embedding_dimension), dtype=np.float32)
+
+            progress = None
+            if show_progress:
+                from tqdm import tqdm
+                progress = tqdm(total=len(texts), desc="Encoding")
+            for bucket in buckets:
+                rows = self._model_encode([texts[i] for i in bucket], len(bucket), prompt_name, False)
+                matrix[bucket] = rows
+                if progress is not None:
+                    progress.update(len(bucket))
+            if progress is not None:
+                progress.close()
+            self._record_batches([len(b) for b in buckets], (lengths, buckets))
+
+        matrix.flags.writeable = False
+        return list(matrix)
+
+    def _record_batches(self, sizes: List[int], plan) -> None:
+        """累计分批统计：批次数、真实 token 数与填充后 token 数"""
+        stats = self._batch_stats
+        stats["batches"] += len(sizes)
+        stats["texts"] += sum(sizes)
+        if plan is not None:
+            lengths, buckets = plan
+            for bucket in buckets:
+                stats["tokens"] += sum(lengths[i] for i in bucket)
+                stats["padded_tokens"] += len(bucket) * max(lengths[i] for i in bucket)
+
+    def get_batching_stats(self) -> Dict[str, Any]:
+        """
+        获取编码分批统计
+
+        Returns:
+            批次数、平均批大小与 token 填充率（仅分桶模式下统计 token），
+            启用工作进程池时附带合并批次统计
+        """
+        stats = self._batch_stats
+        padded = stats["padded_tokens"]
+        result = {
+            "token_budget": self.batch_token_budget,
+            "max_batch_size": self.max_batch_size,
+            "batches": stats["batches"],
+            "texts": stats["texts"],
+            "avg_batch_size": round(stats["texts"] / stats["batches"], 2) if stats["batches"] else 0.0,
+            "tokens": stats["tokens"],
+            "padded_tokens": padded,
+            "padding_ratio": round(1 - stats["tokens"] / padded, 4) if padded else 0.0,
+        }
+        if self.uses_worker_pool:
+            result["worker_pool"] = self.model.get_statistics()
+        return result
 
     def compute_similarity(
         self,
-        text1: Union[str, List[float]],
-        text2: Union[str, List[float]]
+        text1: Union[str, List[float], np.ndarray],
+        text2: Union[str, List[float], np.ndarray]
     ) -> float:
         """
         计算两个文本或向量的余弦相似度
@@ -509,23 +1193,14 @@ class EmbeddingGenerator:
             相似度分数（0-1）
         """
         # 获取向量
-        if isinstance(text1, str):
-            vec1 = torch.tensor(self.encode(text1))
-        else:
-            vec1 = torch.tensor(text1)
-
-        if isinstance(text2, str):
-            vec2 = torch.tensor(self.encode(text2))
-        else:
-            vec2 = torch.tensor(text2)
+        vec1 = np.asarray(self.encode(text1) if isinstance(text1, str) else text1, dtype=np.float32)
+        vec2 = np.asarray(self.encode(text2) if isinstance(text2, str) else text2, dtype=np.float32)
 
         # 计算余弦相似度
-        similarity = torch.nn.functional.cosine_similarity(
-            vec1.unsqueeze(0),
-            vec2.unsqueeze(0)
-        )
-
-        return similarity.item()
+        norm = float(np.linalg.norm(vec1) * np.linalg.norm(vec2))
+        if norm == 0.0:
+            return 0.0
+        return float(np.dot(vec1, vec2) / norm)
 
     def clear_cache(self):
         """清空L1内存缓存"""
@@ -543,8 +1218,10 @@ class EmbeddingGenerator:
             logger.warning("Disk cache not enabled")
             return False
         try:
-            self._db_conn.execute("DELETE FROM embeddings")
-            self._db_conn.commit()
+            self.flush_disk_cache()
+            with self._db_lock:
+                self._db_conn.execute("DELETE FROM embeddings")
+                self._db_conn.commit()
             logger.info("L2 disk cache cleared")
             return True
         except Exception as e:
@@ -555,12 +1232,7 @@ class EmbeddingGenerator:
         """清空所有缓存（L1 + L2）并重置统计"""
         self.clear_cache()
         self.clear_disk_cache()
-        self._cache_stats = {
-            "l1_hits": 0,
-            "l2_hits": 0,
-            "misses": 0,
-            "total_requests": 0
-        }
+        self._cache_stats = self._new_cache_stats()
         logger.info("All caches and stats cleared")
 
     def warmup_cache(self, texts: List[str], prompt_name: Optional[str] = None) -> Dict[str, Any]:
@@ -577,24 +1249,20 @@ class EmbeddingGenerator:
         start_time = time.time()
         cache_suffix = f"_{prompt_name}" if prompt_name else ""
 
-        # 统计已缓存和需要编码的文本
+        # 统计已缓存和需要编码的文本（L1 + 一次批量 L2 查询）
+        keys = [self._get_cache_key(text) + cache_suffix for text in texts]
+        l1_miss = [i for i, key in enumerate(keys) if key not in self._l1_cache]
+        disk_hits = self._get_many_from_disk_cache([keys[i] for i in l1_miss])
+
         texts_to_encode = []
-        already_cached = 0
-
-        for text in texts:
-            cache_key = self._get_cache_key(text) + cache_suffix
-            # 检查L1
-            if cache_key in self._l1_cache:
-                already_cached += 1
-                continue
-            # 检查L2
-            disk_embedding = self._get_from_disk_cache(cache_key)
-            if disk_embedding is not None:
+        for i in l1_miss:
+            embedding = disk_hits.get(keys[i])
+            if embedding is not None:
                 # 回填L1
-                self._l1_cache[cache_key] = disk_embedding
-                already_cached += 1
-                continue
-            texts_to_encode.append(text)
+                self._l1_cache[keys[i]] = embedding
+            else:
+                texts_to_encode.append(texts[i])
+        already_cached = len(texts) - len(texts_to_encode)
 
         # 编码新文本
         newly_encoded = 0
@@ -634,12 +1302,15 @@ class EmbeddingGenerator:
         # L2磁盘缓存统计
         l2_size = 0
         disk_file_size_bytes = 0
+        payload_bytes = 0
         if self._disk_cache_enabled and self._db_conn:
             try:
-                cursor = self._db_conn.execute("SELECT COUNT(*) FROM embeddings")
-                l2_size = cursor.fetchone()[0]
-                if hasattr(self, '_db_path') and self._db_path.exists():
-                    disk_file_size_bytes = self._db_path.stat().st_size
+                with self._db_lock:
+                    cursor = self._db_conn.execute(
+                        "SELECT COUNT(*), COALESCE(SUM(LENGTH(embedding) + LENGTH(key)), 0) FROM embeddings"
+                    )
+                    l2_size, payload_bytes = cursor.fetchone()
+                disk_file_size_bytes = self._disk_cache_file_size()
             except Exception as e:
                 logger.warning(f"Failed to get disk cache stats: {e}")
 
@@ -656,7 +1327,20 @@ class EmbeddingGenerator:
                 "file_size_bytes": disk_file_size_bytes,
                 "file_size_mb": round(disk_file_size_bytes / (1024 * 1024), 2),
                 "hits": l2_hits,
-                "hit_rate": round(l2_hit_rate, 4)
+                "hit_rate": round(l2_hit_rate, 4),
+                "format_version": DISK_CACHE_FORMAT_VERSION,
+                "dtype": self.cache_dtype,
+                "legacy_migrated": self._cache_stats["legacy_migrated"],
+                "write_behind": self._write_queue is not None,
+                "pending_writes": self._write_queue.qsize() if self._write_queue is not None else 0,
+                "write_batches": self._cache_stats["l2_write_batches"],
+                "payload_bytes": payload_bytes,
+                "max_rows": self.cache_max_rows,
+                "max_bytes": self.cache_max_bytes,
+                "evictions": self._cache_stats["evictions"],
+                "vacuums": self._cache_stats["vacuums"],
+                "hit_age_distribution": dict(self._cache_stats["hit_age"]),
+                "namespace": self.cache_namespace
             },
             "overall": {
                 "total_requests": total_requests,
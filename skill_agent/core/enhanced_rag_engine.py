@@ -4,28 +4,36 @@
 新增：检索轨迹、分层上下文、用户偏好（借鉴 OpenViking）
 """
 
+import atexit
 import logging
 import hashlib
 import json
-from typing import List, Dict, Any, Optional
+import os
+import threading
+from typing import Callable, List, Dict, Any, Optional
 from datetime import datetime
-from cachetools import TTLCache
 
 from .embeddings import EmbeddingGenerator
 from .vector_store import create_vector_store
+from .vector_result import VectorQueryResult
 from .skill_indexer import SkillIndexer
 from .action_indexer import ActionIndexer
 from .structured_query_engine import StructuredQueryEngine
 
 # 新增模块
 from .hybrid_search import HybridSearchEngine, BM25Index
+from .bm25_tokenizer import create_tokenizer
 from .query_understanding import QueryUnderstandingEngine, QueryIntent
 from .reranker import (
     RerankerPipeline, SkillReranker, ActionReranker,
-    CrossEncoderReranker, RerankResult
+    CrossEncoderReranker, SemanticReranker, RerankResult
 )
 from .extended_query_parser import ExtendedQueryParser, ExtendedQueryEvaluator
-from .incremental_indexer import IncrementalIndexer, FileChangeType
+from .query_batcher import QueryBatcher
+from .index_pipeline import IndexCheckpoint, IndexChunk, IndexProgress, IndexRecord, StreamingIndexer
+from .lazy_component import LazyComponent, LazyProxy, StartupTimings, component_attribute
+from .query_cache import VersionedQueryCache, SemanticQueryCache
+from .incremental_indexer import IncrementalIndexer, FileChange, FileChangeType
 from .context_aware_retriever import ContextAwareRetriever, EditContext
 
 # OpenViking 启发的模块
@@ -53,186 +61,389 @@ class EnhancedRAGEngine:
 
         logger.info("Initializing Enhanced RAG Engine...")
 
-        # ============ 基础组件 ============
-        # 1. 嵌入生成器
-        self.embedding_generator = EmbeddingGenerator(config.get('embedding', {}))
-
-        # 2. 向量存储（技能）
-        self.vector_store = create_vector_store(
-            config.get('vector_store', {}),
-            embedding_dimension=self.embedding_generator.get_embedding_dimension(),
-        )
-
-        # 3. Action向量存储
-        action_vector_config = config.get('vector_store', {}).copy()
-        action_vector_config['collection_name'] = config.get('action_indexer', {}).get(
-            'collection_name', 'action_collection'
-        )
-        self.action_vector_store = create_vector_store(
-            action_vector_config,
-            embedding_dimension=self.embedding_generator.get_embedding_dimension(),
-        )
-
-        # 4. 索引器
-        self.skill_indexer = SkillIndexer(config.get('skill_indexer', {}))
-        self.action_indexer = ActionIndexer(config.get('action_indexer', {}))
-
-        # 5. 结构化查询引擎
-        skills_dir = config.get('skill_indexer', {}).get(
+        self.startup_timings = StartupTimings()
+        lazy_config = self.rag_config.get('lazy_startup', {}) or {}
+        self._serve_bm25_while_loading = lazy_config.get('serve_bm25_while_loading', True)
+        self._skills_dir = config.get('skill_indexer', {}).get(
             'skills_directory', '../Data/Skills'
         )
-        self.structured_query_engine = StructuredQueryEngine(
-            skills_dir=skills_dir,
-            cache_size=self.rag_config.get('structured_query_cache_size', 100)
-        )
-
-        # ============ 增强组件 ============
-        # 6. 混合检索引擎
-        self.hybrid_search = HybridSearchEngine(
-            vector_store=self.vector_store,
-            embedding_generator=self.embedding_generator,
-            bm25_weight=self.rag_config.get('bm25_weight', 0.3),
-            vector_weight=self.rag_config.get('vector_weight', 0.7),
-            rrf_k=self.rag_config.get('rrf_k', 60)
-        )
-
-        # 7. Action混合检索
-        self.action_hybrid_search = HybridSearchEngine(
-            vector_store=self.action_vector_store,
-            embedding_generator=self.embedding_generator,
-            bm25_weight=0.4,  # Action更依赖关键词
-            vector_weight=0.6
-        )
-
-        # 8. 查询理解引擎
-        self.query_understanding = QueryUnderstandingEngine()
 
-        # 9. 重排序管道
-        self.skill_reranker = RerankerPipeline()
-        self.skill_reranker.add_stage(SkillReranker())
-        
-        self.action_reranker = RerankerPipeline()
-        self.action_reranker.add_stage(ActionReranker())
-
-        # 可选：添加Cross-Encoder重排序
-        if self.rag_config.get('use_cross_encoder', False):
-            self.skill_reranker.add_stage(CrossEncoderReranker())
-            self.action_reranker.add_stage(CrossEncoderReranker())
+        # BM25快照：写入只改内存索引，文件监听的批次在静默 bm25_save_delay 秒后合并保存一次，
+        # 全量索引结束与进程退出时立即保存
+        self._bm25_save_delay = self.rag_config.get('bm25_save_delay', 5.0)
+        self._bm25_save_timer: Optional[threading.Timer] = None
+        self._index_lock = threading.RLock()
+
+        # ============ 组件（首次使用时构建） ============
+        # 下游组件持有嵌入生成器的代理，模型在第一次 encode 时才需要就绪
+        self._embedding_proxy = LazyProxy(lambda: self.embedding_generator)
+        self._components: Dict[str, LazyComponent] = {
+            name: LazyComponent(name, factory, self.startup_timings)
+            for name, factory in [
+                # 基础组件
+                ('embedding_generator', self._build_embedding_generator),
+                ('vector_store', self._build_vector_store),
+                ('action_vector_store', self._build_action_vector_store),
+                ('skill_indexer', lambda: SkillIndexer(config.get('skill_indexer', {}))),
+                ('action_indexer', lambda: ActionIndexer(config.get('action_indexer', {}))),
+                ('structured_query_engine', lambda: StructuredQueryEngine(
+                    skills_dir=self._skills_dir,
+                    cache_size=self.rag_config.get('structured_query_cache_size', 100)
+                )),
+                # 增强组件
+                ('bm25_tokenizer', lambda: create_tokenizer(self.rag_config.get('bm25_tokenizer'))),
+                ('hybrid_search', self._build_hybrid_search),
+                ('action_hybrid_search', self._build_action_hybrid_search),
+                ('query_batchers', self._build_query_batchers),
+                ('query_understanding', QueryUnderstandingEngine),
+                ('skill_reranker', self._build_skill_reranker),
+                ('action_reranker', self._build_action_reranker),
+                ('skill_keyword_reranker', lambda: self._build_reranker(SkillReranker())),
+                ('action_keyword_reranker', lambda: self._build_reranker(ActionReranker())),
+                ('incremental_indexer', self._build_incremental_indexer),
+                ('context_retriever', lambda: ContextAwareRetriever(
+                    rag_engine=self,
+                    history_file=self.rag_config.get(
+                        'query_history_file', '../Data/query_history.json'
+                    )
+                )),
+                # OpenViking 启发的组件
+                ('trace_storage', lambda: TraceStorage(
+                    storage_path=self.rag_config.get('trace_storage_path', 'Data/traces'),
+                    max_traces=1000
+                )),
+                ('context_cache', lambda: LayeredContextCache(
+                    cache_dir=self.rag_config.get('context_cache_dir', 'Data/context_cache')
+                )),
+                ('preference_memory', lambda: PreferenceMemory(
+                    storage_path=self.rag_config.get(
+                        'preference_storage_path', 'Data/user_preferences'
+                    ),
+                    user_id=self.rag_config.get('user_id', 'default')
+                )),
+            ]
+        }
 
-        # 10. 扩展查询解析器
+        # 扩展查询解析器、上下文生成器（无外部资源，直接构建）
         self.extended_parser = ExtendedQueryParser()
         self.extended_evaluator = ExtendedQueryEvaluator()
-
-        # 11. 增量索引器
-        self.incremental_indexer = IncrementalIndexer(
-            watch_directory=skills_dir,
-            file_pattern="*.json",
-            hash_cache_file=config.get('skill_indexer', {}).get(
-                'hash_cache', '../Data/skill_hash_cache.json'
-            ),
-            index_version_file=config.get('skill_indexer', {}).get(
-                'version_file', '../Data/skill_index_version.json'
-            )
-        )
-        self._setup_incremental_callbacks()
-
-        # 12. 上下文感知检索器
-        self.context_retriever = ContextAwareRetriever(
-            rag_engine=self,
-            history_file=config.get('rag', {}).get(
-                'query_history_file', '../Data/query_history.json'
-            )
-        )
+        self.context_generator = SkillContextGenerator()
+        self._enable_tracing = self.rag_config.get('enable_tracing', True)
 
         # ============ 缓存 ============
+        # 查询缓存按索引代号失效：增量索引版本 + 本引擎内的写入计数
+        self._index_generation = 0
         cache_enabled = self.rag_config.get('cache_enabled', True)
         cache_ttl = self.rag_config.get('cache_ttl', 3600)
         if cache_enabled:
-            self._query_cache = TTLCache(maxsize=1000, ttl=cache_ttl)
+            self._query_cache: Optional[VersionedQueryCache] = VersionedQueryCache(
+                generation=self._current_index_generation,
+                maxsize=self.rag_config.get('cache_maxsize', 1000),
+                ttl=cache_ttl
+            )
         else:
             self._query_cache = None
 
-        # ============ OpenViking 启发的组件 ============
-        # 13. 检索轨迹存储
-        self.trace_storage = TraceStorage(
-            storage_path=config.get('rag', {}).get(
-                'trace_storage_path', 'Data/traces'
-            ),
-            max_traces=1000
-        )
-        self._enable_tracing = self.rag_config.get('enable_tracing', True)
-
-        # 14. 分层上下文缓存
-        self.context_cache = LayeredContextCache(
-            cache_dir=config.get('rag', {}).get(
-                'context_cache_dir', 'Data/context_cache'
+        # 二级语义缓存：查询向量与已缓存查询足够相似时复用结果
+        semantic_cache_config = self.rag_config.get('semantic_cache', {})
+        if cache_enabled and semantic_cache_config.get('enabled', False):
+            self._semantic_cache: Optional[SemanticQueryCache] = SemanticQueryCache(
+                generation=self._current_index_generation,
+                threshold=semantic_cache_config.get('threshold', 0.92),
+                maxsize=semantic_cache_config.get('maxsize', 256),
+                ttl=cache_ttl
             )
-        )
-        self.context_generator = SkillContextGenerator()
-
-        # 15. 用户偏好记忆
-        self.preference_memory = PreferenceMemory(
-            storage_path=config.get('rag', {}).get(
-                'preference_storage_path', 'Data/user_preferences'
-            ),
-            user_id=config.get('rag', {}).get('user_id', 'default')
-        )
+        else:
+            self._semantic_cache = None
 
         # ============ 统计 ============
         self._stats = {
             'total_queries': 0,
             'cache_hits': 0,
+            'semantic_cache_hits': 0,
             'hybrid_searches': 0,
+            'bm25_fallback_queries': 0,
             'reranked_queries': 0,
             'total_indexed': 0,
             'last_index_time': None,
             'traced_queries': 0
         }
 
+        # ============ 启动 ============
+        atexit.register(self.flush_bm25_snapshots)
+        if lazy_config.get('enabled', True):
+            # 模型等耗时组件放到后台线程预热，其余组件首次使用时构建
+            for name in lazy_config.get('preload', ['embedding_generator']):
+                self._components[name].preload()
+        else:
+            for component in self._components.values():
+                component.get()
+        self.startup_timings.log_summary("Enhanced RAG Engine constructed")
+
         logger.info("Enhanced RAG Engine initialized successfully (with OpenViking features)")
 
-    def _setup_incremental_callbacks(self):
-        """设置增量索引回调"""
-        def on_file_created(file_path: str):
-            logger.info(f"New skill file detected: {file_path}")
-            self._index_single_skill(file_path)
+    # ============ 组件 ============
+
+    embedding_generator = component_attribute()
+    vector_store = component_attribute()
+    action_vector_store = component_attribute()
+    skill_indexer = component_attribute()
+    action_indexer = component_attribute()
+    structured_query_engine = component_attribute()
+    bm25_tokenizer = component_attribute()
+    hybrid_search = component_attribute()
+    action_hybrid_search = component_attribute()
+    query_understanding = component_attribute()
+    skill_reranker = component_attribute()
+    action_reranker = component_attribute()
+    skill_keyword_reranker = component_attribute()  # 仅规则阶段，模型加载期间使用
+    action_keyword_reranker = component_attribute()
+    incremental_indexer = component_attribute()
+    context_retriever = component_attribute()
+    trace_storage = component_attribute()
+    context_cache = component_attribute()
+    preference_memory = component_attribute()
+
+    @property
+    def skill_query_batcher(self) -> Optional[QueryBatcher]:
+        return self._components['query_batchers'].get()[0]
+
+    @property
+    def action_query_batcher(self) -> Optional[QueryBatcher]:
+        return self._components['query_batchers'].get()[1]
+
+    def _embedding_dimension(self) -> int:
+        """
+        向量维度：优先使用配置 embedding.dimension，
+        这样打开向量表与加载BM25快照不必等待模型加载
+        """
+        dimension = self.config.get('embedding', {}).get('dimension')
+        if dimension:
+            return int(dimension)
+        return self.embedding_generator.get_embedding_dimension()
+
+    def _build_embedding_generator(self) -> EmbeddingGenerator:
+        generator = EmbeddingGenerator(self.config.get('embedding', {}))
+        configured = self.config.get('embedding', {}).get('dimension')
+        if configured and int(configured) != generator.get_embedding_dimension():
+            raise ValueError(
+                f"embedding.dimension={configured} does not match model dimension "
+                f"{generator.get_embedding_dimension()}"
+            )
+        return generator
+
+    def _build_vector_store(self):
+        return create_vector_store(
+            self.config.get('vector_store', {}),
+            embedding_dimension=self._embedding_dimension(),
+        )
+
+    def _build_action_vector_store(self):
+        action_vector_config = self.config.get('vector_store', {}).copy()
+        action_vector_config['collection_name'] = self.config.get('action_indexer', {}).get(
+            'collection_name', 'action_collection'
+        )
+        return create_vector_store(
+            action_vector_config,
+            embedding_dimension=self._embedding_dimension(),
+        )
+
+    def _build_hybrid_search(self) -> HybridSearchEngine:
+        # 技能与Action共用同一个BM25分词器；加载与向量表同版本的BM25快照
+        hybrid_search = HybridSearchEngine(
+            vector_store=self.vector_store,
+            embedding_generator=self._embedding_proxy,
+            bm25_weight=self.rag_config.get('bm25_weight', 0.3),
+            vector_weight=self.rag_config.get('vector_weight', 0.7),
+            rrf_k=self.rag_config.get('rrf_k', 60),
+            bm25_path=self._bm25_path(self.vector_store),
+            bm25_tokenizer=self.bm25_tokenizer
+        )
+        hybrid_search.query_batcher = self.skill_query_batcher
+        hybrid_search.load_bm25_index()
+        return hybrid_search
 
-        def on_file_modified(file_path: str):
-            logger.info(f"Skill file modified: {file_path}")
-            self._index_single_skill(file_path)
+    def _build_action_hybrid_search(self) -> HybridSearchEngine:
+        action_hybrid_search = HybridSearchEngine(
+            vector_store=self.action_vector_store,
+            embedding_generator=self._embedding_proxy,
+            bm25_weight=0.4,  # Action更依赖关键词
+            vector_weight=0.6,
+            bm25_path=self._bm25_path(self.action_vector_store),
+            bm25_tokenizer=self.bm25_tokenizer
+        )
+        action_hybrid_search.query_batcher = self.action_query_batcher
+        action_hybrid_search.load_bm25_index()
+        return action_hybrid_search
+
+    def _build_query_batchers(self):
+        """查询微批处理：并发查询在时间窗内合并编码与检索"""
+        batching_config = self.rag_config.get('query_batching', {}) or {}
+        if not batching_config.get('enabled', False):
+            return None, None
+        window_ms = batching_config.get('window_ms', 2.0)
+        max_batch_size = batching_config.get('max_batch_size', 16)
+        skill_batcher = QueryBatcher(
+            self._embedding_proxy, self.vector_store,
+            window_ms=window_ms, max_batch_size=max_batch_size
+        )
+        action_batcher = QueryBatcher(
+            self._embedding_proxy, self.action_vector_store,
+            window_ms=window_ms, max_batch_size=max_batch_size
+        )
+        return skill_batcher, action_batcher
+
+    def _build_reranker(self, base_stage, store=None) -> RerankerPipeline:
+        """base_stage 之后追加语义 / Cross-Encoder 阶段；store 为 None 时只有规则阶段"""
+        pipeline = RerankerPipeline()
+        pipeline.add_stage(base_stage)
+        if store is None:
+            return pipeline
+        # 语义重排序：文档向量从向量存储读取，一次矩阵运算打分
+        if self.rag_config.get('use_semantic_rerank', True):
+            pipeline.add_stage(SemanticReranker(self._embedding_proxy, vector_store=store))
+        # 可选：添加Cross-Encoder重排序
+        if self.rag_config.get('use_cross_encoder', False):
+            pipeline.add_stage(CrossEncoderReranker())
+        return pipeline
 
-        def on_file_deleted(file_path: str):
-            logger.info(f"Skill file deleted: {file_path}")
-            self._remove_skill_from_index(file_path)
+    def _build_skill_reranker(self) -> RerankerPipeline:
+        return self._build_reranker(SkillReranker(), self.vector_store)
 
-        self.incremental_indexer.on_file_created(on_file_created)
-        self.incremental_indexer.on_file_modified(on_file_modified)
-        self.incremental_indexer.on_file_deleted(on_file_deleted)
+    def _build_action_reranker(self) -> RerankerPipeline:
+        return self._build_reranker(ActionReranker(), self.action_vector_store)
 
-    def _get_cache_key(self, query: str, top_k: int, filters: Optional[Dict] = None) -> str:
-        """生成缓存键"""
-        cache_str = f"{query}|{top_k}|{json.dumps(filters or {}, sort_keys=True)}"
+    def _build_incremental_indexer(self) -> IncrementalIndexer:
+        incremental_indexer = IncrementalIndexer(
+            watch_directory=self._skills_dir,
+            file_pattern="*.json",
+            hash_cache_file=self.config.get('skill_indexer', {}).get(
+                'hash_cache', '../Data/skill_hash_cache.json'
+            ),
+            index_version_file=self.config.get('skill_indexer', {}).get(
+                'version_file', '../Data/skill_index_version.json'
+            ),
+            rebuild_after_changes=self.config.get('vector_store', {}).get('ann_rebuild_after_changes')
+        )
+        self._setup_incremental_callbacks(incremental_indexer)
+        return incremental_indexer
+
+    def _model_loading(self) -> bool:
+        """嵌入模型是否仍在后台加载"""
+        return self._components['embedding_generator'].loading
+
+    def get_startup_timings(self) -> Dict[str, float]:
+        """已构建组件的构建耗时（毫秒）"""
+        return self.startup_timings.as_dict()
+
+    def _bm25_path(self, store) -> Optional[str]:
+        """BM25快照文件路径：与向量表存放在同一目录"""
+        if not self.rag_config.get('bm25_persist', True):
+            return None
+        db_path = getattr(store, 'db_path', None)
+        if not db_path:
+            return None
+        collection = getattr(store, 'collection_name', 'collection')
+        return os.path.join(db_path, f"{collection}.bm25")
+
+    def _setup_incremental_callbacks(self, incremental_indexer: IncrementalIndexer):
+        """设置增量索引回调：一批文件变更合并为一次编码、一次写入"""
+        incremental_indexer.on_changes(self._apply_skill_changes)
+        incremental_indexer.on_rebuild(self._rebuild_vector_index)
+
+    def _rebuild_vector_index(self, changes: int):
+        """累计变更达到阈值后重新训练技能表的ANN索引"""
+        with self._index_lock:
+            if not self.vector_store.build_vector_index(retrain=True):
+                return
+            # 重建索引会推进表版本，BM25快照随之重新保存
+            self.hybrid_search.save_bm25_index()
+            self._bump_index_generation()
+        logger.info(f"Rebuilt skill vector index after {changes} changes")
+
+    def _schedule_bm25_save(self):
+        """文件监听批次写入后调用：静默 bm25_save_delay 秒后保存一次BM25快照"""
+        with self._index_lock:
+            if self._bm25_save_timer is not None:
+                self._bm25_save_timer.cancel()
+            if self._bm25_save_delay <= 0:
+                self._bm25_save_timer = None
+                self._save_bm25_snapshots()
+                return
+            self._bm25_save_timer = threading.Timer(self._bm25_save_delay, self.flush_bm25_snapshots)
+            self._bm25_save_timer.daemon = True
+            self._bm25_save_timer.start()
+
+    def flush_bm25_snapshots(self):
+        """立即保存有未落盘写入的BM25快照（全量索引结束、停止监听、进程退出时调用）"""
+        with self._index_lock:
+            if self._bm25_save_timer is not None:
+                self._bm25_save_timer.cancel()
+                self._bm25_save_timer = None
+            self._save_bm25_snapshots()
+
+    def _save_bm25_snapshots(self):
+        for name in ('hybrid_search', 'action_hybrid_search'):
+            hybrid_search = self._loaded(name)
+            if hybrid_search is not None and hybrid_search.bm25_dirty:
+                hybrid_search.save_bm25_index()
+
+    def _current_index_generation(self):
+        """技能索引代号：IncrementalIndexer 的 IndexVersion 与引擎内写入计数"""
+        return (self.incremental_indexer.current_version.version, self._index_generation)
+
+    def _bump_index_generation(self):
+        """技能索引发生写入后调用，使查询缓存失效"""
+        self._index_generation += 1
+
+    def _get_cache_key(
+        self,
+        query: str,
+        top_k: int,
+        filters: Optional[Dict] = None,
+        options: Optional[Dict[str, Any]] = None
+    ) -> str:
+        """生成缓存键（options 为影响结果内容的检索开关，如 use_rerank / return_details）"""
+        cache_str = (
+            f"{query}|{top_k}|{json.dumps(filters or {}, sort_keys=True)}"
+            f"|{json.dumps(options or {}, sort_keys=True)}"
+        )
         return hashlib.md5(cache_str.encode('utf-8')).hexdigest()
 
     # ============ 索引方法 ============
 
-    def index_skills(self, force_rebuild: bool = False) -> Dict[str, Any]:
-        """索引所有技能（支持增量）"""
+    def index_skills(
+        self,
+        force_rebuild: bool = False,
+        on_progress: Optional[Callable[[IndexProgress], None]] = None
+    ) -> Dict[str, Any]:
+        """
+        索引所有技能（支持增量）
+
+        全量索引走流式流水线：解析、编码、写入并发进行，按块提交；
+        上次被中断时从检查点继续，已提交的技能不再重复编码。
+
+        Args:
+            force_rebuild: 是否强制重建索引
+            on_progress: 进度回调（在流水线线程中调用）
+        """
         logger.info(f"Starting skill indexing (force_rebuild={force_rebuild})")
         start_time = datetime.now()
+        checkpoint = self._index_checkpoint(self.vector_store)
+        resuming = checkpoint is not None and checkpoint.exists()
 
-        if force_rebuild:
+        if resuming:
+            logger.info(f"Resuming interrupted skill indexing from {checkpoint.path}")
+        elif force_rebuild:
             # 全量索引
-            skills = self.skill_indexer.index_all_skills(force_rebuild=True)
             self.hybrid_search.clear()
         else:
             # 增量索引
             result = self.incremental_indexer.incremental_index()
+            self.flush_bm25_snapshots()
             if not any(result['stats'].values()):
                 # 无变更，检查是否需要初始化
-                if self.hybrid_search.bm25_index.doc_count == 0:
-                    skills = self.skill_indexer.index_all_skills(force_rebuild=False)
-                else:
+                if self.hybrid_search.bm25_index.doc_count != 0:
                     return {
                         "status": "no_changes",
                         "version": result['version']
@@ -244,37 +455,88 @@ class EnhancedRAGEngine:
                     "version": result['version']
                 }
 
-        if not skills:
+        skill_files = self.skill_indexer.scan_skills()
+        if not skill_files:
             return {"status": "no_skills", "count": 0}
 
-        # 准备数据
-        documents, metadatas, ids = [], [], []
-        for skill in skills:
-            documents.append(skill['search_text'])
-            metadatas.append(self._build_skill_metadata(skill))
-            ids.append(hashlib.md5(skill['file_path'].encode('utf-8')).hexdigest())
-
-        # 生成嵌入
-        embeddings = self.embedding_generator.encode_batch(documents, show_progress=True)
-
-        # 索引到混合检索引擎
-        self.hybrid_search.index_documents(
-            documents=documents,
-            doc_ids=ids,
-            metadatas=metadatas,
-            embeddings=embeddings
+        # 已提交块的BM25快照可能尚未保存：检查点中的技能从向量表的行补回BM25，
+        # 只跳过确实已在向量表中的技能
+        resume_from = {}
+        if resuming:
+            committed = checkpoint.load()
+            restored = self.hybrid_search.restore_bm25_documents(list(committed))
+            resume_from = {doc_id: committed[doc_id] for doc_id in restored}
+
+        records = (
+            IndexRecord(
+                doc_id=hashlib.md5(skill['file_path'].encode('utf-8')).hexdigest(),
+                document=skill['search_text'],
+                metadata=self._build_skill_metadata(skill),
+                version=skill.get('file_hash', '')
+            )
+            for skill in self.skill_indexer.iter_skills(
+                force_rebuild=force_rebuild, skill_files=skill_files
+            )
         )
+        pipeline_config = self.rag_config.get('index_pipeline', {}) or {}
+        pipeline = StreamingIndexer(
+            encode=lambda documents: self.embedding_generator.encode_batch(documents, show_progress=False),
+            commit=self._commit_skill_chunk,
+            chunk_size=pipeline_config.get('chunk_size', 64),
+            queue_size=pipeline_config.get('queue_size', 2),
+            checkpoint=checkpoint,
+            on_progress=on_progress
+        )
+        pipeline_stats = pipeline.run(records, total=len(skill_files), resume_from=resume_from)
+        # 各块提交只更新内存中的BM25，流水线结束后保存一次快照
+        self.flush_bm25_snapshots()
+
+        count = pipeline_stats['committed'] + pipeline_stats['skipped']
+        if pipeline_stats['status'] != 'success':
+            return {
+                "status": "error",
+                "count": pipeline_stats['committed'],
+                "message": "Failed to add documents to vector store",
+                "pipeline": pipeline_stats
+            }
+        if count == 0:
+            return {"status": "no_skills", "count": 0}
 
         elapsed = (datetime.now() - start_time).total_seconds()
-        self._stats['total_indexed'] = len(skills)
+        self._stats['total_indexed'] = count
         self._stats['last_index_time'] = datetime.now().isoformat()
 
         return {
             "status": "success",
-            "count": len(skills),
-            "elapsed_time": elapsed
+            "count": count,
+            "elapsed_time": elapsed,
+            "resumed": resuming,
+            "parse_stats": self.skill_indexer.last_parse_stats,
+            "pipeline": pipeline_stats
         }
 
+    def _commit_skill_chunk(self, chunk: IndexChunk) -> bool:
+        """流水线写入阶段：一个块写入BM25与向量表"""
+        success = self.hybrid_search.index_documents(
+            documents=chunk.documents,
+            doc_ids=chunk.doc_ids,
+            metadatas=chunk.metadatas,
+            embeddings=chunk.embeddings
+        )
+        if success:
+            self._bump_index_generation()
+        return success
+
+    def _index_checkpoint(self, store) -> Optional[IndexCheckpoint]:
+        """索引检查点：与向量表存放在同一目录"""
+        if not (self.rag_config.get('index_pipeline', {}) or {}).get('resumable', True):
+            return None
+        db_path = getattr(store, 'db_path', None)
+        if not db_path:
+            return None
+        collection = getattr(store, 'collection_name', 'collection')
+        return IndexCheckpoint(os.path.join(db_path, f"{collection}.checkpoint.jsonl"))
+
     def _build_skill_metadata(self, skill: Dict[str, Any]) -> Dict[str, Any]:
         """构建技能元数据"""
         action_types = self._extract_action_types(skill)
@@ -303,30 +565,53 @@ class EnhancedRAGEngine:
                     action_types.add(action_type)
         return sorted(list(action_types))
 
+    def _apply_skill_changes(self, changes: List[FileChange]):
+        """
+        应用一批技能文件变更（文件监听 / 增量扫描回调）
+
+        新增与修改的文件一起编码、一次 upsert；删除的文件一次删除。
+        写入失败时抛出异常，IncrementalIndexer 不会记录这批变更，下次扫描重试。
+        """
+        with self._index_lock:
+            documents, doc_ids, metadatas, removed_ids = [], [], [], []
+            for change in changes:
+                doc_id = hashlib.md5(change.file_path.encode('utf-8')).hexdigest()
+                if change.change_type == FileChangeType.DELETED:
+                    removed_ids.append(doc_id)
+                    continue
+                skill_data = self.skill_indexer.parse_skill_file(change.file_path)
+                if not skill_data:
+                    continue
+                documents.append(self.skill_indexer.build_search_text(skill_data))
+                doc_ids.append(doc_id)
+                metadatas.append(self._build_skill_metadata(skill_data))
+
+            if documents:
+                embeddings = self.embedding_generator.encode_batch(documents, show_progress=False)
+                if not self.hybrid_search.index_documents(
+                    documents=documents,
+                    doc_ids=doc_ids,
+                    metadatas=metadatas,
+                    embeddings=embeddings
+                ):
+                    raise RuntimeError(f"Failed to index {len(documents)} changed skills")
+            if removed_ids:
+                if not self.hybrid_search.delete_documents(removed_ids):
+                    raise RuntimeError(f"Failed to remove {len(removed_ids)} deleted skills")
+
+            if documents or removed_ids:
+                self._bump_index_generation()
+                # 监听到的批次合并保存快照，避免每次编辑都整体重写
+                self._schedule_bm25_save()
+                logger.info(f"Applied skill changes: {len(documents)} upserted, {len(removed_ids)} removed")
+
     def _index_single_skill(self, file_path: str):
         """索引单个技能文件"""
-        skill_data = self.skill_indexer.parse_skill_file(file_path)
-        if not skill_data:
-            return
-
-        skill_data['search_text'] = self.skill_indexer.build_search_text(skill_data)
-        doc_id = hashlib.md5(file_path.encode('utf-8')).hexdigest()
-        metadata = self._build_skill_metadata(skill_data)
-        embedding = self.embedding_generator.encode(skill_data['search_text'])
-
-        self.hybrid_search.index_documents(
-            documents=[skill_data['search_text']],
-            doc_ids=[doc_id],
-            metadatas=[metadata],
-            embeddings=[embedding]
-        )
+        self._apply_skill_changes([FileChange(file_path, FileChangeType.MODIFIED, datetime.now())])
 
     def _remove_skill_from_index(self, file_path: str):
         """从索引中移除技能"""
-        doc_id = hashlib.md5(file_path.encode('utf-8')).hexdigest()
-        self.vector_store.delete_documents([doc_id])
-        # BM25索引需要重建（简化处理）
-        logger.info(f"Removed skill from vector store: {file_path}")
+        self._apply_skill_changes([FileChange(file_path, FileChangeType.DELETED, datetime.now())])
 
     def index_actions(self, force_rebuild: bool = False) -> Dict[str, Any]:
         """索引所有Action"""
@@ -352,6 +637,7 @@ class EnhancedRAGEngine:
             metadatas=metadatas,
             embeddings=embeddings
         )
+        self.flush_bm25_snapshots()
 
         elapsed = (datetime.now() - start_time).total_seconds()
         return {
@@ -393,11 +679,37 @@ class EnhancedRAGEngine:
         should_trace = enable_trace if enable_trace is not None else self._enable_tracing
         tracer = RetrievalTracer(query=query) if should_trace else None
 
-        # 检查缓存
-        cache_key = self._get_cache_key(query, top_k, filters)
-        if self._query_cache and cache_key in self._query_cache:
-            self._stats['cache_hits'] += 1
-            return self._query_cache[cache_key]
+        # 检查缓存（记录查询开始时的索引代号，期间索引变化则不写回）
+        # 检索开关不同的结果（候选来源、排序、返回字段）不能互相复用
+        search_options = {
+            'use_hybrid': use_hybrid,
+            'use_rerank': use_rerank,
+            'use_query_expansion': use_query_expansion,
+            'return_details': return_details,
+        }
+        cache_key = self._get_cache_key(query, top_k, filters, search_options)
+        cache_generation = self._current_index_generation()
+        if self._query_cache is not None:
+            cached = self._query_cache.get(cache_key, cache_generation)
+            if cached is not None:
+                self._stats['cache_hits'] += 1
+                return cached
+
+        # 嵌入模型仍在后台加载时，先用BM25关键词检索应答（结果不缓存）
+        keyword_only = self._serve_bm25_while_loading and self._model_loading()
+
+        # 语义缓存：查询向量随后检索时从嵌入缓存直接取用，不会重复编码
+        query_embedding = None
+        semantic_scope = None
+        if self._semantic_cache is not None and not keyword_only:
+            query_embedding = self.embedding_generator.encode(query, prompt_name="query")
+            semantic_scope = self._get_cache_key("", top_k, filters, search_options)
+            cached = self._semantic_cache.get(query_embedding, semantic_scope, cache_generation)
+            if cached is not None:
+                self._stats['semantic_cache_hits'] += 1
+                if self._query_cache is not None:
+                    self._query_cache.put(cache_key, cached, cache_generation)
+                return cached
 
         # 1. 查询理解
         if tracer:
@@ -412,54 +724,56 @@ class EnhancedRAGEngine:
                 metadata={'intent': understanding.intent.value if understanding.intent else None}
             )
 
-        # 2. 检索
+        # 2. 检索（最多3个扩展查询，一次批量完成）
         all_results = []
         candidate_k = min(top_k * 3, 50)
+        search_queries = search_queries[:3]
 
-        for search_query in search_queries[:3]:  # 最多3个扩展查询
-            if use_hybrid:
-                self._stats['hybrid_searches'] += 1
-                if tracer:
-                    tracer.start_stage(RetrievalStage.HYBRID_FUSION, {'search_query': search_query})
-                results = self.hybrid_search.search(
-                    query=search_query,
-                    top_k=candidate_k,
-                    fusion_method="rrf",
-                    filters=filters,
-                    return_scores=True
+        if keyword_only:
+            self._stats['bm25_fallback_queries'] += 1
+            if tracer:
+                tracer.start_stage(RetrievalStage.BM25_SEARCH, {'search_queries': search_queries})
+            all_results = self.hybrid_search.search_keyword(
+                queries=search_queries,
+                top_k=candidate_k,
+                filters=filters,
+                return_scores=True
+            )
+            if tracer:
+                tracer.end_stage(
+                    output_data={'results': [r.get('doc_id') for r in all_results[:5]]},
+                    metadata={'result_count': len(all_results), 'model_loading': True}
                 )
-                if tracer:
-                    tracer.end_stage(
-                        output_data={'results': [r.get('doc_id') for r in results[:5]]},
-                        metadata={'result_count': len(results)}
-                    )
-                all_results.extend(results)
-            else:
-                # 纯向量检索
-                if tracer:
-                    tracer.start_stage(RetrievalStage.VECTOR_SEARCH, {'search_query': search_query})
-                query_embedding = self.embedding_generator.encode(
-                    search_query, prompt_name="query"
+        elif use_hybrid:
+            self._stats['hybrid_searches'] += 1
+            if tracer:
+                tracer.start_stage(RetrievalStage.HYBRID_FUSION, {'search_queries': search_queries})
+            all_results = self.hybrid_search.search_multi(
+                queries=search_queries,
+                top_k=candidate_k,
+                fusion_method="rrf",
+                filters=filters,
+                return_scores=True
+            )
+            if tracer:
+                tracer.end_stage(
+                    output_data={'results': [r.get('doc_id') for r in all_results[:5]]},
+                    metadata={'result_count': len(all_results)}
                 )
-                results = self.vector_store.query(
-                    query_embeddings=[query_embedding],
-                    top_k=candidate_k,
-                    where=filters
+        else:
+            # 纯向量检索
+            if tracer:
+                tracer.start_stage(RetrievalStage.VECTOR_SEARCH, {'search_queries': search_queries})
+            results = self._vector_query_many(
+                self.vector_store, self.skill_query_batcher, search_queries, candidate_k, filters
+            )
+            # 转换格式（按 id 去重后再解码；不重排序时只解码 top_k 条）
+            all_results = results.to_candidates(limit=None if use_rerank else top_k)
+            if tracer:
+                tracer.end_stage(
+                    output_data={'results': [r.get('doc_id') for r in all_results[:5]]},
+                    metadata={'result_count': len(all_results)}
                 )
-                # 转换格式
-                if results and results['ids'] and results['ids'][0]:
-                    for i in range(len(results['ids'][0])):
-                        all_results.append({
-                            'doc_id': results['ids'][0][i],
-                            'document': results['documents'][0][i],
-                            'metadata': results['metadatas'][0][i],
-                            'score': 1.0 - results['distances'][0][i]
-                        })
-                if tracer:
-                    tracer.end_stage(
-                        output_data={'results': [r.get('doc_id') for r in all_results[:5]]},
-                        metadata={'result_count': len(all_results)}
-                    )
 
         # 去重
         seen_ids = set()
@@ -475,7 +789,8 @@ class EnhancedRAGEngine:
             self._stats['reranked_queries'] += 1
             if tracer:
                 tracer.start_stage(RetrievalStage.RERANK, {'input_count': len(unique_results)})
-            reranked = self.skill_reranker.rerank(query, unique_results, top_k=top_k)
+            reranker = self.skill_keyword_reranker if keyword_only else self.skill_reranker
+            reranked = reranker.rerank(query, unique_results, top_k=top_k)
             final_results = self._convert_rerank_results(reranked, return_details)
             if tracer:
                 tracer.end_stage(
@@ -510,11 +825,52 @@ class EnhancedRAGEngine:
                 final_results[0]['_trace_id'] = trace.trace_id
 
         # 缓存结果
-        if self._query_cache:
-            self._query_cache[cache_key] = final_results
+        if keyword_only:
+            return final_results
+        if self._query_cache is not None:
+            self._query_cache.put(cache_key, final_results, cache_generation)
+        if self._semantic_cache is not None:
+            self._semantic_cache.put(query_embedding, semantic_scope, final_results, cache_generation)
 
         return final_results
 
+    def _vector_query(
+        self,
+        store,
+        batcher: Optional[QueryBatcher],
+        query: str,
+        top_k: int,
+        filters: Optional[Dict[str, Any]]
+    ) -> VectorQueryResult:
+        """纯向量检索；启用查询微批处理时与并发查询合并"""
+        if batcher is not None:
+            return VectorQueryResult.coerce(batcher.query(query, top_k=top_k, where=filters))
+        query_embedding = self.embedding_generator.encode(query, prompt_name="query")
+        return VectorQueryResult.coerce(store.query(
+            query_embeddings=[query_embedding],
+            top_k=top_k,
+            where=filters
+        ))
+
+    def _vector_query_many(
+        self,
+        store,
+        batcher: Optional[QueryBatcher],
+        queries: List[str],
+        top_k: int,
+        filters: Optional[Dict[str, Any]]
+    ) -> VectorQueryResult:
+        """多个查询的纯向量检索：一次批量编码 + 一次多向量检索，每个查询一行结果"""
+        if batcher is not None:
+            rows = batcher.query_many(queries, top_k=top_k, where=filters)
+            return VectorQueryResult.concat([VectorQueryResult.coerce(r).take([0]) for r in rows])
+        embeddings = self.embedding_generator.encode(queries, prompt_name="query")
+        return VectorQueryResult.coerce(store.query(
+            query_embeddings=list(embeddings),
+            top_k=top_k,
+            where=filters
+        ))
+
     def _convert_rerank_results(
         self,
         results: List[RerankResult],
@@ -542,6 +898,32 @@ class EnhancedRAGEngine:
             converted.append(item)
         return converted
 
+    def _convert_search_results(
+        self,
+        results: List[Dict[str, Any]],
+        return_details: bool
+    ) -> List[Dict[str, Any]]:
+        """转换未重排序的检索结果"""
+        converted = []
+        for r in results:
+            meta = r.get('metadata') or {}
+            item = {
+                'skill_id': meta.get('skill_id', ''),
+                'skill_name': meta.get('skill_name', ''),
+                'file_name': meta.get('file_name', ''),
+                'similarity': round(r.get('fused_score', r.get('score', 0)), 4)
+            }
+            if return_details:
+                item.update({
+                    'file_path': meta.get('file_path', ''),
+                    'total_duration': meta.get('total_duration', 0),
+                    'num_tracks': meta.get('num_tracks', 0),
+                    'num_actions': meta.get('num_actions', 0),
+                    'action_type_list': meta.get('action_type_list', '[]')
+                })
+            converted.append(item)
+        return converted
+
     def search_actions(
         self,
         query: str,
@@ -558,7 +940,16 @@ class EnhancedRAGEngine:
         # 构建过滤条件
         filters = {"category": category_filter} if category_filter else None
 
-        if use_hybrid:
+        keyword_only = self._serve_bm25_while_loading and self._model_loading()
+        if keyword_only:
+            self._stats['bm25_fallback_queries'] += 1
+            results = self.action_hybrid_search.search_keyword(
+                queries=[query],
+                top_k=candidate_k,
+                filters=filters,
+                return_scores=True
+            )
+        elif use_hybrid:
             results = self.action_hybrid_search.search(
                 query=query,
                 top_k=candidate_k,
@@ -566,25 +957,15 @@ class EnhancedRAGEngine:
                 return_scores=True
             )
         else:
-            query_embedding = self.embedding_generator.encode(query, prompt_name="query")
-            raw_results = self.action_vector_store.query(
-                query_embeddings=[query_embedding],
-                top_k=candidate_k,
-                where=filters
+            raw_results = self._vector_query(
+                self.action_vector_store, self.action_query_batcher, query, candidate_k, filters
             )
-            results = []
-            if raw_results and raw_results['ids'] and raw_results['ids'][0]:
-                for i in range(len(raw_results['ids'][0])):
-                    results.append({
-                        'doc_id': raw_results['ids'][0][i],
-                        'document': raw_results['documents'][0][i],
-                        'metadata': raw_results['metadatas'][0][i],
-                        'score': 1.0 - raw_results['distances'][0][i]
-                    })
+            results = raw_results.to_candidates(limit=None if use_rerank else top_k)
 
         # 重排序
         if use_rerank and results:
-            reranked = self.action_reranker.rerank(query, results, top_k=top_k)
+            reranker = self.action_keyword_reranker if keyword_only else self.action_reranker
+            reranked = reranker.rerank(query, results, top_k=top_k)
             return self._convert_action_rerank_results(reranked, return_details)
 
         return self._convert_action_results(results[:top_k], return_details)
@@ -723,8 +1104,9 @@ class EnhancedRAGEngine:
             self.incremental_indexer.start_watching(poll_interval=5.0)
 
     def stop_file_watching(self):
-        """停止文件监听"""
+        """停止文件监听（并保存尚未落盘的BM25快照）"""
         self.incremental_indexer.stop_watching()
+        self.flush_bm25_snapshots()
 
     # ============ 工具方法 ============
 
@@ -741,25 +1123,49 @@ class EnhancedRAGEngine:
                 return self.skill_indexer.parse_skill_file(file_path)
         return None
 
+    def _loaded(self, name: str):
+        """已构建的组件；尚未构建时返回 None（不触发构建）"""
+        return self._components[name].peek()
+
     def get_statistics(self) -> Dict[str, Any]:
-        """获取统计信息"""
+        """获取统计信息（尚未构建的组件记为 None）"""
+        def stats_of(name: str, method: str = 'get_statistics'):
+            component = self._loaded(name)
+            return getattr(component, method)() if component is not None else None
+
+        query_batchers = self._loaded('query_batchers') or (None, None)
         return {
             'engine_stats': self._stats,
-            'hybrid_search': self.hybrid_search.get_statistics(),
-            'action_hybrid_search': self.action_hybrid_search.get_statistics(),
-            'incremental_indexer': self.incremental_indexer.get_status(),
-            'context_retriever': self.context_retriever.get_statistics(),
-            'query_cache_size': len(self._query_cache) if self._query_cache else 0,
-            'trace_statistics': self.trace_storage.get_statistics(),
-            'user_preference': self.preference_memory.get_preference_summary()
+            'startup': {
+                'timings_ms': self.startup_timings.as_dict(),
+                'model_loading': self._model_loading(),
+                'loaded_components': [name for name, c in self._components.items() if c.loaded]
+            },
+            'hybrid_search': stats_of('hybrid_search'),
+            'action_hybrid_search': stats_of('action_hybrid_search'),
+            'incremental_indexer': stats_of('incremental_indexer', 'get_status'),
+            'context_retriever': stats_of('context_retriever'),
+            'query_cache_size': len(self._query_cache) if self._query_cache is not None else 0,
+            'query_cache': self._query_cache.get_statistics() if self._query_cache is not None else None,
+            'semantic_cache': self._semantic_cache.get_statistics() if self._semantic_cache is not None else None,
+            'trace_statistics': stats_of('trace_storage'),
+            'user_preference': stats_of('preference_memory', 'get_preference_summary'),
+            'query_batching': {
+                'skills': query_batchers[0].get_statistics() if query_batchers[0] else None,
+                'actions': query_batchers[1].get_statistics() if query_batchers[1] else None
+            }
         }
 
     def clear_cache(self):
         """清空所有缓存"""
-        if self._query_cache:
+        if self._query_cache is not None:
             self._query_cache.clear()
-        self.structured_query_engine.clear_cache()
-        self.embedding_generator.clear_cache()
+        if self._semantic_cache is not None:
+            self._semantic_cache.clear()
+        for name in ('structured_query_engine', 'embedding_generator'):
+            component = self._loaded(name)
+            if component is not None:
+                component.clear_cache()
 
     # ============ OpenViking 启发的方法 ============
 
@@ -5,11 +5,19 @@
 
 import math
 import logging
-from typing import List, Dict, Any, Optional, Tuple
-from collections import defaultdict
+import os
+from typing import List, Dict, Any, Iterable, Optional, Tuple
+from collections import Counter, defaultdict
 import re
 import json
 
+import numpy as np
+
+from .bm25_storage import BM25Segment, open_bm25_file, read_bm25_header, write_bm25_file
+from .bm25_tokenizer import Tokenizer, create_tokenizer
+from .vector_result import VectorQueryResult
+from .vector_store import matches_where
+
 logger = logging.getLogger(__name__)
 
 
@@ -121,55 +129,53 @@ class QueryAnalyzer:
 class BM25Index:
     """BM25关键词检索索引"""
     
-    def __init__(self, k1: float = 1.5, b: float = 0.75):
+    def __init__(self, k1: float = 1.5, b: float = 0.75, tokenizer: Optional[Tokenizer] = None):
         """
         Args:
             k1: 词频饱和参数 (1.2-2.0)
             b: 文档长度归一化参数 (0-1)
+            tokenizer: 分词器（默认使用游戏术语词典分词）
         """
         self.k1 = k1
         self.b = b
         
         # 索引数据
         self.documents: Dict[str, str] = {}  # doc_id -> document text
+        self.metadatas: Dict[str, Dict] = {}  # doc_id -> metadata
         self.doc_lengths: Dict[str, int] = {}  # doc_id -> token count
         self.avg_doc_length: float = 0.0
         self.doc_count: int = 0
         
         # 倒排索引: term -> {doc_id: term_frequency}
         self.inverted_index: Dict[str, Dict[str, int]] = defaultdict(dict)
+
+        # 正排索引: doc_id -> 文档包含的词项（删除/更新时只需处理这些词项）
+        self.forward_index: Dict[str, List[str]] = {}
+        self._total_length: int = 0
         
-        # IDF缓存
-        self.idf_cache: Dict[str, float] = {}
+        # IDF缓存: term -> (计算时的文档总数, idf)
+        self.idf_cache: Dict[str, Tuple[int, float]] = {}
         
-        # 中文分词器（简单实现，可替换为jieba）
-        self._tokenizer = None
+        # 分词器（可替换，见 bm25_tokenizer）
+        self.tokenizer: Tokenizer = tokenizer or create_tokenizer()
+
+        # 从磁盘 mmap 加载的只读索引段；首次修改时才展开为上面的字典
+        self._segment: Optional[BM25Segment] = None
+
+        # 打分用的数组视图：文档占用整数槽位，倒排表按词项编译为 (槽位数组, 词频数组)
+        self._doc_slots: Dict[str, int] = {}  # doc_id -> slot
+        self._slot_ids: List[Optional[str]] = []  # slot -> doc_id（删除后为None，可复用）
+        self._free_slots: List[int] = []
+        self._slot_lengths = np.zeros(0, dtype=np.float64)
+        self._length_norms: Optional[np.ndarray] = None  # k1*(1-b+b*len/avg)，按槽位
+        # term -> (槽位, 词频, 最大词频, 最短文档长度)；词项被修改时失效
+        self._term_postings: Dict[str, Tuple[np.ndarray, np.ndarray, float, float]] = {}
+
+        self._search_stats = {"queries": 0, "postings_scored": 0, "postings_pruned": 0}
     
     def _tokenize(self, text: str) -> List[str]:
         """分词（支持中英文混合）"""
-        if not text:
-            return []
-        
-        tokens = []
-        
-        # 中文字符单独切分
-        chinese_pattern = re.compile(r'[\u4e00-\u9fff]+')
-        english_pattern = re.compile(r'[a-zA-Z0-9]+')
-        
-        # 提取中文词（按字切分，简单实现）
-        for match in chinese_pattern.finditer(text):
-            chinese_text = match.group()
-            # 按2-gram切分中文
-            for i in range(len(chinese_text)):
-                tokens.append(chinese_text[i])
-                if i < len(chinese_text) - 1:
-                    tokens.append(chinese_text[i:i+2])
-        
-        # 提取英文词
-        for match in english_pattern.finditer(text.lower()):
-            tokens.append(match.group())
-        
-        return tokens
+        return self.tokenizer.tokenize(text)
     
     def add_documents(
         self,
@@ -178,59 +184,144 @@ class BM25Index:
         metadatas: Optional[List[Dict]] = None
     ):
         """
-        添加文档到索引
+        添加文档到索引（已存在的doc_id按upsert处理）
         
         Args:
             documents: 文档文本列表
             doc_ids: 文档ID列表
             metadatas: 元数据列表（可选，用于存储额外信息）
         """
+        self.upsert(documents, doc_ids, metadatas)
+        logger.info(f"BM25 indexed {len(documents)} documents, vocabulary size: {len(self.inverted_index)}")
+
+    def upsert(
+        self,
+        documents: List[str],
+        doc_ids: List[str],
+        metadatas: Optional[List[Dict]] = None
+    ):
+        """
+        插入或替换文档；旧版本的倒排项先按正排索引移除
+
+        每篇文档的代价为 O(该文档的词项数)，不重建整个索引。
+        """
+        self._materialize()
+
         for i, (doc_id, doc_text) in enumerate(zip(doc_ids, documents)):
-            # 分词
-            tokens = self._tokenize(doc_text)
-            
-            # 存储文档
-            self.documents[doc_id] = doc_text
-            self.doc_lengths[doc_id] = len(tokens)
-            
-            # 构建倒排索引
-            term_freq = defaultdict(int)
-            for token in tokens:
-                term_freq[token] += 1
-            
-            for term, freq in term_freq.items():
-                self.inverted_index[term][doc_id] = freq
-        
-        # 更新统计信息
+            self._remove_document(doc_id)
+            metadata = metadatas[i] if metadatas is not None and i < len(metadatas) else None
+            self._add_document(doc_id, doc_text, metadata)
+
+        self._update_statistics()
+
+    def delete(self, doc_ids: List[str]) -> int:
+        """
+        删除文档
+
+        Returns:
+            实际删除的文档数
+        """
+        self._materialize()
+
+        removed = sum(1 for doc_id in doc_ids if self._remove_document(doc_id))
+        self._update_statistics()
+        if removed:
+            logger.info(f"BM25 removed {removed} documents, vocabulary size: {len(self.inverted_index)}")
+        return removed
+
+    def _add_document(self, doc_id: str, doc_text: str, metadata: Optional[Dict]):
+        # 分词
+        tokens = self._tokenize(doc_text)
+
+        # 存储文档
+        self.documents[doc_id] = doc_text
+        self.doc_lengths[doc_id] = len(tokens)
+        self._total_length += len(tokens)
+        if metadata is not None:
+            self.metadatas[doc_id] = metadata
+        self._assign_slot(doc_id, len(tokens))
+
+        # 构建倒排索引
+        term_freq = defaultdict(int)
+        for token in tokens:
+            term_freq[token] += 1
+
+        for term, freq in term_freq.items():
+            self.inverted_index[term][doc_id] = freq
+            self._invalidate_term(term)
+        self.forward_index[doc_id] = list(term_freq)
+
+    def _remove_document(self, doc_id: str) -> bool:
+        if doc_id not in self.documents:
+            return False
+
+        for term in self.forward_index.pop(doc_id, []):
+            postings = self.inverted_index.get(term)
+            if postings is not None:
+                postings.pop(doc_id, None)
+                if not postings:
+                    del self.inverted_index[term]
+            self._invalidate_term(term)
+
+        self._total_length -= self.doc_lengths.pop(doc_id, 0)
+        del self.documents[doc_id]
+        self.metadatas.pop(doc_id, None)
+        self._release_slot(doc_id)
+        return True
+
+    def _invalidate_term(self, term: str):
+        self.idf_cache.pop(term, None)
+        self._term_postings.pop(term, None)
+
+    def _assign_slot(self, doc_id: str, length: int):
+        slot = self._free_slots.pop() if self._free_slots else len(self._slot_ids)
+        if slot == len(self._slot_ids):
+            self._slot_ids.append(doc_id)
+        else:
+            self._slot_ids[slot] = doc_id
+        if slot >= len(self._slot_lengths):
+            grown = np.zeros(max(2 * len(self._slot_lengths), slot + 1, 16), dtype=np.float64)
+            grown[:len(self._slot_lengths)] = self._slot_lengths
+            self._slot_lengths = grown
+        self._slot_lengths[slot] = length
+        self._doc_slots[doc_id] = slot
+
+    def _release_slot(self, doc_id: str):
+        slot = self._doc_slots.pop(doc_id, None)
+        if slot is not None:
+            self._slot_ids[slot] = None
+            self._slot_lengths[slot] = 0
+            self._free_slots.append(slot)
+
+    def _update_statistics(self):
         self.doc_count = len(self.documents)
-        if self.doc_count > 0:
-            self.avg_doc_length = sum(self.doc_lengths.values()) / self.doc_count
-        
-        # 清空IDF缓存
-        self.idf_cache.clear()
-        
-        logger.info(f"BM25 indexed {len(documents)} documents, vocabulary size: {len(self.inverted_index)}")
+        self.avg_doc_length = self._total_length / self.doc_count if self.doc_count else 0.0
+        self._length_norms = None
     
     def _compute_idf(self, term: str) -> float:
-        """计算IDF值"""
-        if term in self.idf_cache:
-            return self.idf_cache[term]
+        """计算IDF值（文档总数变化后缓存项惰性失效）"""
+        cached = self.idf_cache.get(term)
+        if cached is not None and cached[0] == self.doc_count:
+            return cached[1]
         
-        doc_freq = len(self.inverted_index.get(term, {}))
+        if self._segment is not None:
+            doc_freq = self._segment.doc_freq(term)
+        else:
+            doc_freq = len(self.inverted_index.get(term, {}))
         if doc_freq == 0:
             idf = 0.0
         else:
             # BM25 IDF公式
             idf = math.log((self.doc_count - doc_freq + 0.5) / (doc_freq + 0.5) + 1)
         
-        self.idf_cache[term] = idf
+        self.idf_cache[term] = (self.doc_count, idf)
         return idf
     
     def search(
         self,
         query: str,
         top_k: int = 10,
-        doc_ids_filter: Optional[List[str]] = None
+        doc_ids_filter: Optional[Iterable[str]] = None
     ) -> List[Tuple[str, float]]:
         """
         BM25检索
@@ -238,56 +329,317 @@ class BM25Index:
         Args:
             query: 查询文本
             top_k: 返回结果数量
-            doc_ids_filter: 限制搜索范围的文档ID列表
+            doc_ids_filter: 限制搜索范围的文档ID集合
         
         Returns:
-            [(doc_id, score), ...] 按分数降序排列
+            [(doc_id, score), ...] 按分数降序排列（同分按doc_id）
         """
         query_tokens = self._tokenize(query)
-        if not query_tokens:
+        if not query_tokens or self.doc_count == 0 or top_k <= 0:
             return []
-        
-        scores: Dict[str, float] = defaultdict(float)
-        
-        for term in query_tokens:
-            if term not in self.inverted_index:
+
+        allowed = self._filter_mask(doc_ids_filter) if doc_ids_filter else None
+        return self._score_terms(Counter(query_tokens), top_k, allowed)
+
+    def search_multi(
+        self,
+        queries: List[str],
+        top_k: int = 10,
+        doc_ids_filter: Optional[Iterable[str]] = None
+    ) -> List[List[Tuple[str, float]]]:
+        """
+        多个查询一次检索：所有查询的词项合并后，每个词项的倒排只读取、打分一次，
+        再按各查询的词频累加到各自的分数行
+
+        Returns:
+            与 queries 对应的 [(doc_id, score), ...] 列表
+        """
+        query_terms = [Counter(self._tokenize(q)) for q in queries]
+        if self.doc_count == 0 or top_k <= 0:
+            return [[] for _ in queries]
+
+        allowed = self._filter_mask(doc_ids_filter) if doc_ids_filter else None
+        norms = self._norms()
+        scores = np.zeros((len(queries), len(norms)), dtype=np.float64)
+        hit = np.zeros(scores.shape, dtype=bool)
+        scored = 0
+
+        for term in dict.fromkeys(t for terms in query_terms for t in terms):
+            postings = self._get_postings(term)
+            if postings is None:
                 continue
-            
-            idf = self._compute_idf(term)
-            
-            for doc_id, tf in self.inverted_index[term].items():
-                # 如果有过滤条件，跳过不在范围内的文档
-                if doc_ids_filter and doc_id not in doc_ids_filter:
-                    continue
-                
-                doc_len = self.doc_lengths[doc_id]
-                
-                # BM25评分公式
-                numerator = tf * (self.k1 + 1)
-                denominator = tf + self.k1 * (1 - self.b + self.b * doc_len / self.avg_doc_length)
-                scores[doc_id] += idf * numerator / denominator
-        
-        # 排序并返回top_k
-        sorted_results = sorted(scores.items(), key=lambda x: x[1], reverse=True)
-        return sorted_results[:top_k]
+            slots, tf, _, _ = postings
+            if allowed is not None:
+                keep = allowed[slots]
+                slots, tf = slots[keep], tf[keep]
+            scored += len(slots)
+            contribution = self._compute_idf(term) * tf * (self.k1 + 1) / (tf + norms[slots])
+            for row, terms in enumerate(query_terms):
+                if term in terms:
+                    scores[row, slots] += terms[term] * contribution
+                    hit[row, slots] = True
+
+        self._search_stats["queries"] += len(queries)
+        self._search_stats["postings_scored"] += scored
+        return [self._top_k(np.flatnonzero(hit[row]), scores[row], top_k) for row in range(len(queries))]
+
+    def _score_terms(
+        self,
+        query_terms: Counter,
+        top_k: int,
+        allowed: Optional[np.ndarray]
+    ) -> List[Tuple[str, float]]:
+        """
+        MaxScore 剪枝的向量化打分
+
+        词项按分数上界从大到小处理；当剩余词项上界之和小于当前第 top_k 名的分数时，
+        未命中的文档不可能再进入 top_k，之后的词项只对仍有希望的候选文档累加。
+        """
+        k1, b = self.k1, self.b
+        norms = self._norms()
+        min_norm_factor = k1 * b / (self.avg_doc_length or 1.0)
+
+        terms = []
+        for term, query_tf in query_terms.items():
+            postings = self._get_postings(term)
+            if postings is None:
+                continue
+            slots, tf, max_tf, min_length = postings
+            weight = self._compute_idf(term) * query_tf
+            min_norm = k1 * (1 - b) + min_norm_factor * min_length
+            upper = weight * max_tf * (k1 + 1) / (max_tf + min_norm)
+            terms.append((upper, weight, slots, tf))
+        if not terms:
+            return []
+        terms.sort(key=lambda t: -t[0])
+        remaining = np.cumsum([t[0] for t in terms][::-1])[::-1].tolist()[1:] + [0.0]
+
+        scores = np.zeros(len(norms), dtype=np.float64)
+        hit = np.zeros(len(norms), dtype=bool)
+        candidates: Optional[np.ndarray] = None
+        scored = pruned = 0
+
+        for (upper, weight, slots, tf), rest in zip(terms, remaining):
+            if allowed is not None:
+                keep = allowed[slots]
+                slots, tf = slots[keep], tf[keep]
+            if candidates is not None:
+                keep = candidates[slots]
+                pruned += len(slots) - int(keep.sum())
+                slots, tf = slots[keep], tf[keep]
+            scored += len(slots)
+
+            scores[slots] += weight * tf * (k1 + 1) / (tf + norms[slots])
+            hit[slots] = True
+
+            # 更新阈值：当前第 top_k 名的分数是最终第 top_k 名分数的下界
+            pool = candidates if candidates is not None else hit
+            if rest > 0:
+                pool_scores = scores[pool]
+                if len(pool_scores) >= top_k:
+                    threshold = np.partition(pool_scores, len(pool_scores) - top_k)[-top_k]
+                    if rest < threshold:
+                        candidates = pool & (scores + rest >= threshold)
+
+        with_hits = np.flatnonzero(candidates if candidates is not None else hit)
+        self._search_stats["queries"] += 1
+        self._search_stats["postings_scored"] += scored
+        self._search_stats["postings_pruned"] += pruned
+        return self._top_k(with_hits, scores, top_k)
+
+    def _top_k(self, slots: np.ndarray, scores: np.ndarray, top_k: int) -> List[Tuple[str, float]]:
+        """argpartition 取出前 top_k（含同分），再按 (-score, doc_id) 排序"""
+        slot_scores = scores[slots]
+        if len(slots) > top_k:
+            threshold = np.partition(slot_scores, len(slot_scores) - top_k)[-top_k]
+            keep = slot_scores >= threshold
+            slots, slot_scores = slots[keep], slot_scores[keep]
+        results = [(self._slot_doc_id(int(slot)), float(score)) for slot, score in zip(slots, slot_scores)]
+        results.sort(key=lambda x: (-x[1], x[0]))
+        return results[:top_k]
+
+    def _get_postings(self, term: str) -> Optional[Tuple[np.ndarray, np.ndarray, float, float]]:
+        """词项的倒排数组（按需编译并缓存）"""
+        cached = self._term_postings.get(term)
+        if cached is not None:
+            return cached
+
+        if self._segment is not None:
+            postings = self._segment.postings(term)
+            if postings is None:
+                return None
+            slots, tf = postings
+            lengths = self._segment.doc_lengths[slots]
+        else:
+            postings = self.inverted_index.get(term)
+            if not postings:
+                return None
+            slots = np.fromiter((self._doc_slots[d] for d in postings), dtype=np.int64, count=len(postings))
+            tf = np.fromiter(postings.values(), dtype=np.float64, count=len(postings))
+            lengths = self._slot_lengths[slots]
+
+        cached = (slots, tf.astype(np.float64), float(tf.max()), float(lengths.min()))
+        self._term_postings[term] = cached
+        return cached
+
+    def _norms(self) -> np.ndarray:
+        """按槽位预计算的文档长度归一化项（文档统计变化后重算）"""
+        if self._length_norms is None:
+            lengths = self._segment.doc_lengths if self._segment is not None else self._slot_lengths
+            avg = self.avg_doc_length or 1.0
+            self._length_norms = self.k1 * (1 - self.b + self.b * np.asarray(lengths, dtype=np.float64) / avg)
+        return self._length_norms
+
+    def _filter_mask(self, doc_ids: Iterable[str]) -> np.ndarray:
+        """文档ID集合 -> 按槽位的布尔位图"""
+        slot_of = self._segment.doc_index if self._segment is not None else self._doc_slots
+        mask = np.zeros(len(self._norms()), dtype=bool)
+        slots = [slot_of[d] for d in doc_ids if d in slot_of]
+        if slots:
+            mask[slots] = True
+        return mask
+
+    def _slot_doc_id(self, slot: int) -> str:
+        if self._segment is not None:
+            return self._segment.doc_ids[slot]
+        return self._slot_ids[slot]
+
+    def _materialize(self):
+        """把 mmap 索引段展开为可修改的字典结构"""
+        segment = self._segment
+        if segment is None:
+            return
+
+        self.documents = {doc_id: segment.documents[doc_id] for doc_id in segment.doc_ids}
+        self.metadatas = {doc_id: segment.metadatas[doc_id] for doc_id in segment.doc_ids}
+        self.doc_lengths = dict(zip(segment.doc_ids, segment.doc_lengths.tolist()))
+        self._total_length = sum(self.doc_lengths.values())
+        self._doc_slots = dict(segment.doc_index)
+        self._slot_ids = list(segment.doc_ids)
+        self._free_slots = []
+        self._slot_lengths = np.array(segment.doc_lengths, dtype=np.float64)
+        self.inverted_index = defaultdict(dict)
+        self.forward_index = {doc_id: [] for doc_id in segment.doc_ids}
+        postings_doc = segment.postings_doc.tolist()
+        postings_tf = segment.postings_tf.tolist()
+        offsets = segment.term_offsets.tolist()
+        for t, term in enumerate(segment.terms):
+            postings = {}
+            for p in range(offsets[t], offsets[t + 1]):
+                doc_id = segment.doc_ids[postings_doc[p]]
+                postings[doc_id] = postings_tf[p]
+                self.forward_index[doc_id].append(term)
+            self.inverted_index[term] = postings
+
+        # 槽位与索引段一致，但已缓存的倒排数组引用了映射内存，需丢弃
+        self._segment = None
+        self._length_norms = None
+        self._term_postings.clear()
+
+    # ==================== 持久化 ====================
+
+    def save(self, path: str, index_version: Any = None) -> None:
+        """
+        写入磁盘索引文件
+
+        Args:
+            path: 文件路径
+            index_version: 与索引一起保存的版本标记（加载时校验）
+        """
+        if self._segment is not None:
+            # 覆盖正在映射的文件前先释放映射（Windows 不允许替换已映射文件）
+            self._materialize()
+        write_bm25_file(
+            path,
+            documents=self.documents,
+            doc_lengths=self.doc_lengths,
+            inverted_index=self.inverted_index,
+            metadatas=self.metadatas,
+            k1=self.k1,
+            b=self.b,
+            avg_doc_length=self.avg_doc_length,
+            tokenizer=self.tokenizer.signature,
+            index_version=index_version,
+        )
+        logger.info(f"BM25 index saved: {path} ({self.doc_count} docs, version={index_version})")
+
+    def load(self, path: str, expected_version: Any = None) -> bool:
+        """
+        mmap 加载磁盘索引文件
+
+        Args:
+            path: 文件路径
+            expected_version: 期望的版本标记；不为 None 且与文件不一致时视为过期
+
+        Returns:
+            是否加载成功
+        """
+        if not os.path.exists(path):
+            return False
+        try:
+            header = read_bm25_header(path)
+            if expected_version is not None and header.get("index_version") != expected_version:
+                logger.info(
+                    f"BM25 index at {path} is stale "
+                    f"(version {header.get('index_version')} != {expected_version})"
+                )
+                return False
+            if header.get("tokenizer") != self.tokenizer.signature:
+                logger.info(
+                    f"BM25 index at {path} was built with tokenizer {header.get('tokenizer')}, "
+                    f"current is {self.tokenizer.signature}"
+                )
+                return False
+            segment = open_bm25_file(path, header)
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning(f"Failed to load BM25 index from {path}: {e}")
+            return False
+
+        self.clear()
+        self._segment = segment
+        self.k1 = header.get("k1", self.k1)
+        self.b = header.get("b", self.b)
+        self.documents = segment.documents
+        self.metadatas = segment.metadatas
+        self.doc_count = segment.doc_count
+        self.avg_doc_length = header.get("avg_doc_length", 0.0)
+        logger.info(f"BM25 index loaded: {path} ({self.doc_count} docs, version={segment.index_version})")
+        return True
     
     def clear(self):
         """清空索引"""
-        self.documents.clear()
+        self._segment = None
+        self._length_norms = None
+        self._term_postings.clear()
+        self._doc_slots.clear()
+        self._slot_ids.clear()
+        self._free_slots.clear()
+        self._slot_lengths = np.zeros(0, dtype=np.float64)
+        self.documents = {}
+        self.metadatas = {}
         self.doc_lengths.clear()
         self.inverted_index.clear()
+        self.forward_index.clear()
         self.idf_cache.clear()
+        self._total_length = 0
         self.doc_count = 0
         self.avg_doc_length = 0.0
     
     def get_statistics(self) -> Dict[str, Any]:
         """获取索引统计信息"""
+        if self._segment is not None:
+            vocabulary_size = len(self._segment.term_index)
+        else:
+            vocabulary_size = len(self.inverted_index)
         return {
             "doc_count": self.doc_count,
-            "vocabulary_size": len(self.inverted_index),
+            "vocabulary_size": vocabulary_size,
             "avg_doc_length": round(self.avg_doc_length, 2),
             "k1": self.k1,
-            "b": self.b
+            "b": self.b,
+            "tokenizer": self.tokenizer.signature,
+            "mmap_loaded": self._segment is not None,
+            "search": dict(self._search_stats)
         }
 
 
@@ -300,7 +652,9 @@ class HybridSearchEngine:
         embedding_generator,
         bm25_weight: float = 0.3,
         vector_weight: float = 0.7,
-        rrf_k: int = 60
+        rrf_k: int = 60,
+        bm25_path: Optional[str] = None,
+        bm25_tokenizer: Optional[Tokenizer] = None
     ):
         """
         Args:
@@ -309,6 +663,8 @@ class HybridSearchEngine:
             bm25_weight: BM25权重 (用于加权融合)
             vector_weight: 向量检索权重 (用于加权融合)
             rrf_k: RRF融合参数 (通常60)
+            bm25_path: BM25索引持久化文件路径（None则只保存在内存）
+            bm25_tokenizer: BM25分词器（None则使用默认词典分词）
         """
         self.vector_store = vector_store
         self.embedding_generator = embedding_generator
@@ -320,11 +676,15 @@ class HybridSearchEngine:
         self.use_dynamic_weights = True  # 是否使用动态权重
         self.query_analyzer = QueryAnalyzer()
 
-        # BM25索引
-        self.bm25_index = BM25Index()
+        # BM25索引（同时保存文档元数据）
+        self.bm25_index = BM25Index(tokenizer=bm25_tokenizer)
+        self.bm25_path = bm25_path
 
-        # 文档元数据缓存
-        self._metadata_cache: Dict[str, Dict] = {}
+        # 查询微批处理器（可选，由上层注入；并发查询合并编码与检索）
+        self.query_batcher = None
+
+        # 写入后BM25快照是否落后于内存索引（由调用方在一批写入结束后 save_bm25_index）
+        self.bm25_dirty = False
     
     def index_documents(
         self,
@@ -346,14 +706,10 @@ class HybridSearchEngine:
             是否成功
         """
         try:
-            # 1. 索引到BM25
+            # 1. 索引到BM25（同时缓存元数据）
             self.bm25_index.add_documents(documents, doc_ids, metadatas)
             
-            # 2. 缓存元数据
-            for doc_id, metadata in zip(doc_ids, metadatas):
-                self._metadata_cache[doc_id] = metadata
-            
-            # 3. 索引到向量存储（如果没有预计算嵌入）
+            # 2. 索引到向量存储（如果没有预计算嵌入）
             if embeddings is None:
                 embeddings = self.embedding_generator.encode_batch(documents)
             
@@ -363,6 +719,11 @@ class HybridSearchEngine:
                 metadatas=metadatas,
                 ids=doc_ids
             )
+
+            # 快照整体重写代价与语料规模成正比，不在每次写入时保存；
+            # 调用方在一批写入结束后调用 save_bm25_index（快照版本落后时加载会被丢弃）
+            if success:
+                self.bm25_dirty = True
             
             logger.info(f"Hybrid search indexed {len(documents)} documents")
             return success
@@ -371,6 +732,49 @@ class HybridSearchEngine:
             logger.error(f"Error indexing documents: {e}")
             return False
     
+    def delete_documents(self, doc_ids: List[str]) -> bool:
+        """
+        从BM25索引和向量存储中删除文档
+        
+        Args:
+            doc_ids: 文档ID列表
+        
+        Returns:
+            是否成功
+        """
+        try:
+            self.bm25_index.delete(doc_ids)
+            success = self.vector_store.delete_documents(doc_ids)
+            if success:
+                self.bm25_dirty = True
+            return success
+        except Exception as e:
+            logger.error(f"Error deleting documents: {e}")
+            return False
+    
+    def restore_bm25_documents(self, doc_ids: List[str], batch_size: int = 500) -> List[str]:
+        """
+        从向量表的行（文档文本与元数据）补回BM25中缺失的文档，不重新编码
+
+        用于续跑被中断的全量索引：已提交块的BM25快照可能尚未保存。
+
+        Args:
+            doc_ids: 需要存在于BM25中的文档ID
+            batch_size: 每次按ID读取向量表的行数
+
+        Returns:
+            当前已在BM25中的ID（原本就在或补回成功；向量表中没有的ID不返回）
+        """
+        indexed = self.bm25_index.documents
+        missing = [doc_id for doc_id in doc_ids if doc_id not in indexed]
+        for start in range(0, len(missing), batch_size):
+            rows = self.vector_store.get_by_ids(missing[start:start + batch_size])
+            if rows.get("ids"):
+                self.bm25_index.add_documents(rows["documents"], rows["ids"], rows["metadatas"])
+                self.bm25_dirty = True
+        indexed = self.bm25_index.documents
+        return [doc_id for doc_id in doc_ids if doc_id in indexed]
+
     def search(
         self,
         query: str,
@@ -392,15 +796,7 @@ class HybridSearchEngine:
         Returns:
             检索结果列表
         """
-        # 动态权重调整
-        if self.use_dynamic_weights:
-            analysis = self.query_analyzer.analyze(query)
-            effective_bm25_weight = analysis['bm25_weight']
-            effective_vector_weight = analysis['vector_weight']
-            logger.debug(f"Query analysis: {analysis}")
-        else:
-            effective_bm25_weight = self.bm25_weight
-            effective_vector_weight = self.vector_weight
+        effective_bm25_weight, effective_vector_weight = self._effective_weights(query)
 
         # 获取更多候选以便融合
         candidate_k = min(top_k * 3, 100)
@@ -409,33 +805,213 @@ class HybridSearchEngine:
         bm25_results = self.bm25_index.search(query, top_k=candidate_k)
 
         # 2. 向量检索
-        query_embedding = self.embedding_generator.encode(query, prompt_name="query")
-        vector_results = self.vector_store.query(
-            query_embeddings=[query_embedding],
-            top_k=candidate_k,
-            where=filters
-        )
-
-        # 解析向量检索结果
-        vector_scores: Dict[str, float] = {}
-        if vector_results and vector_results['ids'] and vector_results['ids'][0]:
-            for i, doc_id in enumerate(vector_results['ids'][0]):
-                distance = vector_results['distances'][0][i]
-                # 转换距离为相似度
-                similarity = 1.0 - distance
-                vector_scores[doc_id] = similarity
+        if self.query_batcher is not None:
+            vector_results = self.query_batcher.query(query, top_k=candidate_k, where=filters)
+        else:
+            query_embedding = self.embedding_generator.encode(query, prompt_name="query")
+            vector_results = self.vector_store.query(
+                query_embeddings=[query_embedding],
+                top_k=candidate_k,
+                where=filters
+            )
+        vector_results = VectorQueryResult.coerce(vector_results)
+        vector_ranking = self._vector_ranking(vector_results, 0)
 
         # 3. 融合排序
         if fusion_method == "rrf":
-            fused_results = self._rrf_fusion(bm25_results, vector_scores, top_k)
+            fused_results = self._rrf_fusion(bm25_results, vector_ranking, top_k)
         else:
             fused_results = self._weighted_fusion(
-                bm25_results, vector_scores, top_k,
+                bm25_results, vector_ranking, top_k,
                 bm25_weight=effective_bm25_weight,
                 vector_weight=effective_vector_weight
             )
         
         # 4. 构建返回结果
+        vector_scores = self._score_map([vector_ranking]) if return_scores else {}
+        return self._build_results(
+            fused_results, dict(bm25_results), vector_scores, return_scores, vector_results
+        )
+
+    def search_multi(
+        self,
+        queries: List[str],
+        top_k: int = 10,
+        fusion_method: str = "rrf",
+        filters: Optional[Dict[str, Any]] = None,
+        return_scores: bool = False
+    ) -> List[Dict[str, Any]]:
+        """
+        多查询混合检索（查询扩展）
+
+        所有查询变体一次批量编码、一次多向量检索、一次BM25倒排遍历，
+        再在一次融合中合并全部排名列表，代价接近单条查询。
+
+        Args:
+            queries: 查询文本列表（重复项会被去掉）
+            top_k: 返回结果数量
+            fusion_method: 融合方法 ("rrf" 或 "weighted")
+            filters: 元数据过滤条件
+            return_scores: 是否返回详细分数（各变体中的最高分）
+
+        Returns:
+            检索结果列表
+        """
+        queries = list(dict.fromkeys(q for q in queries if q))
+        if len(queries) <= 1:
+            return self.search(queries[0], top_k, fusion_method, filters, return_scores) if queries else []
+
+        candidate_k = min(top_k * 3, 100)
+
+        # 1. BM25：所有变体一次倒排遍历
+        bm25_lists = self.bm25_index.search_multi(queries, top_k=candidate_k)
+
+        # 2. 向量：一次批量编码 + 一次多向量检索（启用微批处理时与并发查询合并）
+        if self.query_batcher is not None:
+            rows = self.query_batcher.query_many(queries, top_k=candidate_k, where=filters)
+            vector_results = VectorQueryResult.concat(
+                [VectorQueryResult.coerce(r).take([0]) for r in rows]
+            )
+        else:
+            embeddings = self.embedding_generator.encode(queries, prompt_name="query")
+            vector_results = VectorQueryResult.coerce(self.vector_store.query(
+                query_embeddings=list(embeddings),
+                top_k=candidate_k,
+                where=filters
+            ))
+        vector_lists = [self._vector_ranking(vector_results, i) for i in range(len(queries))]
+
+        # 3. 一次融合
+        if fusion_method == "rrf":
+            fused_results = self._rrf_fusion_many(bm25_lists, vector_lists, top_k)
+        else:
+            merged: Dict[str, float] = {}
+            for query, bm25_results, vector_ranking in zip(queries, bm25_lists, vector_lists):
+                bm25_w, vector_w = self._effective_weights(query)
+                for doc_id, score in self._weighted_fusion(
+                    bm25_results, vector_ranking, candidate_k, bm25_weight=bm25_w, vector_weight=vector_w
+                ):
+                    merged[doc_id] = max(merged.get(doc_id, 0.0), score)
+            fused_results = sorted(merged.items(), key=lambda x: x[1], reverse=True)[:top_k]
+
+        # 4. 构建返回结果（详细分数取各变体最高分）
+        best_bm25: Dict[str, float] = {}
+        for bm25_results in bm25_lists:
+            for doc_id, score in bm25_results:
+                best_bm25[doc_id] = max(best_bm25.get(doc_id, 0.0), score)
+        best_vector = self._score_map(vector_lists) if return_scores else {}
+        return self._build_results(fused_results, best_bm25, best_vector, return_scores, vector_results)
+
+    def search_keyword(
+        self,
+        queries: List[str],
+        top_k: int = 10,
+        filters: Optional[Dict[str, Any]] = None,
+        return_scores: bool = False
+    ) -> List[Dict[str, Any]]:
+        """
+        仅BM25检索（不需要嵌入模型，用于模型加载期间）
+
+        各查询变体的BM25分数按该变体最高分归一化到 0-1 后取最大值，
+        结果格式与 search() 相同，fused_score 可直接与相似度阈值比较。
+
+        Args:
+            queries: 查询文本列表
+            top_k: 返回结果数量
+            filters: 元数据过滤条件（与向量存储的 where 相同，支持 $gte / $in 等运算符）
+            return_scores: 是否返回详细分数
+        """
+        queries = list(dict.fromkeys(q for q in queries if q))
+        if not queries:
+            return []
+
+        doc_ids_filter = None
+        if filters:
+            doc_ids_filter = [
+                doc_id for doc_id, metadata in self.bm25_index.metadatas.items()
+                if matches_where(metadata, filters)
+            ]
+            if not doc_ids_filter:
+                return []
+
+        candidate_k = min(top_k * 3, 100)
+        bm25_lists = self.bm25_index.search_multi(
+            queries, top_k=candidate_k, doc_ids_filter=doc_ids_filter
+        )
+
+        best_bm25: Dict[str, float] = {}
+        normalized: Dict[str, float] = {}
+        for bm25_results in bm25_lists:
+            if not bm25_results:
+                continue
+            top_score = bm25_results[0][1] or 1.0
+            for doc_id, score in bm25_results:
+                best_bm25[doc_id] = max(best_bm25.get(doc_id, 0.0), score)
+                normalized[doc_id] = max(normalized.get(doc_id, 0.0), score / top_score)
+        fused_results = sorted(normalized.items(), key=lambda x: x[1], reverse=True)[:top_k]
+        return self._build_results(fused_results, best_bm25, {}, return_scores)
+
+    def _effective_weights(self, query: str) -> Tuple[float, float]:
+        """动态权重调整：返回 (bm25_weight, vector_weight)"""
+        if self.use_dynamic_weights:
+            analysis = self.query_analyzer.analyze(query)
+            logger.debug(f"Query analysis: {analysis}")
+            return analysis['bm25_weight'], analysis['vector_weight']
+        return self.bm25_weight, self.vector_weight
+
+    @staticmethod
+    def _vector_ranking(vector_results: VectorQueryResult, row: int) -> Tuple[np.ndarray, np.ndarray]:
+        """向量检索结果第 row 个查询的 (doc_id 数组, 相似度数组)，按相似度降序"""
+        ids = vector_results.ids(row)
+        scores = vector_results.scores(row)
+        if scores.size > 1 and np.any(np.diff(scores) > 0):
+            order = np.argsort(-scores, kind="stable")
+            ids, scores = ids[order], scores[order]
+        return ids, scores
+
+    @staticmethod
+    def _score_map(rankings: List[Tuple[np.ndarray, np.ndarray]]) -> Dict[str, float]:
+        """doc_id -> 各排名列表中的最高相似度（仅 return_scores 时构建）"""
+        best: Dict[str, float] = {}
+        for ids, scores in rankings:
+            for doc_id, score in zip(ids.tolist(), scores.tolist()):
+                if doc_id not in best or score > best[doc_id]:
+                    best[doc_id] = score
+        return best
+
+    @staticmethod
+    def _accumulate(
+        id_parts: List[np.ndarray],
+        score_parts: List[np.ndarray],
+        top_k: int
+    ) -> List[Tuple[str, float]]:
+        """按 doc_id 累加分数并取前 top_k；同分时先出现的文档在前"""
+        if not id_parts:
+            return []
+        ids = np.concatenate(id_parts)
+        unique_ids, first_index, inverse = np.unique(ids, return_index=True, return_inverse=True)
+        totals = np.bincount(inverse.ravel(), weights=np.concatenate(score_parts), minlength=len(unique_ids))
+        order = np.lexsort((first_index, -totals))[:top_k]
+        return list(zip(unique_ids[order].tolist(), totals[order].tolist()))
+
+    @staticmethod
+    def _id_array(bm25_results: List[Tuple[str, float]]) -> np.ndarray:
+        ids = np.empty(len(bm25_results), dtype=object)
+        ids[:] = [doc_id for doc_id, _ in bm25_results]
+        return ids
+
+    def _build_results(
+        self,
+        fused_results: List[Tuple[str, float]],
+        bm25_scores: Dict[str, float],
+        vector_scores: Dict[str, float],
+        return_scores: bool,
+        vector_results: Optional[VectorQueryResult] = None
+    ) -> List[Dict[str, Any]]:
+        # BM25 索引中没有的文档（如 BM25 快照落后于向量表）从向量结果中按需解码
+        missing = [doc_id for doc_id, _ in fused_results if doc_id not in self.bm25_index.documents]
+        fallback = self._vector_payloads(vector_results, missing) if missing and vector_results else {}
+
         results = []
         for doc_id, fused_score in fused_results:
             result = {
@@ -444,28 +1020,52 @@ class HybridSearchEngine:
             }
             
             # 添加元数据
-            if doc_id in self._metadata_cache:
-                result["metadata"] = self._metadata_cache[doc_id]
+            if doc_id in self.bm25_index.metadatas:
+                result["metadata"] = self.bm25_index.metadatas[doc_id]
+            elif doc_id in fallback:
+                result["metadata"] = fallback[doc_id][1]
             
             # 添加文档内容
             if doc_id in self.bm25_index.documents:
                 result["document"] = self.bm25_index.documents[doc_id]
+            elif doc_id in fallback:
+                result["document"] = fallback[doc_id][0]
             
             # 添加详细分数
             if return_scores:
-                bm25_score = dict(bm25_results).get(doc_id, 0.0)
-                vector_score = vector_scores.get(doc_id, 0.0)
-                result["bm25_score"] = round(bm25_score, 4)
-                result["vector_score"] = round(vector_score, 4)
+                result["bm25_score"] = round(bm25_scores.get(doc_id, 0.0), 4)
+                result["vector_score"] = round(vector_scores.get(doc_id, 0.0), 4)
             
             results.append(result)
         
         return results
+
+    @staticmethod
+    def _vector_payloads(
+        vector_results: VectorQueryResult,
+        doc_ids: List[str]
+    ) -> Dict[str, Tuple[str, Dict[str, Any]]]:
+        """只解码给定 doc_id 所在行的文档与元数据：doc_id -> (document, metadata)"""
+        payloads: Dict[str, Tuple[str, Dict[str, Any]]] = {}
+        wanted = set(doc_ids)
+        for row in range(vector_results.num_queries):
+            if not wanted:
+                break
+            ids = vector_results.ids(row)
+            positions = [i for i, doc_id in enumerate(ids) if doc_id in wanted]
+            if not positions:
+                continue
+            documents = vector_results.documents(row, positions)
+            metadatas = vector_results.metadatas(row, positions)
+            for position, document, metadata in zip(positions, documents, metadatas):
+                payloads[ids[position]] = (document, metadata)
+                wanted.discard(ids[position])
+        return payloads
     
     def _rrf_fusion(
         self,
         bm25_results: List[Tuple[str, float]],
-        vector_scores: Dict[str, float],
+        vector_ranking: Tuple[np.ndarray, np.ndarray],
         top_k: int
     ) -> List[Tuple[str, float]]:
         """
@@ -473,25 +1073,35 @@ class HybridSearchEngine:
         
         RRF公式: score = sum(1 / (k + rank_i))
         """
-        rrf_scores: Dict[str, float] = defaultdict(float)
-        
-        # BM25排名贡献
-        for rank, (doc_id, _) in enumerate(bm25_results):
-            rrf_scores[doc_id] += 1.0 / (self.rrf_k + rank + 1)
-        
-        # 向量检索排名贡献
-        sorted_vector = sorted(vector_scores.items(), key=lambda x: x[1], reverse=True)
-        for rank, (doc_id, _) in enumerate(sorted_vector):
-            rrf_scores[doc_id] += 1.0 / (self.rrf_k + rank + 1)
-        
-        # 排序返回
-        sorted_results = sorted(rrf_scores.items(), key=lambda x: x[1], reverse=True)
-        return sorted_results[:top_k]
+        return self._rrf_fusion_many([bm25_results], [vector_ranking], top_k)
+
+    def _rrf_fusion_many(
+        self,
+        bm25_lists: List[List[Tuple[str, float]]],
+        vector_lists: List[Tuple[np.ndarray, np.ndarray]],
+        top_k: int
+    ) -> List[Tuple[str, float]]:
+        """多个查询变体的 BM25 / 向量排名列表一次性做 RRF 融合（按数组累加，不逐条建字典）"""
+        id_parts: List[np.ndarray] = []
+        score_parts: List[np.ndarray] = []
+
+        for bm25_results, (vector_ids, _) in zip(bm25_lists, vector_lists):
+            # BM25排名贡献
+            if bm25_results:
+                id_parts.append(self._id_array(bm25_results))
+                score_parts.append(1.0 / (self.rrf_k + np.arange(1, len(bm25_results) + 1)))
+
+            # 向量检索排名贡献（vector_ids 已按相似度降序）
+            if len(vector_ids):
+                id_parts.append(vector_ids)
+                score_parts.append(1.0 / (self.rrf_k + np.arange(1, len(vector_ids) + 1)))
+
+        return self._accumulate(id_parts, score_parts, top_k)
     
     def _weighted_fusion(
         self,
         bm25_results: List[Tuple[str, float]],
-        vector_scores: Dict[str, float],
+        vector_ranking: Tuple[np.ndarray, np.ndarray],
         top_k: int,
         bm25_weight: Optional[float] = None,
         vector_weight: Optional[float] = None
@@ -501,34 +1111,66 @@ class HybridSearchEngine:
         bm25_w = bm25_weight if bm25_weight is not None else self.bm25_weight
         vector_w = vector_weight if vector_weight is not None else self.vector_weight
 
+        id_parts: List[np.ndarray] = []
+        score_parts: List[np.ndarray] = []
+
         # 归一化BM25分数
-        bm25_dict = dict(bm25_results)
-        max_bm25 = max(bm25_dict.values()) if bm25_dict else 1.0
+        if bm25_results:
+            bm25_scores = np.fromiter((score for _, score in bm25_results), dtype=np.float64)
+            max_bm25 = bm25_scores.max()
+            id_parts.append(self._id_array(bm25_results))
+            score_parts.append(bm25_w * bm25_scores / max_bm25 if max_bm25 > 0 else np.zeros_like(bm25_scores))
 
         # 归一化向量分数
-        max_vector = max(vector_scores.values()) if vector_scores else 1.0
+        vector_ids, vector_scores = vector_ranking
+        if len(vector_ids):
+            max_vector = vector_scores.max()
+            id_parts.append(vector_ids)
+            score_parts.append(
+                vector_w * vector_scores / max_vector if max_vector > 0 else np.zeros_like(vector_scores)
+            )
 
-        # 融合
-        all_doc_ids = set(bm25_dict.keys()) | set(vector_scores.keys())
-        fused_scores: Dict[str, float] = {}
+        return self._accumulate(id_parts, score_parts, top_k)
+    
+    # ==================== BM25 持久化 ====================
 
-        for doc_id in all_doc_ids:
-            bm25_norm = bm25_dict.get(doc_id, 0.0) / max_bm25 if max_bm25 > 0 else 0
-            vector_norm = vector_scores.get(doc_id, 0.0) / max_vector if max_vector > 0 else 0
+    def _index_version(self) -> Any:
+        """向量表版本号；BM25快照与之绑定"""
+        get_version = getattr(self.vector_store, "get_version", None)
+        return get_version() if get_version else None
 
-            fused_scores[doc_id] = (
-                bm25_w * bm25_norm +
-                vector_w * vector_norm
-            )
+    def load_bm25_index(self) -> bool:
+        """
+        从磁盘加载与向量表同版本的BM25快照
+
+        Returns:
+            是否加载成功（文件不存在或版本不一致时返回False）
+        """
+        if not self.bm25_path:
+            return False
+        version = self._index_version()
+        if version is None:
+            return False
+        return self.bm25_index.load(self.bm25_path, expected_version=version)
+
+    def save_bm25_index(self) -> bool:
+        """把当前BM25索引连同向量表版本号写入磁盘"""
+        if not self.bm25_path:
+            return False
+        try:
+            self.bm25_index.save(self.bm25_path, index_version=self._index_version())
+            self.bm25_dirty = False
+            return True
+        except OSError as e:
+            logger.error(f"Error saving BM25 index: {e}")
+            return False
 
-        sorted_results = sorted(fused_scores.items(), key=lambda x: x[1], reverse=True)
-        return sorted_results[:top_k]
-    
     def clear(self):
         """清空索引"""
         self.bm25_index.clear()
-        self._metadata_cache.clear()
         self.vector_store.clear()
+        if self.bm25_path and os.path.exists(self.bm25_path):
+            os.remove(self.bm25_path)
     
     def get_statistics(self) -> Dict[str, Any]:
         """获取统计信息"""
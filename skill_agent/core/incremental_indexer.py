@@ -43,6 +43,7 @@ class IndexVersion:
     file_count: int
     total_documents: int
     file_hashes: Dict[str, str] = field(default_factory=dict)
+    changes_since_rebuild: int = 0  # 上次重建向量索引以来累计的文件变更数
 
 
 class FileHashTracker:
@@ -166,7 +167,8 @@ class IncrementalIndexer:
         watch_directory: str,
         file_pattern: str = "*.json",
         hash_cache_file: Optional[str] = None,
-        index_version_file: Optional[str] = None
+        index_version_file: Optional[str] = None,
+        rebuild_after_changes: Optional[int] = None
     ):
         """
         Args:
@@ -174,10 +176,12 @@ class IncrementalIndexer:
             file_pattern: 文件匹配模式
             hash_cache_file: 哈希缓存文件路径
             index_version_file: 索引版本文件路径
+            rebuild_after_changes: 累计多少个文件变更后触发索引重建回调（None 不触发）
         """
         self.watch_directory = Path(watch_directory)
         self.file_pattern = file_pattern
         self.index_version_file = index_version_file
+        self.rebuild_after_changes = rebuild_after_changes
         
         # 文件哈希追踪器
         self.hash_tracker = FileHashTracker(hash_cache_file)
@@ -189,6 +193,8 @@ class IncrementalIndexer:
         self._on_file_created: List[Callable] = []
         self._on_file_modified: List[Callable] = []
         self._on_file_deleted: List[Callable] = []
+        self._on_changes: List[Callable] = []
+        self._on_rebuild: List[Callable] = []
         
         # 文件监听器
         self._watcher = None
@@ -226,7 +232,8 @@ class IncrementalIndexer:
                         'created_at': self.current_version.created_at,
                         'file_count': self.current_version.file_count,
                         'total_documents': self.current_version.total_documents,
-                        'file_hashes': self.current_version.file_hashes
+                        'file_hashes': self.current_version.file_hashes,
+                        'changes_since_rebuild': self.current_version.changes_since_rebuild
                     }, f, indent=2)
             except Exception as e:
                 logger.warning(f"Failed to save index version: {e}")
@@ -243,6 +250,32 @@ class IncrementalIndexer:
         """注册文件删除回调"""
         self._on_file_deleted.append(callback)
     
+    def on_changes(self, callback: Callable[[List[FileChange]], None]):
+        """
+        注册批量变更回调：一次扫描（或一次防抖窗口）内的全部变更一起交给回调，
+        便于合并为一次写入；回调抛出异常时本批变更不记入哈希追踪器，下次扫描重试
+        """
+        self._on_changes.append(callback)
+    
+    def on_rebuild(self, callback: Callable[[int], None]):
+        """
+        注册索引重建回调：累计变更数达到 rebuild_after_changes 时调用（参数为累计变更数）；
+        回调成功后计数清零，抛出异常时计数保留，下次变更后重试
+        """
+        self._on_rebuild.append(callback)
+    
+    def _maybe_trigger_rebuild(self):
+        """累计变更达到阈值时触发重建回调"""
+        pending = self.current_version.changes_since_rebuild
+        if not self.rebuild_after_changes or not self._on_rebuild or pending < self.rebuild_after_changes:
+            return
+        try:
+            for callback in self._on_rebuild:
+                callback(pending)
+            self.current_version.changes_since_rebuild = 0
+        except Exception as e:
+            logger.error(f"Index rebuild after {pending} changes failed: {e}")
+    
     def scan_for_changes(self) -> List[FileChange]:
         """
         扫描目录检测变更
@@ -297,6 +330,14 @@ class IncrementalIndexer:
         """
         stats = {'created': 0, 'modified': 0, 'deleted': 0}
         
+        if changes and self._on_changes:
+            try:
+                for callback in self._on_changes:
+                    callback(changes)
+            except Exception as e:
+                logger.error(f"Error applying {len(changes)} changes: {e}")
+                return stats
+        
         for change in changes:
             try:
                 if change.change_type == FileChangeType.CREATED:
@@ -328,6 +369,8 @@ class IncrementalIndexer:
         if any(stats.values()):
             self.current_version.version += 1
             self.current_version.file_count = len(self.hash_tracker.file_hashes)
+            self.current_version.changes_since_rebuild += sum(stats.values())
+            self._maybe_trigger_rebuild()
             self._save_version()
         
         return stats
@@ -348,6 +391,7 @@ class IncrementalIndexer:
         self.current_version.version += 1
         self.current_version.file_count = len(files)
         self.current_version.created_at = datetime.now().isoformat()
+        self.current_version.changes_since_rebuild = 0
         self._save_version()
         
         return files
@@ -418,26 +462,33 @@ class IncrementalIndexer:
         class SkillFileHandler(FileSystemEventHandler):
             def __init__(handler_self, indexer):
                 handler_self.indexer = indexer
-                handler_self._debounce_timers: Dict[str, threading.Timer] = {}
+                handler_self._lock = threading.Lock()
+                handler_self._pending: Dict[str, FileChange] = {}
+                handler_self._debounce_timer: Optional[threading.Timer] = None
+            
+            def _flush(handler_self):
+                with handler_self._lock:
+                    changes = list(handler_self._pending.values())
+                    handler_self._pending.clear()
+                    handler_self._debounce_timer = None
+                if changes:
+                    handler_self.indexer.apply_changes(changes)
             
             def _debounced_handle(handler_self, file_path: str, change_type: FileChangeType):
-                """防抖处理"""
-                # 取消之前的定时器
-                if file_path in handler_self._debounce_timers:
-                    handler_self._debounce_timers[file_path].cancel()
-                
-                def handle():
-                    change = FileChange(
+                """防抖处理：500ms 内的事件合并为一批（同一文件只保留最后一次变更）"""
+                with handler_self._lock:
+                    handler_self._pending[file_path] = FileChange(
                         file_path=file_path,
                         change_type=change_type,
                         timestamp=datetime.now()
                     )
-                    handler_self.indexer.apply_changes([change])
-                
-                # 设置新的定时器（500ms防抖）
-                timer = threading.Timer(0.5, handle)
-                handler_self._debounce_timers[file_path] = timer
-                timer.start()
+                    # 取消之前的定时器
+                    if handler_self._debounce_timer is not None:
+                        handler_self._debounce_timer.cancel()
+                    timer = threading.Timer(0.5, handler_self._flush)
+                    timer.daemon = True
+                    handler_self._debounce_timer = timer
+                    timer.start()
             
             def on_created(handler_self, event):
                 if not event.is_directory and event.src_path.endswith('.json'):
@@ -0,0 +1,303 @@
+"""
+流式索引流水线
+parse → embed → store 三个阶段在各自线程中并发运行，阶段之间用有界队列连接：
+- 峰值内存只与 chunk_size × 队列长度有关，与技能库规模无关
+- 每个块写入后即可检索；块提交后追加到检查点文件，中断后可从检查点继续
+- 每个阶段完成一个块时发出进度事件
+"""
+
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from dataclasses import asdict, dataclass, field
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional
+
+logger = logging.getLogger(__name__)
+
+STAGE_PARSE = "parse"
+STAGE_EMBED = "embed"
+STAGE_STORE = "store"
+STAGE_DONE = "done"
+
+_END = object()
+
+
+@dataclass
+class IndexRecord:
+    """待索引的一条文档"""
+    doc_id: str
+    document: str
+    metadata: Dict[str, Any]
+    version: str = ""  # 内容版本（如文件哈希），用于判断检查点中的记录是否仍然有效
+
+
+@dataclass
+class IndexChunk:
+    """流水线中传递的一个块"""
+    index: int
+    records: List[IndexRecord]
+    embeddings: Optional[List[Any]] = None
+
+    @property
+    def doc_ids(self) -> List[str]:
+        return [r.doc_id for r in self.records]
+
+    @property
+    def documents(self) -> List[str]:
+        return [r.document for r in self.records]
+
+    @property
+    def metadatas(self) -> List[Dict[str, Any]]:
+        return [r.metadata for r in self.records]
+
+
+@dataclass
+class IndexProgress:
+    """进度事件"""
+    stage: str
+    chunk: int
+    parsed: int
+    embedded: int
+    committed: int
+    skipped: int
+    total: Optional[int]
+    elapsed_seconds: float
+    extra: Dict[str, Any] = field(default_factory=dict)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+
+class IndexCheckpoint:
+    """
+    已提交文档的检查点（JSON Lines，每提交一个块追加一行）
+
+    全部完成后删除；文件存在即表示上一次索引被中断。
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def exists(self) -> bool:
+        return os.path.exists(self.path)
+
+    def load(self) -> Dict[str, str]:
+        """doc_id -> version；损坏的行（中断时写了一半）被忽略"""
+        committed: Dict[str, str] = {}
+        if not self.exists():
+            return committed
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    committed.update(json.loads(line))
+                except json.JSONDecodeError:
+                    continue
+        return committed
+
+    def append(self, records: List[IndexRecord]) -> None:
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps({r.doc_id: r.version for r in records}) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+    def clear(self) -> None:
+        if self.exists():
+            os.remove(self.path)
+
+
+class StreamingIndexer:
+    """
+    parse → embed → store 流水线
+
+    parse 阶段在后台线程中消费 records 迭代器并按 chunk_size 切块；
+    embed 阶段在另一线程中对每块调用 encode；store 阶段在调用线程中
+    调用 commit 写入存储并更新检查点。任一阶段出错时其余阶段停止，
+    异常在 run() 中重新抛出。
+    """
+
+    def __init__(
+        self,
+        encode: Callable[[List[str]], List[Any]],
+        commit: Callable[[IndexChunk], bool],
+        chunk_size: int = 64,
+        queue_size: int = 2,
+        checkpoint: Optional[IndexCheckpoint] = None,
+        on_progress: Optional[Callable[[IndexProgress], None]] = None
+    ):
+        """
+        Args:
+            encode: 文档文本列表 -> 向量列表
+            commit: 写入一个块（含向量），返回是否成功
+            chunk_size: 每块文档数（也是提交粒度）
+            queue_size: 阶段之间的队列容量（块数）
+            checkpoint: 检查点（None 则不可续传）
+            on_progress: 进度回调
+        """
+        self.encode = encode
+        self.commit = commit
+        self.chunk_size = max(1, chunk_size)
+        self.queue_size = max(1, queue_size)
+        self.checkpoint = checkpoint
+        self.on_progress = on_progress
+
+    def run(
+        self,
+        records: Iterable[IndexRecord],
+        total: Optional[int] = None,
+        resume_from: Optional[Dict[str, str]] = None
+    ) -> Dict[str, Any]:
+        """
+        执行流水线
+
+        Args:
+            records: 待索引文档（可以是惰性生成器）
+            total: 文档总数（仅用于进度事件）
+            resume_from: 已提交的 doc_id -> version；版本一致的记录跳过
+
+        Returns:
+            统计信息；commit 返回 False 时 status 为 "error"，检查点保留
+        """
+        resume_from = resume_from or {}
+        start = time.perf_counter()
+        counts = {"parsed": 0, "embedded": 0, "committed": 0, "skipped": 0, "chunks": 0}
+        stage_seconds = {STAGE_PARSE: 0.0, STAGE_EMBED: 0.0, STAGE_STORE: 0.0}
+        stop = threading.Event()
+        errors: List[BaseException] = []
+        parsed_queue: "queue.Queue" = queue.Queue(maxsize=self.queue_size)
+        embedded_queue: "queue.Queue" = queue.Queue(maxsize=self.queue_size)
+
+        def emit(stage: str, chunk: int, **extra):
+            if self.on_progress is None:
+                return
+            try:
+                self.on_progress(IndexProgress(
+                    stage=stage, chunk=chunk, total=total,
+                    parsed=counts["parsed"], embedded=counts["embedded"],
+                    committed=counts["committed"], skipped=counts["skipped"],
+                    elapsed_seconds=round(time.perf_counter() - start, 3), extra=extra
+                ))
+            except Exception as e:
+                logger.warning(f"Index progress callback failed: {e}")
+
+        def put(q: "queue.Queue", item) -> bool:
+            """放入队列；下游已停止时返回 False"""
+            while not stop.is_set():
+                try:
+                    q.put(item, timeout=0.1)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+
+        def get(q: "queue.Queue"):
+            while True:
+                try:
+                    return q.get(timeout=0.1)
+                except queue.Empty:
+                    if stop.is_set():
+                        return _END
+
+        def chunks() -> Iterator[IndexChunk]:
+            batch: List[IndexRecord] = []
+            index = 0
+            for record in records:
+                if record.doc_id in resume_from and resume_from[record.doc_id] == record.version:
+                    counts["skipped"] += 1
+                    continue
+                batch.append(record)
+                if len(batch) >= self.chunk_size:
+                    yield IndexChunk(index, batch)
+                    index += 1
+                    batch = []
+            if batch:
+                yield IndexChunk(index, batch)
+
+        def parse_stage():
+            try:
+                it = chunks()
+                while not stop.is_set():
+                    t = time.perf_counter()
+                    chunk = next(it, None)
+                    stage_seconds[STAGE_PARSE] += time.perf_counter() - t
+                    if chunk is None:
+                        break
+                    counts["parsed"] += len(chunk.records)
+                    emit(STAGE_PARSE, chunk.index)
+                    if not put(parsed_queue, chunk):
+                        return
+            except BaseException as e:
+                errors.append(e)
+                stop.set()
+            finally:
+                put(parsed_queue, _END)
+
+        def embed_stage():
+            try:
+                while True:
+                    chunk = get(parsed_queue)
+                    if chunk is _END:
+                        break
+                    t = time.perf_counter()
+                    chunk.embeddings = self.encode(chunk.documents)
+                    stage_seconds[STAGE_EMBED] += time.perf_counter() - t
+                    counts["embedded"] += len(chunk.records)
+                    emit(STAGE_EMBED, chunk.index)
+                    if not put(embedded_queue, chunk):
+                        return
+            except BaseException as e:
+                errors.append(e)
+                stop.set()
+            finally:
+                put(embedded_queue, _END)
+
+        threads = [
+            threading.Thread(target=parse_stage, name="index-parse", daemon=True),
+            threading.Thread(target=embed_stage, name="index-embed", daemon=True),
+        ]
+        for thread in threads:
+            thread.start()
+
+        status = "success"
+        try:
+            while True:
+                chunk = get(embedded_queue)
+                if chunk is _END:
+                    break
+                t = time.perf_counter()
+                if not self.commit(chunk):
+                    status = "error"
+                    stop.set()
+                    break
+                if self.checkpoint is not None:
+                    self.checkpoint.append(chunk.records)
+                stage_seconds[STAGE_STORE] += time.perf_counter() - t
+                counts["committed"] += len(chunk.records)
+                counts["chunks"] += 1
+                emit(STAGE_STORE, chunk.index)
+        except BaseException:
+            stop.set()
+            raise
+        finally:
+            for thread in threads:
+                thread.join()
+
+        if errors:
+            raise errors[0]
+        if status == "success" and self.checkpoint is not None:
+            self.checkpoint.clear()
+
+        elapsed = time.perf_counter() - start
+        emit(STAGE_DONE, counts["chunks"])
+        return {
+            "status": status,
+            **counts,
+            "elapsed_time": round(elapsed, 3),
+            "stage_seconds": {k: round(v, 3) for k, v in stage_seconds.items()},
+            "docs_per_s": round(counts["committed"] / elapsed, 1) if elapsed > 0 else 0.0
+        }
@@ -0,0 +1,146 @@
+"""
+延迟构建的组件
+组件在首次访问时才构建（线程安全，只构建一次），也可以提前放到后台线程预热；
+每个组件的构建耗时记录到 StartupTimings，便于定位启动慢在哪一步。
+"""
+
+import logging
+import threading
+import time
+from typing import Callable, Dict, Generic, Optional, TypeVar
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class StartupTimings:
+    """各组件构建耗时（毫秒）"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._timings: Dict[str, float] = {}
+        self._started_at = time.perf_counter()
+
+    def record(self, name: str, elapsed_ms: float) -> None:
+        with self._lock:
+            self._timings[name] = round(elapsed_ms, 2)
+        logger.info(f"Startup: {name} ready in {elapsed_ms:.1f} ms")
+
+    def as_dict(self) -> Dict[str, float]:
+        with self._lock:
+            return dict(self._timings)
+
+    def log_summary(self, title: str = "Startup timings") -> None:
+        """按耗时从高到低输出一次汇总"""
+        timings = self.as_dict()
+        total = (time.perf_counter() - self._started_at) * 1000
+        breakdown = ", ".join(
+            f"{name}={ms:.1f}ms" for name, ms in sorted(timings.items(), key=lambda x: -x[1])
+        )
+        logger.info(f"{title} ({total:.1f} ms since start): {breakdown or 'nothing built yet'}")
+
+
+class LazyComponent(Generic[T]):
+    """
+    首次 get() 时调用 factory 构建的组件
+
+    多个线程同时 get() 只会构建一次，其余线程等待构建完成；
+    构建失败时异常抛给调用方，下一次 get() 会重新尝试。
+    """
+
+    def __init__(self, name: str, factory: Callable[[], T], timings: Optional[StartupTimings] = None):
+        self.name = name
+        self._factory = factory
+        self._timings = timings
+        self._lock = threading.Lock()
+        self._value: Optional[T] = None
+        self._loaded = False
+        self._preload_thread: Optional[threading.Thread] = None
+
+    @property
+    def loaded(self) -> bool:
+        """是否已构建完成"""
+        return self._loaded
+
+    @property
+    def loading(self) -> bool:
+        """后台预热是否仍在进行"""
+        thread = self._preload_thread
+        return not self._loaded and thread is not None and thread.is_alive()
+
+    def get(self) -> T:
+        """返回组件实例，必要时构建"""
+        if self._loaded:
+            return self._value
+        with self._lock:
+            if not self._loaded:
+                start = time.perf_counter()
+                self._value = self._factory()
+                self._loaded = True
+                if self._timings is not None:
+                    self._timings.record(self.name, (time.perf_counter() - start) * 1000)
+        return self._value
+
+    def peek(self) -> Optional[T]:
+        """已构建则返回实例，否则返回 None（不会触发构建）"""
+        return self._value if self._loaded else None
+
+    def preload(self) -> None:
+        """在后台守护线程中构建组件（重复调用无副作用）"""
+        if self._loaded or self._preload_thread is not None:
+            return
+
+        def run():
+            try:
+                self.get()
+            except Exception as e:
+                logger.error(f"Background loading of {self.name} failed: {e}")
+
+        self._preload_thread = threading.Thread(
+            target=run, name=f"preload-{self.name}", daemon=True
+        )
+        self._preload_thread.start()
+
+
+class LazyProxy:
+    """
+    转发属性访问的代理：下游组件只在真正调用方法时才触发构建
+
+    例如把嵌入生成器的代理交给混合检索与重排序，它们可以先构建好，
+    模型在第一次 encode() 时（或后台预热完成后）才就绪。
+    """
+
+    def __init__(self, resolve: Callable[[], object]):
+        """
+        Args:
+            resolve: 返回真实实例的函数（如 lambda: engine.embedding_generator）
+        """
+        object.__setattr__(self, "_resolve", resolve)
+
+    def __getattr__(self, name: str):
+        return getattr(self._resolve(), name)
+
+    def __setattr__(self, name: str, value) -> None:
+        setattr(self._resolve(), name, value)
+
+
+class component_attribute:
+    """
+    把实例属性映射到 instance._components[name]
+
+    读取时按需构建；赋值时直接替换为已构建的组件（便于注入替身）。
+    """
+
+    def __set_name__(self, owner, name: str) -> None:
+        self.name = name
+
+    def __get__(self, instance, owner=None):
+        if instance is None:
+            return self
+        return instance._components[self.name].get()
+
+    def __set__(self, instance, value) -> None:
+        component = LazyComponent(self.name, lambda: value)
+        component.get()
+        instance._components[self.name] = component
@@ -0,0 +1,195 @@
+"""
+查询微批处理
+把并发到达的单条检索请求在一个很短的时间窗内合并：
+查询文本一次批量编码，相同过滤条件的查询合并成一次多向量检索，再把结果分发回各调用方
+
+适用于多名编辑器用户同时调用 search_skills 的场景；单用户串行调用时
+每次只会多等待一个时间窗（默认几毫秒）。
+"""
+
+import json
+import logging
+import queue
+import threading
+import time
+from collections import Counter, deque
+from concurrent.futures import Future
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from .vector_result import VectorQueryResult
+
+logger = logging.getLogger(__name__)
+
+# 调度线程空闲轮询间隔（秒）
+_POLL_INTERVAL = 0.5
+
+# 保留最近多少次请求的等待时间用于统计分位数
+_LATENCY_WINDOW = 1000
+
+
+class _PendingQuery:
+    __slots__ = ("text", "top_k", "where", "future", "enqueued_at")
+
+    def __init__(self, text: str, top_k: int, where: Optional[Dict[str, Any]]):
+        self.text = text
+        self.top_k = top_k
+        self.where = where
+        self.future: Future = Future()
+        self.enqueued_at = time.perf_counter()
+
+
+class QueryBatcher:
+    """
+    向量检索请求合并器
+
+    query() 返回单条查询的 VectorQueryResult（与 VectorStore.query 一致，
+    也可按 {"ids": [[...]], "documents": [[...]], ...} 的方式读取）。
+    """
+
+    def __init__(
+        self,
+        embedding_generator,
+        vector_store,
+        window_ms: float = 2.0,
+        max_batch_size: int = 16,
+        prompt_name: Optional[str] = "query",
+    ):
+        """
+        Args:
+            embedding_generator: 嵌入生成器
+            vector_store: 向量存储（query 需支持多个查询向量）
+            window_ms: 合并时间窗（毫秒）
+            max_batch_size: 单批最多合并的查询数
+            prompt_name: 查询编码使用的 prompt
+        """
+        self.embedding_generator = embedding_generator
+        self.vector_store = vector_store
+        self.window = max(0.0, float(window_ms)) / 1000.0
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.prompt_name = prompt_name
+
+        self._requests: "queue.Queue[_PendingQuery]" = queue.Queue()
+        self._closed = False
+        self._stats_lock = threading.Lock()
+        self._batch_sizes: Counter = Counter()
+        self._store_queries = 0
+        self._errors = 0
+        self._wait_ms: deque = deque(maxlen=_LATENCY_WINDOW)
+
+        self._thread = threading.Thread(target=self._dispatch_loop, name="query-batcher", daemon=True)
+        self._thread.start()
+
+    def query(self, text: str, top_k: int = 5, where: Optional[Dict[str, Any]] = None) -> VectorQueryResult:
+        """提交一条查询并等待合并批次的结果"""
+        if self._closed:
+            raise RuntimeError("QueryBatcher is closed")
+        request = _PendingQuery(text, top_k, where)
+        self._requests.put(request)
+        return request.future.result()
+
+    def query_many(
+        self, texts: List[str], top_k: int = 5, where: Optional[Dict[str, Any]] = None
+    ) -> List[VectorQueryResult]:
+        """一次提交多条查询（同一调用方的查询扩展），它们进入同一批次，按顺序返回各自结果"""
+        if self._closed:
+            raise RuntimeError("QueryBatcher is closed")
+        requests = [_PendingQuery(text, top_k, where) for text in texts]
+        for request in requests:
+            self._requests.put(request)
+        return [request.future.result() for request in requests]
+
+    # ==================== 调度 ====================
+
+    def _dispatch_loop(self) -> None:
+        while True:
+            try:
+                first = self._requests.get(timeout=_POLL_INTERVAL)
+            except queue.Empty:
+                if self._closed:
+                    return
+                continue
+
+            batch = [first]
+            deadline = first.enqueued_at + self.window
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.perf_counter()
+                try:
+                    batch.append(self._requests.get(timeout=remaining) if remaining > 0
+                                 else self._requests.get_nowait())
+                except queue.Empty:
+                    break
+
+            started = time.perf_counter()
+            with self._stats_lock:
+                self._batch_sizes[len(batch)] += 1
+                self._wait_ms.extend((started - r.enqueued_at) * 1000 for r in batch)
+
+            try:
+                self._run_batch(batch)
+            except Exception as e:
+                logger.error(f"Batched query failed: {e}")
+                with self._stats_lock:
+                    self._errors += 1
+                for request in batch:
+                    if not request.future.done():
+                        request.future.set_exception(e)
+
+    def _run_batch(self, batch: List[_PendingQuery]) -> None:
+        # 1. 一次编码所有不同的查询文本
+        texts = list(dict.fromkeys(r.text for r in batch))
+        vectors = self.embedding_generator.encode(texts, prompt_name=self.prompt_name)
+        vector_of = dict(zip(texts, vectors))
+
+        # 2. 相同过滤条件的查询合并成一次多向量检索
+        groups: Dict[str, List[_PendingQuery]] = {}
+        for request in batch:
+            key = json.dumps(request.where or {}, sort_keys=True, ensure_ascii=False, default=str)
+            groups.setdefault(key, []).append(request)
+
+        for requests in groups.values():
+            top_k = max(r.top_k for r in requests)
+            results = VectorQueryResult.coerce(self.vector_store.query(
+                query_embeddings=[np.asarray(vector_of[r.text]) for r in requests],
+                top_k=top_k,
+                where=requests[0].where,
+            ))
+            with self._stats_lock:
+                self._store_queries += 1
+
+            # 3. 按各自 top_k 切片后分发（Arrow 切片，不复制数据）
+            for i, request in enumerate(requests):
+                request.future.set_result(results.take([i], top_k=request.top_k))
+
+    # ==================== 统计 / 生命周期 ====================
+
+    def get_statistics(self) -> Dict[str, Any]:
+        """批大小分布与因合并产生的额外等待时间"""
+        with self._stats_lock:
+            sizes = dict(sorted(self._batch_sizes.items()))
+            waits = np.asarray(self._wait_ms, dtype=np.float64)
+            store_queries = self._store_queries
+            errors = self._errors
+        batches = sum(sizes.values())
+        requests = sum(size * count for size, count in sizes.items())
+        return {
+            "window_ms": round(self.window * 1000, 3),
+            "max_batch_size": self.max_batch_size,
+            "requests": requests,
+            "batches": batches,
+            "store_queries": store_queries,
+            "avg_batch_size": round(requests / batches, 2) if batches else 0.0,
+            "batch_size_histogram": sizes,
+            "added_latency_ms": {
+                "avg": round(float(waits.mean()), 3) if waits.size else 0.0,
+                "p50": round(float(np.percentile(waits, 50)), 3) if waits.size else 0.0,
+                "p95": round(float(np.percentile(waits, 95)), 3) if waits.size else 0.0,
+            },
+            "errors": errors,
+        }
+
+    def close(self) -> None:
+        """停止调度线程"""
+        self._closed = True
+        self._thread.join(timeout=_POLL_INTERVAL * 2)
@@ -0,0 +1,320 @@
+"""
+查询结果缓存
+缓存与索引代号绑定：索引任何一次写入都会推进代号，旧代号下的结果整体失效，
+因此可以放心使用较长的 TTL，而不会在文件监听触发重建索引后返回过期结果。
+
+- VersionedQueryCache: 按查询字符串精确匹配（一级缓存）
+- SemanticQueryCache: 按查询向量余弦相似度匹配（二级缓存），
+  同一需求的不同说法（“火球 范围伤害” / “范围火焰伤害技能”）可复用结果
+"""
+
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, Hashable, List, Optional
+
+import numpy as np
+from cachetools import TTLCache
+
+logger = logging.getLogger(__name__)
+
+
+class VersionedQueryCache:
+    """
+    按索引代号失效的查询缓存
+
+    用法：查询开始时取 generation()，查找与写入都带上该代号；
+    查询期间索引若发生变化，写入会被丢弃，避免旧结果落入新代号。
+    """
+
+    def __init__(
+        self,
+        generation: Callable[[], Hashable],
+        maxsize: int = 1000,
+        ttl: float = 3600
+    ):
+        """
+        Args:
+            generation: 返回当前索引代号的函数
+            maxsize: 最大缓存条目数
+            ttl: 缓存生存时间（秒）
+        """
+        self._generation_fn = generation
+        self._cache: TTLCache = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._cached_generation: Optional[Hashable] = None
+        self._lock = threading.Lock()
+        self._stats = {
+            'hits': 0,
+            'misses': 0,
+            'invalidations': 0,
+            'invalidated_entries': 0,
+            'stale_writes_dropped': 0
+        }
+
+    def generation(self) -> Hashable:
+        """当前索引代号"""
+        return self._generation_fn()
+
+    def _sync_generation(self, generation: Hashable) -> None:
+        """代号变化时清空缓存（调用方持有锁）"""
+        if generation == self._cached_generation:
+            return
+        if self._cached_generation is not None:
+            self._stats['invalidations'] += 1
+            self._stats['invalidated_entries'] += len(self._cache)
+            if self._cache:
+                logger.debug(f"Index generation {self._cached_generation} -> {generation}, "
+                             f"dropped {len(self._cache)} cached queries")
+        self._cache.clear()
+        self._cached_generation = generation
+
+    def get(self, key: Hashable, generation: Optional[Hashable] = None) -> Optional[Any]:
+        """查找缓存；未命中返回 None"""
+        generation = self.generation() if generation is None else generation
+        with self._lock:
+            self._sync_generation(generation)
+            value = self._cache.get(key)
+            if value is None:
+                self._stats['misses'] += 1
+            else:
+                self._stats['hits'] += 1
+            return value
+
+    def put(self, key: Hashable, value: Any, generation: Optional[Hashable] = None) -> bool:
+        """
+        写入缓存
+
+        Args:
+            generation: 计算该结果时的索引代号；与当前代号不一致时不写入
+
+        Returns:
+            是否写入
+        """
+        current = self.generation()
+        with self._lock:
+            if generation is not None and generation != current:
+                self._stats['stale_writes_dropped'] += 1
+                return False
+            self._sync_generation(current)
+            self._cache[key] = value
+            return True
+
+    def clear(self) -> None:
+        """清空缓存"""
+        with self._lock:
+            self._cache.clear()
+
+    def __len__(self) -> int:
+        return len(self._cache)
+
+    def get_statistics(self) -> Dict[str, Any]:
+        """命中 / 未命中 / 失效统计"""
+        with self._lock:
+            lookups = self._stats['hits'] + self._stats['misses']
+            return {
+                **self._stats,
+                'size': len(self._cache),
+                'maxsize': self._cache.maxsize,
+                'ttl': self._cache.ttl,
+                'generation': self._cached_generation,
+                'hit_rate': round(self._stats['hits'] / lookups, 4) if lookups else 0.0
+            }
+
+
+class SemanticQueryCache:
+    """
+    按查询向量相似度命中的查询缓存
+
+    最近查询的归一化向量存放在一块连续矩阵中，查找时一次矩阵-向量乘
+    得到全部余弦相似度；条目数有上限（默认 256），规模内精确扫描比
+    维护近似索引更快也更简单。只有 scope（top_k + 过滤条件）相同且
+    索引代号相同的条目才可命中。容量满时淘汰最久未使用的条目。
+    """
+
+    def __init__(
+        self,
+        generation: Callable[[], Hashable],
+        threshold: float = 0.92,
+        maxsize: int = 256,
+        ttl: float = 3600
+    ):
+        """
+        Args:
+            generation: 返回当前索引代号的函数
+            threshold: 命中所需的最小余弦相似度
+            maxsize: 最大缓存条目数
+            ttl: 缓存生存时间（秒）
+        """
+        self._generation_fn = generation
+        self.threshold = threshold
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._lock = threading.Lock()
+
+        self._vectors: Optional[np.ndarray] = None  # (maxsize, dim)，按需分配
+        self._scopes: List[Optional[Hashable]] = [None] * maxsize
+        self._values: List[Any] = [None] * maxsize
+        self._expires = np.zeros(maxsize, dtype=np.float64)
+        self._last_used = np.zeros(maxsize, dtype=np.int64)
+        self._occupied = np.zeros(maxsize, dtype=bool)
+        self._tick = 0
+        self._cached_generation: Optional[Hashable] = None
+        self._stats = {
+            'hits': 0,
+            'misses': 0,
+            'evictions': 0,
+            'invalidations': 0,
+            'stale_writes_dropped': 0
+        }
+
+    def generation(self) -> Hashable:
+        """当前索引代号"""
+        return self._generation_fn()
+
+    @staticmethod
+    def _normalize(embedding) -> Optional[np.ndarray]:
+        vector = np.asarray(embedding, dtype=np.float32).ravel()
+        norm = float(np.linalg.norm(vector))
+        if norm == 0.0:
+            return None
+        return vector / norm
+
+    def _reset(self) -> None:
+        """清空全部条目（调用方持有锁）"""
+        self._occupied[:] = False
+        self._scopes = [None] * self.maxsize
+        self._values = [None] * self.maxsize
+
+    def _sync_generation(self, generation: Hashable) -> None:
+        """代号变化时清空缓存（调用方持有锁）"""
+        if generation == self._cached_generation:
+            return
+        if self._cached_generation is not None and self._occupied.any():
+            self._stats['invalidations'] += 1
+        self._reset()
+        self._cached_generation = generation
+
+    def _live_slots(self, now: float) -> np.ndarray:
+        """未过期的占用槽位掩码，顺带释放过期条目（调用方持有锁）"""
+        expired = self._occupied & (self._expires <= now)
+        if expired.any():
+            for slot in np.flatnonzero(expired):
+                self._scopes[slot] = None
+                self._values[slot] = None
+            self._occupied &= ~expired
+        return self._occupied
+
+    def get(
+        self,
+        embedding,
+        scope: Hashable,
+        generation: Optional[Hashable] = None
+    ) -> Optional[Any]:
+        """
+        查找与 embedding 足够相似的已缓存查询
+
+        Args:
+            embedding: 查询向量
+            scope: 命中范围（通常为 top_k + 过滤条件），只在同一 scope 内匹配
+            generation: 查询开始时的索引代号
+
+        Returns:
+            命中的结果；未命中返回 None
+        """
+        vector = self._normalize(embedding)
+        generation = self.generation() if generation is None else generation
+        with self._lock:
+            self._sync_generation(generation)
+            live = self._live_slots(time.monotonic())
+            if vector is None or self._vectors is None or not live.any() \
+                    or vector.shape[0] != self._vectors.shape[1]:
+                self._stats['misses'] += 1
+                return None
+
+            candidates = np.flatnonzero(live)
+            candidates = candidates[[self._scopes[slot] == scope for slot in candidates]]
+            if candidates.size == 0:
+                self._stats['misses'] += 1
+                return None
+
+            similarities = self._vectors[candidates] @ vector
+            best = int(np.argmax(similarities))
+            if similarities[best] < self.threshold:
+                self._stats['misses'] += 1
+                return None
+
+            slot = candidates[best]
+            self._tick += 1
+            self._last_used[slot] = self._tick
+            self._stats['hits'] += 1
+            return self._values[slot]
+
+    def put(
+        self,
+        embedding,
+        scope: Hashable,
+        value: Any,
+        generation: Optional[Hashable] = None
+    ) -> bool:
+        """
+        写入缓存
+
+        Args:
+            generation: 计算该结果时的索引代号；与当前代号不一致时不写入
+
+        Returns:
+            是否写入
+        """
+        vector = self._normalize(embedding)
+        if vector is None:
+            return False
+        current = self.generation()
+        with self._lock:
+            if generation is not None and generation != current:
+                self._stats['stale_writes_dropped'] += 1
+                return False
+            self._sync_generation(current)
+
+            if self._vectors is None or self._vectors.shape[1] != vector.shape[0]:
+                self._vectors = np.zeros((self.maxsize, vector.shape[0]), dtype=np.float32)
+                self._reset()
+
+            now = time.monotonic()
+            live = self._live_slots(now)
+            free = np.flatnonzero(~live)
+            if free.size:
+                slot = int(free[0])
+            else:
+                slot = int(np.argmin(self._last_used))
+                self._stats['evictions'] += 1
+
+            self._tick += 1
+            self._vectors[slot] = vector
+            self._scopes[slot] = scope
+            self._values[slot] = value
+            self._expires[slot] = now + self.ttl
+            self._last_used[slot] = self._tick
+            self._occupied[slot] = True
+            return True
+
+    def clear(self) -> None:
+        """清空缓存"""
+        with self._lock:
+            self._reset()
+
+    def __len__(self) -> int:
+        return int(self._occupied.sum())
+
+    def get_statistics(self) -> Dict[str, Any]:
+        """命中 / 未命中 / 淘汰统计"""
+        with self._lock:
+            lookups = self._stats['hits'] + self._stats['misses']
+            return {
+                **self._stats,
+                'size': int(self._occupied.sum()),
+                'maxsize': self.maxsize,
+                'threshold': self.threshold,
+                'ttl': self.ttl,
+                'generation': self._cached_generation,
+                'hit_rate': round(self._stats['hits'] / lookups, 4) if lookups else 0.0
+            }
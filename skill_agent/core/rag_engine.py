@@ -4,7 +4,8 @@ RAG引擎核心模块
 """
 
 import logging
-from typing import List, Dict, Any, Optional, Tuple
+import os
+from typing import Callable, List, Dict, Any, Optional, Tuple
 from datetime import datetime
 from cachetools import TTLCache
 import hashlib
@@ -16,6 +17,7 @@ from .skill_indexer import SkillIndexer
 from .action_indexer import ActionIndexer
 from .structured_query_engine import StructuredQueryEngine
 from .performance_monitor import PerformanceMonitor, get_global_monitor
+from .index_pipeline import IndexCheckpoint, IndexProgress, IndexRecord, StreamingIndexer
 
 logger = logging.getLogger(__name__)
 
@@ -122,12 +124,20 @@ class RAGEngine:
 
         return sorted(list(action_types))
 
-    def index_skills(self, force_rebuild: bool = False) -> Dict[str, Any]:
+    def index_skills(
+        self,
+        force_rebuild: bool = False,
+        on_progress: Optional[Callable[[IndexProgress], None]] = None
+    ) -> Dict[str, Any]:
         """
         索引所有技能到向量数据库
 
+        解析、编码、写入由流式流水线并发执行，按块提交；
+        上次被中断时从检查点继续。
+
         Args:
             force_rebuild: 是否强制重建索引
+            on_progress: 进度回调（在流水线线程中调用）
 
         Returns:
             索引结果统计
@@ -135,92 +145,107 @@ class RAGEngine:
         logger.info(f"Starting skill indexing (force_rebuild={force_rebuild})")
         start_time = datetime.now()
 
-        # 1. 扫描并解析技能文件
-        skills = self.skill_indexer.index_all_skills(force_rebuild=force_rebuild)
-
-        if not skills:
+        # 1. 扫描技能文件
+        skill_files = self.skill_indexer.scan_skills()
+        if not skill_files:
             logger.warning("No skills found to index")
             return {"status": "no_skills", "count": 0}
 
-        # 2. 准备数据
-        documents = []
-        metadatas = []
-        ids = []
-
-        for skill in skills:
-            # 文档文本（用于搜索）
-            documents.append(skill['search_text'])
-
-            # 提取action类型列表
-            action_types = self._extract_action_types(skill)
-
-            # 元数据
-            metadata = {
-                'skill_id': skill.get('skillId', ''),
-                'skill_name': skill.get('skillName', ''),
-                'file_name': skill.get('file_name', ''),
-                'file_path': skill.get('file_path', ''),
-                'file_hash': skill.get('file_hash', ''),
-                'last_modified': skill.get('last_modified', ''),
-                'total_duration': skill.get('totalDuration', 0),
-                'frame_rate': skill.get('frameRate', 30),
-                'num_tracks': len(skill.get('tracks', [])),
-                'num_actions': sum(len(track.get('actions', [])) for track in skill.get('tracks', [])),
-                'action_type_list': json.dumps(action_types)  # 存储为JSON字符串，支持过滤
-            }
-            metadatas.append(metadata)
-
-            # 文档ID（使用文件路径的哈希）
-            doc_id = hashlib.md5(skill['file_path'].encode('utf-8')).hexdigest()
-            ids.append(doc_id)
-
-        # 3. 生成嵌入向量
-        logger.info(f"Generating embeddings for {len(documents)} skills...")
-        embeddings = self.embedding_generator.encode_batch(
-            documents,
-            show_progress=True
-        )
-
-        # 4. 存储到向量数据库
-        logger.info("Storing embeddings to vector database...")
-
-        # 如果是强制重建，先清空
-        if force_rebuild:
+        # 如果是强制重建，先清空（续传时保留已提交的部分）
+        checkpoint = self._index_checkpoint()
+        resuming = checkpoint is not None and checkpoint.exists()
+        if force_rebuild and not resuming:
             self.vector_store.clear()
 
-        # 添加文档
-        success = self.vector_store.add_documents(
-            documents=documents,
-            embeddings=embeddings,
-            metadatas=metadatas,
-            ids=ids
+        # 2. 解析 → 生成嵌入向量 → 存储到向量数据库（流水线）
+        records = (
+            IndexRecord(
+                # 文档ID（使用文件路径的哈希）
+                doc_id=hashlib.md5(skill['file_path'].encode('utf-8')).hexdigest(),
+                # 文档文本（用于搜索）
+                document=skill['search_text'],
+                metadata=self._build_skill_metadata(skill),
+                version=skill.get('file_hash', '')
+            )
+            for skill in self.skill_indexer.iter_skills(
+                force_rebuild=force_rebuild, skill_files=skill_files
+            )
+        )
+        pipeline_config = self.rag_config.get('index_pipeline', {}) or {}
+        pipeline = StreamingIndexer(
+            encode=lambda documents: self.embedding_generator.encode_batch(documents, show_progress=False),
+            commit=lambda chunk: self.vector_store.add_documents(
+                documents=chunk.documents,
+                embeddings=chunk.embeddings,
+                metadatas=chunk.metadatas,
+                ids=chunk.doc_ids
+            ),
+            chunk_size=pipeline_config.get('chunk_size', 64),
+            queue_size=pipeline_config.get('queue_size', 2),
+            checkpoint=checkpoint,
+            on_progress=on_progress
+        )
+        pipeline_stats = pipeline.run(
+            records,
+            total=len(skill_files),
+            resume_from=checkpoint.load() if resuming else None
         )
+        count = pipeline_stats['committed'] + pipeline_stats['skipped']
 
-        # 5. 统计
+        # 3. 统计
         elapsed_time = (datetime.now() - start_time).total_seconds()
 
-        if success:
-            self._stats['total_indexed'] = len(skills)
+        if pipeline_stats['status'] == 'success':
+            self._stats['total_indexed'] = count
             self._stats['last_index_time'] = datetime.now().isoformat()
 
             result = {
                 "status": "success",
-                "count": len(skills),
+                "count": count,
                 "elapsed_time": elapsed_time,
-                "vector_dimension": self.embedding_generator.get_embedding_dimension()
+                "vector_dimension": self.embedding_generator.get_embedding_dimension(),
+                "pipeline": pipeline_stats
             }
 
-            logger.info(f"Indexing completed: {len(skills)} skills in {elapsed_time:.2f}s")
+            logger.info(f"Indexing completed: {count} skills in {elapsed_time:.2f}s")
         else:
             result = {
                 "status": "error",
-                "count": 0,
+                "count": pipeline_stats['committed'],
                 "message": "Failed to add documents to vector store"
             }
             logger.error("Indexing failed")
 
         return result
 
+    def _build_skill_metadata(self, skill: Dict[str, Any]) -> Dict[str, Any]:
+        """构建技能元数据"""
+        # 提取action类型列表
+        action_types = self._extract_action_types(skill)
+        return {
+            'skill_id': skill.get('skillId', ''),
+            'skill_name': skill.get('skillName', ''),
+            'file_name': skill.get('file_name', ''),
+            'file_path': skill.get('file_path', ''),
+            'file_hash': skill.get('file_hash', ''),
+            'last_modified': skill.get('last_modified', ''),
+            'total_duration': skill.get('totalDuration', 0),
+            'frame_rate': skill.get('frameRate', 30),
+            'num_tracks': len(skill.get('tracks', [])),
+            'num_actions': sum(len(track.get('actions', [])) for track in skill.get('tracks', [])),
+            'action_type_list': json.dumps(action_types)  # 存储为JSON字符串，支持过滤
+        }
+
+    def _index_checkpoint(self) -> Optional[IndexCheckpoint]:
+        """索引检查点：与向量表存放在同一目录"""
+        if not (self.rag_config.get('index_pipeline', {}) or {}).get('resumable', True):
+            return None
+        db_path = getattr(self.vector_store, 'db_path', None)
+        if not db_path:
+            return None
+        collection = getattr(self.vector_store, 'collection_name', 'collection')
+        return IndexCheckpoint(os.path.join(db_path, f"{collection}.checkpoint.jsonl"))
+
     def search_skills(
         self,
         query: str,
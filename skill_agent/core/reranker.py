@@ -8,6 +8,8 @@ from typing import List, Dict, Any, Optional, Tuple, Callable
 from dataclasses import dataclass
 from abc import ABC, abstractmethod
 
+import numpy as np
+
 logger = logging.getLogger(__name__)
 
 
@@ -432,21 +434,30 @@ class SemanticReranker(BaseReranker):
     """
     语义重排序器
     基于查询和文档的语义相似度进行重排序
+
+    文档向量优先取自候选结果自带的 embedding，其次从向量存储按 ID 批量读取，
+    仍缺失的再一次性批量编码；打分为一次矩阵-向量乘法。
     """
 
-    def __init__(self, embedding_generator=None, weight: float = 0.3):
+    def __init__(self, embedding_generator=None, weight: float = 0.3, vector_store=None):
         """
         Args:
             embedding_generator: 嵌入生成器实例（可选）
             weight: 语义分数权重（与原始分数融合）
+            vector_store: 向量存储（可选，用于按 doc_id 读取已索引的文档向量）
         """
         self.embedding_generator = embedding_generator
         self.weight = weight
+        self.vector_store = vector_store
 
     def set_embedding_generator(self, generator):
         """设置嵌入生成器"""
         self.embedding_generator = generator
 
+    def set_vector_store(self, vector_store):
+        """设置向量存储"""
+        self.vector_store = vector_store
+
     def rerank(
         self,
         query: str,
@@ -465,31 +476,29 @@ class SemanticReranker(BaseReranker):
 
         try:
             # 获取查询向量
-            query_embedding = self.embedding_generator.encode(query, prompt_name="query")
+            query_embedding = np.asarray(
+                self.embedding_generator.encode(query, prompt_name="query"), dtype=np.float32
+            )
+            matrix, has_vector = self._document_matrix(documents)
+            semantic_scores = np.zeros(len(documents), dtype=np.float32)
+            if has_vector.any():
+                semantic_scores[has_vector] = self._cosine_scores(matrix[has_vector], query_embedding)
+
+            original_scores = np.asarray(
+                [doc.get('score', doc.get('fused_score', 0.0)) for doc in documents], dtype=np.float64
+            )
+            # 融合分数
+            combined_scores = (1 - self.weight) * original_scores + self.weight * semantic_scores
 
             results = []
             for i, doc in enumerate(documents):
-                original_score = doc.get('score', doc.get('fused_score', 0.0))
-
-                # 获取文档向量（如果有缓存的话会很快）
-                doc_text = doc.get('document', '') or doc.get('text', '')
-                if doc_text:
-                    doc_embedding = self.embedding_generator.encode(doc_text)
-                    # 计算余弦相似度
-                    semantic_score = self._cosine_similarity(query_embedding, doc_embedding)
-                else:
-                    semantic_score = 0.0
-
-                # 融合分数
-                combined_score = (1 - self.weight) * original_score + self.weight * semantic_score
-
                 results.append(RerankResult(
                     doc_id=doc.get('doc_id', str(i)),
                     original_rank=i,
                     new_rank=-1,
-                    original_score=original_score,
-                    rerank_score=combined_score,
-                    document=doc_text,
+                    original_score=float(original_scores[i]),
+                    rerank_score=float(combined_scores[i]),
+                    document=doc.get('document', '') or doc.get('text', ''),
                     metadata=doc.get('metadata', {})
                 ))
 
@@ -507,15 +516,60 @@ class SemanticReranker(BaseReranker):
             logger.warning(f"Semantic reranking failed, falling back: {e}")
             return self._fallback_rerank(documents, top_k)
 
-    def _cosine_similarity(self, vec1: List[float], vec2: List[float]) -> float:
+    def _document_matrix(self, documents: List[Dict[str, Any]]) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        收集候选文档向量
+
+        Returns:
+            (文档向量矩阵, 是否取到向量的布尔掩码)；未取到向量的行为全零
+        """
+        vectors: List[Optional[np.ndarray]] = [None] * len(documents)
+
+        # 1. 候选结果自带的向量
+        for i, doc in enumerate(documents):
+            if doc.get('embedding') is not None:
+                vectors[i] = doc['embedding']
+
+        # 2. 从向量存储按 ID 批量读取
+        missing = [i for i, v in enumerate(vectors) if v is None and documents[i].get('doc_id')]
+        if missing and self.vector_store is not None:
+            ids = list(dict.fromkeys(documents[i]['doc_id'] for i in missing))
+            stored = self.vector_store.get_by_ids(ids) or {}
+            by_id = dict(zip(stored.get('ids') or [], stored.get('embeddings') or []))
+            for i in missing:
+                vectors[i] = by_id.get(documents[i]['doc_id'])
+
+        # 3. 剩余的按文本一次性批量编码（命中嵌入缓存时很快）
+        missing = [
+            i for i, v in enumerate(vectors)
+            if v is None and (documents[i].get('document') or documents[i].get('text'))
+        ]
+        if missing:
+            texts = [documents[i].get('document') or documents[i].get('text') for i in missing]
+            for i, embedding in zip(missing, self.embedding_generator.encode(texts)):
+                vectors[i] = embedding
+
+        has_vector = np.array([v is not None for v in vectors], dtype=bool)
+        if not has_vector.any():
+            return np.zeros((len(documents), 0), dtype=np.float32), has_vector
+        dim = len(next(v for v in vectors if v is not None))
+        matrix = np.zeros((len(documents), dim), dtype=np.float32)
+        for i, v in enumerate(vectors):
+            if v is not None:
+                matrix[i] = np.asarray(v, dtype=np.float32)
+        return matrix, has_vector
+
+    @staticmethod
+    def _cosine_scores(matrix: np.ndarray, query: np.ndarray) -> np.ndarray:
+        """一次矩阵-向量乘法计算所有文档与查询的余弦相似度"""
+        norms = np.linalg.norm(matrix, axis=1) * np.linalg.norm(query)
+        return np.divide(matrix @ query, norms, out=np.zeros(len(matrix), dtype=np.float32), where=norms > 0)
+
+    def _cosine_similarity(self, vec1, vec2) -> float:
         """计算余弦相似度"""
-        import math
-        dot_product = sum(a * b for a, b in zip(vec1, vec2))
-        norm1 = math.sqrt(sum(a * a for a in vec1))
-        norm2 = math.sqrt(sum(b * b for b in vec2))
-        if norm1 == 0 or norm2 == 0:
-            return 0.0
-        return dot_product / (norm1 * norm2)
+        return float(self._cosine_scores(
+            np.asarray(vec1, dtype=np.float32)[None, :], np.asarray(vec2, dtype=np.float32)
+        )[0])
 
     def _fallback_rerank(self, documents: List[Dict], top_k: Optional[int]) -> List[RerankResult]:
         """降级重排序（使用原始分数）"""
@@ -592,8 +646,9 @@ class RerankerPipeline:
 
 def create_skill_reranker_pipeline(
     use_cross_encoder: bool = False,
-    use_semantic: bool = False,
-    embedding_generator=None
+    use_semantic: bool = True,
+    embedding_generator=None,
+    vector_store=None
 ) -> RerankerPipeline:
     """
     创建技能检索的重排序管道
@@ -602,6 +657,7 @@ def create_skill_reranker_pipeline(
         use_cross_encoder: 是否使用Cross-Encoder（需要额外模型）
         use_semantic: 是否使用语义重排序
         embedding_generator: 嵌入生成器（语义重排序需要）
+        vector_store: 向量存储（可选，语义重排序从中读取文档向量）
     """
     pipeline = RerankerPipeline()
 
@@ -610,7 +666,7 @@ def create_skill_reranker_pipeline(
 
     # 阶段2: 语义重排序（可选）
     if use_semantic and embedding_generator:
-        pipeline.add_stage(SemanticReranker(embedding_generator))
+        pipeline.add_stage(SemanticReranker(embedding_generator, vector_store=vector_store))
 
     # 阶段3: Cross-Encoder（可选）
     if use_cross_encoder:
@@ -621,8 +677,9 @@ def create_skill_reranker_pipeline(
 
 def create_action_reranker_pipeline(
     use_cross_encoder: bool = False,
-    use_semantic: bool = False,
-    embedding_generator=None
+    use_semantic: bool = True,
+    embedding_generator=None,
+    vector_store=None
 ) -> RerankerPipeline:
     """
     创建Action检索的重排序管道
@@ -631,6 +688,7 @@ def create_action_reranker_pipeline(
         use_cross_encoder: 是否使用Cross-Encoder（需要额外模型）
         use_semantic: 是否使用语义重排序
         embedding_generator: 嵌入生成器（语义重排序需要）
+        vector_store: 向量存储（可选，语义重排序从中读取文档向量）
     """
     pipeline = RerankerPipeline()
 
@@ -639,7 +697,7 @@ def create_action_reranker_pipeline(
 
     # 阶段2: 语义重排序（可选）
     if use_semantic and embedding_generator:
-        pipeline.add_stage(SemanticReranker(embedding_generator))
+        pipeline.add_stage(SemanticReranker(embedding_generator, vector_store=vector_store))
 
     # 阶段3: Cross-Encoder（可选）
     if use_cross_encoder:
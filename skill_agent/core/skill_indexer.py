@@ -6,7 +6,11 @@
 import os
 import json
 import logging
-from typing import List, Dict, Any, Optional
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import List, Dict, Any, Iterator, Optional
 from pathlib import Path
 from datetime import datetime
 import hashlib
@@ -15,22 +19,44 @@ from core.odin_json_parser import OdinJsonParser
 
 logger = logging.getLogger(__name__)
 
+# 解析工作进程内的索引器（由 _init_parse_worker 创建，不加载索引缓存）
+_worker_indexer: Optional["SkillIndexer"] = None
+
+
+def _init_parse_worker(config: dict):
+    global _worker_indexer
+    _worker_indexer = SkillIndexer(config, load_cache=False)
+
+
+def _parse_skill_chunk(file_paths: List[str]) -> List[Optional[Dict[str, Any]]]:
+    """工作进程：按顺序解析一批技能文件（含检索文本）"""
+    return [_worker_indexer._parse_for_index(file_path) for file_path in file_paths]
+
 
 class SkillIndexer:
     """技能索引器，处理技能数据的读取和索引"""
 
-    def __init__(self, config: dict):
+    def __init__(self, config: dict, load_cache: bool = True):
         """
         初始化技能索引器
 
         Args:
             config: 索引配置字典
+                - parse_workers: 解析进程数（0/1 串行，"auto" 使用 CPU 核数）
+                - parse_chunk_size: 每个进程任务包含的文件数
+                - parse_pool_min_files: 待解析文件少于该值时不启动进程池
+            load_cache: 是否加载索引缓存（解析工作进程不需要）
         """
         self.config = config
         self.skills_directory = config.get("skills_directory", "../../ai_agent_for_skill/Assets/Skills")
         self.index_cache_path = config.get("index_cache", "../Data/skill_index.json")
         self.index_fields = config.get("index_fields", ["skillName", "skillDescription", "skillId", "actions"])
         self.index_action_details = config.get("index_action_details", True)
+        self.parse_workers = config.get("parse_workers", 0)
+        self.parse_chunk_size = max(1, int(config.get("parse_chunk_size", 16)))
+        self.parse_pool_min_files = config.get("parse_pool_min_files", 64)
+        self.last_parse_stats: Dict[str, Any] = {}
+        self._parse_workers_used = 1
 
         # 初始化 Odin JSON 解析器
         self.odin_parser = OdinJsonParser()
@@ -40,7 +66,7 @@ class SkillIndexer:
             logger.warning(f"Skills directory not found: {self.skills_directory}")
 
         # 加载缓存索引
-        self.cached_index = self._load_index_cache()
+        self.cached_index = self._load_index_cache() if load_cache else {"skills": {}, "last_updated": None}
 
     def _load_index_cache(self) -> Dict[str, Any]:
         """加载缓存的索引信息"""
@@ -193,7 +219,7 @@ class SkillIndexer:
             return skill_files
 
         try:
-            for file_name in os.listdir(self.skills_directory):
+            for file_name in sorted(os.listdir(self.skills_directory)):
                 if file_name.endswith('.json'):
                     file_path = os.path.join(self.skills_directory, file_name)
                     skill_files.append(file_path)
@@ -260,24 +286,26 @@ class SkillIndexer:
             解析后的技能数据，失败返回None
         """
         try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                json_str = f.read()
+            # 只读一次文件：同一份字节既用于哈希也用于解析
+            with open(file_path, 'rb') as f:
+                raw = f.read()
+                stat = os.fstat(f.fileno())
 
             # 修复Unity的非标准JSON格式
-            json_str = self._fix_unity_json(json_str)
+            json_str = self._fix_unity_json(raw.decode('utf-8'))
 
             # 解析JSON
             json_data = json.loads(json_str)
 
             skill_data = self._parse_odin_json(json_data)
 
-            # 添加文件信息
+            # 添加文件信息（大小与修改时间用于下次索引时跳过未变化的文件）
             skill_data['file_path'] = file_path
             skill_data['file_name'] = os.path.basename(file_path)
-            skill_data['file_hash'] = self._compute_file_hash(file_path)
-            skill_data['last_modified'] = datetime.fromtimestamp(
-                os.path.getmtime(file_path)
-            ).isoformat()
+            skill_data['file_hash'] = hashlib.md5(raw).hexdigest()
+            skill_data['file_size'] = stat.st_size
+            skill_data['file_mtime_ns'] = stat.st_mtime_ns
+            skill_data['last_modified'] = datetime.fromtimestamp(stat.st_mtime).isoformat()
 
             return skill_data
 
@@ -338,47 +366,174 @@ class SkillIndexer:
 
         return "\n".join(text_parts)
 
-    def index_all_skills(self, force_rebuild: bool = False) -> List[Dict[str, Any]]:
-        """
-        索引所有技能
+    def _parse_for_index(self, file_path: str) -> Optional[Dict[str, Any]]:
+        """解析技能文件并生成检索文本"""
+        skill_data = self.parse_skill_file(file_path)
+        if skill_data:
+            skill_data['search_text'] = self.build_search_text(skill_data)
+        return skill_data
 
-        Args:
-            force_rebuild: 是否强制重建索引（忽略缓存）
+    def _reuse_cached(self, file_path: str, cached_skill: Dict[str, Any], counters: Dict[str, int]) -> bool:
+        """
+        判断缓存条目是否仍然有效
 
-        Returns:
-            技能数据列表
+        先比较文件大小与修改时间，一致则不读取文件；
+        不一致时再比较内容哈希（文件被 touch 但内容未变的情况）。
         """
-        skill_files = self.scan_skills()
-        indexed_skills = []
+        try:
+            stat = os.stat(file_path)
+        except OSError:
+            return False
+        if (cached_skill.get('file_size') == stat.st_size
+                and cached_skill.get('file_mtime_ns') == stat.st_mtime_ns):
+            counters['unchanged'] += 1
+            return True
+
+        counters['hashed'] += 1
+        if cached_skill.get('file_hash') == self._compute_file_hash(file_path):
+            cached_skill['file_size'] = stat.st_size
+            cached_skill['file_mtime_ns'] = stat.st_mtime_ns
+            counters['hash_matched'] += 1
+            return True
+        return False
+
+    def _resolve_parse_workers(self) -> int:
+        if self.parse_workers == "auto":
+            return os.cpu_count() or 1
+        return int(self.parse_workers or 0)
+
+    def _iter_parsed(self, file_paths: List[str]) -> Iterator[Optional[Dict[str, Any]]]:
+        """
+        逐个产出解析结果，顺序与 file_paths 一致
 
-        for file_path in skill_files:
-            # 检查缓存
-            file_hash = self._compute_file_hash(file_path)
-            cached_skill = self.cached_index.get('skills', {}).get(file_path)
+        文件数达到 parse_pool_min_files 且配置了多个进程时，按 parse_chunk_size
+        分块交给进程池；同时在途的块数有上限（进程数 × 2），消费方处理慢时
+        不会把全部结果堆在内存里。进程池不可用时从失败的块开始改为串行解析。
+        """
+        workers = self._resolve_parse_workers()
+        self._parse_workers_used = 1
+        chunk_size = self.parse_chunk_size
+        chunks = [file_paths[i:i + chunk_size] for i in range(0, len(file_paths), chunk_size)]
+        next_chunk = 0
+
+        if workers > 1 and len(file_paths) >= self.parse_pool_min_files:
+            workers = min(workers, len(chunks))
+            try:
+                with ProcessPoolExecutor(
+                    max_workers=workers,
+                    initializer=_init_parse_worker,
+                    initargs=(self.config,)
+                ) as pool:
+                    self._parse_workers_used = workers
+                    pending: deque = deque()
+                    while next_chunk < len(chunks) or pending:
+                        while next_chunk < len(chunks) and len(pending) < workers * 2:
+                            pending.append(pool.submit(_parse_skill_chunk, chunks[next_chunk]))
+                            next_chunk += 1
+                        results = pending[0].result()
+                        pending.popleft()
+                        yield from results
+            except (OSError, BrokenProcessPool) as e:
+                logger.warning(f"Parallel skill parsing failed ({e}), falling back to serial parsing")
+                next_chunk -= len(pending)
+
+        for chunk in chunks[next_chunk:]:
+            for file_path in chunk:
+                yield self._parse_for_index(file_path)
+
+    def iter_skills(
+        self,
+        force_rebuild: bool = False,
+        skill_files: Optional[List[str]] = None
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        流式索引所有技能：按文件名顺序逐个产出技能数据
 
-            if not force_rebuild and cached_skill:
-                if cached_skill.get('file_hash') == file_hash:
-                    logger.debug(f"Using cached data for {file_path}")
-                    indexed_skills.append(cached_skill)
-                    continue
+        未变化的文件直接产出缓存条目，其余文件边解析边产出；
+        全部产出后更新索引缓存并记录 last_parse_stats。
 
-            # 解析技能文件
-            skill_data = self.parse_skill_file(file_path)
+        Args:
+            force_rebuild: 是否强制重建索引（忽略缓存）
+            skill_files: 预先扫描好的文件列表（None 则调用 scan_skills）
+        """
+        start_time = time.perf_counter()
+        if skill_files is None:
+            skill_files = self.scan_skills()
+        cached_skills = self.cached_index.get('skills', {})
+        counters = {'unchanged': 0, 'hashed': 0, 'hash_matched': 0}
+
+        # 1. 检查缓存：未变化的文件直接复用，其余文件待解析
+        reusable: List[Optional[Dict[str, Any]]] = []
+        to_parse: List[str] = []
+        for file_path in skill_files:
+            cached_skill = None if force_rebuild else cached_skills.get(file_path)
+            if cached_skill and self._reuse_cached(file_path, cached_skill, counters):
+                logger.debug(f"Using cached data for {file_path}")
+                reusable.append(cached_skill)
+            else:
+                reusable.append(None)
+                to_parse.append(file_path)
+
+        # 2. 解析（串行或进程池），与缓存条目按原顺序合并产出
+        new_skills: Dict[str, Dict[str, Any]] = {}
+        parse_seconds = 0.0
+        parsed_count = parsed_ok = parsed_bytes = 0
+        parsed_iter = self._iter_parsed(to_parse)
+        for cached_skill in reusable:
+            skill_data = cached_skill
+            if skill_data is None:
+                parse_start = time.perf_counter()
+                skill_data = next(parsed_iter)
+                parse_seconds += time.perf_counter() - parse_start
+                parsed_count += 1
+                if skill_data:
+                    parsed_ok += 1
+                    parsed_bytes += skill_data.get('file_size', 0)
             if skill_data:
-                # 构建搜索文本
-                skill_data['search_text'] = self.build_search_text(skill_data)
-                indexed_skills.append(skill_data)
-
-        # 更新缓存
-        new_cache = {
-            'skills': {skill['file_path']: skill for skill in indexed_skills},
-            'last_updated': datetime.now().isoformat()
+                new_skills[skill_data['file_path']] = skill_data
+                yield skill_data
+
+        # 更新缓存（全部命中且文件集合未变时无需重写）
+        if to_parse or counters['hash_matched'] or new_skills.keys() != cached_skills.keys():
+            new_cache = {
+                'skills': new_skills,
+                'last_updated': datetime.now().isoformat()
+            }
+            self._save_index_cache(new_cache)
+            self.cached_index = new_cache
+
+        self.last_parse_stats = {
+            'files': len(skill_files),
+            'parsed': parsed_ok,
+            'failed': parsed_count - parsed_ok,
+            'unchanged_by_stat': counters['unchanged'],
+            'hashed': counters['hashed'],
+            'unchanged_by_hash': counters['hash_matched'],
+            'workers': self._parse_workers_used,
+            'parse_seconds': round(parse_seconds, 3),
+            'total_seconds': round(time.perf_counter() - start_time, 3),
+            'files_per_s': round(parsed_count / parse_seconds, 1) if parse_seconds > 0 else 0.0,
+            'mb_per_s': round(parsed_bytes / 1048576 / parse_seconds, 2) if parse_seconds > 0 else 0.0
         }
-        self._save_index_cache(new_cache)
-        self.cached_index = new_cache
 
-        logger.info(f"Indexed {len(indexed_skills)} skills")
-        return indexed_skills
+        logger.info(
+            f"Indexed {len(new_skills)} skills ({parsed_ok} parsed, "
+            f"{counters['unchanged'] + counters['hash_matched']} cached); "
+            f"parse throughput {self.last_parse_stats['files_per_s']} files/s, "
+            f"{self.last_parse_stats['mb_per_s']} MB/s"
+        )
+
+    def index_all_skills(self, force_rebuild: bool = False) -> List[Dict[str, Any]]:
+        """
+        索引所有技能
+
+        Args:
+            force_rebuild: 是否强制重建索引（忽略缓存）
+
+        Returns:
+            技能数据列表（按文件名排序）
+        """
+        return list(self.iter_skills(force_rebuild=force_rebuild))
 
     def check_for_changes(self) -> List[str]:
         """
@@ -389,12 +544,11 @@ class SkillIndexer:
         """
         changed_files = []
         skill_files = self.scan_skills()
+        counters = {'unchanged': 0, 'hashed': 0, 'hash_matched': 0}
 
         for file_path in skill_files:
-            current_hash = self._compute_file_hash(file_path)
             cached_skill = self.cached_index.get('skills', {}).get(file_path)
-
-            if not cached_skill or cached_skill.get('file_hash') != current_hash:
+            if not cached_skill or not self._reuse_cached(file_path, cached_skill, counters):
                 changed_files.append(file_path)
 
         return changed_files
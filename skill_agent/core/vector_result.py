@@ -0,0 +1,237 @@
+"""Columnar vector-search results.
+
+``VectorQueryResult`` keeps the Arrow table LanceDB returns for each query
+vector instead of converting every row to Python objects. Fusion and reranking
+read ``ids(row)`` / ``distances(row)`` as NumPy arrays (distances are a
+zero-copy view of the ``_distance`` column); documents and metadata are only
+decoded for the positions a caller asks for, typically the final ``top_k``.
+
+The class is also a read-only ``Mapping`` with the Chroma-style keys
+(``ids``, ``documents``, ``metadatas``, ``distances``), so code that indexes
+``results["ids"][row][rank]`` keeps working; those nested lists are built on
+first access and cached.
+"""
+
+from __future__ import annotations
+
+import json
+from collections.abc import Mapping
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence
+
+import numpy as np
+import pyarrow as pa
+
+FIELDS = ("ids", "documents", "metadatas", "distances")
+
+_EMPTY_SCHEMA = pa.schema([
+    ("id", pa.string()),
+    ("document", pa.string()),
+    ("metadata", pa.string()),
+    ("_distance", pa.float32()),
+])
+
+
+def _decode_json_metadata(row: Dict[str, Any]) -> Dict[str, Any]:
+    """Default metadata decoder: the ``metadata`` column holds a JSON object."""
+    text = row.get("metadata")
+    if not text or text == "{}":
+        return {}
+    try:
+        return json.loads(text)
+    except (json.JSONDecodeError, TypeError):
+        return {}
+
+
+class VectorQueryResult(Mapping):
+    """Per-query Arrow tables (rows ordered by ascending distance)."""
+
+    def __init__(
+        self,
+        tables: Sequence[pa.Table],
+        decode_metadata: Optional[Callable[[Dict[str, Any]], Dict[str, Any]]] = None,
+    ):
+        """
+        Args:
+            tables: one table per query vector with at least ``id`` and
+                ``_distance``; ``document`` / ``metadata`` (and any typed
+                metadata columns) are decoded lazily.
+            decode_metadata: builds the metadata dict from a row of every
+                column except id / document / _distance.
+        """
+        self.tables: List[pa.Table] = list(tables)
+        self._decode_metadata = decode_metadata or _decode_json_metadata
+        self._nested: Dict[str, list] = {}
+
+    # ---------------------------------------------------------- construction
+
+    @classmethod
+    def empty(cls, num_queries: int = 1) -> "VectorQueryResult":
+        return cls([_EMPTY_SCHEMA.empty_table() for _ in range(max(1, num_queries))])
+
+    @classmethod
+    def from_dict(cls, results: Optional[Dict[str, Any]]) -> "VectorQueryResult":
+        """Wrap a Chroma-style nested-list result (stores without an Arrow path)."""
+        results = results or {}
+        ids = results.get("ids") or []
+        tables = []
+        for row, row_ids in enumerate(ids):
+            row_ids = list(row_ids or [])
+            columns = {
+                "id": pa.array([str(i) for i in row_ids], pa.string()),
+                "document": pa.array(cls._nested_row(results, "documents", row, len(row_ids)), pa.string()),
+                "metadata": pa.array(
+                    [json.dumps(m or {}, ensure_ascii=False, default=str)
+                     for m in cls._nested_row(results, "metadatas", row, len(row_ids))],
+                    pa.string(),
+                ),
+                "_distance": pa.array(
+                    [0.0 if d is None else float(d)
+                     for d in cls._nested_row(results, "distances", row, len(row_ids))],
+                    pa.float32(),
+                ),
+            }
+            tables.append(pa.table(columns))
+        return cls(tables) if tables else cls.empty(1)
+
+    @classmethod
+    def coerce(cls, results: Any) -> "VectorQueryResult":
+        """Return ``results`` as a VectorQueryResult, wrapping dict results."""
+        if isinstance(results, VectorQueryResult):
+            return results
+        return cls.from_dict(results)
+
+    @classmethod
+    def concat(cls, results: Sequence[Any]) -> "VectorQueryResult":
+        """Stack the query rows of several results (e.g. one per batched query)."""
+        parts = [cls.coerce(r) for r in results]
+        if not parts:
+            return cls.empty(1)
+        return cls([t for part in parts for t in part.tables], parts[0]._decode_metadata)
+
+    @staticmethod
+    def _nested_row(results: Dict[str, Any], field: str, row: int, length: int) -> list:
+        rows = results.get(field) or []
+        values = list(rows[row]) if row < len(rows) and rows[row] is not None else []
+        return (values + [None] * length)[:length]
+
+    # ---------------------------------------------------------- columnar access
+
+    @property
+    def num_queries(self) -> int:
+        return len(self.tables)
+
+    def num_rows(self, row: int = 0) -> int:
+        return self.tables[row].num_rows if row < len(self.tables) else 0
+
+    def ids(self, row: int = 0) -> np.ndarray:
+        """Document ids of query ``row`` (object array, best match first)."""
+        if row >= len(self.tables):
+            return np.empty(0, dtype=object)
+        return self.tables[row].column("id").to_numpy(zero_copy_only=False)
+
+    def distances(self, row: int = 0) -> np.ndarray:
+        """Distances of query ``row``; a view of the Arrow buffer when possible."""
+        if row >= len(self.tables):
+            return np.empty(0, dtype=np.float32)
+        column = self.tables[row].column("_distance")
+        if column.num_chunks == 1 and column.null_count == 0:
+            return column.chunk(0).to_numpy(zero_copy_only=False)
+        return column.to_numpy()
+
+    def scores(self, row: int = 0) -> np.ndarray:
+        """Similarity ``1 - distance`` as float64."""
+        return 1.0 - self.distances(row).astype(np.float64)
+
+    def documents(self, row: int = 0, positions: Optional[Sequence[int]] = None) -> List[str]:
+        table = self._rows(row, positions)
+        if table is None or "document" not in table.column_names:
+            return [""] * (table.num_rows if table is not None else 0)
+        return table.column("document").to_pylist()
+
+    def metadatas(self, row: int = 0, positions: Optional[Sequence[int]] = None) -> List[Dict[str, Any]]:
+        table = self._rows(row, positions)
+        if table is None:
+            return []
+        columns = [c for c in table.column_names if c not in ("id", "document", "_distance")]
+        if not columns:
+            return [{} for _ in range(table.num_rows)]
+        return [self._decode_metadata(r) for r in table.select(columns).to_pylist()]
+
+    def _rows(self, row: int, positions: Optional[Sequence[int]]) -> Optional[pa.Table]:
+        if row >= len(self.tables):
+            return None
+        table = self.tables[row]
+        if positions is None:
+            return table
+        return table.take(pa.array(np.asarray(positions, dtype=np.int64)))
+
+    # ---------------------------------------------------------- reshaping
+
+    def take(self, rows: Sequence[int], top_k: Optional[int] = None) -> "VectorQueryResult":
+        """Result of the given query rows, each cut to ``top_k`` (zero-copy slices)."""
+        tables = []
+        for row in rows:
+            table = self.tables[row] if row < len(self.tables) else _EMPTY_SCHEMA.empty_table()
+            tables.append(table.slice(0, top_k) if top_k is not None else table)
+        return VectorQueryResult(tables, self._decode_metadata)
+
+    def to_candidates(self, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Reranker candidates ``{doc_id, document, metadata, score}``.
+
+        Rows are walked in query order and ids already seen are skipped before
+        anything is decoded, so each document is materialized at most once and
+        only the first ``limit`` unique hits are built.
+        """
+        seen = set()
+        candidates: List[Dict[str, Any]] = []
+        for row in range(len(self.tables)):
+            if limit is not None and len(candidates) >= limit:
+                break
+            ids = self.ids(row)
+            positions = []
+            for position, doc_id in enumerate(ids):
+                if doc_id in seen:
+                    continue
+                seen.add(doc_id)
+                positions.append(position)
+                if limit is not None and len(candidates) + len(positions) >= limit:
+                    break
+            if not positions:
+                continue
+            scores = self.scores(row)[positions]
+            documents = self.documents(row, positions)
+            metadatas = self.metadatas(row, positions)
+            for position, document, metadata, score in zip(positions, documents, metadatas, scores):
+                candidates.append({
+                    "doc_id": ids[position],
+                    "document": document,
+                    "metadata": metadata,
+                    "score": float(score),
+                })
+        return candidates
+
+    # ---------------------------------------------------------- Mapping (compat)
+
+    def __getitem__(self, key: str) -> list:
+        if key not in FIELDS:
+            raise KeyError(key)
+        if key not in self._nested:
+            rows = range(len(self.tables))
+            if key == "ids":
+                self._nested[key] = [self.tables[r].column("id").to_pylist() for r in rows]
+            elif key == "distances":
+                self._nested[key] = [self.distances(r).astype(float).tolist() for r in rows]
+            elif key == "documents":
+                self._nested[key] = [self.documents(r) for r in rows]
+            else:
+                self._nested[key] = [self.metadatas(r) for r in rows]
+        return self._nested[key]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(FIELDS)
+
+    def __len__(self) -> int:
+        return len(FIELDS)
+
+    def __repr__(self) -> str:
+        return f"VectorQueryResult(queries={self.num_queries}, rows={[t.num_rows for t in self.tables]})"
@@ -5,13 +5,86 @@ No external services or Docker required - data is stored locally.
 """
 
 import os
+import json
 import logging
 from typing import List, Dict, Any, Optional
 from typing import Protocol
 
+from .vector_result import VectorQueryResult
+
 logger = logging.getLogger(__name__)
 
 
+def matches_where(metadata: Optional[Dict[str, Any]], where: Optional[Dict[str, Any]]) -> bool:
+    """Evaluate a Chroma-style ``where`` filter against one metadata dict.
+
+    Same operators as the SQL predicates LanceDBVectorStore compiles, for
+    indexes that filter in memory (e.g. BM25). List-valued fields may be lists
+    or JSON strings of lists.
+    """
+    metadata = metadata or {}
+    for key, condition in (where or {}).items():
+        if key == "$and":
+            if not all(matches_where(metadata, sub) for sub in condition):
+                return False
+            continue
+        if key == "$or":
+            if not any(matches_where(metadata, sub) for sub in condition):
+                return False
+            continue
+
+        value = metadata.get(key)
+        if isinstance(value, str) and value.startswith("["):
+            try:
+                value = json.loads(value)
+            except ValueError:
+                pass
+        operators = condition if isinstance(condition, dict) else {"$eq": condition}
+        for op, expected in operators.items():
+            if not _matches_operator(value, op, expected):
+                return False
+    return True
+
+
+def _matches_operator(value: Any, op: str, expected: Any) -> bool:
+    if isinstance(value, list):
+        if op in ("$eq", "$contains"):
+            return expected in value
+        if op == "$ne":
+            return expected not in value
+        if op == "$in":
+            return any(item in value for item in expected)
+        if op == "$nin":
+            return not any(item in value for item in expected)
+        if op == "$all":
+            return all(item in value for item in expected)
+        return False
+    if op == "$eq":
+        return value == expected
+    if op == "$ne":
+        return value != expected
+    if op == "$in":
+        return value in expected
+    if op == "$nin":
+        return value not in expected
+    if op == "$contains":
+        return isinstance(value, str) and str(expected) in value
+    if value is None:
+        return False
+    try:
+        if op == "$gt":
+            return value > expected
+        if op == "$gte":
+            return value >= expected
+        if op == "$lt":
+            return value < expected
+        if op == "$lte":
+            return value <= expected
+    except TypeError:
+        return False
+    return False
+
+
 class VectorStore(Protocol):
     """Vector store interface used by RAGEngine."""
 
@@ -39,7 +112,11 @@ class VectorStore(Protocol):
         top_k: int = 5,
         where: Optional[Dict[str, Any]] = None,
         where_document: Optional[Dict[str, Any]] = None,
-    ) -> Dict[str, Any]: ...
+        nprobes: Optional[int] = None,
+        refine_factor: Optional[int] = None,
+    ) -> VectorQueryResult: ...
+
+    def build_vector_index(self, retrain: bool = False) -> bool: ...
 
     def get_by_ids(self, ids: List[str]) -> Dict[str, Any]: ...
 
@@ -53,6 +130,8 @@ class VectorStore(Protocol):
 
     def get_statistics(self) -> Dict[str, Any]: ...
 
+    def get_version(self) -> Optional[int]: ...
+
 
 def create_vector_store(config: dict, embedding_dimension: int = 768) -> VectorStore:
     """Factory that creates a LanceDB vector store.
@@ -8,6 +8,21 @@ Features:
 - High performance (Rust core)
 - Supports cosine, L2, and dot product distance metrics
 - Automatic persistence to local directory
+- Optional Matryoshka two-stage search: a truncated, re-normalized copy of
+  each vector (``vector_short``) is scanned first, then only the candidates
+  are rescored with the full-dimension vector
+- Keyed writes: upserts go through ``merge_insert`` on ``id`` and a BTree
+  scalar index on ``id`` keeps lookups, updates and deletes proportional to
+  the number of ids touched rather than the table size
+- Automatic ANN index (IVF-PQ or IVF-HNSW) once a table reaches
+  ``ann_min_rows``; ``nprobes`` / ``refine_factor`` are tunable per query.
+  Smaller tables keep exact brute-force search
+- Optional typed metadata columns (``metadata_columns``): listed fields are
+  stored as real Arrow columns with scalar indexes, so Chroma-style ``where``
+  filters compile to typed predicates (numeric ranges, list membership) that
+  LanceDB pushes down; the remaining fields stay in a JSON string column
+- Batched queries: several query embeddings run as one multi-vector search
+  and come back as one result row per embedding
 """
 
 from __future__ import annotations
@@ -15,12 +30,29 @@ from __future__ import annotations
 import json
 import logging
 import os
+import re
+import time
 from typing import Any, Dict, List, Optional
 
+import numpy as np
 import pyarrow as pa
 
+from .vector_result import VectorQueryResult
+
 logger = logging.getLogger(__name__)
 
+# Supported ``metadata_columns`` types
+_METADATA_TYPES = {
+    "string": pa.string(),
+    "int": pa.int64(),
+    "float": pa.float64(),
+    "bool": pa.bool_(),
+    "list<string>": pa.list_(pa.string()),
+}
+_RESERVED_COLUMNS = {"id", "document", "vector", "vector_short", "metadata", "_distance"}
+_COLUMN_NAME = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*$")
+_COMPARISONS = {"$eq": "=", "$ne": "!=", "$gt": ">", "$gte": ">=", "$lt": "<", "$lte": "<="}
+
 
 class LanceDBVectorStore:
     """Vector store backed by LanceDB."""
@@ -34,6 +66,59 @@ class LanceDBVectorStore:
         # LanceDB storage path
         self.db_path = config.get("lancedb_path") or config.get("path") or "Data/lancedb"
         
+        # Matryoshka short vectors (None disables two-stage search)
+        short_dimension = config.get("short_dimension")
+        if short_dimension and int(short_dimension) >= embedding_dimension:
+            logger.warning(
+                f"short_dimension {short_dimension} >= embedding dimension {embedding_dimension}, "
+                "two-stage search disabled"
+            )
+            short_dimension = None
+        self.short_dimension: Optional[int] = int(short_dimension) if short_dimension else None
+        self.short_candidate_factor = config.get("short_candidate_factor", 4)
+        self.short_min_candidates = config.get("short_min_candidates", 50)
+
+        # Scalar index on ``id`` (built on the first non-empty write)
+        self.id_index_enabled = config.get("id_index", True)
+        self._has_id_index = False
+
+        # Typed metadata columns: field name -> one of _METADATA_TYPES. Each gets
+        # its own column and scalar index; other fields stay in the JSON column
+        self.metadata_columns: Dict[str, str] = {}
+        for name, kind in (config.get("metadata_columns") or {}).items():
+            kind = str(kind).lower()
+            if kind not in _METADATA_TYPES:
+                raise ValueError(f"Unsupported type {kind!r} for metadata column {name!r}")
+            if name in _RESERVED_COLUMNS or not _COLUMN_NAME.match(name):
+                raise ValueError(f"Invalid metadata column name {name!r}")
+            self.metadata_columns[name] = kind
+        self._scalar_indexes_pending = True
+
+        # ANN index on the searched vector column (None / "none" disables it)
+        ann_index_type = config.get("ann_index_type", "IVF_PQ")
+        self.ann_index_type: Optional[str] = (
+            str(ann_index_type).upper() if ann_index_type and str(ann_index_type).lower() != "none" else None
+        )
+        self.ann_min_rows = int(config.get("ann_min_rows", 10000))
+        self.ann_num_partitions = config.get("ann_num_partitions")  # None: chosen from the row count
+        self.ann_num_sub_vectors = config.get("ann_num_sub_vectors")  # None: chosen from the dimension
+        self.ann_hnsw_m = int(config.get("ann_hnsw_m", 20))
+        self.ann_hnsw_ef_construction = int(config.get("ann_hnsw_ef_construction", 300))
+        self.nprobes = int(config.get("nprobes", 20))
+        self.refine_factor: Optional[int] = config.get("refine_factor", 10) or None
+        self._has_ann_index = False
+
+        # Rows written after the indexes were built are folded into them once
+        # ``index_refresh_rows`` accumulate (until then they are scanned)
+        self.index_refresh_rows = int(config.get("index_refresh_rows", 1024))
+        self._unindexed_rows = 0
+
+        # Row count seen by the last index check plus rows written since; the
+        # indexes are only re-inspected once it reaches ``_next_index_check``
+        # (None: every index the table can have already exists)
+        self._estimated_rows = 0
+        self._next_index_check: Optional[int] = None
+
         # Ensure directory exists
         os.makedirs(self.db_path, exist_ok=True)
         
@@ -82,19 +167,310 @@ class LanceDBVectorStore:
         table_name = self._table_name()
         
         if table_name not in db.table_names():
-            # Create empty table with schema
-            schema = pa.schema([
-                pa.field("id", pa.string()),
-                pa.field("document", pa.string()),
-                pa.field("vector", pa.list_(pa.float32(), self.embedding_dimension)),
-                pa.field("metadata", pa.string()),  # JSON string
-            ])
             # Create with empty data matching schema
-            self._table = db.create_table(table_name, schema=schema)
+            self._table = db.create_table(table_name, schema=self._schema())
             logger.info(f"Created LanceDB table: {table_name}")
         else:
             self._table = db.open_table(table_name)
             logger.info(f"Opened existing LanceDB table: {table_name}")
+            if (self.short_dimension and not self._has_short_column(self._table)) or (
+                self.metadata_columns and not self._has_metadata_columns(self._table)
+            ):
+                self._migrate_table()
+        self._ensure_indexes()
+
+    def _ann_column(self) -> str:
+        """Vector column the ANN index covers: the column the first search stage scans."""
+        return "vector_short" if self.short_dimension else "vector"
+
+    def _scalar_index_types(self) -> Dict[str, str]:
+        """Column -> scalar index type for every column that should be indexed."""
+        index_types = {"id": "BTREE"} if self.id_index_enabled else {}
+        for name, kind in self.metadata_columns.items():
+            index_types[name] = "LABEL_LIST" if kind == "list<string>" else "BTREE"
+        return index_types
+
+    def _ensure_indexes(self) -> bool:
+        """Pick up existing indexes and build the ones the table has grown into.
+
+        Also decides at which row count indexes need to be checked again.
+
+        Returns:
+            Whether any index was built.
+        """
+        self._has_id_index = False
+        self._has_ann_index = False
+        self._scalar_indexes_pending = True
+        self._next_index_check = None
+        if self._table is None:
+            return False
+        try:
+            indexed = {tuple(index.columns) for index in self._table.list_indices()}
+            missing = [(c, t) for c, t in self._scalar_index_types().items() if (c,) not in indexed]
+            self._has_ann_index = (self._ann_column(),) in indexed
+            if not missing and (self._has_ann_index or not self.ann_index_type):
+                self._has_id_index = ("id",) in indexed
+                self._scalar_indexes_pending = False
+                return False
+            rows = self._table.count_rows()
+        except Exception as e:
+            logger.warning(f"Could not inspect indexes on {self._table_name()}: {e}")
+            self._next_index_check = self._estimated_rows + self.index_refresh_rows
+            return False
+
+        built = False
+        if rows > 0:
+            for column, index_type in missing:
+                try:
+                    self._table.create_scalar_index(column, index_type=index_type)
+                    indexed.add((column,))
+                    built = True
+                    logger.info(f"Created {index_type} index on {self._table_name()}.{column}")
+                except Exception as e:
+                    logger.warning(f"Could not create {index_type} index on {self._table_name()}.{column}: {e}")
+        self._has_id_index = ("id",) in indexed
+        self._scalar_indexes_pending = any((c,) not in indexed for c in self._scalar_index_types())
+        if not self._has_ann_index and self.ann_index_type and rows >= self.ann_min_rows:
+            built = self.build_vector_index() or built
+
+        # Next check: first row of an empty table, a retry after a failed
+        # scalar index, or the ANN threshold
+        self._estimated_rows = rows
+        thresholds = []
+        if self._scalar_indexes_pending:
+            thresholds.append(rows + self.index_refresh_rows if rows > 0 else 1)
+        if self.ann_index_type and not self._has_ann_index:
+            thresholds.append(max(self.ann_min_rows, rows + 1))
+        self._next_index_check = min(thresholds) if thresholds else None
+        if built:
+            self._unindexed_rows = 0
+        return built
+
+    def build_vector_index(self, retrain: bool = False) -> bool:
+        """Create the ANN index, or retrain it from scratch when ``retrain`` is set.
+
+        Without ``retrain`` an existing index is left alone: new rows are folded
+        into its existing partitions by the periodic refresh, which does not
+        move centroids. Retraining after many changes keeps partitions balanced.
+
+        Returns:
+            Whether an index was (re)built.
+        """
+        table = self._get_table()
+        if table is None or not self.ann_index_type:
+            return False
+        if self._has_ann_index and not retrain:
+            return False
+        rows = table.count_rows()
+        if rows < self.ann_min_rows:
+            return False
+
+        kwargs: Dict[str, Any] = {
+            "metric": self._get_metric_type().lower(),
+            "vector_column_name": self._ann_column(),
+            "index_type": self.ann_index_type,
+            "replace": True,
+        }
+        if self.ann_num_partitions:
+            kwargs["num_partitions"] = int(self.ann_num_partitions)
+        if "HNSW" in self.ann_index_type:
+            kwargs["m"] = self.ann_hnsw_m
+            kwargs["ef_construction"] = self.ann_hnsw_ef_construction
+        if "PQ" in self.ann_index_type and self.ann_num_sub_vectors:
+            kwargs["num_sub_vectors"] = int(self.ann_num_sub_vectors)
+        try:
+            start = time.perf_counter()
+            table.create_index(**kwargs)
+            self._has_ann_index = True
+            logger.info(
+                f"Built {self.ann_index_type} index on {self._table_name()}.{self._ann_column()} "
+                f"({rows} rows, {time.perf_counter() - start:.1f}s)"
+            )
+            return True
+        except Exception as e:
+            logger.warning(f"Could not build {self.ann_index_type} index on {self._table_name()}: {e}")
+            return False
+
+    def _after_write(self, written_rows: int) -> None:
+        """Keep indexes in step with writes.
+
+        Builds indexes the table has just grown into, and once
+        ``index_refresh_rows`` new rows have accumulated folds them into the
+        existing indexes (unindexed rows are still found by scanning, so this
+        only bounds that tail). Runs inside the write, so the table version
+        reported afterwards already includes it.
+        """
+        if self._table is None:
+            return
+        self._estimated_rows += written_rows
+        if self._next_index_check is not None and self._estimated_rows >= self._next_index_check:
+            if self._ensure_indexes():
+                return  # freshly built indexes already cover every row
+        if not (self._scalar_index_types() or self._has_ann_index):
+            return
+        self._unindexed_rows += written_rows
+        if self._unindexed_rows < self.index_refresh_rows:
+            return
+        try:
+            self._table.optimize()
+            self._unindexed_rows = 0
+        except Exception as e:
+            logger.warning(f"Could not refresh indexes on {self._table_name()}: {e}")
+
+    @staticmethod
+    def _id_filter(ids: List[str]) -> str:
+        """SQL predicate matching the given ids (quotes escaped)."""
+        quoted = ", ".join("'" + str(doc_id).replace("'", "''") + "'" for doc_id in ids)
+        return f"id IN ({quoted})"
+
+    def _upsert_rows(self, rows: List[Dict[str, Any]]) -> None:
+        """Insert or replace rows keyed on ``id`` in a single write."""
+        table = self._get_table()
+        if table is None:
+            self._table = self._connect().create_table(self._table_name(), rows)
+            self._ensure_indexes()
+            return
+        (
+            table.merge_insert("id")
+            .when_matched_update_all()
+            .when_not_matched_insert_all()
+            .execute(rows)
+        )
+        self._after_write(len(rows))
+
+    def _schema(self) -> pa.Schema:
+        """Arrow schema for the table."""
+        fields = [
+            pa.field("id", pa.string()),
+            pa.field("document", pa.string()),
+            pa.field("vector", pa.list_(pa.float32(), self.embedding_dimension)),
+            pa.field("metadata", pa.string()),  # JSON string (fields without a typed column)
+        ]
+        fields.extend(pa.field(name, _METADATA_TYPES[kind]) for name, kind in self.metadata_columns.items())
+        if self.short_dimension:
+            fields.append(pa.field("vector_short", pa.list_(pa.float32(), self.short_dimension)))
+        return pa.schema(fields)
+
+    def _has_short_column(self, table) -> bool:
+        existing = table.schema.field("vector_short") if "vector_short" in table.schema.names else None
+        return existing is not None and existing.type.list_size == self.short_dimension
+
+    def _truncate_vector(self, embedding) -> np.ndarray:
+        """Matryoshka truncation: keep the leading dimensions and re-normalize."""
+        short = np.asarray(embedding, dtype=np.float32)[: self.short_dimension]
+        norm = float(np.linalg.norm(short))
+        return short / norm if norm > 0 else short
+
+    def _has_metadata_columns(self, table) -> bool:
+        names = table.schema.names
+        return all(
+            name in names and table.schema.field(name).type == _METADATA_TYPES[kind]
+            for name, kind in self.metadata_columns.items()
+        )
+
+    def _migrate_table(self) -> None:
+        """Rewrite an existing table into the current schema in a single overwrite.
+
+        Moves the typed metadata fields out of the JSON column and/or adds the
+        short vectors, whichever the table is missing, so that the data matches
+        ``_schema()`` before it is cast.
+        """
+        data = self._table.to_arrow()
+        schema = self._schema()
+        steps = []
+
+        if self.metadata_columns and not self._has_metadata_columns(self._table):
+            source = [c for c in ("metadata", *self.metadata_columns) if c in data.column_names]
+            split = [self._split_metadata(self._row_metadata(row)) for row in data.select(source).to_pylist()]
+            for name in ("metadata", *self.metadata_columns):
+                column = pa.array([values[name] for values in split], type=schema.field(name).type)
+                if name in data.column_names:
+                    data = data.set_column(data.schema.get_field_index(name), name, column)
+                else:
+                    data = data.append_column(name, column)
+            steps.append(f"metadata fields {sorted(self.metadata_columns)} moved into typed columns")
+
+        if self.short_dimension and not self._has_short_column(self._table):
+            if "vector_short" in data.column_names:
+                data = data.drop_columns(["vector_short"])
+            vectors = data.column("vector").combine_chunks().flatten().to_numpy(zero_copy_only=False)
+            vectors = vectors.reshape(-1, self.embedding_dimension)[:, : self.short_dimension]
+            norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+            short = (vectors / np.where(norms > 0, norms, 1.0)).astype(np.float32).ravel()
+            data = data.append_column(
+                pa.field("vector_short", pa.list_(pa.float32(), self.short_dimension)),
+                pa.FixedSizeListArray.from_arrays(pa.array(short, type=pa.float32()), self.short_dimension),
+            )
+            steps.append(f"short vectors (dim={self.short_dimension}) backfilled")
+
+        self._table = self._connect().create_table(
+            self._table_name(), data.select(schema.names).cast(schema), mode="overwrite"
+        )
+        logger.info(f"Migrated {data.num_rows} rows in {self._table_name()}: {'; '.join(steps)}")
+
+    def _make_row(self, doc_id: str, document: str, embedding, metadata: Dict[str, Any]) -> Dict[str, Any]:
+        row = {
+            "id": doc_id,
+            "document": document,
+            "vector": embedding,
+        }
+        row.update(self._split_metadata(metadata))
+        if self.short_dimension:
+            row["vector_short"] = self._truncate_vector(embedding)
+        return row
+
+    def _split_metadata(self, metadata: Dict[str, Any]) -> Dict[str, Any]:
+        """Metadata dict -> typed column values plus the JSON string of the other fields."""
+        metadata = metadata or {}
+        values: Dict[str, Any] = {
+            name: self._column_value(kind, metadata.get(name)) for name, kind in self.metadata_columns.items()
+        }
+        values["metadata"] = self._clean_metadata(
+            {k: v for k, v in metadata.items() if k not in self.metadata_columns}
+        )
+        return values
+
+    @staticmethod
+    def _column_value(kind: str, value: Any) -> Any:
+        """Coerce a metadata value to its column type (None when it does not fit)."""
+        if value is None:
+            return None
+        try:
+            if kind == "list<string>":
+                if isinstance(value, str):
+                    value = json.loads(value) if value.strip().startswith("[") else [value]
+                return [str(item) for item in value]
+            if kind == "int":
+                return int(value)
+            if kind == "float":
+                return float(value)
+            if kind == "bool":
+                return value if isinstance(value, bool) else str(value).lower() in ("1", "true", "yes")
+            return str(value)
+        except (TypeError, ValueError):
+            logger.warning(f"Metadata value {value!r} does not fit a {kind} column, stored as null")
+            return None
+
+    def _row_metadata(self, row: Dict[str, Any]) -> Dict[str, Any]:
+        """Rebuild the metadata dict of a result row.
+
+        List columns come back as JSON strings, matching how non-scalar metadata
+        has always been returned (see ``_clean_metadata``).
+        """
+        metadata = self._parse_metadata(row.get("metadata", "{}"))
+        for name, kind in self.metadata_columns.items():
+            value = row.get(name)
+            if value is None:
+                continue
+            metadata[name] = json.dumps(list(value), ensure_ascii=False) if kind == "list<string>" else value
+        return metadata
+
+    def _result_columns(self, with_vector: bool = False) -> List[str]:
+        """Columns a result row needs (vectors only when asked for)."""
+        columns = ["id", "document", "metadata", *self.metadata_columns]
+        if with_vector:
+            columns.append("vector")
+        return columns
 
     def _clean_metadata(self, metadata: Dict[str, Any]) -> str:
         """Convert metadata dict to JSON string."""
@@ -108,7 +484,7 @@ class LanceDBVectorStore:
 
     def _parse_metadata(self, metadata_str: str) -> Dict[str, Any]:
         """Parse metadata JSON string back to dict."""
-        if not metadata_str:
+        if not metadata_str or metadata_str == "{}":
             return {}
         try:
             return json.loads(metadata_str)
@@ -122,39 +498,16 @@ class LanceDBVectorStore:
         metadatas: List[Dict[str, Any]],
         ids: List[str],
     ) -> bool:
-        """Add or update documents in the store."""
+        """Add or update documents in the store (one merge-insert keyed on ``id``)."""
         try:
-            table = self._get_table()
-            
-            # Prepare data
-            data = []
+            # Prepare data; a repeated id within the batch keeps its last row
+            rows: Dict[str, Dict[str, Any]] = {}
             for doc_id, doc, emb, meta in zip(ids, documents, embeddings, metadatas):
-                data.append({
-                    "id": doc_id,
-                    "document": doc,
-                    "vector": emb,
-                    "metadata": self._clean_metadata(meta),
-                })
-            
-            if table is None:
-                # Create table with initial data
-                db = self._connect()
-                self._table = db.create_table(self._table_name(), data)
-            else:
-                # Delete existing docs with same IDs first (upsert behavior)
-                existing_ids = set(self.get_all_ids())
-                ids_to_delete = [doc_id for doc_id in ids if doc_id in existing_ids]
-                if ids_to_delete:
-                    self.delete_documents(ids_to_delete)
-                
-                # Add new data
-                table = self._get_table()
-                if table is not None:
-                    table.add(data)
-                else:
-                    db = self._connect()
-                    self._table = db.create_table(self._table_name(), data)
-            
+                rows[doc_id] = self._make_row(doc_id, doc, emb, meta)
+            if not rows:
+                return True
+
+            self._upsert_rows(list(rows.values()))
             logger.info(f"Upserted {len(documents)} documents into {self.collection_name}")
             return True
         except Exception as e:
@@ -175,26 +528,21 @@ class LanceDBVectorStore:
                 return False
             
             # Get existing document
-            existing = table.search().where(f"id = '{document_id}'").limit(1).to_list()
+            existing = table.search().where(self._id_filter([document_id])).limit(1).to_list()
             if not existing:
                 return False
             
             existing_doc = existing[0]
             
             # Prepare updated data
-            updated = {
-                "id": document_id,
-                "document": document if document is not None else existing_doc.get("document", ""),
-                "vector": embedding if embedding is not None else existing_doc.get("vector", []),
-                "metadata": self._clean_metadata(metadata) if metadata is not None else existing_doc.get("metadata", "{}"),
-            }
-            
-            # Delete and re-add (LanceDB doesn't have native update)
-            self.delete_documents([document_id])
-            table = self._get_table()
-            if table is not None:
-                table.add([updated])
+            updated = self._make_row(
+                document_id,
+                document if document is not None else existing_doc.get("document", ""),
+                embedding if embedding is not None else existing_doc.get("vector", []),
+                metadata if metadata is not None else self._row_metadata(existing_doc),
+            )
             
+            self._upsert_rows([updated])
             return True
         except Exception as e:
             logger.error(f"Error updating document in LanceDB: {e}")
@@ -204,17 +552,10 @@ class LanceDBVectorStore:
         """Delete documents by IDs."""
         try:
             table = self._get_table()
-            if table is None:
+            if table is None or not ids:
                 return True
-            
-            # Build filter for deletion
-            if len(ids) == 1:
-                filter_expr = f"id = '{ids[0]}'"
-            else:
-                ids_str = ", ".join(f"'{id}'" for id in ids)
-                filter_expr = f"id IN ({ids_str})"
-            
-            table.delete(filter_expr)
+
+            table.delete(self._id_filter(ids))
             return True
         except Exception as e:
             logger.error(f"Error deleting documents in LanceDB: {e}")
@@ -236,66 +577,269 @@ class LanceDBVectorStore:
         top_k: int = 5,
         where: Optional[Dict[str, Any]] = None,
         where_document: Optional[Dict[str, Any]] = None,
-    ) -> Dict[str, Any]:
-        """Query for similar documents."""
+        nprobes: Optional[int] = None,
+        refine_factor: Optional[int] = None,
+    ) -> VectorQueryResult:
+        """Query for similar documents.
+
+        Every embedding in ``query_embeddings`` gets its own result row, so the
+        returned lists are indexed ``[query][rank]`` as in Chroma. All
+        embeddings are answered by one multi-vector LanceDB search.
+
+        The result keeps LanceDB's Arrow tables (see ``VectorQueryResult``):
+        ids and distances are read as arrays, documents and metadata are
+        decoded only when accessed.
+
+        ``nprobes`` / ``refine_factor`` override the configured ANN search
+        parameters for this call; they are ignored while the table has no ANN
+        index (exact search).
+        """
         table = self._get_table()
-        embedding = query_embeddings[0] if query_embeddings else None
+        embeddings = list(query_embeddings or [])
         
-        if embedding is None or table is None:
-            return {"ids": [[]], "documents": [[]], "metadatas": [[]], "distances": [[]]}
+        if not embeddings or table is None:
+            return VectorQueryResult.empty(len(embeddings))
         
         try:
-            # Build search query
-            search = table.search(embedding, vector_column_name="vector")
-            search = search.metric(self._get_metric_type())
-            search = search.limit(top_k)
-            
-            # Apply metadata filter if provided
-            filter_parts = []
-            if where:
-                for k, v in where.items():
-                    # LanceDB filter on JSON field requires parsing
-                    filter_parts.append(f"json_extract(metadata, '$.{k}') = '{v}'")
-            
-            if where_document and "$contains" in where_document:
-                search_term = where_document["$contains"]
-                filter_parts.append(f"document LIKE '%{search_term}%'")
-            
-            if filter_parts:
-                filter_expr = " AND ".join(filter_parts)
-                search = search.where(filter_expr)
-            
-            results = search.to_list()
-            
-            ids = [r["id"] for r in results]
-            docs = [r["document"] for r in results]
-            metas = [self._parse_metadata(r.get("metadata", "{}")) for r in results]
-            dists = [float(r.get("_distance", 0.0)) for r in results]
-            
-            return {"ids": [ids], "documents": [docs], "metadatas": [metas], "distances": [dists]}
+            filter_expr = self._build_filter(where, where_document)
+            tables = self._search_many(table, embeddings, top_k, filter_expr, nprobes, refine_factor)
+            return VectorQueryResult(tables, self._row_metadata)
         except Exception as e:
             logger.error(f"Error querying LanceDB: {e}")
-            return {"ids": [[]], "documents": [[]], "metadatas": [[]], "distances": [[]]}
+            return VectorQueryResult.empty(len(embeddings))
+
+    def _search_many(
+        self,
+        table,
+        embeddings: List[Any],
+        top_k: int,
+        filter_expr: Optional[str],
+        nprobes: Optional[int] = None,
+        refine_factor: Optional[int] = None,
+    ) -> List[pa.Table]:
+        """Nearest-neighbour search for every embedding, one result table each.
+
+        Several embeddings are sent as a single multi-vector search, so the
+        vector column (or the probed IVF partitions) is scanned once for the
+        whole batch. If the installed LanceDB cannot run it, each embedding is
+        searched on its own.
+        """
+        queries = [np.asarray(e, dtype=np.float32) for e in embeddings]
+        if self.short_dimension:
+            # Two-stage: wide candidates on the short vectors, rescored in _rescore
+            search_queries = [self._truncate_vector(q) for q in queries]
+            options = dict(
+                column="vector_short",
+                limit=max(top_k * self.short_candidate_factor, self.short_min_candidates),
+                filter_expr=filter_expr, nprobes=nprobes, refine_factor=0, with_vector=True,
+            )
+        else:
+            search_queries = queries
+            options = dict(
+                column="vector", limit=top_k, filter_expr=filter_expr,
+                nprobes=nprobes, refine_factor=refine_factor, with_vector=False,
+            )
+
+        candidates = None
+        if len(queries) > 1:
+            try:
+                candidates = self._split_by_query(self._knn(table, search_queries, **options), len(queries))
+            except Exception as e:
+                logger.debug(f"Multi-vector search unavailable, searching per vector: {e}")
+        if candidates is None:
+            candidates = [self._knn(table, q, **options) for q in search_queries]
+
+        if self.short_dimension:
+            return [self._rescore(c, q, top_k) for c, q in zip(candidates, queries)]
+        return candidates
+
+    def _knn(
+        self,
+        table,
+        query,
+        column: str,
+        limit: int,
+        filter_expr: Optional[str],
+        nprobes: Optional[int],
+        refine_factor: Optional[int],
+        with_vector: bool,
+    ) -> pa.Table:
+        """Run one LanceDB vector search (``query`` may be a list of vectors)."""
+        search = table.search(query, vector_column_name=column)
+        search = search.metric(self._get_metric_type())
+        search = self._apply_ann_params(search, nprobes, refine_factor)
+        search = search.select([*self._result_columns(with_vector=with_vector), "_distance"]).limit(limit)
+        if filter_expr:
+            search = search.where(filter_expr)
+        return search.to_arrow()
+
+    @staticmethod
+    def _split_by_query(results: pa.Table, num_queries: int) -> List[pa.Table]:
+        """Split a multi-vector search result on ``query_index`` (zero-copy slices)."""
+        if "query_index" not in results.column_names:
+            raise ValueError("result has no query_index column")
+        query_index = results.column("query_index").to_numpy()
+        results = results.drop_columns(["query_index"])
+        if np.any(query_index[1:] < query_index[:-1]):
+            order = np.argsort(query_index, kind="stable")
+            results = results.take(pa.array(order))
+            query_index = query_index[order]
+        bounds = np.searchsorted(query_index, np.arange(num_queries + 1))
+        return [results.slice(bounds[i], bounds[i + 1] - bounds[i]) for i in range(num_queries)]
+
+    def _apply_ann_params(self, search, nprobes: Optional[int], refine_factor: Optional[int]):
+        """Set IVF probe count and re-ranking depth when an ANN index serves the search."""
+        if not self._has_ann_index:
+            return search
+        search = search.nprobes(int(nprobes or self.nprobes))
+        refine = self.refine_factor if refine_factor is None else refine_factor
+        if refine:
+            search = search.refine_factor(int(refine))
+        return search
+
+    def _build_filter(
+        self,
+        where: Optional[Dict[str, Any]],
+        where_document: Optional[Dict[str, Any]],
+    ) -> Optional[str]:
+        """Translate Chroma-style filters into a LanceDB SQL predicate.
+
+        ``where`` maps a field to a value (equality) or to operators:
+        ``$eq $ne $gt $gte $lt $lte $in $nin`` on scalar columns, ``$contains``
+        (or plain equality) / ``$in`` (any of) / ``$all`` / ``$ne`` / ``$nin`` on
+        ``list<string>`` columns; ``$and`` / ``$or`` take lists of sub-filters.
+        Fields without a typed column support equality and ``$in`` only.
+        """
+        filter_parts = self._compile_where(where) if where else []
+
+        if where_document and "$contains" in where_document:
+            term = self._like_escape(str(where_document["$contains"]))
+            filter_parts.append(f"document LIKE '%{term}%' ESCAPE '\\'")
+
+        return " AND ".join(filter_parts) if filter_parts else None
+
+    def _compile_where(self, where: Dict[str, Any]) -> List[str]:
+        """``where`` dict -> list of SQL predicates (joined with AND by the caller)."""
+        parts = []
+        for key, condition in where.items():
+            if key in ("$and", "$or"):
+                clauses = [" AND ".join(self._compile_where(sub)) or "TRUE" for sub in condition]
+                if clauses:
+                    parts.append("(" + f" {key[1:].upper()} ".join(f"({c})" for c in clauses) + ")")
+                continue
+            operators = condition if isinstance(condition, dict) else {"$eq": condition}
+            for op, value in operators.items():
+                parts.append(self._compile_condition(key, op, value))
+        return parts
+
+    def _compile_condition(self, key: str, op: str, value: Any) -> str:
+        kind = self.metadata_columns.get(key)
+        if kind is None:
+            return self._json_condition(key, op, value)
+        negated = op in ("$ne", "$nin")
+        if value is None and op in ("$eq", "$ne"):
+            return f"{key} IS {'NOT ' if negated else ''}NULL"
+
+        if kind == "list<string>":
+            if op in ("$eq", "$contains", "$ne"):
+                predicate = f"array_has({key}, {self._sql_literal('string', value)})"
+            elif op in ("$in", "$nin", "$all"):
+                function = "array_has_all" if op == "$all" else "array_has_any"
+                items = ", ".join(self._sql_literal("string", v) for v in value)
+                predicate = f"{function}({key}, [{items}])"
+            else:
+                raise ValueError(f"Operator {op} is not supported on list column {key!r}")
+        elif op in ("$in", "$nin"):
+            items = ", ".join(self._sql_literal(kind, v) for v in value)
+            predicate = f"{key} IN ({items})" if items else "FALSE"
+        elif op == "$contains" and kind == "string":
+            predicate = f"{key} LIKE '%{self._like_escape(str(value))}%' ESCAPE '\\'"
+        elif op in _COMPARISONS:
+            operator = "=" if op == "$ne" else _COMPARISONS[op]
+            predicate = f"{key} {operator} {self._sql_literal(kind, value)}"
+        else:
+            raise ValueError(f"Operator {op} is not supported on {kind} column {key!r}")
+
+        # Rows without a value count as "not equal"
+        return f"({key} IS NULL OR NOT {predicate})" if negated else predicate
+
+    def _json_condition(self, key: str, op: str, value: Any) -> str:
+        """Equality on a field kept in the JSON column.
+
+        The store writes that column itself (``_clean_metadata``), so a field is
+        matched on its serialized ``"key": value`` form followed by a separator.
+        """
+        if op == "$in":
+            return "(" + " OR ".join(self._json_condition(key, "$eq", v) for v in value) + ")" if value else "FALSE"
+        if op != "$eq":
+            raise ValueError(f"Operator {op} on {key!r} needs a typed metadata column (metadata_columns)")
+        if not isinstance(value, (str, int, float, bool)) and value is not None:
+            value = json.dumps(value, ensure_ascii=False)
+        token = self._like_escape(json.dumps({key: value}, ensure_ascii=False)[1:-1])
+        return (
+            f"(metadata LIKE '%{token},%' ESCAPE '\\' OR metadata LIKE '%{token}}}' ESCAPE '\\')"
+        )
+
+    def _sql_literal(self, kind: str, value: Any) -> str:
+        value = self._column_value("string" if kind == "list<string>" else kind, value)
+        if value is None:
+            return "NULL"
+        if isinstance(value, bool):
+            return "TRUE" if value else "FALSE"
+        if isinstance(value, (int, float)):
+            return repr(value)
+        return "'" + str(value).replace("'", "''") + "'"
+
+    @staticmethod
+    def _like_escape(text: str) -> str:
+        """Escape LIKE wildcards (with ``\\`` as the escape character) and quotes."""
+        text = text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+        return text.replace("'", "''")
+
+    def _rescore(self, candidates: pa.Table, query: np.ndarray, top_k: int) -> pa.Table:
+        """Rescore short-vector candidates with the full vectors and keep the best ``top_k``.
+
+        The full-vector rescoring already plays the role of ``refine_factor``,
+        so an ANN index on the short vectors only takes ``nprobes``.
+        """
+        if candidates.num_rows == 0:
+            return candidates.drop_columns(["vector"])
+
+        vector_column = candidates.column("vector").combine_chunks()
+        vectors = vector_column.flatten().to_numpy().reshape(candidates.num_rows, -1)
+        distances = self._full_distances(vectors.astype(np.float32, copy=False), query)
+        order = np.argsort(distances, kind="stable")[:top_k]
+        results = candidates.drop_columns(["vector"]).take(pa.array(order))
+        position = results.schema.get_field_index("_distance")
+        return results.set_column(
+            position, "_distance", pa.array(distances[order].astype(np.float32))
+        )
+
+    def _full_distances(self, vectors: np.ndarray, query: np.ndarray) -> np.ndarray:
+        """Distances with the same semantics as LanceDB's metric on the full vectors."""
+        metric = self._get_metric_type()
+        if metric == "L2":
+            diff = vectors - query
+            return np.einsum("ij,ij->i", diff, diff)
+        if metric == "dot":
+            return 1.0 - vectors @ query
+        norms = np.linalg.norm(vectors, axis=1) * (np.linalg.norm(query) or 1.0)
+        return 1.0 - (vectors @ query) / np.where(norms > 0, norms, 1.0)
 
     def get_by_ids(self, ids: List[str]) -> Dict[str, Any]:
         """Get documents by their IDs."""
         table = self._get_table()
-        if table is None:
+        if table is None or not ids:
             return {"ids": [], "documents": [], "metadatas": [], "embeddings": []}
         
         try:
-            if len(ids) == 1:
-                filter_expr = f"id = '{ids[0]}'"
-            else:
-                ids_str = ", ".join(f"'{id}'" for id in ids)
-                filter_expr = f"id IN ({ids_str})"
-            
-            results = table.search().where(filter_expr).limit(len(ids)).to_list()
+            search = table.search().where(self._id_filter(ids))
+            results = search.select(self._result_columns(with_vector=True)).limit(len(ids)).to_list()
             
             return {
                 "ids": [r["id"] for r in results],
                 "documents": [r["document"] for r in results],
-                "metadatas": [self._parse_metadata(r.get("metadata", "{}")) for r in results],
+                "metadatas": [self._row_metadata(r) for r in results],
                 "embeddings": [r["vector"] for r in results],
             }
         except Exception as e:
@@ -312,6 +856,20 @@ class LanceDBVectorStore:
         except Exception:
             return 0
 
+    def get_version(self) -> Optional[int]:
+        """Return the current table version (bumped by every write).
+
+        Side indexes persisted next to the table (e.g. BM25) record this
+        number and are discarded on load when it no longer matches.
+        """
+        table = self._get_table()
+        if table is None:
+            return None
+        try:
+            return int(table.version)
+        except Exception:
+            return None
+
     def clear(self) -> bool:
         """Clear all documents from the table."""
         try:
@@ -327,13 +885,13 @@ class LanceDBVectorStore:
             return False
 
     def get_all_ids(self) -> List[str]:
-        """Get all document IDs."""
+        """Get all document IDs (reads only the ``id`` column)."""
         table = self._get_table()
         if table is None:
             return []
         try:
-            results = table.to_pandas()
-            return results["id"].tolist() if "id" in results.columns else []
+            results = table.search().select(["id"]).limit(None).to_arrow()
+            return results.column("id").to_pylist()
         except Exception as e:
             logger.error(f"Error getting all ids from LanceDB: {e}")
             return []
@@ -345,15 +903,13 @@ class LanceDBVectorStore:
             return {"ids": [], "documents": [], "metadatas": []}
         
         try:
-            filter_parts = []
-            for k, v in (where or {}).items():
-                filter_parts.append(f"json_extract(metadata, '$.{k}') = '{v}'")
+            filter_parts = self._compile_where(where or {})
             
             if not filter_parts:
                 return {"ids": [], "documents": [], "metadatas": []}
             
             filter_expr = " AND ".join(filter_parts)
-            search = table.search().where(filter_expr)
+            search = table.search().where(filter_expr).select(self._result_columns())
             
             if limit:
                 search = search.limit(limit)
@@ -363,7 +919,7 @@ class LanceDBVectorStore:
             return {
                 "ids": [r["id"] for r in results],
                 "documents": [r["document"] for r in results],
-                "metadatas": [self._parse_metadata(r.get("metadata", "{}")) for r in results],
+                "metadatas": [self._row_metadata(r) for r in results],
             }
         except Exception as e:
             logger.error(f"Error searching by metadata in LanceDB: {e}")
@@ -377,5 +933,12 @@ class LanceDBVectorStore:
             "total_documents": self.count(),
             "distance_metric": self.distance_metric,
             "embedding_dimension": self.embedding_dimension,
+            "short_dimension": self.short_dimension,
+            "id_index": self._has_id_index,
+            "metadata_columns": dict(self.metadata_columns),
+            "ann_index": self.ann_index_type if self._has_ann_index else None,
+            "ann_min_rows": self.ann_min_rows,
+            "nprobes": self.nprobes,
+            "refine_factor": self.refine_factor,
             "db_path": self.db_path,
         }
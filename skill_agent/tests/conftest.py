@@ -1,12 +1,15 @@
 """
 Pytest 配置文件
-在所有测试运行前加载环境变量
+在所有测试运行前加载环境变量，并提供共享的测试 fixture
 """
 
 import os
 import sys
 from pathlib import Path
 
+import numpy as np
+import pytest
+
 # 添加项目根目录到 sys.path
 project_root = Path(__file__).parent.parent
 sys.path.insert(0, str(project_root))
@@ -26,3 +29,137 @@ if deepseek_key:
     print(f"[OK] DEEPSEEK_API_KEY loaded (length: {len(deepseek_key)})")
 else:
     print("[WARN] DEEPSEEK_API_KEY not found in environment")
+
+
+@pytest.fixture(scope="session")
+def tiny_model(tmp_path_factory):
+    """构造一个 16 维、末 token 池化的微型 SentenceTransformer 模型"""
+    import torch
+    from sentence_transformers import SentenceTransformer, models
+    from transformers import BertConfig, BertModel, BertTokenizer
+
+    root = tmp_path_factory.mktemp("tiny_model")
+    vocab = ["[PAD]", "[UNK]", "[CLS]", "[SEP]", "[MASK]"] + list("火球术冰霜新星冲锋护盾治疗") + [
+        "fire", "ball", "ice", "the", "a"
+    ]
+    (root / "vocab.txt").write_text("\n".join(vocab), encoding="utf-8")
+    torch.manual_seed(0)
+    bert = BertModel(BertConfig(
+        vocab_size=len(vocab), hidden_size=16, num_hidden_layers=2,
+        num_attention_heads=2, intermediate_size=32, max_position_embeddings=64,
+    ))
+    bert.save_pretrained(root / "src")
+    BertTokenizer(str(root / "vocab.txt")).save_pretrained(root / "src")
+
+    st_model = SentenceTransformer(modules=[
+        models.Transformer(str(root / "src"), max_seq_length=32),
+        models.Pooling(16, pooling_mode="lasttoken"),
+        models.Normalize(),
+    ], device="cpu")
+    st_model.prompts = {"query": "ice "}
+    st_model.save(str(root / "st"))
+    return str(root / "st")
+
+
+class FakeEmbeddingGenerator:
+    """记录调用的假嵌入生成器：每条文本的向量由 embed(text) 给出（默认 8 维全 1）"""
+
+    def __init__(self, embed=None, dim=8):
+        self.embed = embed or (lambda text: np.ones(dim, dtype=np.float32))
+        self.calls = []
+
+    def encode(self, texts, prompt_name=None):
+        if isinstance(texts, str):
+            self.calls.append((texts, prompt_name))
+            return self.embed(texts)
+        texts = list(texts)
+        self.calls.append((texts, prompt_name))
+        return [self.embed(t) for t in texts]
+
+    def encode_batch(self, texts, show_progress=False):
+        return self.encode(texts)
+
+
+class FakeVectorStore:
+    """
+    记录调用的假向量存储
+
+    Args:
+        rankings: 每个查询向量依次返回的文档ID列表，或按 (向量, top_k) 生成该列表的函数
+        vectors: get_by_ids 可以读到的文档向量 {doc_id: vector}
+        fail: query 是否抛出 ValueError
+    """
+
+    def __init__(self, rankings=None, vectors=None, fail=False):
+        self.rankings = rankings if rankings is not None else []
+        self.vectors = vectors if vectors is not None else {}
+        self.fail = fail
+        self.calls = []
+
+    def query(self, query_embeddings, top_k=5, where=None, where_document=None):
+        self.calls.append((len(query_embeddings), top_k, where))
+        if self.fail:
+            raise ValueError("store offline")
+        if callable(self.rankings):
+            ids = [self.rankings(v, top_k) for v in query_embeddings]
+        else:
+            ids = [row[:top_k] for row in self.rankings[:len(query_embeddings)]]
+        return {
+            "ids": ids,
+            "documents": [[f"doc {i}" for i in row] for row in ids],
+            "metadatas": [[{"id": i} for i in row] for row in ids],
+            "distances": [[0.1 * (rank + 1) for rank in range(len(row))] for row in ids],
+        }
+
+    def get_by_ids(self, ids):
+        self.calls.append(list(ids))
+        found = [i for i in ids if i in self.vectors]
+        return {"ids": found, "embeddings": [self.vectors[i] for i in found]}
+
+
+@pytest.fixture
+def fake_generator():
+    """假嵌入生成器工厂：fake_generator(embed=None, dim=8)"""
+    return FakeEmbeddingGenerator
+
+
+@pytest.fixture
+def fake_store():
+    """假向量存储工厂：fake_store(rankings=None, vectors=None, fail=False)"""
+    return FakeVectorStore
+
+
+@pytest.fixture
+def engine_config(tmp_path, tiny_model):
+    """EnhancedRAGEngine 配置：微型模型 + 几个示例技能文件，所有持久化路径都在 tmp_path 下"""
+    import shutil
+
+    skills_source = project_root.parent / "ai_agent_for_skill" / "Assets" / "Skills"
+    skills_dir = tmp_path / "skills"
+    skills_dir.mkdir()
+    for name in ("FlameShockwave.json", "RivenBrokenWings.json",
+                 "SionSoulFurnace.json", "TryndamereSpinningSlash.json"):
+        shutil.copy(skills_source / name, skills_dir / name)
+
+    return {
+        'embedding': {'model_name': tiny_model, 'max_length': 32, 'cache_path': None, 'dimension': 16},
+        'vector_store': {'lancedb_path': str(tmp_path / "db"), 'collection_name': 'skills'},
+        'skill_indexer': {
+            'skills_directory': str(skills_dir),
+            'index_cache': str(tmp_path / "index.json"),
+            'hash_cache': str(tmp_path / "hashes.json"),
+            'version_file': str(tmp_path / "version.json"),
+        },
+        'action_indexer': {
+            'actions_directory': str(tmp_path / "actions"),
+            'action_index_cache': str(tmp_path / "action_index.json"),
+        },
+        'rag': {
+            'similarity_threshold': 0.0,
+            'trace_storage_path': str(tmp_path / "traces"),
+            'context_cache_dir': str(tmp_path / "context"),
+            'preference_storage_path': str(tmp_path / "preferences"),
+            'query_history_file': str(tmp_path / "history.json"),
+            'lazy_startup': {'preload': []},
+        },
+    }
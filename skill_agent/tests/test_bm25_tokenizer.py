@@ -0,0 +1,75 @@
+"""
+BM25 分词器单元测试
+
+验证：
+- Aho–Corasick 自动机输出全部重叠匹配
+- 词典分词把游戏术语切成整词，并输出长词内部的短词典词
+- ngram 分词保持原有的单字 + 二元组行为
+- 分词器变化后 BM25 快照失效
+"""
+
+import pytest
+
+from core.bm25_tokenizer import (
+    DictionaryTokenizer,
+    NgramTokenizer,
+    _AhoCorasick,
+    create_tokenizer,
+)
+from core.hybrid_search import BM25Index
+
+
+class TestAhoCorasick:
+    """多模式匹配测试"""
+
+    def test_overlapping_matches(self):
+        automaton = _AhoCorasick(["he", "she", "his", "hers"])
+        assert sorted(automaton.iter_matches("ushers")) == [(1, 3), (2, 2), (2, 4)]
+
+
+class TestDictionaryTokenizer:
+    """词典分词测试"""
+
+    def test_game_terms_are_single_tokens(self):
+        tokens = create_tokenizer().tokenize("雷霆一击 眩晕敌人并击退")
+
+        assert "眩晕" in tokens and "击退" in tokens
+        assert "眩" not in tokens and "晕击" not in tokens
+        # 未覆盖的片段仍按单字 + 二元组切分
+        assert {"雷", "雷霆", "敌人"} <= set(tokens)
+
+    def test_nested_terms_emitted(self):
+        tokens = DictionaryTokenizer(["范围伤害", "范围", "伤害"]).tokenize("造成范围伤害")
+        assert {"范围伤害", "范围", "伤害"} <= set(tokens)
+        assert "围伤" not in tokens
+
+    def test_unigram_fallback(self):
+        tokens = DictionaryTokenizer(["护盾"], ngram_fallback=False).tokenize("护盾吸收 Shield")
+        assert tokens == ["护盾", "吸", "收", "shield"]
+
+    def test_signature_tracks_vocabulary_and_fallback(self):
+        base = DictionaryTokenizer(["护盾"])
+        assert base.signature == DictionaryTokenizer(["护盾"]).signature
+        assert base.signature != DictionaryTokenizer(["护盾", "击退"]).signature
+        assert base.signature != DictionaryTokenizer(["护盾"], ngram_fallback=False).signature
+
+
+class TestTokenizerSelection:
+    """分词器选择与快照兼容测试"""
+
+    def test_ngram_tokenizer_keeps_legacy_output(self):
+        assert NgramTokenizer().tokenize("雷霆 Fire") == ["雷", "雷霆", "霆", "fire"]
+        assert create_tokenizer({"type": "ngram"}).signature == "ngram"
+
+    def test_unknown_type_rejected(self):
+        with pytest.raises(ValueError):
+            create_tokenizer({"type": "jieba"})
+
+    def test_snapshot_rejected_after_tokenizer_change(self, tmp_path):
+        path = str(tmp_path / "skills.bm25")
+        index = BM25Index(tokenizer=NgramTokenizer())
+        index.add_documents(["眩晕 击退"], ["stun"])
+        index.save(path, index_version=1)
+
+        assert BM25Index(tokenizer=NgramTokenizer()).load(path, expected_version=1)
+        assert not BM25Index().load(path, expected_version=1)
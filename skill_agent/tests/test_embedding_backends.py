@@ -0,0 +1,101 @@
+"""
+嵌入推理后端单元测试
+
+使用随机初始化的微型 BERT（SentenceTransformer 格式）验证：
+- ONNX 导出 / int8 量化后与 SentenceTransformer 输出数值一致
+- 导出产物复用与过期重导
+- EmbeddingGenerator 按配置切换后端且共享缓存命名空间
+"""
+
+import json
+
+import numpy as np
+import pytest
+
+pytest.importorskip("onnxruntime")
+pytest.importorskip("onnx")
+
+from core.embedding_backends import (
+    ONNX_EXPORT_META_FILE,
+    OnnxEmbeddingBackend,
+    pool_hidden_states,
+)
+from core.embeddings import EmbeddingGenerator
+
+TEXTS = ["火球术", "冰霜新星 fire ball", "冲锋", "护盾 治疗 the a fire"]
+
+
+def _cosines(a, b):
+    a = np.asarray(a)
+    b = np.asarray(b)
+    return (a * b).sum(axis=1) / (np.linalg.norm(a, axis=1) * np.linalg.norm(b, axis=1))
+
+
+class TestPooling:
+    """池化语义测试"""
+
+    def test_lasttoken_handles_left_and_right_padding(self):
+        hidden = np.arange(2 * 4 * 2, dtype=np.float32).reshape(2, 4, 2)
+        right = np.array([[1, 1, 0, 0], [1, 1, 1, 1]])
+        left = np.array([[0, 0, 1, 1], [1, 1, 1, 1]])
+
+        np.testing.assert_array_equal(pool_hidden_states(hidden, right, "lasttoken"), hidden[[0, 1], [1, 3]])
+        np.testing.assert_array_equal(pool_hidden_states(hidden, left, "lasttoken"), hidden[[0, 1], [3, 3]])
+
+    def test_mean_ignores_padding(self):
+        hidden = np.ones((1, 3, 2), dtype=np.float32)
+        hidden[0, 2] = 100
+        pooled = pool_hidden_states(hidden, np.array([[1, 1, 0]]), "mean")
+        np.testing.assert_allclose(pooled, [[1.0, 1.0]])
+
+
+class TestOnnxBackend:
+    """ONNX 后端导出与数值一致性测试"""
+
+    @pytest.mark.parametrize("quantize, min_cosine", [(False, 0.9999), (True, 0.99)])
+    def test_matches_sentence_transformers(self, tiny_model, tmp_path, quantize, min_cosine):
+        from sentence_transformers import SentenceTransformer
+
+        reference = SentenceTransformer(tiny_model, device="cpu").encode(
+            TEXTS, normalize_embeddings=True, prompt_name="query"
+        )
+        backend = OnnxEmbeddingBackend(
+            tiny_model, onnx_path=str(tmp_path / "onnx"), quantize=quantize, intra_op_threads=1
+        )
+        output = backend.encode(TEXTS, batch_size=2, normalize_embeddings=True, prompt_name="query")
+
+        assert output.shape == reference.shape
+        assert _cosines(output, reference).min() >= min_cosine
+
+    def test_export_reused_until_stale(self, tiny_model, tmp_path):
+        onnx_dir = tmp_path / "onnx"
+        first = OnnxEmbeddingBackend(tiny_model, onnx_path=str(onnx_dir), weights_digest="v1")
+        second = OnnxEmbeddingBackend(tiny_model, onnx_path=str(onnx_dir), weights_digest="v1")
+        assert second.meta["exported_at"] == first.meta["exported_at"]
+
+        third = OnnxEmbeddingBackend(tiny_model, onnx_path=str(onnx_dir), weights_digest="v2")
+        assert third.meta["exported_at"] != first.meta["exported_at"]
+        meta = json.loads((onnx_dir / ONNX_EXPORT_META_FILE).read_text(encoding="utf-8"))
+        assert meta["weights_digest"] == "v2"
+
+
+class TestBackendSelection:
+    """EmbeddingGenerator 后端切换测试"""
+
+    def test_onnx_backend_shares_cache_namespace(self, tiny_model, tmp_path):
+        base = {"model_name": tiny_model, "max_length": 32, "cache_path": str(tmp_path / "cache")}
+        st_gen = EmbeddingGenerator(base)
+        cached = st_gen.encode(TEXTS)
+        st_gen.close()
+
+        onnx_gen = EmbeddingGenerator({**base, "backend": "onnx", "onnx_path": str(tmp_path / "onnx")})
+
+        assert isinstance(onnx_gen.model, OnnxEmbeddingBackend)
+        assert onnx_gen.cache_namespace == st_gen.cache_namespace
+        np.testing.assert_array_equal(onnx_gen.encode(TEXTS), cached)
+        assert onnx_gen.get_cache_info()["l2_cache"]["hits"] == len(TEXTS)
+        onnx_gen.close()
+
+    def test_unknown_backend_rejected(self, tiny_model):
+        with pytest.raises(ValueError):
+            EmbeddingGenerator({"model_name": tiny_model, "cache_path": None, "backend": "tensorrt"})
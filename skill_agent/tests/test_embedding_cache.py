@@ -0,0 +1,339 @@
+"""
+EmbeddingGenerator 缓存单元测试
+
+使用轻量假模型替换 SentenceTransformer，只验证 L1/L2 缓存行为：
+- L2 原始字节存储格式与旧 pickle 行的惰性迁移
+- L2 批量查询 / 单事务写入 / 后台写入队列
+- L2 预算淘汰与压缩
+- 按模型指纹划分的缓存命名空间
+- 未命中文本按 token 长度分桶编码
+"""
+
+import hashlib
+import pickle
+import sqlite3
+
+import numpy as np
+import pytest
+
+import core.embeddings as embeddings_module
+from core.embeddings import DISK_CACHE_FORMAT_VERSION, EmbeddingGenerator
+
+
+class FakeSentenceTransformer:
+    """按文本内容生成确定性向量的假模型"""
+
+    DIM = 8
+
+    def __init__(self, *args, **kwargs):
+        self.encode_calls = []
+
+    def get_sentence_embedding_dimension(self):
+        return self.DIM
+
+    def encode(self, texts, batch_size=32, show_progress_bar=False,
+               convert_to_numpy=True, normalize_embeddings=True, prompt_name=None):
+        self.encode_calls.append(list(texts))
+        rows = []
+        for text in texts:
+            seed = sum(ord(c) for c in text) + (1 if prompt_name else 0)
+            vec = np.random.default_rng(seed).standard_normal(self.DIM).astype(np.float32)
+            rows.append(vec / np.linalg.norm(vec))
+        return np.stack(rows)
+
+
+@pytest.fixture
+def make_generator(monkeypatch, tmp_path):
+    monkeypatch.setattr(embeddings_module, "SentenceTransformer", FakeSentenceTransformer)
+
+    def factory(**overrides):
+        config = {
+            "model_name": "fake-model",
+            "cache_path": str(tmp_path / "embedding_cache"),
+            "l1_cache_size": 100,
+        }
+        config.update(overrides)
+        return EmbeddingGenerator(config)
+
+    return factory
+
+
+class TestDiskCacheFormat:
+    """L2 磁盘缓存存储格式测试"""
+
+    def test_encode_returns_numpy(self, make_generator):
+        gen = make_generator()
+        single = gen.encode("火球术")
+        batch = gen.encode(["火球术", "冰霜新星"])
+
+        assert isinstance(single, np.ndarray)
+        assert single.dtype == np.float32
+        assert all(isinstance(v, np.ndarray) for v in batch)
+        np.testing.assert_array_equal(single, batch[0])
+
+    def test_rows_stored_as_raw_float32(self, make_generator, tmp_path):
+        gen = make_generator()
+        vec = gen.encode("火球术")
+        gen.flush_disk_cache()
+
+        conn = sqlite3.connect(str(tmp_path / "embedding_cache" / "embeddings.db"))
+        blob, fmt, dtype, dim, model = conn.execute(
+            "SELECT embedding, format_version, dtype, dim, model FROM embeddings"
+        ).fetchone()
+        conn.close()
+
+        assert fmt == DISK_CACHE_FORMAT_VERSION
+        assert dtype == "float32"
+        assert dim == FakeSentenceTransformer.DIM
+        assert model == "fake-model"
+        assert len(blob) == FakeSentenceTransformer.DIM * 4
+        np.testing.assert_array_equal(np.frombuffer(blob, dtype="<f4"), vec)
+
+    def test_l2_hit_after_restart(self, make_generator):
+        old = make_generator()
+        first = old.encode("冲锋")
+        old.close()
+
+        gen = make_generator()
+        second = gen.encode("冲锋")
+
+        np.testing.assert_array_equal(first, second)
+        assert gen.model.encode_calls == []
+        assert gen.get_cache_info()["l2_cache"]["hits"] == 1
+
+    def test_float16_storage(self, make_generator):
+        old = make_generator(cache_dtype="float16")
+        first = old.encode("护盾")
+        old.close()
+
+        gen = make_generator(cache_dtype="float16")
+        second = gen.encode("护盾")
+
+        assert second.dtype == np.float32
+        np.testing.assert_allclose(first, second, atol=1e-3)
+
+    def test_legacy_pickle_rows_migrated_lazily(self, make_generator, tmp_path):
+        # 旧版表结构：只有 key/embedding/created_at 三列，值为 pickle 的 List[float]
+        cache_dir = tmp_path / "embedding_cache"
+        cache_dir.mkdir()
+        legacy = [0.5] * FakeSentenceTransformer.DIM
+        key = hashlib.md5("旧数据".encode("utf-8")).hexdigest()
+        conn = sqlite3.connect(str(cache_dir / "embeddings.db"))
+        conn.execute("CREATE TABLE embeddings (key TEXT PRIMARY KEY, embedding BLOB, created_at REAL)")
+        conn.execute("INSERT INTO embeddings VALUES (?, ?, 0)", (key, pickle.dumps(legacy)))
+        conn.commit()
+        conn.close()
+
+        gen = make_generator()
+        vec = gen.encode("旧数据")
+        gen.flush_disk_cache()
+
+        np.testing.assert_array_equal(vec, np.asarray(legacy, dtype=np.float32))
+        assert gen.model.encode_calls == []
+        rows = gen._db_conn.execute(
+            "SELECT key, format_version, dtype, namespace FROM embeddings"
+        ).fetchall()
+        assert rows == [(gen._get_cache_key("旧数据"), DISK_CACHE_FORMAT_VERSION, "float32", gen.cache_namespace)]
+        assert gen.get_cache_info()["l2_cache"]["legacy_migrated"] == 1
+
+    def test_order_preserved_with_partial_hits(self, make_generator):
+        gen = make_generator()
+        cached = gen.encode("B")
+        results = gen.encode(["A", "B", "C"])
+
+        np.testing.assert_array_equal(results[1], cached)
+        assert gen.model.encode_calls[-1] == ["A", "C"]
+
+
+class TestDiskCacheBatching:
+    """L2 批量读写测试"""
+
+    def _trace_statements(self, gen):
+        statements = []
+        gen._db_conn.set_trace_callback(statements.append)
+        return statements
+
+    def test_single_lookup_query_per_batch(self, make_generator):
+        gen = make_generator()
+        statements = self._trace_statements(gen)
+
+        gen.encode([f"技能{i}" for i in range(20)])
+
+        selects = [s for s in statements if s.lstrip().upper().startswith("SELECT KEY")]
+        assert len(selects) == 1
+
+    def test_lookup_chunks_large_batches(self, make_generator):
+        gen = make_generator()
+        texts = [f"技能{i}" for i in range(1200)]
+        gen.encode(texts)
+        gen.flush_disk_cache()
+        gen.clear_cache()
+
+        statements = self._trace_statements(gen)
+        results = gen.encode(texts)
+
+        selects = [s for s in statements if s.lstrip().upper().startswith("SELECT KEY")]
+        assert len(selects) == 3
+        assert len(results) == 1200
+        assert gen.get_cache_info()["l2_cache"]["hits"] == 1200
+
+    def test_sync_writes_use_one_transaction(self, make_generator):
+        gen = make_generator(cache_write_behind=False)
+
+        gen.encode([f"技能{i}" for i in range(50)])
+
+        info = gen.get_cache_info()["l2_cache"]
+        assert info["write_behind"] is False
+        assert info["size"] == 50
+        assert info["write_batches"] == 1
+
+    def test_write_behind_flush_and_close(self, make_generator):
+        gen = make_generator()
+        gen.encode([f"技能{i}" for i in range(30)])
+
+        gen.flush_disk_cache()
+        assert gen.get_cache_info()["l2_cache"]["size"] == 30
+        assert gen.get_cache_info()["l2_cache"]["pending_writes"] == 0
+
+        gen.close()
+        assert gen._writer_thread is None
+
+    def test_wal_mode_enabled(self, make_generator):
+        gen = make_generator()
+        mode = gen._db_conn.execute("PRAGMA journal_mode").fetchone()[0]
+        assert mode.lower() == "wal"
+
+
+class TestDiskCacheEviction:
+    """L2 预算淘汰测试"""
+
+    def test_row_budget_evicts_least_recently_accessed(self, make_generator):
+        gen = make_generator(cache_write_behind=False, cache_max_rows=10,
+                             cache_budget_check_interval=1)
+        gen.encode([f"旧{i}" for i in range(10)])
+        # 访问一条旧数据，使其成为最近使用
+        gen.clear_cache()
+        gen.encode("旧0")
+        gen.flush_disk_cache()
+
+        gen.encode([f"新{i}" for i in range(5)])
+
+        info = gen.get_cache_info()["l2_cache"]
+        assert info["size"] <= 10
+        assert info["evictions"] >= 5
+        survivors = gen._get_many_from_disk_cache(
+            [gen._get_cache_key(t) for t in ["旧0"] + [f"新{i}" for i in range(5)]]
+        )
+        assert len(survivors) == 6
+
+    def test_byte_budget(self, make_generator):
+        row_bytes = FakeSentenceTransformer.DIM * 4 + 32
+        gen = make_generator(cache_write_behind=False, cache_max_bytes=row_bytes * 20,
+                             cache_budget_check_interval=1)
+
+        gen.encode([f"技能{i}" for i in range(40)])
+
+        info = gen.get_cache_info()["l2_cache"]
+        assert info["payload_bytes"] <= row_bytes * 20
+        assert info["evictions"] > 0
+
+    def test_compact_disk_cache(self, make_generator):
+        gen = make_generator(cache_max_bytes=None)
+        gen.encode([f"技能{i}" for i in range(100)])
+        gen.clear_disk_cache()
+
+        result = gen.compact_disk_cache()
+
+        assert result["enabled"] is True
+        assert result["size_after_bytes"] <= result["size_before_bytes"]
+        assert gen.get_cache_info()["l2_cache"]["vacuums"] == 1
+
+    def test_hit_age_distribution(self, make_generator):
+        gen = make_generator()
+        gen.encode(["冲锋", "护盾"])
+        gen.flush_disk_cache()
+        gen.clear_cache()
+
+        gen.encode(["冲锋", "护盾"])
+
+        ages = gen.get_cache_info()["l2_cache"]["hit_age_distribution"]
+        assert ages["<1h"] == 2
+
+
+class TestCacheNamespace:
+    """模型指纹命名空间测试"""
+
+    def test_encode_options_change_namespace(self, make_generator):
+        base = make_generator(cache_path=None)
+        assert make_generator(cache_path=None).cache_namespace == base.cache_namespace
+        assert make_generator(cache_path=None, max_length=512).cache_namespace != base.cache_namespace
+        assert make_generator(cache_path=None, normalize_embeddings=False).cache_namespace != base.cache_namespace
+        assert make_generator(cache_path=None, model_name="other-model").cache_namespace != base.cache_namespace
+
+    def test_model_change_does_not_reuse_vectors(self, make_generator):
+        old = make_generator()
+        old.encode("冲锋")
+        old.close()
+
+        gen = make_generator(model_name="other-model", cache_adopt_legacy=False)
+        gen.encode("冲锋")
+
+        assert gen.model.encode_calls == [["冲锋"]]
+        assert gen.get_cache_info()["l2_cache"]["hits"] == 0
+
+    def test_weights_change_namespace(self, make_generator, tmp_path):
+        model_dir = tmp_path / "model"
+        model_dir.mkdir()
+        (model_dir / "model.safetensors").write_bytes(b"weights-v1")
+        first = make_generator(cache_path=None, model_name=str(model_dir)).cache_namespace
+
+        (model_dir / "model.safetensors").write_bytes(b"weights-v2")
+        second = make_generator(cache_path=None, model_name=str(model_dir)).cache_namespace
+
+        assert first != second
+
+    def test_purge_stale_namespaces(self, make_generator):
+        old = make_generator(model_name="other-model")
+        old.encode(["a", "b"])
+        old.close()
+
+        gen = make_generator()
+        gen.encode("c")
+
+        assert gen.purge_stale_namespaces() == 2
+        assert gen.get_cache_info()["l2_cache"]["size"] == 1
+
+
+class TestLengthBucketing:
+    """按长度分桶的动态批处理测试"""
+
+    TEXTS = ["短", "中等长度文本", "x" * 30, "长" * 12, "a", "bb", "x" * 29]
+
+    def test_batches_respect_token_budget(self, make_generator):
+        gen = make_generator(cache_path=None, batch_token_budget=40)
+        expected = make_generator(cache_path=None, batch_token_budget=None).encode(self.TEXTS, use_cache=False)
+
+        results = gen.encode(self.TEXTS, use_cache=False)
+
+        for batch in gen.model.encode_calls:
+            assert len(batch) == 1 or len(batch) * max(len(t) for t in batch) <= 40
+        assert sorted(t for batch in gen.model.encode_calls for t in batch) == sorted(self.TEXTS)
+        for got, want in zip(results, expected):
+            np.testing.assert_array_equal(got, want)
+
+    def test_short_texts_grouped_together(self, make_generator):
+        gen = make_generator(cache_path=None, batch_token_budget=40)
+        gen.encode(self.TEXTS, use_cache=False)
+
+        # 假模型无分词器，按字符数估算长度
+        assert gen.model.encode_calls == [["短", "a", "bb", "中等长度文本"], ["长" * 12], ["x" * 29], ["x" * 30]]
+        stats = gen.get_batching_stats()
+        assert stats["batches"] == 4
+        assert stats["tokens"] == 81
+        assert stats["padded_tokens"] == 4 * 6 + 12 + 29 + 30
+
+    def test_budget_disabled_uses_single_call(self, make_generator):
+        gen = make_generator(cache_path=None, batch_token_budget=None)
+        gen.encode(self.TEXTS, use_cache=False)
+
+        assert gen.model.encode_calls == [self.TEXTS]
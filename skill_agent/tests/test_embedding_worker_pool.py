@@ -0,0 +1,141 @@
+"""
+嵌入工作进程池单元测试
+
+启动真实的 spawn 工作进程（加载微型 SentenceTransformer），验证：
+- 共享内存返回的结果与进程内编码一致
+- 并发请求在时间窗内合并成批
+- EmbeddingGenerator 通过配置启用工作进程池
+- 工作进程被杀死后重启；无法重启时请求失败而不是永久等待
+"""
+
+import asyncio
+import threading
+
+import numpy as np
+import pytest
+
+from core.embedding_worker_pool import EmbeddingWorkerPool
+from core.embeddings import EmbeddingGenerator
+
+TEXTS = ["火球术", "冰霜新星 fire ball", "冲锋", "护盾 治疗 the a fire", "治疗"]
+
+
+@pytest.fixture(scope="module")
+def worker_config(tiny_model):
+    return {"model_name": tiny_model, "max_length": 32, "cache_path": None}
+
+
+@pytest.fixture(scope="module")
+def reference(worker_config):
+    generator = EmbeddingGenerator(worker_config)
+    return {
+        None: np.stack(generator.encode(TEXTS, use_cache=False)),
+        "query": np.stack(generator.encode(TEXTS, use_cache=False, prompt_name="query")),
+    }
+
+
+@pytest.fixture(scope="module")
+def pool(worker_config):
+    pool = EmbeddingWorkerPool(worker_config, num_workers=2, max_batch_size=8, batch_window_ms=50)
+    yield pool
+    pool.close()
+
+
+class TestEmbeddingWorkerPool:
+    """工作进程池测试"""
+
+    def test_results_match_in_process(self, pool, reference):
+        assert pool.get_sentence_embedding_dimension() == reference[None].shape[1]
+        np.testing.assert_allclose(pool.encode(TEXTS), reference[None], atol=1e-5)
+        np.testing.assert_allclose(pool.encode(TEXTS, prompt_name="query"), reference["query"], atol=1e-5)
+
+    def test_requests_larger_than_batch_are_split(self, pool, reference):
+        texts = TEXTS * 4
+        result = pool.encode(texts)
+
+        assert result.shape == (len(texts), reference[None].shape[1])
+        np.testing.assert_allclose(result[-len(TEXTS):], reference[None], atol=1e-5)
+
+    def test_concurrent_requests_coalesced(self, pool, reference):
+        before = pool.get_statistics()
+        results = [None] * len(TEXTS)
+        barrier = threading.Barrier(len(TEXTS))
+
+        def worker(i):
+            barrier.wait()
+            results[i] = pool.encode(TEXTS[i], prompt_name="query")
+
+        threads = [threading.Thread(target=worker, args=(i,)) for i in range(len(TEXTS))]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        after = pool.get_statistics()
+        np.testing.assert_allclose(np.stack(results), reference["query"], atol=1e-5)
+        assert after["requests"] - before["requests"] == len(TEXTS)
+        assert after["batches"] - before["batches"] < len(TEXTS)
+
+    def test_encode_async(self, pool, reference):
+        async def run():
+            return await asyncio.gather(*(pool.encode_async([t]) for t in TEXTS))
+
+        results = asyncio.run(run())
+        np.testing.assert_allclose(np.concatenate(results), reference[None], atol=1e-5)
+
+
+class TestWorkerFailure:
+    """工作进程异常退出测试"""
+
+    def _kill(self, pool, worker_id=0):
+        process = pool._processes[worker_id]
+        process.kill()
+        process.join(5)
+
+    def test_killed_worker_is_restarted(self, worker_config, reference):
+        pool = EmbeddingWorkerPool(worker_config, num_workers=1, max_batch_size=8, batch_window_ms=1)
+        try:
+            shm_name = pool._shms[0].name
+            self._kill(pool)
+
+            result = np.concatenate([f.result(timeout=120) for f in pool.submit(TEXTS)])
+            np.testing.assert_allclose(result, reference[None], atol=1e-5)
+            stats = pool.get_statistics()
+            assert stats["restarts"] == 1
+            assert stats["alive_workers"] == 1
+            assert pool._shms[0].name == shm_name
+        finally:
+            pool.close()
+
+    def test_pool_fails_requests_when_workers_exhausted(self, worker_config):
+        pool = EmbeddingWorkerPool(worker_config, num_workers=1, max_batch_size=8, max_restarts=0)
+        try:
+            self._kill(pool)
+            future = pool.submit(["火球术"])[0]
+
+            with pytest.raises(RuntimeError, match="exited"):
+                future.result(timeout=10)
+            with pytest.raises(RuntimeError):
+                pool.encode(["冲锋"])
+            assert pool.get_statistics()["broken"]
+        finally:
+            pool.close()
+
+
+class TestGeneratorIntegration:
+    """EmbeddingGenerator 启用工作进程池测试"""
+
+    def test_generator_uses_pool(self, worker_config, reference, tmp_path):
+        generator = EmbeddingGenerator({
+            **worker_config,
+            "cache_path": str(tmp_path / "cache"),
+            "worker_pool": {"enabled": True, "num_workers": 1, "batch_window_ms": 1},
+        })
+        try:
+            assert generator.uses_worker_pool
+            np.testing.assert_allclose(np.stack(generator.encode(TEXTS)), reference[None], atol=1e-5)
+            stats = generator.get_batching_stats()["worker_pool"]
+            assert stats["texts"] == len(TEXTS)
+        finally:
+            generator.close()
+        assert generator.model.get_statistics()["alive_workers"] == 0
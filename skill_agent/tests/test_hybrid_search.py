@@ -0,0 +1,492 @@
+"""
+混合检索 / BM25 索引单元测试
+
+验证：
+- 数组打分 + MaxScore 剪枝与逐条公式计算结果一致
+- BM25 增量 upsert / delete 与全量重建结果一致
+- BM25 磁盘快照保存后 mmap 加载，检索结果与内存索引一致
+- 快照与 LanceDB 表版本绑定，版本不一致时不加载
+- 写入不重写快照：全量索引结束保存一次，监听批次延迟合并保存
+- 多查询混合检索只做一次编码、一次向量检索，启用微批处理时经由 QueryBatcher
+- 仅 BM25 检索不调用嵌入模型
+- 数组化 RRF / 加权融合与逐条字典计算结果一致
+"""
+
+import os
+import random
+from collections import defaultdict
+from datetime import datetime
+
+import numpy as np
+import pytest
+
+from core.hybrid_search import BM25Index, HybridSearchEngine
+from core.incremental_indexer import FileChange, FileChangeType
+
+DOCS = {
+    "fire": "火球术 对敌人造成火焰伤害 fire ball",
+    "ice": "冰霜新星 冻结周围敌人 frost nova",
+    "stun": "雷霆一击 眩晕 并造成伤害",
+    "shield": "护盾 吸收伤害 shield",
+    "heal": "治疗术 恢复生命 heal",
+}
+
+
+def _build_index():
+    index = BM25Index()
+    index.add_documents(
+        list(DOCS.values()), list(DOCS),
+        metadatas=[{"skill_name": name, "num_tracks": i} for i, name in enumerate(DOCS)],
+    )
+    return index
+
+
+def _assert_results_equal(actual, expected):
+    assert [d for d, _ in actual] == [d for d, _ in expected]
+    np.testing.assert_allclose([s for _, s in actual], [s for _, s in expected], rtol=1e-9)
+
+
+def _assert_same_results(actual_index, expected_index, queries):
+    for query in queries:
+        _assert_results_equal(actual_index.search(query, top_k=10), expected_index.search(query, top_k=10))
+
+
+def _reference_search(index, query, top_k, doc_ids_filter=None):
+    """逐条倒排项套用 BM25 公式的参考实现"""
+    scores = defaultdict(float)
+    for term in index._tokenize(query):
+        idf = index._compute_idf(term)
+        for doc_id, tf in index.inverted_index.get(term, {}).items():
+            if doc_ids_filter and doc_id not in doc_ids_filter:
+                continue
+            norm = index.k1 * (1 - index.b + index.b * index.doc_lengths[doc_id] / index.avg_doc_length)
+            scores[doc_id] += idf * tf * (index.k1 + 1) / (tf + norm)
+    return sorted(scores.items(), key=lambda x: (-x[1], x[0]))[:top_k]
+
+
+class TestBM25Scoring:
+    """数组打分与剪枝测试"""
+
+    CHARS = "火球冰霜雷电护盾治疗眩晕击退伤害敌人周围恢复生命的了"
+
+    @pytest.fixture(scope="class")
+    def corpus_index(self):
+        rng = random.Random(0)
+        docs = [
+            "".join(rng.choice(self.CHARS) for _ in range(rng.randint(5, 120))) + f" fire{i % 5}"
+            for i in range(400)
+        ]
+        index = BM25Index()
+        index.add_documents(docs, [f"d{i}" for i in range(len(docs))])
+        return index
+
+    def test_matches_reference_with_pruning(self, corpus_index):
+        rng = random.Random(1)
+        for _ in range(60):
+            query = "".join(rng.choice(self.CHARS) for _ in range(rng.randint(1, 6))) + rng.choice(["", " fire2"])
+            top_k = rng.choice([1, 3, 10])
+            _assert_results_equal(corpus_index.search(query, top_k), _reference_search(corpus_index, query, top_k))
+
+        assert corpus_index.get_statistics()["search"]["postings_pruned"] > 0
+
+    def test_filter_accepts_set(self, corpus_index):
+        allowed = {f"d{i}" for i in range(0, 400, 3)} | {"missing"}
+        results = corpus_index.search("火球伤害", top_k=20, doc_ids_filter=allowed)
+
+        assert results and all(doc_id in allowed for doc_id, _ in results)
+        _assert_results_equal(results, _reference_search(corpus_index, "火球伤害", 20, allowed))
+
+    def test_search_multi_matches_single_queries(self, corpus_index):
+        queries = ["火球伤害", "眩晕 fire3", "护盾护盾", "不存在"]
+        batched = corpus_index.search_multi(queries, top_k=7, doc_ids_filter={f"d{i}" for i in range(200)})
+
+        assert len(batched) == len(queries)
+        for query, results in zip(queries, batched):
+            _assert_results_equal(
+                results, corpus_index.search(query, top_k=7, doc_ids_filter={f"d{i}" for i in range(200)})
+            )
+
+    def test_repeated_query_terms_weighted(self):
+        index = _build_index()
+        single = dict(index.search("护盾"))
+        double = dict(index.search("护盾 护盾"))
+        assert double["shield"] == pytest.approx(2 * single["shield"])
+
+
+class TestBM25Updates:
+    """BM25 增量更新测试"""
+
+    QUERIES = ["伤害", "fire", "冻结敌人", "护盾 shield", "眩晕 击退"]
+
+    def test_readd_replaces_old_postings(self):
+        index = _build_index()
+        index.add_documents(["冲锋 击退 charge"], ["fire"])
+
+        assert index.doc_count == len(DOCS)
+        assert "fire" not in dict(index.search("火球"))
+        assert index.search("charge")[0][0] == "fire"
+        assert "火球" not in index.inverted_index
+        assert index.forward_index["fire"] == list(dict.fromkeys(index._tokenize("冲锋 击退 charge")))
+
+    def test_delete_updates_counts_and_lengths(self):
+        index = _build_index()
+        removed = index.delete(["stun", "heal", "missing"])
+
+        expected = BM25Index()
+        remaining = {k: v for k, v in DOCS.items() if k not in ("stun", "heal")}
+        expected.add_documents(list(remaining.values()), list(remaining))
+
+        assert removed == 2
+        assert index.doc_count == 3
+        assert index.avg_doc_length == pytest.approx(expected.avg_doc_length)
+        assert set(index.inverted_index) == set(expected.inverted_index)
+        assert "stun" not in index.metadatas
+        _assert_same_results(index, expected, self.QUERIES)
+
+    def test_incremental_matches_full_rebuild(self):
+        index = _build_index()
+        index.upsert(["雷霆一击 击退 眩晕"], ["stun"])
+        index.delete(["ice"])
+        index.upsert(["冰霜新星 frost"], ["ice"])
+
+        docs = {**DOCS, "stun": "雷霆一击 击退 眩晕", "ice": "冰霜新星 frost"}
+        expected = BM25Index()
+        expected.add_documents(list(docs.values()), list(docs))
+
+        _assert_same_results(index, expected, self.QUERIES)
+
+    def test_only_touched_idf_entries_invalidated(self):
+        index = _build_index()
+        index.search("伤害 fire")
+        assert {"伤害", "fire"} <= set(index.idf_cache)
+
+        index.upsert(["火球术 fire"], ["fire"])
+
+        assert "fire" not in index.idf_cache
+        assert "伤害" not in index.idf_cache  # 旧版本文档包含该词项
+        index.search("伤害")
+        index.upsert(["新技能 nova"], ["nova"])
+        assert "伤害" in index.idf_cache
+        # 文档总数变化后缓存项在读取时重新计算
+        count, _ = index.idf_cache["伤害"]
+        assert count == len(DOCS)
+        index.search("伤害")
+        assert index.idf_cache["伤害"][0] == len(DOCS) + 1
+
+    def test_updates_after_load(self, tmp_path):
+        path = str(tmp_path / "skills.bm25")
+        _build_index().save(path)
+        loaded = BM25Index()
+        loaded.load(path)
+
+        loaded.delete(["fire"])
+
+        assert loaded.doc_count == len(DOCS) - 1
+        assert "fire" not in dict(loaded.search("伤害"))
+        assert "fire" not in loaded.inverted_index
+
+
+class TestBM25Persistence:
+    """BM25 快照读写测试"""
+
+    @pytest.mark.parametrize("query", ["伤害", "fire", "冻结敌人", "护盾 shield", "不存在"])
+    def test_loaded_index_matches_in_memory(self, tmp_path, query):
+        index = _build_index()
+        path = str(tmp_path / "skills.bm25")
+        index.save(path, index_version=3)
+
+        loaded = BM25Index()
+        assert loaded.load(path, expected_version=3)
+        assert loaded.get_statistics()["mmap_loaded"]
+
+        _assert_results_equal(loaded.search(query, top_k=10), index.search(query, top_k=10))
+        assert loaded.get_statistics()["vocabulary_size"] == index.get_statistics()["vocabulary_size"]
+
+    def test_documents_and_metadata_read_from_file(self, tmp_path):
+        path = str(tmp_path / "skills.bm25")
+        _build_index().save(path)
+
+        loaded = BM25Index()
+        assert loaded.load(path)
+        assert loaded.documents["stun"] == DOCS["stun"]
+        assert loaded.metadatas["heal"] == {"skill_name": "heal", "num_tracks": 4}
+        assert "missing" not in loaded.documents
+        assert len(loaded.documents) == len(DOCS)
+
+    def test_filter_on_loaded_index(self, tmp_path):
+        path = str(tmp_path / "skills.bm25")
+        _build_index().save(path)
+        loaded = BM25Index()
+        loaded.load(path)
+
+        results = loaded.search("伤害", doc_ids_filter=["shield", "heal"])
+        assert [d for d, _ in results] == ["shield"]
+
+    def test_add_after_load_materializes(self, tmp_path):
+        path = str(tmp_path / "skills.bm25")
+        _build_index().save(path)
+        loaded = BM25Index()
+        loaded.load(path)
+
+        loaded.add_documents(["冲锋 击退 charge"], ["charge"], [{"skill_name": "charge"}])
+
+        assert not loaded.get_statistics()["mmap_loaded"]
+        assert loaded.doc_count == len(DOCS) + 1
+        assert loaded.search("charge")[0][0] == "charge"
+        assert loaded.search("fire")[0][0] == "fire"
+
+        loaded.save(path, index_version=4)
+        reloaded = BM25Index()
+        assert reloaded.load(path, expected_version=4)
+        assert reloaded.metadatas["charge"] == {"skill_name": "charge"}
+
+    def test_stale_version_rejected(self, tmp_path):
+        path = str(tmp_path / "skills.bm25")
+        _build_index().save(path, index_version=3)
+
+        loaded = BM25Index()
+        assert not loaded.load(path, expected_version=5)
+        assert loaded.doc_count == 0
+        assert not loaded.load(str(tmp_path / "missing.bm25"))
+
+
+class TestMultiQuerySearch:
+    """多查询混合检索测试"""
+
+    def _engine(self, store, generator):
+        engine = HybridSearchEngine(store, generator)
+        engine.bm25_index.add_documents(list(DOCS.values()), list(DOCS), [{"name": k} for k in DOCS])
+        return engine
+
+    def test_one_encode_and_one_store_query(self, fake_generator, fake_store):
+        engine = self._engine(fake_store([["ice", "fire"], ["shield", "heal"]]), fake_generator())
+
+        results = engine.search_multi(["冻结敌人", "护盾 shield", "冻结敌人"], top_k=5, return_scores=True)
+
+        assert engine.embedding_generator.calls == [(["冻结敌人", "护盾 shield"], "query")]
+        assert [n for n, _, _ in engine.vector_store.calls] == [2]
+        ids = [r["doc_id"] for r in results]
+        assert {"ice", "shield"} <= set(ids[:2])
+        shield = next(r for r in results if r["doc_id"] == "shield")
+        assert shield["vector_score"] == pytest.approx(0.9)
+        assert shield["metadata"] == {"name": "shield"}
+
+    def test_rrf_sums_over_all_variants(self, fake_generator, fake_store):
+        engine = self._engine(fake_store([["heal"], ["heal"]]), fake_generator())
+        engine.bm25_index.clear()
+
+        results = engine.search_multi(["治疗", "恢复"], top_k=1)
+
+        assert results[0]["doc_id"] == "heal"
+        assert results[0]["fused_score"] == pytest.approx(round(2 / (engine.rrf_k + 1), 4))
+
+    def test_single_query_uses_search(self, fake_generator, fake_store):
+        engine = self._engine(fake_store([["fire"]]), fake_generator())
+        results = engine.search_multi(["火球", "火球"], top_k=3)
+
+        assert engine.embedding_generator.calls == [("火球", "query")]
+        assert results[0]["doc_id"] == "fire"
+
+    def test_variants_go_through_query_batcher(self, fake_generator, fake_store):
+        from core.query_batcher import QueryBatcher
+
+        engine = self._engine(fake_store([["ice"], ["shield"]]), fake_generator())
+        engine.query_batcher = QueryBatcher(engine.embedding_generator, engine.vector_store, window_ms=20)
+        try:
+            results = engine.search_multi(["冻结敌人", "护盾 shield"], top_k=5, return_scores=True)
+            stats = engine.query_batcher.get_statistics()
+        finally:
+            engine.query_batcher.close()
+
+        assert stats["requests"] == 2
+        assert stats["batches"] == 1
+        assert engine.vector_store.calls == [(2, 15, None)]
+        shield = next(r for r in results if r["doc_id"] == "shield")
+        assert shield["vector_score"] == pytest.approx(0.9)
+
+    def test_keyword_search_needs_no_embeddings(self, fake_generator, fake_store):
+        engine = self._engine(fake_store([]), fake_generator())
+        engine.bm25_index.metadatas["ice"]["school"] = "frost"
+
+        results = engine.search_keyword(["火焰伤害", "冻结"], top_k=3, return_scores=True)
+        filtered = engine.search_keyword(["敌人"], top_k=3, filters={"school": "frost"})
+
+        assert engine.embedding_generator.calls == []
+        assert engine.vector_store.calls == []
+        assert {r["doc_id"] for r in results[:2]} == {"fire", "ice"}
+        assert results[0]["fused_score"] == 1.0 and results[0]["vector_score"] == 0.0
+        assert [r["doc_id"] for r in filtered] == ["ice"]
+
+    def test_keyword_search_operator_filters(self, fake_generator, fake_store):
+        engine = self._engine(fake_store([]), fake_generator())
+        for i, doc_id in enumerate(DOCS):
+            engine.bm25_index.metadatas[doc_id].update(
+                num_tracks=i, action_type_list='["DamageAction"]' if "伤害" in DOCS[doc_id] else "[]"
+            )
+
+        results = engine.search_keyword(
+            ["伤害"], top_k=5, filters={"num_tracks": {"$gte": 1}, "action_type_list": "DamageAction"}
+        )
+
+        assert sorted(r["doc_id"] for r in results) == ["shield", "stun"]
+
+
+def _reference_rrf(bm25_lists, vector_lists, k, top_k):
+    scores = defaultdict(float)
+    for bm25_results, vector_results in zip(bm25_lists, vector_lists):
+        for rank, (doc_id, _) in enumerate(bm25_results):
+            scores[doc_id] += 1.0 / (k + rank + 1)
+        for rank, (doc_id, _) in enumerate(sorted(vector_results, key=lambda x: x[1], reverse=True)):
+            scores[doc_id] += 1.0 / (k + rank + 1)
+    return sorted(scores.items(), key=lambda x: x[1], reverse=True)[:top_k]
+
+
+def _reference_weighted(bm25_results, vector_results, bm25_w, vector_w, top_k):
+    bm25 = dict(bm25_results)
+    vector = dict(vector_results)
+    max_bm25 = max(bm25.values()) if bm25 else 1.0
+    max_vector = max(vector.values()) if vector else 1.0
+    fused = {}
+    for doc_id in list(dict.fromkeys([*bm25, *vector])):
+        fused[doc_id] = (bm25_w * bm25.get(doc_id, 0.0) / max_bm25
+                         + vector_w * vector.get(doc_id, 0.0) / max_vector)
+    return sorted(fused.items(), key=lambda x: x[1], reverse=True)[:top_k]
+
+
+class TestArrayFusion:
+    """数组化融合测试"""
+
+    def _ranking(self, rng, pool, size):
+        ids = rng.sample(pool, size)
+        scores = sorted((rng.random() for _ in ids), reverse=True)
+        return list(zip(ids, scores))
+
+    def _arrays(self, ranking):
+        ids = np.empty(len(ranking), dtype=object)
+        ids[:] = [doc_id for doc_id, _ in ranking]
+        return ids, np.array([score for _, score in ranking], dtype=np.float64)
+
+    @pytest.mark.parametrize("seed", range(5))
+    def test_matches_dict_reference(self, seed, fake_generator, fake_store):
+        rng = random.Random(seed)
+        pool = [f"doc_{i}" for i in range(60)]
+        engine = HybridSearchEngine(fake_store(), fake_generator())
+        bm25_lists = [self._ranking(rng, pool, 25) for _ in range(3)]
+        vector_lists = [self._ranking(rng, pool, 25) for _ in range(3)]
+
+        fused = engine._rrf_fusion_many(bm25_lists, [self._arrays(v) for v in vector_lists], 20)
+        expected = _reference_rrf(bm25_lists, vector_lists, engine.rrf_k, 20)
+        assert [d for d, _ in fused] == [d for d, _ in expected]
+        np.testing.assert_allclose([s for _, s in fused], [s for _, s in expected])
+
+        weighted = engine._weighted_fusion(bm25_lists[0], self._arrays(vector_lists[0]), 20, 0.3, 0.7)
+        expected = _reference_weighted(bm25_lists[0], vector_lists[0], 0.3, 0.7, 20)
+        assert [d for d, _ in weighted] == [d for d, _ in expected]
+        np.testing.assert_allclose([s for _, s in weighted], [s for _, s in expected])
+
+    def test_documents_missing_from_bm25_decoded_from_vector_results(self, fake_generator, fake_store):
+        engine = HybridSearchEngine(fake_store([["fresh", "fire"]]), fake_generator())
+        engine.bm25_index.add_documents([DOCS["fire"]], ["fire"], [{"name": "fire"}])
+
+        results = engine.search("火球", top_k=2)
+
+        fresh = next(r for r in results if r["doc_id"] == "fresh")
+        assert fresh["document"] == "doc fresh"
+        assert fresh["metadata"] == {"id": "fresh"}
+        fire = next(r for r in results if r["doc_id"] == "fire")
+        assert fire["document"] == DOCS["fire"]
+
+
+class TestHybridSearchSnapshot:
+    """HybridSearchEngine 快照与向量表版本绑定测试"""
+
+    @pytest.fixture
+    def make_engine(self, tmp_path, fake_generator):
+        pytest.importorskip("lancedb")
+        from core.vector_store_lancedb import LanceDBVectorStore
+
+        def factory():
+            store = LanceDBVectorStore(
+                {"lancedb_path": str(tmp_path / "lancedb"), "collection_name": "skills"},
+                embedding_dimension=8,
+            )
+            return HybridSearchEngine(
+                store, fake_generator(), bm25_path=str(tmp_path / "lancedb" / "skills.bm25")
+            )
+
+        return factory
+
+    def test_warm_restart_loads_snapshot(self, make_engine):
+        engine = make_engine()
+        metadatas = [{"skill_name": name} for name in DOCS]
+        assert engine.index_documents(list(DOCS.values()), list(DOCS), metadatas)
+        assert engine.bm25_dirty
+        assert engine.save_bm25_index()
+        assert not engine.bm25_dirty
+
+        restarted = make_engine()
+        assert restarted.load_bm25_index()
+        assert restarted.bm25_index.doc_count == len(DOCS)
+
+        results = restarted.search("火球 fire", top_k=3)
+        assert results[0]["doc_id"] == "fire"
+        assert results[0]["metadata"] == {"skill_name": "fire"}
+        assert results[0]["document"] == DOCS["fire"]
+
+    def test_writes_not_saved_until_requested(self, make_engine):
+        engine = make_engine()
+        engine.index_documents(list(DOCS.values()), list(DOCS), [{} for _ in DOCS])
+        engine.save_bm25_index()
+        assert engine.delete_documents(["fire"])
+        assert engine.bm25_dirty
+
+        # 写入不重写快照：旧快照版本落后于向量表，加载时被丢弃
+        assert not make_engine().load_bm25_index()
+
+        engine.save_bm25_index()
+        restarted = make_engine()
+        assert restarted.load_bm25_index()
+        assert "fire" not in restarted.bm25_index.documents
+        assert restarted.vector_store.count() == len(DOCS) - 1
+
+    def test_snapshot_discarded_after_table_changes(self, make_engine):
+        engine = make_engine()
+        engine.index_documents(list(DOCS.values()), list(DOCS), [{} for _ in DOCS])
+        engine.save_bm25_index()
+        engine.vector_store.delete_documents(["heal"])
+
+        restarted = make_engine()
+        assert not restarted.load_bm25_index()
+        assert restarted.bm25_index.doc_count == 0
+
+
+class TestEngineSnapshotSaves:
+    """EnhancedRAGEngine BM25快照保存时机测试"""
+
+    def test_watcher_batches_saved_once_after_delay(self, engine_config, monkeypatch):
+        from core.enhanced_rag_engine import EnhancedRAGEngine
+
+        engine_config['rag']['bm25_save_delay'] = 60
+        engine = EnhancedRAGEngine(engine_config)
+        saves = []
+        original_save = HybridSearchEngine.save_bm25_index
+        monkeypatch.setattr(
+            HybridSearchEngine, "save_bm25_index",
+            lambda self: saves.append(self) or original_save(self)
+        )
+
+        engine.index_skills(force_rebuild=True)
+        assert len(saves) == 1
+
+        skills_dir = engine_config['skill_indexer']['skills_directory']
+        for name in ("FlameShockwave.json", "SionSoulFurnace.json"):
+            path = os.path.join(skills_dir, name)
+            engine._apply_skill_changes([FileChange(path, FileChangeType.MODIFIED, datetime.now())])
+        assert len(saves) == 1
+        assert engine.hybrid_search.bm25_dirty
+        assert engine._bm25_save_timer is not None
+
+        engine.stop_file_watching()
+        assert len(saves) == 2
+        assert engine._bm25_save_timer is None
+        assert engine.hybrid_search.load_bm25_index()
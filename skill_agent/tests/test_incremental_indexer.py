@@ -0,0 +1,87 @@
+"""
+IncrementalIndexer 单元测试
+
+验证批量变更回调：一次扫描的全部变更合并交给回调，回调失败时下次扫描重试；
+累计变更达到阈值后触发索引重建回调
+"""
+
+import pytest
+
+from core.incremental_indexer import FileChangeType, IncrementalIndexer
+
+
+@pytest.fixture
+def skills_dir(tmp_path):
+    directory = tmp_path / "skills"
+    directory.mkdir()
+    for name in ("a", "b", "c"):
+        (directory / f"{name}.json").write_text(f'{{"skillName": "{name}"}}', encoding="utf-8")
+    return directory
+
+
+class TestBatchedChanges:
+    """批量变更回调测试"""
+
+    def test_scan_delivers_one_batch(self, skills_dir, tmp_path):
+        indexer = IncrementalIndexer(str(skills_dir), hash_cache_file=str(tmp_path / "h.json"))
+        batches = []
+        indexer.on_changes(batches.append)
+
+        result = indexer.incremental_index()
+
+        assert len(batches) == 1
+        assert len(batches[0]) == 3
+        assert {c.change_type for c in batches[0]} == {FileChangeType.CREATED}
+        assert result['stats']['created'] == 3
+
+        (skills_dir / "a.json").unlink()
+        (skills_dir / "b.json").write_text('{"skillName": "b2"}', encoding="utf-8")
+        indexer.hash_tracker.file_mtimes.clear()  # 同一秒内改写，mtime 可能不变
+        indexer.incremental_index()
+
+        assert len(batches) == 2
+        assert sorted(c.change_type.value for c in batches[1]) == ["deleted", "modified"]
+
+    def test_failed_batch_is_retried(self, skills_dir, tmp_path):
+        indexer = IncrementalIndexer(str(skills_dir), hash_cache_file=str(tmp_path / "h.json"))
+        calls = []
+
+        def flaky(changes):
+            calls.append(len(changes))
+            if len(calls) == 1:
+                raise RuntimeError("store unavailable")
+
+        indexer.on_changes(flaky)
+
+        first = indexer.incremental_index()
+        second = indexer.incremental_index()
+
+        assert not any(first['stats'].values())
+        assert second['stats']['created'] == 3
+        assert calls == [3, 3]
+
+
+class TestRebuildTrigger:
+    """索引重建触发测试"""
+
+    def test_rebuild_after_threshold(self, skills_dir, tmp_path):
+        indexer = IncrementalIndexer(
+            str(skills_dir),
+            hash_cache_file=str(tmp_path / "h.json"),
+            index_version_file=str(tmp_path / "v.json"),
+            rebuild_after_changes=4
+        )
+        rebuilds = []
+        indexer.on_rebuild(rebuilds.append)
+
+        indexer.incremental_index()
+        assert rebuilds == []
+        assert indexer.current_version.changes_since_rebuild == 3
+
+        (skills_dir / "d.json").write_text('{"skillName": "d"}', encoding="utf-8")
+        indexer.incremental_index()
+
+        assert rebuilds == [4]
+        assert indexer.current_version.changes_since_rebuild == 0
+        reloaded = IncrementalIndexer(str(skills_dir), index_version_file=str(tmp_path / "v.json"))
+        assert reloaded.current_version.changes_since_rebuild == 0
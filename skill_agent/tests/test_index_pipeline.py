@@ -0,0 +1,153 @@
+"""
+流式索引流水线单元测试
+
+验证：
+- 按顺序、按块提交全部记录，并发出各阶段进度事件
+- 阶段之间有界：解析不会领先提交太多
+- 提交失败后检查点保留已提交的块，续传时只处理剩余记录
+- 引擎续传时从向量表的行补回BM25，不依赖BM25快照
+"""
+
+import threading
+
+import pytest
+
+from core.index_pipeline import (
+    STAGE_DONE, STAGE_EMBED, STAGE_PARSE, STAGE_STORE,
+    IndexCheckpoint, IndexRecord, StreamingIndexer,
+)
+
+
+def _records(n, version="v1"):
+    return [IndexRecord(f"doc{i}", f"text {i}", {"i": i}, version) for i in range(n)]
+
+
+class _Store:
+    def __init__(self, fail_at=None):
+        self.chunks = []
+        self.fail_at = fail_at
+
+    def commit(self, chunk):
+        if self.fail_at is not None and len(self.chunks) == self.fail_at:
+            raise IOError("disk full")
+        assert len(chunk.embeddings) == len(chunk.records)
+        self.chunks.append(chunk.doc_ids)
+        return True
+
+
+def _encode(documents):
+    return [[float(len(d))] for d in documents]
+
+
+class TestStreamingIndexer:
+    """流水线测试"""
+
+    def test_commits_all_records_in_order(self):
+        store = _Store()
+        events = []
+        pipeline = StreamingIndexer(_encode, store.commit, chunk_size=4, on_progress=events.append)
+
+        stats = pipeline.run(iter(_records(10)), total=10)
+
+        assert stats["status"] == "success"
+        assert stats["committed"] == 10 and stats["chunks"] == 3
+        assert [len(c) for c in store.chunks] == [4, 4, 2]
+        assert [d for c in store.chunks for d in c] == [f"doc{i}" for i in range(10)]
+        stages = {e.stage for e in events}
+        assert stages == {STAGE_PARSE, STAGE_EMBED, STAGE_STORE, STAGE_DONE}
+        assert events[-1].stage == STAGE_DONE and events[-1].committed == 10
+
+    def test_queues_are_bounded(self):
+        produced = []
+        committed = []
+        lag = []
+
+        def records():
+            for record in _records(200):
+                produced.append(record.doc_id)
+                yield record
+
+        def commit(chunk):
+            threading.Event().wait(0.002)
+            committed.extend(chunk.doc_ids)
+            lag.append(len(produced) - len(committed))
+            return True
+
+        StreamingIndexer(_encode, commit, chunk_size=5, queue_size=1).run(records())
+
+        # 每个阶段最多各持有一块，加上两个队列各一块
+        assert max(lag) <= 5 * 5
+
+    def test_resume_after_failure(self, tmp_path):
+        checkpoint = IndexCheckpoint(str(tmp_path / "skills.checkpoint.jsonl"))
+        failing = _Store(fail_at=2)
+
+        with pytest.raises(IOError):
+            StreamingIndexer(_encode, failing.commit, chunk_size=3, checkpoint=checkpoint).run(_records(10))
+
+        committed = checkpoint.load()
+        assert sorted(committed) == sorted(f"doc{i}" for i in range(6))
+
+        # doc1 内容已变化，需要重新索引
+        records = _records(10)
+        records[1].version = "v2"
+        store = _Store()
+        stats = StreamingIndexer(_encode, store.commit, chunk_size=3, checkpoint=checkpoint).run(
+            records, resume_from=committed
+        )
+
+        assert stats["skipped"] == 5
+        assert [d for c in store.chunks for d in c] == ["doc1", "doc6", "doc7", "doc8", "doc9"]
+        assert not checkpoint.exists()
+
+    def test_failed_commit_keeps_checkpoint(self, tmp_path):
+        checkpoint = IndexCheckpoint(str(tmp_path / "skills.checkpoint.jsonl"))
+        calls = []
+
+        def commit(chunk):
+            calls.append(chunk.index)
+            return len(calls) == 1
+
+        stats = StreamingIndexer(_encode, commit, chunk_size=2, checkpoint=checkpoint).run(_records(6))
+
+        assert stats["status"] == "error" and stats["committed"] == 2
+        assert list(checkpoint.load()) == ["doc0", "doc1"]
+
+
+class TestEngineResume:
+    """EnhancedRAGEngine 中断后续传测试"""
+
+    def test_resume_restores_bm25_from_vector_rows(self, engine_config):
+        from core.enhanced_rag_engine import EnhancedRAGEngine
+
+        engine_config['rag']['index_pipeline'] = {'chunk_size': 1}
+        engine = EnhancedRAGEngine(engine_config)
+        commit = engine._commit_skill_chunk
+        commits = []
+
+        def interrupted(chunk):
+            if len(commits) == 2:
+                raise KeyboardInterrupt
+            commits.append(chunk.doc_ids)
+            return commit(chunk)
+
+        engine._commit_skill_chunk = interrupted
+        with pytest.raises(KeyboardInterrupt):
+            engine.index_skills(force_rebuild=True)
+
+        restarted = EnhancedRAGEngine(engine_config)
+        assert not restarted.hybrid_search.load_bm25_index()
+        encoded = []
+        encode_batch = restarted.embedding_generator.encode_batch
+        restarted.embedding_generator.encode_batch = (
+            lambda documents, **kwargs: encoded.extend(documents) or encode_batch(documents, **kwargs)
+        )
+
+        result = restarted.index_skills()
+
+        assert result['status'] == 'success' and result['resumed']
+        assert result['pipeline']['skipped'] == 2
+        assert len(encoded) == 2
+        assert restarted.hybrid_search.bm25_index.doc_count == 4
+        assert set(d for ids in commits for d in ids) <= set(restarted.hybrid_search.bm25_index.documents)
+        assert restarted.hybrid_search.load_bm25_index()
@@ -0,0 +1,182 @@
+"""
+延迟构建组件单元测试
+
+验证：
+- 并发访问只构建一次，并记录构建耗时
+- 构建失败后下一次访问重新尝试
+- 后台预热与 peek 不阻塞调用方
+- 代理与属性描述符按需构建、支持替换
+- 引擎在模型加载期间用 BM25 应答且不缓存，写入后查询缓存失效
+"""
+
+import os
+import threading
+import time
+from datetime import datetime
+
+import pytest
+
+from core.incremental_indexer import FileChange, FileChangeType
+from core.lazy_component import LazyComponent, LazyProxy, StartupTimings, component_attribute
+
+
+class TestLazyComponent:
+    """LazyComponent 测试"""
+
+    def test_built_once_under_concurrency(self):
+        calls = []
+
+        def factory():
+            calls.append(1)
+            time.sleep(0.05)
+            return object()
+
+        timings = StartupTimings()
+        component = LazyComponent("model", factory, timings)
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(component.get())) for _ in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        assert len(calls) == 1
+        assert len({id(r) for r in results}) == 1
+        assert timings.as_dict()["model"] >= 40
+
+    def test_failed_build_retried(self):
+        attempts = []
+
+        def factory():
+            attempts.append(1)
+            if len(attempts) == 1:
+                raise OSError("model file missing")
+            return "ready"
+
+        component = LazyComponent("model", factory)
+        with pytest.raises(OSError):
+            component.get()
+        assert not component.loaded
+        assert component.get() == "ready"
+
+    def test_preload_runs_in_background(self):
+        release = threading.Event()
+        component = LazyComponent("model", lambda: release.wait(5) and "ready")
+
+        component.preload()
+        assert component.loading
+        assert component.peek() is None
+
+        release.set()
+        assert component.get() == "ready"
+        assert component.loaded and not component.loading
+
+
+class _Engine:
+    model = component_attribute()
+
+    def __init__(self, factory):
+        self._components = {"model": LazyComponent("model", factory)}
+        self.proxy = LazyProxy(lambda: self.model)
+
+
+class TestComponentAttribute:
+    """属性描述符与代理测试"""
+
+    def test_proxy_builds_on_first_use(self):
+        built = []
+        engine = _Engine(lambda: built.append(1) or "abc")
+
+        assert built == []
+        assert engine.proxy.upper() == "ABC"
+        assert built == [1]
+
+    def test_assignment_replaces_component(self):
+        engine = _Engine(lambda: pytest.fail("factory should not run"))
+        engine.model = "stub"
+
+        assert engine.model == "stub"
+        assert engine.proxy.upper() == "STUB"
+        assert engine._components["model"].loaded
+
+
+@pytest.fixture
+def engine(engine_config):
+    from core.enhanced_rag_engine import EnhancedRAGEngine
+
+    engine = EnhancedRAGEngine(engine_config)
+    engine.index_skills(force_rebuild=True)
+    return engine
+
+
+def _slow_model(engine, release: threading.Event):
+    """把已加载的嵌入模型换成要等 release 才构建完成的组件，并开始后台预热"""
+    generator = engine.embedding_generator
+    component = LazyComponent("embedding_generator", lambda: release.wait(30) and generator)
+    engine._components["embedding_generator"] = component
+    component.preload()
+    return component
+
+
+class TestEngineLazyStartup:
+    """EnhancedRAGEngine 延迟启动测试"""
+
+    def test_serves_bm25_while_model_loading(self, engine):
+        release = threading.Event()
+        component = _slow_model(engine, release)
+        try:
+            assert engine._model_loading()
+            results = engine.search_skills("flame shockwave", top_k=2, enable_trace=False)
+
+            assert results[0]['skill_name'] == "Flame Shockwave"
+            assert component.loading
+            assert engine._stats['bm25_fallback_queries'] == 1
+            assert len(engine._query_cache) == 0
+        finally:
+            release.set()
+
+        component.get()
+        engine.search_skills("flame shockwave", top_k=2, enable_trace=False)
+        assert engine._stats['bm25_fallback_queries'] == 1
+        assert len(engine._query_cache) == 1
+
+    def test_skill_changes_invalidate_query_cache(self, engine, engine_config):
+        engine.search_skills("flame shockwave", top_k=2, enable_trace=False)
+        engine.search_skills("flame shockwave", top_k=2, enable_trace=False)
+        assert engine._stats['cache_hits'] == 1
+
+        path = os.path.join(engine_config['skill_indexer']['skills_directory'], "FlameShockwave.json")
+        engine._apply_skill_changes([FileChange(path, FileChangeType.MODIFIED, datetime.now())])
+        engine.search_skills("flame shockwave", top_k=2, enable_trace=False)
+
+        assert engine._stats['cache_hits'] == 1
+
+    def test_configured_dimension_skips_model_load(self, engine_config):
+        from core.enhanced_rag_engine import EnhancedRAGEngine
+
+        engine = EnhancedRAGEngine(engine_config)
+
+        assert engine._embedding_dimension() == 16
+        assert not engine._components["embedding_generator"].loaded
+
+    def test_dimension_mismatch_rejected(self, engine_config):
+        from core.enhanced_rag_engine import EnhancedRAGEngine
+
+        engine_config['embedding']['dimension'] = 32
+        engine = EnhancedRAGEngine(engine_config)
+
+        with pytest.raises(ValueError, match="embedding.dimension=32"):
+            engine._build_embedding_generator()
+
+    def test_statistics_and_clear_cache_without_building(self, engine_config):
+        from core.enhanced_rag_engine import EnhancedRAGEngine
+
+        engine = EnhancedRAGEngine(engine_config)
+        stats = engine.get_statistics()
+        engine.clear_cache()
+
+        assert stats['startup']['model_loading'] is False
+        assert stats['hybrid_search'] is None
+        assert stats['query_batching'] == {'skills': None, 'actions': None}
+        assert engine.startup_timings.as_dict() == {}
+        assert not any(c.loaded for c in engine._components.values())
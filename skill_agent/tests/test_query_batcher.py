@@ -0,0 +1,117 @@
+"""
+查询微批处理单元测试
+
+使用记录调用的假嵌入生成器与假向量存储，验证：
+- 时间窗内的并发查询只触发一次编码与一次多向量检索
+- 结果按各自 top_k 分发回调用方
+- 不同过滤条件分组检索，异常传递给所有调用方
+- query_many 的多条查询进入同一批次
+"""
+
+import threading
+
+import numpy as np
+import pytest
+
+from core.query_batcher import QueryBatcher
+
+
+def _embed_length(text):
+    return np.full(4, len(text), dtype=np.float32)
+
+
+def _ids_by_length(vector, top_k):
+    return [f"{int(vector[0])}_{rank}" for rank in range(top_k)]
+
+
+def _run_concurrently(batcher, calls):
+    results = [None] * len(calls)
+    errors = [None] * len(calls)
+    barrier = threading.Barrier(len(calls))
+
+    def worker(i, args):
+        barrier.wait()
+        try:
+            results[i] = batcher.query(*args)
+        except Exception as e:
+            errors[i] = e
+
+    threads = [threading.Thread(target=worker, args=(i, args)) for i, args in enumerate(calls)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return results, errors
+
+
+class TestQueryBatcher:
+    """查询合并测试"""
+
+    def test_concurrent_queries_share_one_encode_and_store_query(self, fake_generator, fake_store):
+        generator, store = fake_generator(_embed_length), fake_store(_ids_by_length)
+        batcher = QueryBatcher(generator, store, window_ms=100, max_batch_size=8)
+
+        results, errors = _run_concurrently(batcher, [("a", 2), ("bb", 3), ("ccc", 1), ("a", 2)])
+        batcher.close()
+
+        assert errors == [None] * 4
+        assert len(generator.calls) == 1
+        assert sorted(generator.calls[0][0]) == ["a", "bb", "ccc"]
+        assert generator.calls[0][1] == "query"
+        assert store.calls == [(4, 3, None)]
+        assert results[1]["ids"] == [["2_0", "2_1", "2_2"]]
+        assert results[2]["ids"] == [["3_0"]]
+        assert results[0] == results[3]
+
+        stats = batcher.get_statistics()
+        assert stats["requests"] == 4
+        assert stats["batches"] == 1
+        assert stats["batch_size_histogram"] == {4: 1}
+        assert stats["added_latency_ms"]["p95"] >= 0
+
+    def test_filters_grouped_separately(self, fake_generator, fake_store):
+        generator, store = fake_generator(_embed_length), fake_store(_ids_by_length)
+        batcher = QueryBatcher(generator, store, window_ms=100)
+
+        _run_concurrently(batcher, [("a", 2, {"k": 1}), ("bb", 2, None), ("ccc", 2, {"k": 1})])
+        batcher.close()
+
+        assert len(generator.calls) == 1
+        assert sorted(store.calls, key=str) == sorted([(2, 2, {"k": 1}), (1, 2, None)], key=str)
+
+    def test_max_batch_size_limits_batch(self, fake_generator, fake_store):
+        generator, store = fake_generator(_embed_length), fake_store(_ids_by_length)
+        batcher = QueryBatcher(generator, store, window_ms=100, max_batch_size=2)
+
+        _run_concurrently(batcher, [(t, 1) for t in ["a", "bb", "ccc", "dddd"]])
+        batcher.close()
+
+        assert all(len(texts) <= 2 for texts, _ in generator.calls)
+        assert batcher.get_statistics()["batches"] >= 2
+
+    def test_errors_propagate_to_callers(self, fake_generator, fake_store):
+        store = fake_store(_ids_by_length, fail=True)
+        batcher = QueryBatcher(fake_generator(_embed_length), store, window_ms=50)
+
+        _, errors = _run_concurrently(batcher, [("a", 1), ("bb", 1)])
+        batcher.close()
+
+        assert all(isinstance(e, ValueError) for e in errors)
+        assert batcher.get_statistics()["errors"] == 1
+
+    def test_query_many_shares_one_batch(self, fake_generator, fake_store):
+        generator, store = fake_generator(_embed_length), fake_store(_ids_by_length)
+        batcher = QueryBatcher(generator, store, window_ms=100)
+
+        results = batcher.query_many(["a", "bb", "ccc"], top_k=2)
+        batcher.close()
+
+        assert store.calls == [(3, 2, None)]
+        assert [r["ids"][0][0] for r in results] == ["1_0", "2_0", "3_0"]
+        assert batcher.get_statistics()["batches"] == 1
+
+    def test_closed_batcher_rejects_queries(self, fake_generator, fake_store):
+        batcher = QueryBatcher(fake_generator(_embed_length), fake_store(_ids_by_length))
+        batcher.close()
+        with pytest.raises(RuntimeError):
+            batcher.query("a")
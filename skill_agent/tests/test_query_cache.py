@@ -0,0 +1,134 @@
+"""
+查询缓存单元测试
+
+验证：
+- 同一索引代号下命中缓存
+- 索引代号推进后整体失效
+- 查询期间索引变化时不写回旧结果
+- 命中 / 未命中 / 失效统计
+- 语义缓存按余弦阈值、scope 命中，容量满时淘汰最久未使用条目
+- 引擎缓存键包含检索开关，开关不同的查询互不复用
+"""
+
+import numpy as np
+
+from core.query_cache import SemanticQueryCache, VersionedQueryCache
+
+
+class _Generation:
+    def __init__(self):
+        self.value = 0
+
+    def __call__(self):
+        return self.value
+
+
+class TestVersionedQueryCache:
+    """按索引代号失效的查询缓存测试"""
+
+    def test_hit_and_miss(self):
+        cache = VersionedQueryCache(_Generation())
+
+        assert cache.get("q") is None
+        assert cache.put("q", ["skill_a"])
+        assert cache.get("q") == ["skill_a"]
+
+        stats = cache.get_statistics()
+        assert (stats['hits'], stats['misses'], stats['size']) == (1, 1, 1)
+        assert stats['hit_rate'] == 0.5
+
+    def test_generation_change_invalidates(self):
+        generation = _Generation()
+        cache = VersionedQueryCache(generation)
+        cache.put("q1", [1])
+        cache.put("q2", [2])
+
+        generation.value = 1
+
+        assert cache.get("q1") is None
+        assert len(cache) == 0
+        stats = cache.get_statistics()
+        assert stats['invalidations'] == 1
+        assert stats['invalidated_entries'] == 2
+        assert stats['generation'] == 1
+
+    def test_stale_write_dropped(self):
+        generation = _Generation()
+        cache = VersionedQueryCache(generation)
+        started = cache.generation()
+
+        # 查询进行中索引被更新
+        generation.value = 1
+
+        assert not cache.put("q", ["old"], started)
+        assert cache.get("q") is None
+        assert cache.get_statistics()['stale_writes_dropped'] == 1
+
+    def test_empty_cache_still_stores(self):
+        cache = VersionedQueryCache(_Generation(), maxsize=2, ttl=60)
+        assert len(cache) == 0
+        cache.put("q", [])
+        assert cache.get("q") == []
+
+
+class TestSemanticQueryCache:
+    """按查询向量相似度命中的缓存测试"""
+
+    def test_similar_query_hits_within_threshold(self):
+        cache = SemanticQueryCache(_Generation(), threshold=0.9)
+        cache.put(np.array([1.0, 0.0, 0.0]), "top5", ["fireball"])
+
+        assert cache.get(np.array([0.95, 0.1, 0.0]), "top5") == ["fireball"]
+        assert cache.get(np.array([0.5, 0.8, 0.0]), "top5") is None
+
+        stats = cache.get_statistics()
+        assert (stats['hits'], stats['misses']) == (1, 1)
+
+    def test_scope_and_generation_must_match(self):
+        generation = _Generation()
+        cache = SemanticQueryCache(generation, threshold=0.9)
+        cache.put(np.array([1.0, 0.0]), "top5", ["a"])
+
+        assert cache.get(np.array([1.0, 0.0]), "top10") is None
+
+        generation.value = 1
+        assert cache.get(np.array([1.0, 0.0]), "top5") is None
+        assert len(cache) == 0
+        assert cache.get_statistics()['invalidations'] == 1
+
+    def test_lru_eviction(self):
+        cache = SemanticQueryCache(_Generation(), threshold=0.99, maxsize=2)
+        cache.put(np.array([1.0, 0.0, 0.0]), "s", "x")
+        cache.put(np.array([0.0, 1.0, 0.0]), "s", "y")
+        # 访问 x 后，y 成为最久未使用
+        assert cache.get(np.array([1.0, 0.0, 0.0]), "s") == "x"
+        cache.put(np.array([0.0, 0.0, 1.0]), "s", "z")
+
+        assert len(cache) == 2
+        assert cache.get(np.array([0.0, 1.0, 0.0]), "s") is None
+        assert cache.get(np.array([1.0, 0.0, 0.0]), "s") == "x"
+        assert cache.get_statistics()['evictions'] == 1
+
+
+class TestEngineCacheScope:
+    """EnhancedRAGEngine 缓存键测试"""
+
+    def test_search_options_not_shared(self, engine_config):
+        from core.enhanced_rag_engine import EnhancedRAGEngine
+
+        engine_config['rag']['semantic_cache'] = {'enabled': True, 'threshold': 0.0}
+        engine = EnhancedRAGEngine(engine_config)
+        engine.index_skills(force_rebuild=True)
+
+        summary = engine.search_skills("flame shockwave", top_k=2, enable_trace=False)
+        detailed = engine.search_skills("flame shockwave", top_k=2, enable_trace=False,
+                                        return_details=True)
+        engine.search_skills("flame shockwave", top_k=2, enable_trace=False, use_rerank=False)
+
+        assert engine._stats['cache_hits'] == 0
+        assert engine._stats['semantic_cache_hits'] == 0
+        assert 'file_path' not in summary[0]
+        assert 'file_path' in detailed[0]
+
+        engine.search_skills("flame shockwave", top_k=2, enable_trace=False, return_details=True)
+        assert engine._stats['cache_hits'] == 1
@@ -0,0 +1,83 @@
+"""
+重排序模块单元测试
+
+验证 SemanticReranker 的向量化打分：
+- 文档向量优先从向量存储按 ID 批量读取
+- 缺失的文档一次性批量编码
+- 分数与逐条余弦相似度一致
+"""
+
+import numpy as np
+import pytest
+
+from core.reranker import SemanticReranker, create_skill_reranker_pipeline
+
+DIM = 8
+
+
+def _vec(seed):
+    return np.random.default_rng(seed).standard_normal(DIM).astype(np.float32)
+
+
+def _embed(text):
+    return _vec(len(text))
+
+
+def _docs(n):
+    return [
+        {"doc_id": f"d{i}", "document": "x" * (i + 1), "score": 0.5, "metadata": {}}
+        for i in range(n)
+    ]
+
+
+def _cosine(a, b):
+    return float(np.dot(a, b) / (np.linalg.norm(a) * np.linalg.norm(b)))
+
+
+class TestSemanticReranker:
+    """语义重排序测试"""
+
+    def test_vectors_read_from_store_in_one_call(self, fake_generator, fake_store):
+        docs = _docs(5)
+        store = fake_store(vectors={d["doc_id"]: _vec(100 + i) for i, d in enumerate(docs)})
+        generator = fake_generator(_embed)
+
+        results = SemanticReranker(generator, weight=1.0, vector_store=store).rerank("火球", docs)
+
+        assert store.calls == [[d["doc_id"] for d in docs]]
+        # 只编码了查询本身
+        assert generator.calls == [("火球", "query")]
+        query = _vec(len("火球"))
+        expected = {d["doc_id"]: _cosine(store.vectors[d["doc_id"]], query) for d in docs}
+        for r in results:
+            assert r.rerank_score == pytest.approx(expected[r.doc_id], abs=1e-5)
+        assert [r.rerank_score for r in results] == sorted((r.rerank_score for r in results), reverse=True)
+
+    def test_missing_vectors_encoded_in_one_batch(self, fake_generator, fake_store):
+        docs = _docs(4)
+        store = fake_store(vectors={"d0": _vec(7)})
+        generator = fake_generator(_embed)
+
+        results = SemanticReranker(generator, weight=0.5, vector_store=store).rerank("q", docs, top_k=2)
+
+        assert len(results) == 2
+        assert generator.calls[1] == (["xx", "xxx", "xxxx"], None)
+        assert len(generator.calls) == 2
+
+    def test_embedding_on_candidate_used_directly(self, fake_generator, fake_store):
+        docs = _docs(2)
+        for i, d in enumerate(docs):
+            d["embedding"] = _vec(200 + i)
+        generator = fake_generator(_embed)
+
+        SemanticReranker(generator, vector_store=fake_store(vectors={})).rerank("q", docs)
+
+        assert generator.calls == [("q", "query")]
+
+    def test_without_generator_keeps_original_order(self):
+        results = SemanticReranker().rerank("q", _docs(3))
+        assert [r.doc_id for r in results] == ["d0", "d1", "d2"]
+
+    def test_pipeline_includes_semantic_stage_by_default(self, fake_generator):
+        pipeline = create_skill_reranker_pipeline(embedding_generator=fake_generator(_embed))
+        assert any(isinstance(stage, SemanticReranker) for stage in pipeline.stages)
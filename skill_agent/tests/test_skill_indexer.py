@@ -0,0 +1,98 @@
+"""
+技能索引器单元测试
+
+验证：
+- 进程池解析与串行解析结果一致，且按文件名排序
+- 大小与修改时间未变的文件不读取、不计算哈希
+- 仅修改时间变化（内容不变）时按哈希复用缓存
+- 内容变化的文件重新解析
+"""
+
+import os
+import shutil
+from pathlib import Path
+
+import pytest
+
+from core.skill_indexer import SkillIndexer
+
+SAMPLE_SKILLS = Path(__file__).resolve().parents[2] / "ai_agent_for_skill" / "Assets" / "Skills"
+
+
+@pytest.fixture
+def skills_dir(tmp_path):
+    # 只使用能被解析的样例（解析失败的文件不进缓存，每次都会重试）
+    parser = SkillIndexer({"skills_directory": str(SAMPLE_SKILLS), "index_cache": str(tmp_path / "probe.json")})
+    samples = [p for p in sorted(SAMPLE_SKILLS.glob("*.json")) if parser.parse_skill_file(str(p))]
+    if not samples:
+        pytest.skip("sample skill files not available")
+    target = tmp_path / "skills"
+    target.mkdir()
+    for copy in range(3):
+        for sample in samples:
+            shutil.copy(sample, target / f"{copy}_{sample.name}")
+    return target
+
+
+def _indexer(skills_dir, tmp_path, **config):
+    return SkillIndexer({
+        "skills_directory": str(skills_dir),
+        "index_cache": str(tmp_path / "skill_index.json"),
+        **config,
+    })
+
+
+def _strip_volatile(skills):
+    return [{k: v for k, v in skill.items() if k != "last_modified"} for skill in skills]
+
+
+class TestParallelParsing:
+    """并行解析测试"""
+
+    def test_pool_matches_serial(self, skills_dir, tmp_path):
+        serial = _indexer(skills_dir, tmp_path / "a").index_all_skills(force_rebuild=True)
+        indexer = _indexer(
+            skills_dir, tmp_path / "b", parse_workers=2, parse_chunk_size=3, parse_pool_min_files=1
+        )
+        parallel = indexer.index_all_skills(force_rebuild=True)
+
+        assert _strip_volatile(parallel) == _strip_volatile(serial)
+        assert [s["file_name"] for s in parallel] == sorted(s["file_name"] for s in parallel)
+        stats = indexer.last_parse_stats
+        assert stats["workers"] == 2
+        assert stats["parsed"] == len(parallel)
+        assert stats["files_per_s"] > 0 and stats["mb_per_s"] > 0
+
+
+class TestChangeDetection:
+    """缓存复用测试"""
+
+    def test_unchanged_files_not_hashed(self, skills_dir, tmp_path, monkeypatch):
+        first = _indexer(skills_dir, tmp_path).index_all_skills()
+
+        indexer = _indexer(skills_dir, tmp_path)
+        monkeypatch.setattr(indexer, "_compute_file_hash", lambda path: pytest.fail("hashed " + path))
+        monkeypatch.setattr(indexer, "parse_skill_file", lambda path: pytest.fail("parsed " + path))
+        second = indexer.index_all_skills()
+
+        assert _strip_volatile(second) == _strip_volatile(first)
+        assert indexer.last_parse_stats["unchanged_by_stat"] == len(first)
+        assert indexer.check_for_changes() == []
+
+    def test_touched_and_modified_files(self, skills_dir, tmp_path):
+        _indexer(skills_dir, tmp_path).index_all_skills()
+        files = sorted(skills_dir.glob("*.json"))
+        touched, modified = files[0], files[1]
+
+        stat = touched.stat()
+        os.utime(touched, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+        modified.write_bytes(modified.read_bytes() + b"\n")
+
+        assert _indexer(skills_dir, tmp_path).check_for_changes() == [str(modified)]
+        indexer = _indexer(skills_dir, tmp_path)
+        indexer.index_all_skills()
+
+        stats = indexer.last_parse_stats
+        assert stats["parsed"] == 1
+        assert stats["hashed"] == 2 and stats["unchanged_by_hash"] == 1
+        assert stats["unchanged_by_stat"] == len(files) - 2
@@ -0,0 +1,542 @@
+"""
+LanceDBVectorStore 单元测试
+
+使用临时目录中的真实 LanceDB 表验证：
+- 基本的写入 / 查询 / upsert
+- 按 id 的 merge_insert upsert 与 id 标量索引
+- 行数达到阈值后自动构建 ANN 索引
+- 类型化元数据列与下推过滤
+- Matryoshka 短向量两阶段检索与旧表回填
+- Arrow 列式检索结果（按需解码文档 / 元数据）
+- 多个查询向量合并为一次多向量检索
+"""
+
+import numpy as np
+import pytest
+
+pytest.importorskip("lancedb")
+
+from core.vector_result import VectorQueryResult
+from core.vector_store_lancedb import LanceDBVectorStore
+
+DIM = 32
+
+
+def _random_vectors(n, seed=0):
+    rng = np.random.default_rng(seed)
+    vectors = rng.standard_normal((n, DIM)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+@pytest.fixture
+def store(tmp_path):
+    return LanceDBVectorStore(
+        {"lancedb_path": str(tmp_path / "lancedb"), "collection_name": "test_skills"},
+        embedding_dimension=DIM,
+    )
+
+
+def _fill(store, vectors, category=lambda i: "attack" if i % 2 else "heal"):
+    ids = [f"skill_{i}" for i in range(len(vectors))]
+    store.add_documents(
+        documents=[f"doc {i}" for i in range(len(vectors))],
+        embeddings=list(vectors),
+        metadatas=[{"category": category(i)} for i in range(len(vectors))],
+        ids=ids,
+    )
+    return ids
+
+
+class TestBasicOperations:
+    """基本读写测试"""
+
+    def test_query_returns_nearest(self, store):
+        vectors = _random_vectors(20)
+        ids = _fill(store, vectors)
+
+        result = store.query([vectors[3]], top_k=3)
+
+        assert result["ids"][0][0] == ids[3]
+        assert result["distances"][0][0] == pytest.approx(0.0, abs=1e-5)
+
+    def test_upsert_replaces_existing(self, store):
+        vectors = _random_vectors(5)
+        _fill(store, vectors)
+
+        store.add_documents(["new doc"], [vectors[0]], [{"category": "buff"}], ["skill_0"])
+
+        assert store.count() == 5
+        assert store.get_by_ids(["skill_0"])["documents"] == ["new doc"]
+
+    def test_multiple_query_embeddings(self, store):
+        vectors = _random_vectors(20, seed=5)
+        ids = _fill(store, vectors)
+
+        result = store.query([vectors[2], vectors[9]], top_k=2)
+
+        assert [row[0] for row in result["ids"]] == [ids[2], ids[9]]
+        assert all(len(row) == 2 for row in result["distances"])
+
+
+class TestKeyedWrites:
+    """merge_insert upsert 与 id 索引测试"""
+
+    def test_id_index_serves_lookups(self, store):
+        _fill(store, _random_vectors(10))
+
+        assert [list(index.columns) for index in store._get_table().list_indices()] == [["id"]]
+        plan = store._get_table().search().where(store._id_filter(["skill_3"])).explain_plan(True)
+        assert "ScalarIndexQuery" in plan
+
+    def test_upsert_is_single_merge(self, store):
+        vectors = _random_vectors(6, seed=7)
+        _fill(store, vectors[:4])
+        version = store.get_version()
+
+        store.add_documents(
+            ["a", "b", "b2"], [vectors[0], vectors[4], vectors[5]],
+            [{}, {}, {}], ["skill_0", "skill_9", "skill_9"]
+        )
+
+        assert store.get_version() == version + 1
+        assert store.count() == 5
+        assert sorted(store.get_all_ids()) == ["skill_0", "skill_1", "skill_2", "skill_3", "skill_9"]
+        assert store.get_by_ids(["skill_9"])["documents"] == ["b2"]
+
+    def test_ids_with_quotes(self, store):
+        vectors = _random_vectors(2, seed=8)
+        store.add_documents(["x", "y"], list(vectors), [{}, {}], ["it's", "plain"])
+
+        assert store.update_document("it's", document="x2")
+        assert store.get_by_ids(["it's"])["documents"] == ["x2"]
+        assert store.delete_documents(["it's"])
+        assert store.get_all_ids() == ["plain"]
+
+    def test_new_rows_folded_into_index(self, tmp_path):
+        store = LanceDBVectorStore(
+            {
+                "lancedb_path": str(tmp_path / "lancedb"),
+                "collection_name": "test_skills",
+                "index_refresh_rows": 4,
+            },
+            embedding_dimension=DIM,
+        )
+        vectors = _random_vectors(12, seed=9)
+        _fill(store, vectors[:5])
+        store.add_documents(["z"] * 7, list(vectors[5:]), [{}] * 7, [f"new_{i}" for i in range(7)])
+
+        stats = store._get_table().index_stats(store._get_table().list_indices()[0].name)
+        assert stats.num_unindexed_rows == 0
+        assert store.get_by_ids(["new_6"])["ids"] == ["new_6"]
+
+    def test_small_writes_refresh_below_ann_threshold(self, tmp_path, monkeypatch):
+        store = LanceDBVectorStore(
+            {
+                "lancedb_path": str(tmp_path / "lancedb"),
+                "collection_name": "test_skills",
+                "index_refresh_rows": 3,
+                "ann_min_rows": 10000,
+            },
+            embedding_dimension=DIM,
+        )
+        vectors = _random_vectors(8, seed=10)
+        _fill(store, vectors[:2])
+        table = store._get_table()
+        optimize, inspections = table.optimize, []
+        monkeypatch.setattr(table, "optimize", lambda *a, **k: (inspections.append("optimize"), optimize(*a, **k)))
+        list_indices = table.list_indices
+        monkeypatch.setattr(table, "list_indices", lambda: (inspections.append("list"), list_indices())[1])
+
+        for i in range(6):
+            store.update_document(f"skill_{i % 2}", document=f"edit {i}", embedding=vectors[2 + i])
+
+        assert inspections.count("optimize") == 2
+        assert "list" not in inspections
+        assert store._unindexed_rows == 0
+        stats = table.index_stats(table.list_indices()[0].name)
+        assert stats.num_unindexed_rows == 0
+
+
+class TestAnnIndex:
+    """ANN 索引自动构建测试"""
+
+    def test_built_once_table_reaches_threshold(self, tmp_path):
+        store = LanceDBVectorStore(
+            {
+                "lancedb_path": str(tmp_path / "lancedb"),
+                "collection_name": "test_skills",
+                "ann_min_rows": 300,
+                "ann_num_partitions": 4,
+                "ann_num_sub_vectors": 4,
+            },
+            embedding_dimension=DIM,
+        )
+        vectors = _random_vectors(400, seed=10)
+        _fill(store, vectors[:200])
+        assert store.get_statistics()["ann_index"] is None
+
+        store.add_documents(["x"] * 200, list(vectors[200:]), [{}] * 200, [f"more_{i}" for i in range(200)])
+
+        assert store.get_statistics()["ann_index"] == "IVF_PQ"
+        result = store.query([vectors[7]], top_k=3, nprobes=4, refine_factor=20)
+        assert result["ids"][0][0] == "skill_7"
+        assert result["distances"][0][0] == pytest.approx(0.0, abs=1e-4)
+
+    def test_existing_index_detected_and_retrained(self, tmp_path):
+        vectors = _random_vectors(300, seed=11)
+        config = {
+            "lancedb_path": str(tmp_path / "lancedb"),
+            "collection_name": "test_skills",
+            "ann_min_rows": 300,
+            "ann_num_partitions": 4,
+            "ann_num_sub_vectors": 4,
+        }
+        _fill(LanceDBVectorStore(config, embedding_dimension=DIM), vectors)
+
+        store = LanceDBVectorStore(config, embedding_dimension=DIM)
+
+        assert store._has_ann_index
+        assert not store.build_vector_index()
+        assert store.build_vector_index(retrain=True)
+
+    def test_disabled(self, tmp_path):
+        store = LanceDBVectorStore(
+            {
+                "lancedb_path": str(tmp_path / "lancedb"),
+                "collection_name": "test_skills",
+                "ann_index_type": "none",
+                "ann_min_rows": 10,
+            },
+            embedding_dimension=DIM,
+        )
+        _fill(store, _random_vectors(50, seed=12))
+
+        assert not store.build_vector_index(retrain=True)
+        assert store.get_statistics()["ann_index"] is None
+
+
+TYPED_COLUMNS = {"skill_name": "string", "num_tracks": "int", "action_type_list": "list<string>"}
+
+
+def _fill_skills(store, vectors):
+    ids = [f"skill_{i}" for i in range(len(vectors))]
+    store.add_documents(
+        documents=[f"doc {i}" for i in range(len(vectors))],
+        embeddings=list(vectors),
+        metadatas=[{
+            "skill_name": f"Skill {i}",
+            "num_tracks": i,
+            "action_type_list": '["DamageAction", "MoveAction"]' if i % 2 else '["HealAction"]',
+            "file_name": f"skill_{i}.json",
+        } for i in range(len(vectors))],
+        ids=ids,
+    )
+    return ids
+
+
+class TestTypedMetadata:
+    """类型化元数据列测试"""
+
+    def test_round_trip(self, tmp_path):
+        store = LanceDBVectorStore(
+            {
+                "lancedb_path": str(tmp_path / "lancedb"),
+                "collection_name": "test_skills",
+                "metadata_columns": TYPED_COLUMNS,
+            },
+            embedding_dimension=DIM,
+        )
+        vectors = _random_vectors(4, seed=13)
+        _fill_skills(store, vectors)
+
+        table = store._get_table()
+        assert str(table.schema.field("action_type_list").type) == "list<item: string>"
+        assert table.to_arrow().column("metadata").to_pylist()[1] == '{"file_name": "skill_1.json"}'
+        metadata = store.get_by_ids(["skill_1"])["metadatas"][0]
+        assert metadata == {
+            "skill_name": "Skill 1",
+            "num_tracks": 1,
+            "action_type_list": '["DamageAction", "MoveAction"]',
+            "file_name": "skill_1.json",
+        }
+
+    def test_typed_filters(self, tmp_path):
+        store = LanceDBVectorStore(
+            {
+                "lancedb_path": str(tmp_path / "lancedb"),
+                "collection_name": "test_skills",
+                "metadata_columns": TYPED_COLUMNS,
+            },
+            embedding_dimension=DIM,
+        )
+        vectors = _random_vectors(10, seed=14)
+        _fill_skills(store, vectors)
+
+        def ids(where):
+            return sorted(store.search_by_metadata(where)["ids"])
+
+        assert ids({"num_tracks": {"$gte": 3, "$lt": 5}}) == ["skill_3", "skill_4"]
+        assert ids({"action_type_list": "HealAction", "num_tracks": {"$gt": 6}}) == ["skill_8"]
+        assert ids({"action_type_list": {"$all": ["DamageAction", "MoveAction"]}, "num_tracks": {"$lte": 3}}) \
+            == ["skill_1", "skill_3"]
+        assert ids({"$or": [{"num_tracks": 0}, {"skill_name": {"$in": ["Skill 9"]}}]}) == ["skill_0", "skill_9"]
+        assert ids({"file_name": "skill_2.json"}) == ["skill_2"]
+
+        result = store.query([vectors[5]], top_k=3, where={"action_type_list": {"$contains": "MoveAction"}})
+        assert result["ids"][0][0] == "skill_5"
+        assert all(int(i.split("_")[1]) % 2 for i in result["ids"][0])
+
+    def test_filters_use_scalar_indexes(self, tmp_path):
+        store = LanceDBVectorStore(
+            {
+                "lancedb_path": str(tmp_path / "lancedb"),
+                "collection_name": "test_skills",
+                "metadata_columns": TYPED_COLUMNS,
+            },
+            embedding_dimension=DIM,
+        )
+        _fill_skills(store, _random_vectors(10, seed=15))
+
+        predicate = store._build_filter({"num_tracks": {"$gte": 3}, "action_type_list": "HealAction"}, None)
+        plan = store._get_table().search().where(predicate).explain_plan(True)
+
+        assert "ScalarIndexQuery" in plan
+        assert "num_tracks_idx" in plan and "action_type_list_idx" in plan
+
+    def test_json_mode_equality(self, store):
+        _fill(store, _random_vectors(6, seed=16))
+
+        assert sorted(store.search_by_metadata({"category": "heal"})["ids"]) == ["skill_0", "skill_2", "skill_4"]
+        with pytest.raises(ValueError):
+            store._build_filter({"category": {"$gt": "a"}}, None)
+
+    def test_existing_table_migrated(self, store, tmp_path):
+        vectors = _random_vectors(6, seed=17)
+        _fill_skills(store, vectors)
+
+        reopened = LanceDBVectorStore(
+            {
+                "lancedb_path": str(tmp_path / "lancedb"),
+                "collection_name": "test_skills",
+                "metadata_columns": TYPED_COLUMNS,
+            },
+            embedding_dimension=DIM,
+        )
+
+        assert "num_tracks" in reopened._get_table().schema.names
+        assert sorted(reopened.search_by_metadata({"num_tracks": {"$gt": 3}})["ids"]) == ["skill_4", "skill_5"]
+        assert reopened.get_by_ids(["skill_2"])["metadatas"][0]["file_name"] == "skill_2.json"
+
+    def test_legacy_table_migrated_with_short_vectors(self, store, tmp_path):
+        vectors = _random_vectors(6, seed=18)
+        _fill_skills(store, vectors)
+
+        reopened = LanceDBVectorStore(
+            {
+                "lancedb_path": str(tmp_path / "lancedb"),
+                "collection_name": "test_skills",
+                "metadata_columns": TYPED_COLUMNS,
+                "short_dimension": 8,
+            },
+            embedding_dimension=DIM,
+        )
+
+        names = reopened._get_table().schema.names
+        assert names == reopened._schema().names
+        assert sorted(reopened.search_by_metadata({"num_tracks": {"$gt": 3}})["ids"]) == ["skill_4", "skill_5"]
+        assert reopened.query([vectors[3]], top_k=1)["ids"][0] == ["skill_3"]
+
+
+class TestTwoStageSearch:
+    """短向量两阶段检索测试"""
+
+    def test_rescored_distances_match_full_search(self, tmp_path):
+        vectors = _random_vectors(200, seed=1)
+        full = LanceDBVectorStore(
+            {"lancedb_path": str(tmp_path / "lancedb"), "collection_name": "full"},
+            embedding_dimension=DIM,
+        )
+        _fill(full, vectors)
+        # 随机向量不具备 Matryoshka 性质，候选集覆盖全表以验证重打分本身
+        short = LanceDBVectorStore(
+            {
+                "lancedb_path": str(tmp_path / "lancedb"),
+                "collection_name": "short",
+                "short_dimension": 8,
+                "short_candidate_factor": 40,
+            },
+            embedding_dimension=DIM,
+        )
+        _fill(short, vectors)
+
+        query = _random_vectors(1, seed=2)[0]
+        expected = full.query([query], top_k=5)
+        result = short.query([query], top_k=5)
+
+        assert result["ids"][0] == expected["ids"][0]
+        np.testing.assert_allclose(result["distances"][0], expected["distances"][0], atol=1e-5)
+
+    def test_filters_apply_to_candidates(self, tmp_path):
+        store = LanceDBVectorStore(
+            {
+                "lancedb_path": str(tmp_path / "lancedb"),
+                "collection_name": "test_skills",
+                "short_dimension": 8,
+            },
+            embedding_dimension=DIM,
+        )
+        vectors = _random_vectors(40, seed=3)
+        _fill(store, vectors)
+
+        result = store.query([vectors[1]], top_k=10, where_document={"$contains": "doc 2"})
+
+        assert result["ids"][0]
+        assert all(doc.startswith("doc 2") for doc in result["documents"][0])
+        assert "skill_1" not in result["ids"][0]
+
+    def test_existing_table_backfilled(self, store, tmp_path):
+        vectors = _random_vectors(10, seed=4)
+        _fill(store, vectors)
+
+        reopened = LanceDBVectorStore(
+            {
+                "lancedb_path": str(tmp_path / "lancedb"),
+                "collection_name": "test_skills",
+                "short_dimension": 8,
+            },
+            embedding_dimension=DIM,
+        )
+
+        assert "vector_short" in reopened._get_table().schema.names
+        assert reopened.count() == 10
+        short = np.asarray(reopened._get_table().to_arrow().column("vector_short").to_pylist()[0])
+        assert short.shape == (8,)
+        assert np.linalg.norm(short) == pytest.approx(1.0, abs=1e-5)
+        assert reopened.query([vectors[7]], top_k=1)["ids"][0] == ["skill_7"]
+
+    def test_short_dimension_not_smaller_than_full_is_ignored(self, tmp_path):
+        store = LanceDBVectorStore(
+            {
+                "lancedb_path": str(tmp_path / "lancedb"),
+                "collection_name": "test_skills",
+                "short_dimension": DIM,
+            },
+            embedding_dimension=DIM,
+        )
+        assert store.short_dimension is None
+
+
+class TestArrowResults:
+    """列式检索结果测试"""
+
+    def test_columnar_access(self, store):
+        vectors = _random_vectors(20, seed=5)
+        ids = _fill(store, vectors)
+
+        result = store.query([vectors[3], vectors[6]], top_k=4)
+
+        assert isinstance(result, VectorQueryResult)
+        assert result.num_queries == 2
+        assert result.ids(1)[0] == ids[6]
+        assert result.distances(0).dtype == np.float32
+        assert result.scores(0)[0] == pytest.approx(1.0, abs=1e-5)
+        assert result.documents(1, positions=[0]) == ["doc 6"]
+        assert result.metadatas(0, positions=[0]) == [{"category": "attack"}]
+        assert result["ids"][1] == list(result.ids(1))
+        assert result["metadatas"][1][0] == {"category": "heal"}
+
+        single = result.take([1], top_k=2)
+        assert single["ids"] == [[ids[6], result.ids(1)[1]]]
+
+    def test_two_stage_result_is_columnar(self, tmp_path):
+        store = LanceDBVectorStore(
+            {
+                "lancedb_path": str(tmp_path / "lancedb"),
+                "collection_name": "test_skills",
+                "short_dimension": 8,
+                "short_candidate_factor": 20,
+            },
+            embedding_dimension=DIM,
+        )
+        vectors = _random_vectors(30, seed=6)
+        _fill(store, vectors)
+
+        result = store.query([vectors[9]], top_k=3)
+
+        assert "vector" not in result.tables[0].column_names
+        assert result.ids(0)[0] == "skill_9"
+        assert np.all(np.diff(result.distances(0)) >= 0)
+
+    def test_candidates_deduplicated_before_decoding(self, store):
+        vectors = _random_vectors(10, seed=7)
+        _fill(store, vectors)
+
+        result = store.query([vectors[2], vectors[2]], top_k=5)
+        candidates = result.to_candidates()
+
+        assert [c["doc_id"] for c in candidates] == list(result.ids(0))
+        assert candidates[0]["document"] == "doc 2"
+        assert candidates[0]["score"] == pytest.approx(1.0, abs=1e-5)
+        assert len(result.to_candidates(limit=2)) == 2
+
+    def test_empty_and_dict_results(self):
+        empty = VectorQueryResult.empty(2)
+        assert empty["ids"] == [[], []]
+        assert empty.to_candidates() == []
+
+        wrapped = VectorQueryResult.coerce({"ids": [["a", "b"]], "distances": [[0.25, 0.5]],
+                                            "metadatas": [[{"k": 1}, None]]})
+        assert wrapped.scores(0).tolist() == [0.75, 0.5]
+        assert wrapped.metadatas(0) == [{"k": 1}, {}]
+
+
+class TestMultiVectorQuery:
+    """多向量批量检索测试"""
+
+    def _count_searches(self, store, monkeypatch):
+        calls = []
+        knn = store._knn
+
+        def counting(table, query, **options):
+            calls.append(np.asarray(query).ndim)
+            return knn(table, query, **options)
+
+        monkeypatch.setattr(store, "_knn", counting)
+        return calls
+
+    @pytest.mark.parametrize("options", [{}, {"short_dimension": 8, "short_candidate_factor": 20}])
+    def test_one_search_matches_single_queries(self, tmp_path, monkeypatch, options):
+        store = LanceDBVectorStore(
+            {
+                "lancedb_path": str(tmp_path / "lancedb"),
+                "collection_name": "test_skills",
+                **options,
+            },
+            embedding_dimension=DIM,
+        )
+        vectors = _random_vectors(60, seed=8)
+        _fill(store, vectors)
+        queries = [vectors[4], vectors[17], vectors[33]]
+        expected = [store.query([q], top_k=5, where={"category": "attack"}) for q in queries]
+
+        calls = self._count_searches(store, monkeypatch)
+        result = store.query(queries, top_k=5, where={"category": "attack"})
+
+        assert calls == [2]
+        for row, single in enumerate(expected):
+            assert result["ids"][row] == single["ids"][0]
+            np.testing.assert_allclose(result["distances"][row], single["distances"][0], atol=1e-5)
+
+    def test_falls_back_to_per_vector_search(self, store, monkeypatch):
+        vectors = _random_vectors(20, seed=9)
+        ids = _fill(store, vectors)
+
+        def unsupported(results, num_queries):
+            raise ValueError("result has no query_index column")
+
+        monkeypatch.setattr(store, "_split_by_query", unsupported)
+        calls = self._count_searches(store, monkeypatch)
+        result = store.query([vectors[1], vectors[5]], top_k=1)
+
+        assert calls == [2, 1, 1]
+        assert result["ids"] == [[ids[1]], [ids[5]]]